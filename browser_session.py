@@ -0,0 +1,302 @@
+"""
+Module for a persistent, warm WhatsApp Web browser session
+
+Every campaign used to call kit.open_web() and sleep while WhatsApp Web
+cold-loaded in whatever browser was the default, and relied on the user
+closing other WhatsApp tabs first. Instead, Chrome is launched once with
+the dedicated User_Data profile and a local DevTools port, and kept open
+between campaigns. Before each campaign the session is health-checked and
+its WhatsApp tab brought to the front, so a warm start takes well under a
+second:
+
+- Process: the browser owning the profile is still running
+- Tab: exactly one web.whatsapp.com tab (opened or extra ones closed via
+  the DevTools HTTP endpoints)
+- Screen: not on the QR login page and no "Use here" modal (matched
+  against templates captured once per machine, like the sent ticks)
+
+    python browser_session.py                  # launch and check the session
+    python browser_session.py capture login    # hover over the login page heading
+    python browser_session.py capture use_here # hover over the "Use here" button
+
+Without Chrome, the default browser is opened with kit.open_web() as before.
+"""
+import json
+import os
+import shutil
+import socket
+import subprocess
+import time
+import urllib.request
+from platform import system
+from typing import Dict, List, Optional, Tuple
+from delivery_confirmation import prepare_frame, load_templates, capture_template, locate
+
+PROFILE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "User_Data")
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "session")
+# Can point at a local mock page (see mock_whatsapp.py)
+WHATSAPP_URL = os.environ.get("WHATSAPP_WEB_URL", "https://web.whatsapp.com/")
+
+# Screens the health check recognizes
+LOGIN_STATE = "login"
+USE_HERE_STATE = "use_here"
+SCREEN_STATES = (LOGIN_STATE, USE_HERE_STATE)
+
+# Both screens are centered: match in the middle of the screen, downscaled
+SCREEN_FACTOR = 4
+SCREEN_TEMPLATE_SIZE = (160, 48)
+MATCH_THRESHOLD = 14.0
+
+DEFAULT_DEBUG_PORT = 9222
+
+
+class SessionNotReadyError(Exception):
+    """Raised when WhatsApp Web is not logged in or cannot be brought up"""
+
+
+def find_chrome() -> Optional[str]:
+    """Path of a Chrome/Chromium executable, or None"""
+    os_name = system().lower()
+    candidates = []
+    if os_name == "darwin":
+        candidates = ["/Applications/Google Chrome.app/Contents/MacOS/Google Chrome",
+                      "/Applications/Chromium.app/Contents/MacOS/Chromium"]
+    elif os_name == "windows":
+        for base in (os.environ.get("PROGRAMFILES", ""), os.environ.get("PROGRAMFILES(X86)", ""),
+                     os.environ.get("LOCALAPPDATA", "")):
+            if base:
+                candidates.append(os.path.join(base, "Google", "Chrome", "Application", "chrome.exe"))
+    for path in candidates:
+        if os.path.exists(path):
+            return path
+    for name in ("google-chrome", "google-chrome-stable", "chromium", "chromium-browser", "chrome"):
+        path = shutil.which(name)
+        if path:
+            return path
+    return None
+
+
+def _port_open(port: int) -> bool:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.settimeout(0.2)
+        return sock.connect_ex(("127.0.0.1", port)) == 0
+
+
+class BrowserSession:
+    """
+    Chrome running the User_Data profile with WhatsApp Web loaded.
+
+    Usage:
+        session = get_session()
+        session.ensure_ready()   # cold launch once, then < 1 s per campaign
+    """
+
+    def __init__(self, profile_dir: str = PROFILE_DIR, port: int = DEFAULT_DEBUG_PORT,
+                 template_dir: str = TEMPLATE_DIR, chrome_path: Optional[str] = None,
+                 chrome_args: Optional[List[str]] = None):
+        """
+        Args:
+            profile_dir: Chrome user data directory (keeps the WhatsApp login)
+            port: Local DevTools port used for tab health checks
+            template_dir: Directory with login.png / use_here.png screen templates
+            chrome_path: Browser executable (auto-detected if None)
+            chrome_args: Extra command-line flags for the browser
+        """
+        self.profile_dir = profile_dir
+        self.port = port
+        self.chrome_path = chrome_path or find_chrome()
+        self.chrome_args = list(chrome_args or [])
+        self.templates = load_templates(template_dir, SCREEN_FACTOR, states=SCREEN_STATES)
+        self.process: Optional[subprocess.Popen] = None
+        self.launched_at: Optional[float] = None
+        # Set when the default browser was used instead of a managed Chrome
+        self._fallback_opened = False
+
+    # ===== DevTools =====
+    def _devtools(self, path: str, method: str = "GET") -> Optional[object]:
+        """Call a DevTools HTTP endpoint; None if the browser is not reachable"""
+        request = urllib.request.Request(f"http://127.0.0.1:{self.port}{path}", method=method)
+        try:
+            with urllib.request.urlopen(request, timeout=1) as response:
+                body = response.read()
+        except OSError:
+            return None
+        try:
+            return json.loads(body)
+        except ValueError:
+            return body.decode("utf-8", errors="replace")
+
+    def whatsapp_tabs(self) -> List[Dict]:
+        """Open WhatsApp Web tabs ([] if the browser is not reachable)"""
+        targets = self._devtools("/json/list") or []
+        return [t for t in targets if t.get("type") == "page" and t.get("url", "").startswith(WHATSAPP_URL)]
+
+    @property
+    def running(self) -> bool:
+        """True if the managed browser answers on its DevTools port"""
+        if self.process is not None and self.process.poll() is not None:
+            self.process = None
+        return _port_open(self.port) and self._devtools("/json/version") is not None
+
+    # ===== Launch =====
+    def launch(self) -> None:
+        """Start Chrome with the profile and WhatsApp Web"""
+        if not self.chrome_path:
+            import pywhatkit as kit
+            kit.open_web()
+            self._fallback_opened = True
+            self.launched_at = time.monotonic()
+            return
+        os.makedirs(self.profile_dir, exist_ok=True)
+        self.process = subprocess.Popen(
+            [self.chrome_path, f"--user-data-dir={self.profile_dir}", f"--remote-debugging-port={self.port}",
+             "--no-first-run", "--no-default-browser-check", *self.chrome_args, WHATSAPP_URL],
+            stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        self.launched_at = time.monotonic()
+        deadline = time.monotonic() + 15
+        while not self.running:
+            if time.monotonic() > deadline:
+                raise SessionNotReadyError(f"Chrome did not open its DevTools port {self.port} "
+                                           f"(is another Chrome window using {self.profile_dir}?)")
+            time.sleep(0.1)
+
+    def _single_tab(self) -> bool:
+        """
+        Leave exactly one WhatsApp tab and bring it to the front.
+
+        Extra tabs are what triggers WhatsApp's "Use here" modal.
+
+        Returns:
+            True if a tab had to be opened (the app will cold-load)
+        """
+        tabs = self.whatsapp_tabs()
+        for extra in tabs[1:]:
+            self._devtools(f"/json/close/{extra['id']}")
+        if tabs:
+            self._devtools(f"/json/activate/{tabs[0]['id']}")
+            return False
+        self._devtools(f"/json/new?{WHATSAPP_URL}", method="PUT")
+        return True
+
+    # ===== Screen checks =====
+    def _find(self) -> Optional[Tuple[str, int, int]]:
+        """(state, x, y) of a recognized screen element in the middle of the screen"""
+        if not self.templates:
+            return None
+        import pyautogui as pg
+        width, height = pg.size()
+        left, top = int(width * 0.15), int(height * 0.1)
+        frame = prepare_frame(pg.screenshot(region=(left, top, int(width * 0.7), int(height * 0.8))),
+                              SCREEN_FACTOR)
+        for state in (USE_HERE_STATE, LOGIN_STATE):
+            template = self.templates.get(state)
+            if template is None:
+                continue
+            score, x, y = locate(frame, template)
+            if score <= MATCH_THRESHOLD:
+                # Center of the match, in screen coordinates
+                return (state, left + (x + template.shape[1] // 2) * SCREEN_FACTOR,
+                        top + (y + template.shape[0] // 2) * SCREEN_FACTOR)
+        return None
+
+    def screen_state(self) -> Optional[str]:
+        """
+        LOGIN_STATE or USE_HERE_STATE if that screen is showing, else None.
+
+        Always None without captured templates.
+        """
+        found = self._find()
+        return found[0] if found else None
+
+    def wait_for_login(self, timeout: float = 120, poll_interval: float = 1.0) -> None:
+        """
+        Wait while the QR login page is showing (the user scans it).
+
+        Raises:
+            SessionNotReadyError: Still not logged in after timeout
+        """
+        deadline = time.monotonic() + timeout
+        announced = False
+        while self.screen_state() == LOGIN_STATE:
+            if not announced:
+                print("📱 WhatsApp Web is not logged in - scan the QR code in the browser")
+                announced = True
+            if time.monotonic() > deadline:
+                raise SessionNotReadyError("WhatsApp Web is not logged in (QR code still showing)")
+            time.sleep(poll_interval)
+
+    # ===== Campaign entry point =====
+    def ensure_ready(self, startup_wait: float = 5.0, login_timeout: float = 120) -> bool:
+        """
+        Hand over a ready WhatsApp Web session.
+
+        Launches the browser only if it is not running; otherwise the warm
+        WhatsApp tab is brought to the front and checked.
+
+        Args:
+            startup_wait: Seconds WhatsApp Web needs to cold-load
+            login_timeout: Seconds to wait for a QR scan
+
+        Returns:
+            True if the session was already warm, False after a cold start
+
+        Raises:
+            SessionNotReadyError: Browser could not be started or not logged in
+        """
+        if not self.chrome_path:
+            # Unmanaged default browser: assume a tab opened earlier is still there
+            warm = self._fallback_opened
+            if not warm:
+                self.launch()
+                time.sleep(startup_wait)
+            return warm
+
+        warm = self.running
+        if not warm:
+            print("🌐 Starting browser with the WhatsApp profile...")
+            self.launch()
+        if self._single_tab():
+            warm = False
+        if not warm:
+            time.sleep(startup_wait)
+
+        found = self._find()
+        if found and found[0] == USE_HERE_STATE:
+            import pyautogui as pg
+            print("   ↪️ Dismissing \"Use here\" dialog")
+            pg.click(found[1], found[2])
+            time.sleep(1)
+        self.wait_for_login(timeout=login_timeout)
+        return warm
+
+    def close(self) -> None:
+        """Close the managed browser"""
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+        self.process = None
+
+
+# Shared across campaigns within one process (the Streamlit server)
+_session: Optional[BrowserSession] = None
+
+
+def get_session() -> BrowserSession:
+    """The process-wide browser session"""
+    global _session
+    if _session is None:
+        _session = BrowserSession()
+    return _session
+
+
+# ===== For standalone execution =====
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 2 and sys.argv[1] == "capture":
+        print(f"✅ Saved {capture_template(sys.argv[2], template_dir=TEMPLATE_DIR, size=SCREEN_TEMPLATE_SIZE, states=SCREEN_STATES)}")
+    else:
+        session = get_session()
+        start = time.perf_counter()
+        warm = session.ensure_ready()
+        print(f"✅ Session ready in {time.perf_counter() - start:.2f}s ({'warm' if warm else 'cold start'})")
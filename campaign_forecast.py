@@ -0,0 +1,221 @@
+"""
+Module for forecasting campaign duration from recorded per-phase timings
+
+The sender records how long each phase took (opening a chat, sending a
+recipient's content, waiting for the sent tick). At the end of a campaign
+the averages are merged into phase_timings.json, so forecasts improve with
+every run. Until something is recorded, defaults derived from the send
+helpers' waits (this machine's timing profile) are used.
+"""
+import json
+import os
+import time
+from typing import Dict, List, Optional
+from timing_profile import load_profile
+from send_events import get_event_buffer, EVENT_PHASE
+
+DEFAULT_TIMINGS_PATH = "phase_timings.json"
+
+# Content types, as used in the "send_<content>" phase names
+CONTENT_TEXT = "text"
+CONTENT_IMAGE = "image"
+CONTENT_IMAGE_TEXT = "image_text"
+
+
+def default_phases(profile: Optional[Dict[str, float]] = None) -> Dict[str, float]:
+    """
+    Seconds per phase implied by the waits in the send helpers.
+
+    Args:
+        profile: Timing profile (this machine's is loaded if None)
+    """
+    p = profile or load_profile()
+    return {
+        "startup": p["startup"],
+        # focus, address bar, paste, page load, settle
+        "navigate_url": p["focus"] + 3 * p["keystroke"] + p["page_load"] + p["chat_settle"],
+        # click, new chat panel, search, open
+        "navigate_in_app": 0.3 + p["panel_open"] + p["search_results"] + p["chat_open"],
+        "compose_text": p["keystroke"],
+        # copy_image + paste + preview
+        "compose_image": 1.0 + p["paste_settle"],
+        # fixed wait without tick confirmation
+        "submit": p["submit_wait"],
+    }
+
+# Smoothing for merging a run's averages into the stored timings
+HISTORY_WEIGHT = 0.7
+
+# Timings recorded during the current process
+_recorded: Dict[str, List[float]] = {}
+
+
+def record_phase(phase: str, seconds: float) -> None:
+    """Record how long one phase took (also published for the live dashboard)"""
+    _recorded.setdefault(phase, []).append(seconds)
+    get_event_buffer().publish(EVENT_PHASE, phase=phase, seconds=seconds)
+
+
+def recorded_phases() -> Dict[str, List[float]]:
+    """Timings recorded since the last save"""
+    return _recorded
+
+
+def load_phase_timings(path: str = DEFAULT_TIMINGS_PATH) -> Dict[str, float]:
+    """
+    Load average seconds per phase from past runs.
+
+    Returns:
+        Dictionary mapping phase name to average seconds (empty if none recorded)
+    """
+    if not os.path.exists(path):
+        return {}
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            return {k: float(v) for k, v in json.load(f).items()}
+    except (OSError, ValueError):
+        return {}
+
+
+def save_phase_timings(path: str = DEFAULT_TIMINGS_PATH) -> Dict[str, float]:
+    """
+    Merge this run's recorded timings into the stored averages and clear them.
+
+    Returns:
+        The updated averages
+    """
+    timings = load_phase_timings(path)
+    for phase, values in _recorded.items():
+        if not values:
+            continue
+        run_avg = sum(values) / len(values)
+        if phase in timings:
+            timings[phase] = HISTORY_WEIGHT * timings[phase] + (1 - HISTORY_WEIGHT) * run_avg
+        else:
+            timings[phase] = run_avg
+    _recorded.clear()
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump(timings, f, indent=2, sort_keys=True)
+    return timings
+
+
+def content_type(send_text: bool, send_image: bool) -> str:
+    """Content type name for a campaign"""
+    if send_image:
+        return CONTENT_IMAGE_TEXT if send_text else CONTENT_IMAGE
+    return CONTENT_TEXT
+
+
+def forecast_campaign(count: int, content: str, navigation: str = "in_app", pause_seconds: float = 8,
+                      timings: Optional[Dict[str, float]] = None, images: int = 1) -> Dict[str, float]:
+    """
+    Predict how long a campaign will take.
+
+    A recorded "send_<content>" average (whole per-recipient send) is used
+    when available; otherwise the time is built from per-phase timings or
+    defaults.
+
+    Args:
+        count: Number of recipients
+        content: CONTENT_TEXT, CONTENT_IMAGE or CONTENT_IMAGE_TEXT
+        navigation: "in_app" or "url"
+        pause_seconds: Pause between recipients
+        timings: Recorded phase averages (loaded from disk if None)
+        images: Images per message; an album pastes each one
+
+    Returns:
+        Dictionary with 'per_recipient' and 'total_seconds' (both in
+        seconds) and 'per_hour' (messages per hour)
+    """
+    if timings is None:
+        timings = load_phase_timings()
+    phases = dict(default_phases(), **timings)
+
+    per_recipient = timings.get(f"send_{content}")
+    if per_recipient is None:
+        per_recipient = phases.get(f"navigate_{navigation}", phases["navigate_url"]) + phases["submit"]
+        # Text and captions are pasted with the chat, whatever their length
+        if content != CONTENT_IMAGE:
+            per_recipient += phases["compose_text"]
+        if content != CONTENT_TEXT:
+            per_recipient += phases["compose_image"]
+    if content != CONTENT_TEXT and images > 1:
+        per_recipient += (images - 1) * phases["compose_image"]
+
+    cycle = per_recipient + pause_seconds
+    total = phases["startup"] + count * cycle - (pause_seconds if count else 0)
+    return {
+        'per_recipient': per_recipient,
+        'total_seconds': max(total, 0.0),
+        'per_hour': 3600.0 / cycle if cycle > 0 else 0.0,
+    }
+
+
+def format_duration(seconds: float) -> str:
+    """Format seconds as e.g. '2h 05m', '12m 30s' or '45s'"""
+    seconds = int(round(seconds))
+    hours, rest = divmod(seconds, 3600)
+    minutes, secs = divmod(rest, 60)
+    if hours:
+        return f"{hours}h {minutes:02d}m"
+    if minutes:
+        return f"{minutes}m {secs:02d}s"
+    return f"{secs}s"
+
+
+class EtaEstimator:
+    """
+    Live ETA from a moving average of recipient completion times.
+
+    Starts from the forecast and moves toward the measured pace as
+    recipients finish.
+    """
+
+    def __init__(self, total: int, per_recipient: float, alpha: float = 0.3):
+        """
+        Args:
+            total: Number of recipients in the campaign
+            per_recipient: Initial estimate (seconds, including the pause)
+            alpha: Weight of the latest measurement in the moving average
+        """
+        self.total = total
+        self.done = 0
+        self.per_recipient = per_recipient
+        self.alpha = alpha
+        self._last = time.monotonic()
+
+    def update(self, done: Optional[int] = None) -> float:
+        """
+        Note that recipients finished and return the new ETA.
+
+        Args:
+            done: Recipients finished so far (default: one more than before)
+
+        Returns:
+            Estimated seconds remaining
+        """
+        now = time.monotonic()
+        done = self.done + 1 if done is None else done
+        finished = done - self.done
+        if finished > 0:
+            sample = (now - self._last) / finished
+            self.per_recipient = self.alpha * sample + (1 - self.alpha) * self.per_recipient
+            self._last = now
+        self.done = done
+        return self.eta_seconds
+
+    def skip(self) -> float:
+        """A recipient was skipped without sending; it no longer counts"""
+        self.total = max(self.total - 1, self.done)
+        return self.eta_seconds
+
+    @property
+    def eta_seconds(self) -> float:
+        """Estimated seconds remaining"""
+        return max(self.total - self.done, 0) * self.per_recipient
+
+    @property
+    def progress(self) -> float:
+        """Fraction of recipients finished (0.0 - 1.0)"""
+        return min(self.done / self.total, 1.0) if self.total else 1.0
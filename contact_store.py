@@ -0,0 +1,193 @@
+"""
+Module for a persistent local contact directory with indexed segments
+
+Numbers extracted by phone_extractor are kept in a SQLite database with
+their extra columns (used as template fields), tags, last-sent time and
+opt-out state. Indexes on tag and last-sent time let a segment such as
+"tag=riyadh AND not messaged in 7 days" be selected in milliseconds even
+for a million contacts, without re-uploading and re-parsing a spreadsheet.
+"""
+import json
+import sqlite3
+import threading
+import time
+from typing import Dict, Iterable, List, Optional
+import pandas as pd
+
+DEFAULT_STORE_PATH = "contacts.sqlite"
+
+
+class ContactStore:
+    """
+    Local contact directory.
+
+    Example:
+        store = ContactStore()
+        store.import_records(records, tags=["riyadh"])
+        numbers = store.select(tags=["riyadh"], not_sent_within_days=7)
+    """
+
+    def __init__(self, path: str = DEFAULT_STORE_PATH):
+        self.path = path
+        # Shared by Streamlit sessions (threads) through st.cache_resource
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(path, check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS contacts (
+                phone TEXT PRIMARY KEY,
+                fields TEXT NOT NULL DEFAULT '{}',
+                opted_out INTEGER NOT NULL DEFAULT 0,
+                last_sent REAL,
+                added_at REAL NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS contacts_last_sent ON contacts (opted_out, last_sent);
+            CREATE TABLE IF NOT EXISTS tags (
+                tag TEXT NOT NULL,
+                phone TEXT NOT NULL,
+                PRIMARY KEY (tag, phone)
+            ) WITHOUT ROWID;
+            CREATE INDEX IF NOT EXISTS tags_phone ON tags (phone);
+        """)
+
+    def close(self) -> None:
+        """Close the database"""
+        with self._lock:
+            self._db.close()
+
+    def __len__(self) -> int:
+        with self._lock:
+            return self._db.execute("SELECT COUNT(*) FROM contacts").fetchone()[0]
+
+    def import_records(self, records: pd.DataFrame, tags: Optional[Iterable[str]] = None) -> int:
+        """
+        Add or update contacts from extracted records.
+
+        Args:
+            records: DataFrame from phone_extractor.extract_records_from_uploaded_file
+                (normalized, deduped phone column named in records.attrs['phone_column'])
+            tags: Tags to add to every imported contact
+
+        Returns:
+            Number of contacts imported
+        """
+        if records.empty:
+            return 0
+        phone_col = records.attrs.get('phone_column') or records.columns[0]
+        other_cols = [col for col in records.columns if col != phone_col]
+        now = time.time()
+
+        rows = []
+        for row in records[[phone_col] + other_cols].itertuples(index=False, name=None):
+            fields = {str(col): value for col, value in zip(other_cols, row[1:]) if not pd.isna(value)}
+            rows.append((row[0], json.dumps(fields, ensure_ascii=False, default=str), now))
+
+        tags = [tag.strip().lower() for tag in (tags or []) if tag and tag.strip()]
+        with self._lock, self._db:
+            # New columns are merged into the existing fields
+            self._db.executemany("""
+                INSERT INTO contacts (phone, fields, added_at) VALUES (?, ?, ?)
+                ON CONFLICT(phone) DO UPDATE SET fields = json_patch(contacts.fields, excluded.fields)
+            """, rows)
+            for tag in tags:
+                self._db.executemany("INSERT OR IGNORE INTO tags VALUES (?, ?)", ((tag, r[0]) for r in rows))
+        return len(rows)
+
+    def add_tags(self, phones: Iterable[str], tags: Iterable[str]) -> None:
+        """Tag existing contacts"""
+        phones = list(phones)
+        with self._lock, self._db:
+            for tag in tags:
+                self._db.executemany("INSERT OR IGNORE INTO tags VALUES (?, ?)",
+                                     ((tag.strip().lower(), phone) for phone in phones))
+
+    def tags(self) -> Dict[str, int]:
+        """All tags with their contact counts"""
+        with self._lock:
+            return dict(self._db.execute("SELECT tag, COUNT(*) FROM tags GROUP BY tag ORDER BY tag").fetchall())
+
+    def set_opted_out(self, phones: Iterable[str], opted_out: bool = True) -> None:
+        """Mark contacts as opted out (never selected) or opted back in"""
+        with self._lock, self._db:
+            self._db.executemany("UPDATE contacts SET opted_out = ? WHERE phone = ?",
+                                 ((int(opted_out), phone) for phone in phones))
+
+    def opted_out(self) -> List[str]:
+        """Numbers of all opted-out contacts"""
+        with self._lock:
+            return [row[0] for row in self._db.execute("SELECT phone FROM contacts WHERE opted_out = 1")]
+
+    def mark_sent(self, phones: Iterable[str], when: Optional[float] = None) -> None:
+        """Record that contacts were just messaged"""
+        when = time.time() if when is None else when
+        with self._lock, self._db:
+            self._db.executemany("UPDATE contacts SET last_sent = ? WHERE phone = ?",
+                                 ((when, phone) for phone in phones))
+
+    def _segment_query(self, columns: str, tags: Optional[Iterable[str]], not_sent_within_days: Optional[float],
+                       include_opted_out: bool, limit: Optional[int]):
+        tags = [tag.strip().lower() for tag in (tags or []) if tag and tag.strip()]
+        params: list = []
+        conditions = []
+        if tags:
+            # Drive the query from the first tag's index entries (CROSS JOIN
+            # keeps SQLite from scanning contacts instead), then check the
+            # other tags with primary-key lookups
+            sql = f"SELECT {columns} FROM tags t0 CROSS JOIN contacts c ON c.phone = t0.phone"
+            for i, tag in enumerate(tags[1:], 1):
+                sql += f" JOIN tags t{i} ON t{i}.tag = ? AND t{i}.phone = c.phone"
+                params.append(tag)
+            conditions.append("t0.tag = ?")
+            params.append(tags[0])
+        else:
+            sql = f"SELECT {columns} FROM contacts c"
+        if not include_opted_out:
+            conditions.append("c.opted_out = 0")
+        if not_sent_within_days:
+            conditions.append("(c.last_sent IS NULL OR c.last_sent < ?)")
+            params.append(time.time() - not_sent_within_days * 86400)
+        if conditions:
+            sql += " WHERE " + " AND ".join(conditions)
+        sql += " ORDER BY c.rowid"
+        if limit:
+            sql += " LIMIT ?"
+            params.append(limit)
+        return sql, params
+
+    def select(self, tags: Optional[Iterable[str]] = None, not_sent_within_days: Optional[float] = None,
+               include_opted_out: bool = False, limit: Optional[int] = None) -> List[str]:
+        """
+        Select a segment of numbers.
+
+        Args:
+            tags: Contacts must have all of these tags
+            not_sent_within_days: Only contacts not messaged in this many days
+            include_opted_out: Also return opted-out contacts
+            limit: Maximum number of contacts
+
+        Returns:
+            Phone numbers in import order
+        """
+        sql, params = self._segment_query("c.phone", tags, not_sent_within_days, include_opted_out, limit)
+        with self._lock:
+            return [row[0] for row in self._db.execute(sql, params)]
+
+    def select_records(self, tags: Optional[Iterable[str]] = None, not_sent_within_days: Optional[float] = None,
+                       include_opted_out: bool = False, limit: Optional[int] = None) -> pd.DataFrame:
+        """
+        Select a segment with its stored fields, ready for send_messages_from_ui.
+
+        Returns:
+            DataFrame with a 'phone' column plus the stored fields
+            (records.attrs['phone_column'] == 'phone')
+        """
+        sql, params = self._segment_query("c.phone, c.fields", tags, not_sent_within_days, include_opted_out, limit)
+        with self._lock:
+            rows = self._db.execute(sql, params).fetchall()
+        rows = [dict(json.loads(fields), phone=phone) for phone, fields in rows]
+        records = pd.DataFrame(rows)
+        if records.empty:
+            records = pd.DataFrame({'phone': []})
+        records = records[['phone'] + [col for col in records.columns if col != 'phone']]
+        records.attrs['phone_column'] = 'phone'
+        return records
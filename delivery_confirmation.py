@@ -0,0 +1,356 @@
+"""
+Module for confirming a message went out by watching for its sent tick
+
+After Enter is pressed, a small strip of the screen just above the composer
+(where the newest outgoing bubble ends) is captured, downscaled and
+grayscaled, and matched against tick templates. Only the bottom-most icon
+counts - the newest bubble - and only if that bubble's end (timestamp and
+icon) appears nowhere in the capture taken before Enter, so the tick of an
+older message never confirms a send, even after the chat scrolled. Waiting stops as soon as a tick appears instead of
+sleeping a fixed 5 seconds.
+
+Tick templates are screenshots of WhatsApp Web's own icons, captured once
+per machine (theme and zoom change how they look):
+
+    python delivery_confirmation.py capture delivered
+    python delivery_confirmation.py capture clock
+
+Hover the mouse over the icon during the 5 second countdown. Without
+templates, confirmation is unavailable and the caller falls back to a
+fixed wait.
+
+ChatHeaderCheck applies the same capture to the chat header, to tell
+whether opening a chat inside WhatsApp Web switched chats at all.
+"""
+import glob
+import os
+import time
+from typing import Dict, Iterable, Optional, Tuple
+import numpy as np
+from PIL import Image
+
+TEMPLATE_DIR = os.path.join(os.path.dirname(os.path.abspath(__file__)), "assets", "ticks")
+
+# Icons that mean the message left the composer, and the pending clock
+TICK_STATES = ("sent", "delivered", "read")
+PENDING_STATE = "clock"
+
+# Size of the box captured around the mouse for a template
+TEMPLATE_SIZE = (24, 18)
+
+# Width of a bubble's end (timestamp and icon), in icon widths, compared
+# with the capture from before Enter; and the mean gray-level difference
+# below which it counts as the same bubble
+BUBBLE_END_WIDTH = 8
+SEEN_THRESHOLD = 1.0
+
+
+class DeliveryNotConfirmedError(Exception):
+    """Raised when no sent tick appeared in time (message may be stuck in the composer)"""
+
+
+class ChatNotOpenedError(Exception):
+    """Raised when in-app navigation left the previous chat (or none) on screen"""
+
+
+def prepare_frame(img: Image.Image, factor: int) -> np.ndarray:
+    """Grayscale and downscale an image for matching"""
+    img = img.convert("L")
+    if factor > 1:
+        img = img.reduce(factor)
+    return np.asarray(img, dtype=np.float32)
+
+
+def locate(haystack: np.ndarray, needle: np.ndarray) -> Tuple[float, int, int]:
+    """
+    Slide needle over haystack and find the closest window.
+
+    Both are small downscaled grayscale arrays, so a plain numpy sliding
+    window is fast enough for polling several times a second.
+
+    Returns:
+        (lowest mean absolute difference, x, y) of the best window
+    """
+    if needle.shape[0] > haystack.shape[0] or needle.shape[1] > haystack.shape[1]:
+        return float("inf"), 0, 0
+    windows = np.lib.stride_tricks.sliding_window_view(haystack, needle.shape)
+    scores = np.abs(windows - needle).mean(axis=(2, 3))
+    y, x = np.unravel_index(np.argmin(scores), scores.shape)
+    return float(scores[y, x]), int(x), int(y)
+
+
+def best_match(haystack: np.ndarray, needle: np.ndarray) -> float:
+    """Lowest mean absolute difference of needle anywhere in haystack"""
+    return locate(haystack, needle)[0]
+
+
+def lowest_match(haystack: np.ndarray, needle: np.ndarray, threshold: float) -> Optional[Tuple[float, int, int]]:
+    """
+    Find the bottom-most window of haystack that matches needle.
+
+    Returns:
+        (mean absolute difference, x, y) of the best window in the lowest
+        matching row, or None if no window is within threshold
+    """
+    if needle.shape[0] > haystack.shape[0] or needle.shape[1] > haystack.shape[1]:
+        return None
+    windows = np.lib.stride_tricks.sliding_window_view(haystack, needle.shape)
+    scores = np.abs(windows - needle).mean(axis=(2, 3))
+    rows = np.nonzero((scores <= threshold).any(axis=1))[0]
+    if not len(rows):
+        return None
+    y = int(rows[-1])
+    x = int(np.argmin(scores[y]))
+    return float(scores[y, x]), x, y
+
+
+def load_templates(template_dir: str = TEMPLATE_DIR, factor: int = 2,
+                   states: Iterable[str] = TICK_STATES + (PENDING_STATE,)) -> Dict[str, np.ndarray]:
+    """Load templates (<state>.png) for the given states, prepared for matching"""
+    states = set(states)
+    templates = {}
+    for path in glob.glob(os.path.join(template_dir, "*.png")):
+        state = os.path.splitext(os.path.basename(path))[0]
+        if state in states:
+            with Image.open(path) as img:
+                templates[state] = prepare_frame(img, factor)
+    return templates
+
+
+class SentTickWatcher:
+    """
+    Watches the newest outgoing bubble for the clock-to-tick transition.
+
+    Usage:
+        watcher.arm()          # before pressing Enter
+        pg.press("enter")
+        elapsed = watcher.wait(timeout=15)   # None if no tick appeared
+    """
+
+    def __init__(self, region: Optional[Tuple[int, int, int, int]] = None, factor: int = 2,
+                 threshold: float = 14.0, template_dir: str = TEMPLATE_DIR):
+        """
+        Args:
+            region: (left, top, width, height) of the strip above the composer
+                to watch; defaults to the right part of the chat pane
+            factor: Downscale factor applied before matching
+            threshold: Max mean gray-level difference for a template match
+            template_dir: Directory with <state>.png templates
+        """
+        self.region = region
+        self.factor = factor
+        self.threshold = threshold
+        self.templates = load_templates(template_dir, factor)
+        self._baseline: Optional[np.ndarray] = None
+
+    @property
+    def available(self) -> bool:
+        """True if at least one tick template is installed"""
+        return any(state in self.templates for state in TICK_STATES)
+
+    def _region(self) -> Tuple[int, int, int, int]:
+        if self.region is None:
+            import pyautogui as pg
+            width, height = pg.size()
+            # Bottom-right of the chat pane, just above the composer
+            self.region = (int(width * 0.55), int(height * 0.78), int(width * 0.43), int(height * 0.12))
+        return self.region
+
+    def grab(self) -> np.ndarray:
+        """Capture and prepare the watched region"""
+        import pyautogui as pg
+        return prepare_frame(pg.screenshot(region=self._region()), self.factor)
+
+    def arm(self) -> None:
+        """Remember how the region looks before the message is submitted"""
+        self._baseline = self.grab()
+
+    def newest_icon(self, frame: np.ndarray) -> Optional[Tuple[str, int, int, Tuple[int, int]]]:
+        """
+        Find the icon of the newest (bottom-most) bubble in a frame.
+
+        Returns:
+            (state, x, y, (height, width)) of the icon, or None if the frame shows none
+        """
+        found = []
+        for state in (PENDING_STATE,) + TICK_STATES:
+            template = self.templates.get(state)
+            if template is None:
+                continue
+            match = lowest_match(frame, template, self.threshold)
+            if match is not None:
+                score, x, y = match
+                found.append((score, state, x, y, template.shape))
+        if not found:
+            return None
+        # Icons matched on the same bubble: the closest template names it
+        bottom = max(m[3] for m in found)
+        _, state, x, y, shape = min((m for m in found if m[3] >= bottom - m[4][0] // 2), key=lambda m: m[0])
+        return state, x, y, shape
+
+    def seen_before(self, frame: np.ndarray, x: int, y: int, shape: Tuple[int, int]) -> bool:
+        """
+        True if the bubble end at (x, y) was already on screen at arm().
+
+        The icon with the timestamp left of it is looked up in the capture
+        taken before Enter at every height, so an older message still counts
+        as seen after the chat scrolled or shifted.
+        """
+        if self._baseline is None or self._baseline.shape != frame.shape:
+            return False
+        height, width = shape
+        cols = slice(max(0, x - BUBBLE_END_WIDTH * width), x + width)
+        score, _, _ = locate(self._baseline[:, cols], frame[y:y + height, cols])
+        return score < SEEN_THRESHOLD
+
+    def state(self, frame: np.ndarray) -> Optional[str]:
+        """
+        Classify the newest bubble of a captured frame.
+
+        Returns:
+            A TICK_STATES entry, PENDING_STATE, or None if the newest bubble
+            has not appeared yet (the bottom-most icon was already there
+            before arm()) or shows no icon
+        """
+        icon = self.newest_icon(frame)
+        if icon is None:
+            return None
+        state, x, y, shape = icon
+        # The tick of an earlier message doesn't count, wherever it moved
+        if self.seen_before(frame, x, y, shape):
+            return None
+        return state
+
+    def wait(self, timeout: float = 15, poll_interval: float = 0.15) -> Optional[float]:
+        """
+        Poll until a tick appears.
+
+        Args:
+            timeout: Seconds to wait at most
+            poll_interval: Seconds between captures
+
+        Returns:
+            Seconds until the tick appeared, or None on timeout
+        """
+        start = time.perf_counter()
+        while True:
+            elapsed = time.perf_counter() - start
+            if self.state(self.grab()) in TICK_STATES:
+                return elapsed
+            if elapsed >= timeout:
+                return None
+            time.sleep(poll_interval)
+
+
+class ChatHeaderCheck:
+    """
+    Checks that opening a chat inside WhatsApp Web really switched chats.
+
+    The header of the chat pane (picture, name or number) is captured before
+    the search result is opened. A number without a result leaves the
+    previous chat in place, so the header stays the same and pasting would
+    go to the wrong chat or the search box.
+
+    This only tells that some other chat opened, not which one; the URL
+    navigation opens the chat by number and needs no check.
+
+    Usage:
+        check.arm()            # before opening the search result
+        pg.press("enter")
+        opened = check.wait(timeout=3)
+    """
+
+    def __init__(self, region: Optional[Tuple[int, int, int, int]] = None, factor: int = 2,
+                 min_change: float = 3.0):
+        """
+        Args:
+            region: (left, top, width, height) of the chat header; defaults
+                to the top of the chat pane, below the browser toolbar
+            factor: Downscale factor applied before comparing
+            min_change: Min mean gray-level difference that counts as a new chat
+        """
+        self.region = region
+        self.factor = factor
+        self.min_change = min_change
+        self._baseline: Optional[np.ndarray] = None
+
+    def _region(self) -> Tuple[int, int, int, int]:
+        if self.region is None:
+            import pyautogui as pg
+            width, height = pg.size()
+            # Right of the chat list, where the contact's name and picture are
+            self.region = (int(width * 0.35), int(height * 0.09), int(width * 0.4), int(height * 0.07))
+        return self.region
+
+    def grab(self) -> np.ndarray:
+        """Capture and prepare the header region"""
+        import pyautogui as pg
+        return prepare_frame(pg.screenshot(region=self._region()), self.factor)
+
+    def arm(self) -> None:
+        """Remember the header of the chat that is open now"""
+        self._baseline = self.grab()
+
+    def changed(self, frame: np.ndarray) -> bool:
+        """True if frame shows another header than the one seen at arm()"""
+        if self._baseline is None or self._baseline.shape != frame.shape:
+            return True
+        return float(np.abs(frame - self._baseline).mean()) >= self.min_change
+
+    def wait(self, timeout: float = 3, poll_interval: float = 0.15) -> bool:
+        """
+        Poll until the header changes.
+
+        Returns:
+            True if another chat opened within timeout
+        """
+        start = time.perf_counter()
+        while True:
+            if self.changed(self.grab()):
+                return True
+            if time.perf_counter() - start >= timeout:
+                return False
+            time.sleep(poll_interval)
+
+
+def capture_template(state: str, template_dir: str = TEMPLATE_DIR, countdown: int = 5,
+                     size: Tuple[int, int] = TEMPLATE_SIZE,
+                     states: Tuple[str, ...] = TICK_STATES + (PENDING_STATE,)) -> str:
+    """
+    Save the screen area under the mouse as the template for a state.
+
+    Args:
+        state: One of states
+        template_dir: Where templates are stored
+        countdown: Seconds to move the mouse over the icon
+        size: (width, height) of the captured box
+        states: Valid state names
+
+    Returns:
+        Path of the saved template
+    """
+    import pyautogui as pg
+    if state not in states:
+        raise ValueError(f"Unknown state: {state}. Use one of: {', '.join(states)}")
+
+    for remaining in range(countdown, 0, -1):
+        print(f"   Hover over the {state} icon... {remaining}")
+        time.sleep(1)
+    x, y = pg.position()
+    w, h = size
+    image = pg.screenshot(region=(x - w // 2, y - h // 2, w, h))
+
+    os.makedirs(template_dir, exist_ok=True)
+    path = os.path.join(template_dir, f"{state}.png")
+    image.save(path)
+    return path
+
+
+# ===== For standalone execution =====
+if __name__ == "__main__":
+    import sys
+
+    if len(sys.argv) > 2 and sys.argv[1] == "capture":
+        print(f"✅ Saved {capture_template(sys.argv[2])}")
+    else:
+        print("Usage: python delivery_confirmation.py capture <sent|delivered|read|clock>")
@@ -0,0 +1,136 @@
+"""
+Module for idempotency keys that stop the same message reaching a recipient twice
+"""
+import hashlib
+import os
+from typing import List, Optional
+from phone_extractor import normalize_phone_number
+
+# Local index of keys for deliveries that already went out
+DEFAULT_INDEX_PATH = "sent_index.txt"
+
+# Status written after a key whose send could not be confirmed (Enter may
+# have been pressed); a key alone means the message went out
+MAYBE_SENT = "maybe"
+
+
+def file_sha256(path: str, chunk_size: int = 1024 * 1024) -> str:
+    """
+    Hash a media file's contents.
+
+    Args:
+        path: Path to the file
+        chunk_size: Bytes read per step
+
+    Returns:
+        Hex SHA-256 digest of the file
+    """
+    digest = hashlib.sha256()
+    with open(path, "rb") as f:
+        for chunk in iter(lambda: f.read(chunk_size), b""):
+            digest.update(chunk)
+    return digest.hexdigest()
+
+
+def media_hash(shas: List[str]) -> str:
+    """
+    Hash of the media of one delivery.
+
+    Args:
+        shas: SHA-256 of each image, in sending order
+
+    Returns:
+        "" for no media, the image's SHA-256 for one image, and for an
+        album a hash over all images in order (one album is one delivery)
+    """
+    if len(shas) > 1:
+        return hashlib.sha256("\n".join(shas).encode()).hexdigest()
+    return shas[0] if shas else ""
+
+
+def delivery_key(phone: str, message: str = "", media_hash: str = "") -> str:
+    """
+    Build the content-addressed key of one delivery.
+
+    The same number (in any format), message text and media always give
+    the same key, so a re-run or re-upload can be recognized.
+
+    Args:
+        phone: Recipient phone number
+        message: Message text actually sent to this recipient
+        media_hash: SHA-256 of the attached media ("" for none)
+
+    Returns:
+        Hex SHA-256 key
+    """
+    normalized = normalize_phone_number(phone) or str(phone).strip()
+    message_hash = hashlib.sha256((message or "").strip().encode("utf-8")).hexdigest()
+    return hashlib.sha256(f"{normalized}\0{message_hash}\0{media_hash}".encode("utf-8")).hexdigest()
+
+
+class IdempotencyIndex:
+    """
+    Append-only file of delivery keys, held in memory as a set.
+
+    Lookups are O(1); each new key is appended and flushed right away so an
+    interrupted campaign still remembers what it sent. A delivery that may
+    have gone out (no sent tick, or the worker died after Enter) is kept
+    with a MAYBE_SENT status: it counts as sent, so it is only sent again on
+    request, and a later confirmed send of the same key replaces it.
+    """
+
+    def __init__(self, path: Optional[str] = DEFAULT_INDEX_PATH):
+        self.path = path
+        self._keys = set()
+        self._maybe = set()
+        if path and os.path.exists(path):
+            with open(path, "r", encoding="utf-8") as f:
+                for line in f:
+                    key, _, status = line.strip().partition("\t")
+                    if not key:
+                        continue
+                    if status == MAYBE_SENT:
+                        if key not in self._keys:
+                            self._maybe.add(key)
+                    else:
+                        self._maybe.discard(key)
+                    self._keys.add(key)
+
+    def __contains__(self, key: str) -> bool:
+        return key in self._keys
+
+    def __len__(self) -> int:
+        return len(self._keys)
+
+    def claim(self, key: str) -> bool:
+        """
+        Reserve a delivery right before it is sent (also with force_resend).
+
+        The local index always allows it; a queue's lease guard (see
+        send_queue.LeaseGuard) marks the job as being sent here and refuses
+        one that another worker took over.
+        """
+        return True
+
+    def maybe_sent(self, key: str) -> bool:
+        """True if the delivery may have gone out but was never confirmed"""
+        return key in self._maybe
+
+    def add(self, key: str, maybe_sent: bool = False) -> None:
+        """
+        Record a delivery key as sent.
+
+        Args:
+            key: Delivery key
+            maybe_sent: The send could not be confirmed (a confirmed key stays confirmed)
+        """
+        if key in self._keys and (maybe_sent or key not in self._maybe):
+            return
+        self._keys.add(key)
+        if maybe_sent:
+            self._maybe.add(key)
+        else:
+            self._maybe.discard(key)
+        if self.path:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write(key + (f"\t{MAYBE_SENT}" if maybe_sent else "") + "\n")
@@ -0,0 +1,330 @@
+"""
+Module for a content-addressed store of campaign media
+
+Uploaded images are stored once under their SHA-256 (media_store/objects/),
+written straight from the upload buffer, so the same picture uploaded by
+two sessions or used by ten campaigns is one file that nobody overwrites.
+Campaigns take a reference while they send and release it afterwards.
+
+Derivatives - the resized copy that is actually pasted into WhatsApp and
+the Windows clipboard payload - are built once per image and cached in
+media_store/derived/. When the store grows beyond its size limit, the
+least recently used derivatives and unreferenced images are evicted;
+images stored or used within the last day are kept, so an upload is not
+lost before its campaign starts and takes a reference.
+"""
+import hashlib
+import io
+import os
+import sqlite3
+import tempfile
+import threading
+import time
+from typing import Callable, Optional
+
+DEFAULT_MEDIA_DIR = "media_store"
+DEFAULT_MAX_BYTES = 500 * 1024 * 1024
+# Unreferenced images stored or used more recently than this are not evicted
+DEFAULT_KEEP_RECENT = 24 * 3600
+
+# WhatsApp Web sends standard-quality images at about this size anyway;
+# pasting a smaller image is faster and looks the same to recipients
+SEND_MAX_SIDE = 1600
+SEND_JPEG_QUALITY = 85
+
+KIND_SEND = "send"
+KIND_CLIPBOARD = "clipboard"
+# Part of the derivative cache key; bumped when derivatives are built
+# differently so copies cached by an older version are not reused
+DERIVED_VERSION = 2
+# EXIF tag holding the camera orientation (1 = upright)
+EXIF_ORIENTATION = 0x0112
+
+
+def _write_atomic(path: str, data) -> None:
+    """Write bytes (or a memoryview, without copying) to path via a temp file"""
+    fd, tmp_path = tempfile.mkstemp(dir=os.path.dirname(path), suffix=".tmp")
+    try:
+        with os.fdopen(fd, "wb") as f:
+            f.write(data)
+        os.replace(tmp_path, path)
+    except BaseException:
+        if os.path.exists(tmp_path):
+            os.unlink(tmp_path)
+        raise
+
+
+class MediaStore:
+    """
+    Images keyed by content hash, with reference counts and cached derivatives.
+
+    Example:
+        store = MediaStore()
+        sha = store.put_upload(uploaded_image)
+        store.acquire(sha)
+        send_messages_from_ui(numbers, image_path=store.path(sha))
+        store.release(sha)
+    """
+
+    def __init__(self, root: str = DEFAULT_MEDIA_DIR, max_bytes: int = DEFAULT_MAX_BYTES,
+                 keep_recent: float = DEFAULT_KEEP_RECENT):
+        """
+        Args:
+            root: Store directory
+            max_bytes: Size above which unreferenced entries are evicted
+            keep_recent: Seconds an unreferenced image is kept after it was
+                stored or last used (uploads wait here until they are sent)
+        """
+        self.root = root
+        self.max_bytes = max_bytes
+        self.keep_recent = keep_recent
+        os.makedirs(os.path.join(root, "objects"), exist_ok=True)
+        os.makedirs(os.path.join(root, "derived"), exist_ok=True)
+        # Shared by Streamlit sessions (threads) and campaigns
+        self._lock = threading.RLock()
+        self._db = sqlite3.connect(os.path.join(root, "index.sqlite"), check_same_thread=False)
+        self._db.executescript("""
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS objects (
+                sha TEXT PRIMARY KEY,
+                ext TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                refs INTEGER NOT NULL DEFAULT 0,
+                last_used REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS derived (
+                sha TEXT NOT NULL,
+                kind TEXT NOT NULL,
+                path TEXT NOT NULL,
+                size INTEGER NOT NULL,
+                last_used REAL NOT NULL,
+                PRIMARY KEY (sha, kind)
+            );
+        """)
+
+    def close(self) -> None:
+        """Close the index"""
+        self._db.close()
+
+    # ===== Originals =====
+    def put_bytes(self, data, name: str = "") -> str:
+        """
+        Store image bytes (bytes or memoryview) unless already present.
+
+        Args:
+            data: Image contents
+            name: Original file name (its extension is kept)
+
+        Returns:
+            SHA-256 of the contents
+        """
+        sha = hashlib.sha256(data).hexdigest()
+        ext = os.path.splitext(name)[1].lower() or ".jpg"
+        with self._lock:
+            row = self._db.execute("SELECT ext FROM objects WHERE sha = ?", (sha,)).fetchone()
+            if row and os.path.exists(self._object_path(sha, row[0])):
+                self._touch("objects", sha)
+                return sha
+            _write_atomic(self._object_path(sha, ext), data)
+            with self._db:
+                self._db.execute(
+                    "INSERT INTO objects (sha, ext, size, last_used) VALUES (?, ?, ?, ?) "
+                    "ON CONFLICT(sha) DO UPDATE SET ext = excluded.ext, size = excluded.size, "
+                    "last_used = excluded.last_used",
+                    (sha, ext, len(data), time.time())
+                )
+        self.evict()
+        return sha
+
+    def put_upload(self, uploaded_file) -> str:
+        """Store a Streamlit UploadedFile straight from its buffer"""
+        data = uploaded_file.getbuffer() if hasattr(uploaded_file, "getbuffer") else uploaded_file.read()
+        return self.put_bytes(data, uploaded_file.name)
+
+    def put_file(self, path: str) -> str:
+        """Store an image file (no copy is made if it is already in the store)"""
+        sha = self.sha_for_path(path)
+        if sha is not None:
+            return sha
+        with open(path, "rb") as f:
+            return self.put_bytes(f.read(), os.path.basename(path))
+
+    def _object_path(self, sha: str, ext: str) -> str:
+        return os.path.join(self.root, "objects", sha + ext)
+
+    def path(self, sha: str) -> str:
+        """File path of a stored image"""
+        row = self._db.execute("SELECT ext FROM objects WHERE sha = ?", (sha,)).fetchone()
+        if row is None:
+            raise KeyError(f"Unknown media: {sha}")
+        return self._object_path(sha, row[0])
+
+    def sha_for_path(self, path: str) -> Optional[str]:
+        """SHA-256 of a path inside the store's objects (None for other paths)"""
+        objects = os.path.abspath(os.path.join(self.root, "objects"))
+        if os.path.dirname(os.path.abspath(path)) != objects:
+            return None
+        sha = os.path.splitext(os.path.basename(path))[0]
+        row = self._db.execute("SELECT 1 FROM objects WHERE sha = ?", (sha,)).fetchone()
+        return sha if row else None
+
+    # ===== References =====
+    def acquire(self, sha: str) -> None:
+        """Keep an image from eviction while a campaign uses it"""
+        with self._lock, self._db:
+            self._db.execute("UPDATE objects SET refs = refs + 1, last_used = ? WHERE sha = ?", (time.time(), sha))
+
+    def release(self, sha: str) -> None:
+        """Drop a campaign's reference"""
+        with self._lock, self._db:
+            self._db.execute("UPDATE objects SET refs = MAX(refs - 1, 0) WHERE sha = ?", (sha,))
+
+    def refs(self, sha: str) -> int:
+        """Current reference count"""
+        row = self._db.execute("SELECT refs FROM objects WHERE sha = ?", (sha,)).fetchone()
+        return row[0] if row else 0
+
+    def _touch(self, table: str, sha: str, kind: Optional[str] = None) -> None:
+        with self._db:
+            if kind is None:
+                self._db.execute(f"UPDATE {table} SET last_used = ? WHERE sha = ?", (time.time(), sha))
+            else:
+                self._db.execute(f"UPDATE {table} SET last_used = ? WHERE sha = ? AND kind = ?",
+                                 (time.time(), sha, kind))
+
+    # ===== Derivatives =====
+    def derivative(self, sha: str, kind: str, build: Callable[[str], bytes], ext: str) -> str:
+        """
+        Path of a cached derivative, building it on first use.
+
+        Args:
+            sha: Source image
+            kind: Derivative name (part of the cache key)
+            build: Function from the source path to the derivative's bytes
+            ext: File extension of the derivative
+
+        Returns:
+            Path of the derivative file
+        """
+        with self._lock:
+            row = self._db.execute("SELECT path FROM derived WHERE sha = ? AND kind = ?", (sha, kind)).fetchone()
+            if row and os.path.exists(row[0]):
+                self._touch("derived", sha, kind)
+                return row[0]
+            data = build(self.path(sha))
+            path = os.path.join(self.root, "derived", f"{sha}.{kind}{ext}")
+            _write_atomic(path, data)
+            with self._db:
+                self._db.execute("INSERT OR REPLACE INTO derived VALUES (?, ?, ?, ?, ?)",
+                                 (sha, kind, path, len(data), time.time()))
+        self.evict()
+        return path
+
+    def send_path(self, sha: str, max_side: int = SEND_MAX_SIDE) -> str:
+        """
+        The image to paste into WhatsApp: downscaled to max_side if larger.
+
+        Re-encoding drops the EXIF orientation tag, so the copy is rotated
+        upright first; phone photos with the tag always get such a copy.
+        GIFs and upright images already small enough are sent as they are.
+        """
+        from PIL import Image, ImageOps
+        original = self.path(sha)
+        if original.endswith(".gif"):
+            return original
+        with Image.open(original) as img:
+            if max(img.size) <= max_side and img.getexif().get(EXIF_ORIENTATION, 1) == 1:
+                return original
+        ext = ".png" if original.endswith(".png") else ".jpg"
+
+        def build(path: str) -> bytes:
+            with Image.open(path) as img:
+                img = ImageOps.exif_transpose(img)
+                img.thumbnail((max_side, max_side))
+                out = io.BytesIO()
+                if ext == ".png":
+                    img.save(out, "PNG", optimize=True)
+                else:
+                    img.convert("RGB").save(out, "JPEG", quality=SEND_JPEG_QUALITY, optimize=True)
+                return out.getvalue()
+
+        return self.derivative(sha, f"{KIND_SEND}{max_side}.v{DERIVED_VERSION}", build, ext)
+
+    def clipboard_dib(self, sha: str) -> bytes:
+        """Windows clipboard payload (CF_DIB) of the image to send"""
+        from PIL import Image, ImageOps
+        source = self.send_path(sha)
+
+        def build(_path: str) -> bytes:
+            with Image.open(source) as img:
+                out = io.BytesIO()
+                ImageOps.exif_transpose(img).convert("RGB").save(out, "BMP")
+                # CF_DIB is the BMP without its 14-byte file header
+                return out.getvalue()[14:]
+
+        with open(self.derivative(sha, f"{KIND_CLIPBOARD}.v{DERIVED_VERSION}", build, ".dib"), "rb") as f:
+            return f.read()
+
+    # ===== Eviction =====
+    def total_bytes(self) -> int:
+        """Size of all stored images and derivatives"""
+        objects = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM objects").fetchone()[0]
+        derived = self._db.execute("SELECT COALESCE(SUM(size), 0) FROM derived").fetchone()[0]
+        return objects + derived
+
+    def evict(self, max_bytes: Optional[int] = None) -> int:
+        """
+        Remove least recently used entries until the store fits max_bytes.
+
+        Derivatives can always be rebuilt and go first; images are only
+        removed when no campaign holds a reference and they were not stored
+        or used in the last keep_recent seconds.
+
+        Returns:
+            Number of bytes freed
+        """
+        limit = self.max_bytes if max_bytes is None else max_bytes
+        freed = 0
+        with self._lock:
+            total = self.total_bytes()
+            if total <= limit:
+                return 0
+            candidates = self._db.execute("""
+                SELECT 0 AS tier, last_used, sha, kind, path, size FROM derived
+                UNION ALL
+                SELECT 1, last_used, sha, NULL, NULL, size FROM objects WHERE refs = 0 AND last_used < ?
+                ORDER BY tier, last_used
+            """, (time.time() - self.keep_recent,)).fetchall()
+            for _tier, _last_used, sha, kind, path, size in candidates:
+                if total - freed <= limit:
+                    break
+                with self._db:
+                    if kind is not None:
+                        self._db.execute("DELETE FROM derived WHERE sha = ? AND kind = ?", (sha, kind))
+                    else:
+                        path = self.path(sha)
+                        for derived_path, derived_size in self._db.execute(
+                                "SELECT path, size FROM derived WHERE sha = ?", (sha,)).fetchall():
+                            if os.path.exists(derived_path):
+                                os.unlink(derived_path)
+                            freed += derived_size
+                        self._db.execute("DELETE FROM derived WHERE sha = ?", (sha,))
+                        self._db.execute("DELETE FROM objects WHERE sha = ?", (sha,))
+                if os.path.exists(path):
+                    os.unlink(path)
+                freed += size
+        return freed
+
+
+# Shared by the UI sessions and campaigns of this process
+_store: Optional[MediaStore] = None
+_store_lock = threading.Lock()
+
+
+def get_store() -> MediaStore:
+    """The process-wide media store"""
+    global _store
+    with _store_lock:
+        if _store is None:
+            _store = MediaStore()
+        return _store
@@ -0,0 +1,324 @@
+"""
+Module for per-recipient message templates bound to spreadsheet columns
+"""
+import re
+from typing import Dict, Iterable, Iterator, List, Mapping, Optional, Tuple
+import pandas as pd
+
+# "{{", "}}", or a "{...}" group without nested braces
+_TOKEN = re.compile(r"\{\{|\}\}|\{([^{}]*)\}")
+# "name", "name!r", "name:.2f" or "name!s:>10"
+_FIELD = re.compile(r"^\s*(?P<name>[^!:]*?)\s*(?:!(?P<conversion>[^:]*))?(?::(?P<spec>.*))?$", re.DOTALL)
+_CONVERSIONS = {'s': str, 'r': repr, 'a': ascii}
+
+
+class MessageTemplate:
+    """
+    A message template such as "مرحبا {name}" compiled once.
+
+    The template is parsed a single time into literal/field parts so that
+    rendering a recipient's message is just a join, no re-parsing.
+
+    Compiled against the file's columns, only a {placeholder} naming a
+    column is a field; any other braces ("{text}", a stray "{" or "}") are
+    kept as written, so a plain message is never mistaken for a template.
+    Use "{{" and "}}" for literal braces next to fields. Format specs and
+    conversions work as in str.format: "{price:.2f}", "{name!r}".
+    """
+
+    def __init__(self, source: str, columns: Optional[Iterable[str]] = None):
+        """
+        Args:
+            source: Message text
+            columns: Column names fields may refer to; without them every
+                {name} group is a field
+        """
+        self.source = source
+        binding = _column_lookup(columns) if columns is not None else None
+        self._parts: List[Tuple[str, Optional[Tuple[str, Optional[str], str, str]]]] = []
+        fields = []
+        # Brace groups kept as written because no column matches them
+        self.unmatched: List[str] = []
+        literal = []
+        position = 0
+        for match in _TOKEN.finditer(source):
+            literal.append(source[position:match.start()])
+            position = match.end()
+            token = match.group(0)
+            if token in ('{{', '}}'):
+                literal.append(token[0])
+                continue
+            field = _parse_field(match.group(1), binding)
+            if field is None:
+                literal.append(token)
+                if match.group(1).strip():
+                    self.unmatched.append(token)
+                continue
+            self._parts.append((''.join(literal), field + (token,)))
+            literal = []
+            if field[0] not in fields:
+                fields.append(field[0])
+        literal.append(source[position:])
+        self._parts.append((''.join(literal), None))
+        self.fields: List[str] = fields
+        # Field name -> (conversion, spec) where one is used
+        self.formats: Dict[str, Tuple[Optional[str], str]] = {
+            name: (conversion, spec) for _, part in self._parts if part
+            for name, conversion, spec, _ in [part] if conversion or spec}
+
+    @property
+    def is_static(self) -> bool:
+        """True if the template has no placeholders"""
+        return not self.fields
+
+    def bind(self, columns: Iterable[str]) -> Dict[str, str]:
+        """
+        Match template fields to column names.
+
+        Exact matches win, otherwise the match is case-insensitive and
+        ignores surrounding spaces.
+
+        Args:
+            columns: Available column names
+
+        Returns:
+            Dictionary mapping field name to column name (unmatched fields are left out)
+        """
+        lookup = _column_lookup(columns)
+        binding = {}
+        for field in self.fields:
+            column = _match_column(field, lookup)
+            if column is not None:
+                binding[field] = column
+        return binding
+
+    def render(self, values: Mapping[str, object]) -> str:
+        """
+        Render the message for one recipient.
+
+        Args:
+            values: Field values keyed by field name (None/NaN render as empty;
+                a field left out of values is kept as written, e.g. "{text}")
+
+        Returns:
+            Rendered message text
+
+        Raises:
+            ValueError: A value does not fit its format spec (see find_format_errors)
+        """
+        out = []
+        for literal, field in self._parts:
+            out.append(literal)
+            if field is not None:
+                name, conversion, spec, token = field
+                if name not in values:
+                    out.append(token)
+                else:
+                    out.append(format_value(values[name], conversion, spec, name))
+        return ''.join(out)
+
+
+def compile_template(source: str, columns: Optional[Iterable[str]] = None) -> MessageTemplate:
+    """Compile a message template once so it can be rendered per recipient (see MessageTemplate)"""
+    return MessageTemplate(source, columns)
+
+
+def _column_lookup(columns: Iterable[str]) -> Tuple[List[str], Dict[str, str]]:
+    """Column names, and the first column per case-insensitive key"""
+    columns = [str(col) for col in columns]
+    by_key = {}
+    for col in columns:
+        by_key.setdefault(col.strip().lower(), col)
+    return columns, by_key
+
+
+def _match_column(name: str, lookup: Tuple[List[str], Dict[str, str]]) -> Optional[str]:
+    columns, by_key = lookup
+    if name in columns:
+        return name
+    return by_key.get(name.strip().lower())
+
+
+def _parse_field(inner: str, lookup) -> Optional[Tuple[str, Optional[str], str]]:
+    """
+    Parse the inside of a {...} group.
+
+    Returns:
+        (field name, conversion, spec), or None if the group is not a field
+
+    Raises:
+        ValueError: The group names a column but its conversion or spec is
+            invalid (without columns such a group is kept as text instead,
+            as it cannot have been checked against the file)
+    """
+    # A column whose name has ":" or "!" in it is matched as a whole
+    if lookup is not None and inner.strip() and _match_column(inner.strip(), lookup) is not None:
+        return inner.strip(), None, ''
+    match = _FIELD.match(inner)
+    name = match.group('name') if match else ''
+    if not name or (lookup is not None and _match_column(name, lookup) is None):
+        return None
+    conversion, spec = match.group('conversion'), match.group('spec') or ''
+    try:
+        if conversion is not None and conversion not in _CONVERSIONS:
+            raise ValueError(f"Unknown conversion !{conversion} in {{{inner}}} (use !s, !r or !a)")
+        if spec:
+            _check_spec(inner, spec)
+    except ValueError:
+        if lookup is None:
+            return None
+        raise
+    return name, conversion, spec
+
+
+def _check_spec(inner: str, spec: str) -> None:
+    """Reject a format spec that fits neither text nor numbers"""
+    error = None
+    for sample in ('', 0, 0.0):
+        try:
+            format(sample, spec)
+            return
+        except (ValueError, TypeError) as e:
+            error = e
+    raise ValueError(f"Invalid format {{{inner}}}: {error}")
+
+
+def format_value(value, conversion: Optional[str] = None, spec: str = '', field: str = '') -> str:
+    """
+    Text of a cell value in a message, with an optional conversion and format spec.
+
+    Without either, the cell's text is used (see _as_text). A numeric spec
+    such as ".2f" also accepts numbers stored as text.
+
+    Raises:
+        ValueError: The value cannot be formatted with the spec
+    """
+    if value is None or (isinstance(value, float) and pd.isna(value)):
+        return ''
+    if conversion is None and not spec:
+        return _as_text(value)
+    if conversion is not None:
+        value = _CONVERSIONS[conversion](value)
+    try:
+        return format(value, spec)
+    except (ValueError, TypeError):
+        pass
+    number = _as_number(value)
+    if number is not None:
+        try:
+            return format(number, spec)
+        except (ValueError, TypeError):
+            pass
+    raise ValueError(f"Cannot format {value!r} as {{{field}:{spec}}}")
+
+
+def _as_number(value):
+    """The value as an int or float, if it is one (e.g. "12.5" or 1001.0)"""
+    if isinstance(value, float) and value.is_integer():
+        return int(value)
+    try:
+        text = str(value).strip()
+        return int(text) if re.fullmatch(r"[+-]?\d+", text) else float(text)
+    except ValueError:
+        return None
+
+
+def _as_text(value) -> str:
+    """Convert a cell value to the text used in a message"""
+    if value is None:
+        return ''
+    if isinstance(value, float):
+        if pd.isna(value):
+            return ''
+        # Spreadsheets often store order numbers etc. as floats
+        if value.is_integer():
+            return str(int(value))
+    return str(value).strip()
+
+
+def find_missing_fields(template: MessageTemplate, records: pd.DataFrame) -> Dict[str, int]:
+    """
+    Pre-flight check: count the recipients that have no value for each field.
+
+    Runs column-wise over the whole DataFrame, so it is cheap even for
+    very large lists and can run before sending begins.
+
+    Args:
+        template: Compiled message template
+        records: Recipient records (one row per recipient)
+
+    Returns:
+        Dictionary mapping field name to the number of rows missing it
+        (fields with no missing values are left out)
+    """
+    binding = template.bind(records.columns)
+    missing = {}
+    for field in template.fields:
+        if field not in binding:
+            count = len(records)
+        else:
+            column = records[binding[field]]
+            text = column.astype(str).str.strip()
+            blank = column.isna() | text.eq('') | text.str.lower().isin(['nan', 'none'])
+            count = int(blank.sum())
+        if count:
+            missing[field] = count
+    return missing
+
+
+def find_format_errors(template: MessageTemplate, records: pd.DataFrame) -> Dict[str, int]:
+    """
+    Pre-flight check: count the recipients whose value does not fit its format spec.
+
+    Each distinct value is formatted once and the failing ones are counted
+    column-wise, so a long list with few distinct values stays cheap.
+
+    Args:
+        template: Compiled message template
+        records: Recipient records (one row per recipient)
+
+    Returns:
+        Dictionary mapping field name to the number of rows that cannot be
+        formatted (e.g. text in a {price:.2f} column)
+    """
+    binding = template.bind(records.columns)
+    errors = {}
+    for field, (conversion, spec) in template.formats.items():
+        if field not in binding:
+            continue
+        column = records[binding[field]]
+        bad = []
+        for value in column.drop_duplicates():
+            try:
+                format_value(value, conversion, spec, field)
+            except ValueError:
+                bad.append(value)
+        if bad:
+            errors[field] = int(column.isin(bad).sum())
+    return errors
+
+
+def iter_fields(template: MessageTemplate, records: pd.DataFrame) -> Iterator[Dict[str, object]]:
+    """
+    Lazily yield each recipient's field values, in row order.
+
+    Only the columns the template uses are read and no second copy of the
+    data is built, so this can stream alongside the recipient list.
+
+    Args:
+        template: Compiled message template
+        records: Recipient records (one row per recipient)
+
+    Yields:
+        Dictionary of field name -> cell value for one recipient
+    """
+    binding = template.bind(records.columns)
+    fields = list(binding.keys())
+    if not fields:
+        for _ in range(len(records)):
+            yield {}
+        return
+
+    columns = [binding[field] for field in fields]
+    for row in records[columns].itertuples(index=False, name=None):
+        yield dict(zip(fields, row))
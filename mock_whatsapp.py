@@ -0,0 +1,570 @@
+"""
+Module for end-to-end benchmarks of the send automation against a mock WhatsApp Web
+
+The pyautogui/pyperclip flow (new chat hotkey, search, composer, image
+paste, album preview, Enter) only ever runs against the real WhatsApp Web,
+so focus or timing regressions show up mid-campaign. This harness runs the
+real send_messages_from_ui, unchanged, on a virtual X display:
+
+- Xvfb provides the display (pyautogui and the clipboard work as usual)
+- MockWhatsAppServer serves a local page that behaves like WhatsApp Web for
+  the steps the sender uses (chat header, composer, attachment preview,
+  sent tick) and records every message that is sent from it
+- Chrome is launched by the normal BrowserSession, pointed at the mock
+  page with WHATSAPP_WEB_URL
+
+Each recipient's wall time comes from the campaign's results file, and the
+mock's record tells whether the message really arrived with the right text
+and number of images, so the numbers are a throughput benchmark of the
+actual automation code that sends nothing to WhatsApp.
+
+    python mock_whatsapp.py                         # 10 text messages
+    python mock_whatsapp.py --content album -n 20   # 20 albums of 3 images
+    python mock_whatsapp.py --serve                 # only serve the mock page
+
+Needs Xvfb, Chrome/Chromium, copyq (image clipboard on Linux, as used by
+pywhatkit) and xclip or xsel (text clipboard, as used by pyperclip).
+Importing pywhatkit checks that https://google.com is reachable; nothing
+else leaves the machine.
+"""
+import json
+import os
+import shutil
+import socket
+import subprocess
+import sys
+import tempfile
+import threading
+import time
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, List, Optional
+from urllib.parse import urlparse
+
+SCREEN_SIZE = (1280, 800)
+
+# Simulated WhatsApp Web latencies, in milliseconds
+DEFAULT_OPEN_DELAY = 300
+DEFAULT_TICK_DELAY = 400
+
+CONTENT_TEXT = "text"
+CONTENT_IMAGE = "image"
+CONTENT_IMAGE_TEXT = "image_text"
+CONTENT_ALBUM = "album"
+CONTENTS = (CONTENT_TEXT, CONTENT_IMAGE, CONTENT_IMAGE_TEXT, CONTENT_ALBUM)
+ALBUM_SIZE = 3
+
+MOCK_PAGE = """<!doctype html>
+<html>
+<head>
+<meta charset="utf-8">
+<title>WhatsApp</title>
+<style>
+  body { margin: 0; font-family: sans-serif; background: #f0f2f5; }
+  #app { display: flex; height: 100vh; }
+  #side { width: 30%; background: #fff; border-right: 1px solid #ddd; }
+  #side header, #chat-header { height: 60px; line-height: 60px; padding: 0 16px; background: #f0f2f5; }
+  #chats { list-style: none; margin: 0; padding: 0; }
+  #chats li { padding: 12px 16px; border-bottom: 1px solid #eee; }
+  #main { flex: 1; display: flex; flex-direction: column; background: #efeae2; }
+  #messages { flex: 1; overflow-y: auto; padding: 16px; }
+  .bubble { max-width: 60%; margin: 4px 0 4px auto; padding: 6px 10px; background: #d9fdd3; border-radius: 8px; white-space: pre-wrap; }
+  .bubble .tick { margin-left: 8px; color: #667781; }
+  footer { padding: 10px 16px; background: #f0f2f5; }
+  #composer, #caption { min-height: 24px; padding: 9px 12px; background: #fff; border-radius: 8px; outline: none; white-space: pre-wrap; }
+  #new-chat { position: fixed; left: 0; top: 0; width: 30%; height: 100vh; background: #fff; }
+  #new-chat input { margin: 76px 16px; width: calc(100% - 56px); padding: 8px 12px; }
+  #preview { position: fixed; left: 30%; top: 60px; right: 0; bottom: 0; background: #e9edef; padding: 16px; }
+  #thumbs img { max-width: 200px; max-height: 200px; margin: 8px; }
+</style>
+</head>
+<body>
+<div id="app">
+  <aside id="side"><header>Chats</header><ul id="chats"></ul></aside>
+  <main id="main">
+    <header id="chat-header"><span id="chat-title">WhatsApp Web</span></header>
+    <section id="messages"></section>
+    <footer><div id="composer" contenteditable="true" role="textbox" title="Type a message"></div></footer>
+  </main>
+</div>
+<div id="new-chat" hidden><input id="search" placeholder="Search name or number"></div>
+<div id="preview" hidden><div id="thumbs"></div><div id="caption" contenteditable="true" role="textbox" title="Add a caption"></div></div>
+<script>
+const CONFIG = __CONFIG__;
+const $ = (id) => document.getElementById(id);
+let current = null;
+let opening = false;
+let pending = [];
+
+function placeCaret(el) {
+  el.focus();
+  const range = document.createRange();
+  range.selectNodeContents(el);
+  range.collapse(false);
+  const selection = window.getSelection();
+  selection.removeAllRanges();
+  selection.addRange(range);
+}
+
+function openChat(phone, text) {
+  opening = true;
+  setTimeout(() => {
+    current = phone;
+    opening = false;
+    $('chat-title').textContent = phone;
+    $('messages').innerHTML = '';
+    const item = document.createElement('li');
+    item.textContent = phone;
+    $('chats').prepend(item);
+    $('composer').textContent = text || '';
+    placeCaret($('composer'));
+  }, CONFIG.open_delay);
+}
+
+function closePreview() {
+  $('preview').hidden = true;
+  $('thumbs').innerHTML = '';
+  $('caption').textContent = '';
+  pending = [];
+}
+
+function send(text, images) {
+  if (!current || opening || (!text.trim() && !images.length)) return;
+  const bubble = document.createElement('div');
+  bubble.className = 'bubble';
+  bubble.textContent = (images.length ? '[' + images.length + ' image(s)] ' : '') + text;
+  $('messages').append(bubble);
+  fetch('/api/sent', {
+    method: 'POST',
+    headers: {'Content-Type': 'application/json'},
+    body: JSON.stringify({phone: current, text: text, images: images.length,
+                          image_types: images.map((f) => f.type), image_sizes: images.map((f) => f.size)})
+  });
+  setTimeout(() => {
+    const tick = document.createElement('span');
+    tick.className = 'tick';
+    tick.textContent = '✓';
+    bubble.append(tick);
+  }, CONFIG.tick_delay);
+}
+
+document.addEventListener('keydown', (e) => {
+  const key = e.key.toLowerCase();
+  if (key === 'n' && ((e.ctrlKey && e.altKey) || (e.metaKey && e.ctrlKey))) {
+    e.preventDefault();
+    closePreview();
+    $('search').value = '';
+    $('new-chat').hidden = false;
+    $('search').focus();
+  } else if (e.key === 'Escape') {
+    $('new-chat').hidden = true;
+    closePreview();
+  }
+}, true);
+
+$('search').addEventListener('keydown', (e) => {
+  if (e.key !== 'Enter') return;
+  e.preventDefault();
+  const digits = $('search').value.replace(/\\D/g, '');
+  if (!digits) return;
+  $('new-chat').hidden = true;
+  openChat('+' + digits, '');
+});
+
+$('composer').addEventListener('keydown', (e) => {
+  if (e.key !== 'Enter' || e.shiftKey) return;
+  e.preventDefault();
+  send($('composer').innerText.trim(), []);
+  $('composer').textContent = '';
+});
+
+$('caption').addEventListener('keydown', (e) => {
+  if (e.key !== 'Enter' || e.shiftKey) return;
+  e.preventDefault();
+  send($('caption').innerText.trim(), pending);
+  closePreview();
+  placeCaret($('composer'));
+});
+
+// Pasting an image opens the attachment preview with the composer text as
+// caption; pasting more images while it is open makes an album
+document.addEventListener('paste', (e) => {
+  const files = Array.from(e.clipboardData.items)
+    .filter((item) => item.kind === 'file' && item.type.startsWith('image/'))
+    .map((item) => item.getAsFile());
+  if (!files.length || !current) return;
+  e.preventDefault();
+  if ($('preview').hidden) {
+    $('caption').textContent = $('composer').innerText.trim();
+    $('composer').textContent = '';
+    $('preview').hidden = false;
+  }
+  for (const file of files) {
+    pending.push(file);
+    const img = document.createElement('img');
+    img.src = URL.createObjectURL(file);
+    $('thumbs').append(img);
+  }
+  placeCaret($('caption'));
+}, true);
+
+// Clicking the page keeps the focus where WhatsApp keeps it
+document.addEventListener('mouseup', () => {
+  if (!$('new-chat').hidden) return;
+  if (!$('preview').hidden) placeCaret($('caption'));
+  else if (current) placeCaret($('composer'));
+});
+
+const params = new URLSearchParams(location.search);
+if (location.pathname.endsWith('/send') && params.get('phone')) {
+  openChat('+' + params.get('phone').replace(/\\D/g, ''), params.get('text') || '');
+}
+</script>
+</body>
+</html>
+"""
+
+
+class MockWhatsAppServer:
+    """
+    Local HTTP server for the mock WhatsApp Web page.
+
+    Usage:
+        server = MockWhatsAppServer()
+        server.start()
+        os.environ["WHATSAPP_WEB_URL"] = server.url
+        ...
+        server.deliveries   # messages sent from the page
+    """
+
+    def __init__(self, port: int = 0, open_delay: int = DEFAULT_OPEN_DELAY, tick_delay: int = DEFAULT_TICK_DELAY):
+        """
+        Args:
+            port: Port to listen on (0 picks a free one)
+            open_delay: Milliseconds the page takes to open a chat
+            tick_delay: Milliseconds from Enter to the sent tick
+        """
+        self.port = port
+        self.config = {"open_delay": open_delay, "tick_delay": tick_delay}
+        self.deliveries: List[Dict] = []
+        self._lock = threading.Lock()
+        self._httpd: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        return f"http://127.0.0.1:{self.port}/"
+
+    def start(self) -> None:
+        """Serve in a background thread"""
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_GET(self):
+                path = urlparse(self.path).path
+                if path in ("/", "/send"):
+                    server._reply(self, 200, "text/html; charset=utf-8",
+                                  MOCK_PAGE.replace("__CONFIG__", json.dumps(server.config)).encode("utf-8"))
+                elif path == "/api/deliveries":
+                    with server._lock:
+                        body = json.dumps(server.deliveries).encode("utf-8")
+                    server._reply(self, 200, "application/json", body)
+                else:
+                    server._reply(self, 404, "text/plain", b"not found")
+
+            def do_POST(self):
+                if urlparse(self.path).path != "/api/sent":
+                    server._reply(self, 404, "text/plain", b"not found")
+                    return
+                try:
+                    delivery = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))))
+                except ValueError:
+                    server._reply(self, 400, "text/plain", b"bad request")
+                    return
+                delivery["received_at"] = time.time()
+                with server._lock:
+                    server.deliveries.append(delivery)
+                server._reply(self, 204, "text/plain", b"")
+
+            def log_message(self, format, *args):
+                pass
+
+        self._httpd = ThreadingHTTPServer(("127.0.0.1", self.port), Handler)
+        self.port = self._httpd.server_address[1]
+        threading.Thread(target=self._httpd.serve_forever, daemon=True, name="mock-whatsapp").start()
+
+    @staticmethod
+    def _reply(handler: BaseHTTPRequestHandler, status: int, content_type: str, body: bytes) -> None:
+        handler.send_response(status)
+        handler.send_header("Content-Type", content_type)
+        handler.send_header("Content-Length", str(len(body)))
+        handler.send_header("Cache-Control", "no-store")
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def stop(self) -> None:
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+
+class VirtualDisplay:
+    """Xvfb display; DISPLAY is set for this process and its children while it runs"""
+
+    def __init__(self, size=SCREEN_SIZE):
+        self.size = size
+        self.display: Optional[str] = None
+        self.process: Optional[subprocess.Popen] = None
+        self._previous = os.environ.get("DISPLAY")
+
+    def start(self) -> str:
+        """Start Xvfb on a free display number and return it (e.g. ":1")"""
+        read_fd, write_fd = os.pipe()
+        self.process = subprocess.Popen(
+            ["Xvfb", "-displayfd", str(write_fd), "-screen", "0", f"{self.size[0]}x{self.size[1]}x24",
+             "-nolisten", "tcp"],
+            pass_fds=(write_fd,), stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL
+        )
+        os.close(write_fd)
+        with os.fdopen(read_fd) as f:
+            number = f.readline().strip()
+        if not number:
+            raise RuntimeError("Xvfb did not start")
+        self.display = f":{number}"
+        os.environ["DISPLAY"] = self.display
+        return self.display
+
+    def stop(self) -> None:
+        if self.process is not None and self.process.poll() is None:
+            self.process.terminate()
+            self.process.wait(5)
+        self.process = None
+        if self._previous is None:
+            os.environ.pop("DISPLAY", None)
+        else:
+            os.environ["DISPLAY"] = self._previous
+
+
+def missing_tools() -> List[str]:
+    """Programs the benchmark needs that are not installed"""
+    from browser_session import find_chrome
+    missing = [name for name in ("Xvfb", "copyq") if not shutil.which(name)]
+    if not (shutil.which("xclip") or shutil.which("xsel")):
+        missing.append("xclip or xsel")
+    if not find_chrome():
+        missing.append("Chrome/Chromium")
+    return missing
+
+
+def _free_port() -> int:
+    with socket.socket(socket.AF_INET, socket.SOCK_STREAM) as sock:
+        sock.bind(("127.0.0.1", 0))
+        return sock.getsockname()[1]
+
+
+def _make_images(directory: str, count: int) -> List[str]:
+    """Test images in the formats pywhatkit can put on the Linux clipboard"""
+    from PIL import Image
+    paths = []
+    for i in range(count):
+        path = os.path.join(directory, f"image_{i + 1}.jpg")
+        Image.new("RGB", (800, 600), (40 * i % 256, 120, 200)).save(path, "JPEG")
+        paths.append(path)
+    return paths
+
+
+def _percentile(values: List[float], share: float) -> float:
+    ordered = sorted(values)
+    return ordered[min(int(share * len(ordered)), len(ordered) - 1)] if ordered else 0.0
+
+
+def summarize(results, deliveries: List[Dict], message: str, images: int) -> Dict:
+    """
+    Match the sender's results with what the mock page received.
+
+    Args:
+        results: Results DataFrame of the campaign (see results_sink.py)
+        deliveries: MockWhatsAppServer.deliveries
+        message: Expected text (caption) of every message
+        images: Expected number of images per message
+
+    Returns:
+        Dict with 'recipients' (one row per number: status, seconds,
+        delivered), 'sent', 'delivered', 'mismatched', 'mean', 'p50',
+        'p90' (seconds per recipient) and 'per_hour'
+    """
+    received: Dict[str, List[Dict]] = {}
+    for delivery in deliveries:
+        received.setdefault(delivery["phone"], []).append(delivery)
+    rows = []
+    finished = results[results["status"].isin(["success", "failed", "exhausted"])]
+    for row in finished.itertuples():
+        got = received.get(row.number, [])
+        ok = [d for d in got if d["text"] == message.strip() and d["images"] == images]
+        rows.append({"number": row.number, "status": row.status, "seconds": float(row.seconds),
+                     "delivered": len(ok), "received": len(got)})
+    seconds = [row["seconds"] for row in rows]
+    total = sum(seconds)
+    return {
+        "recipients": rows,
+        "sent": sum(1 for row in rows if row["status"] == "success"),
+        "delivered": sum(1 for row in rows if row["delivered"] == 1),
+        # Reported sent but not received as expected (or received twice)
+        "mismatched": sum(1 for row in rows if (row["status"] == "success") != (row["delivered"] == 1)),
+        "mean": total / len(rows) if rows else 0.0,
+        "p50": _percentile(seconds, 0.5),
+        "p90": _percentile(seconds, 0.9),
+        "per_hour": 3600 * len(rows) / total if total else 0.0,
+    }
+
+
+def run_benchmark(recipients: int = 10, content: str = CONTENT_TEXT, message: str = "Benchmark message",
+                  navigation: str = "in_app", pause_seconds: float = 0, isolate: bool = True,
+                  open_delay: int = DEFAULT_OPEN_DELAY, tick_delay: int = DEFAULT_TICK_DELAY,
+                  profile: Optional[str] = None, work_dir: Optional[str] = None) -> Dict:
+    """
+    Send a campaign to the mock page on a virtual display and measure it.
+
+    Runs in a scratch working directory, so the send log, sent index and
+    phase timings of the real campaigns are left alone.
+
+    Args:
+        recipients: Number of recipients
+        content: CONTENT_TEXT, CONTENT_IMAGE, CONTENT_IMAGE_TEXT or CONTENT_ALBUM
+        message: Text, or caption for image content
+        navigation: "in_app" or "url" (see send_messages_from_ui)
+        pause_seconds: Pause between recipients
+        isolate: Run the automation in the watched worker process
+        open_delay: Milliseconds the mock takes to open a chat
+        tick_delay: Milliseconds from Enter to the mock's sent tick
+        profile: timing_profile.json to use (default timings if None)
+        work_dir: Scratch directory (a new temporary one if None)
+
+    Returns:
+        summarize() output plus 'wall_seconds' for the whole campaign
+
+    Raises:
+        RuntimeError: A required program is missing
+    """
+    missing = missing_tools()
+    if missing:
+        raise RuntimeError(f"Missing for the end-to-end benchmark: {', '.join(missing)}")
+    work_dir = work_dir or tempfile.mkdtemp(prefix="mock_whatsapp_")
+    if profile:
+        shutil.copy(profile, os.path.join(work_dir, "timing_profile.json"))
+    previous_cwd = os.getcwd()
+    # The sender is imported (and spawns its worker) from the scratch directory
+    package_dir = os.path.dirname(os.path.abspath(__file__))
+    if package_dir not in sys.path:
+        sys.path.insert(0, package_dir)
+    display = VirtualDisplay()
+    server = MockWhatsAppServer(open_delay=open_delay, tick_delay=tick_delay)
+    copyq = None
+    session = None
+    try:
+        os.chdir(work_dir)
+        display.start()
+        print(f"🖥️ Virtual display {display.display} ({display.size[0]}x{display.size[1]})")
+        copyq = subprocess.Popen(["copyq", "--start-server"], stdout=subprocess.DEVNULL,
+                                 stderr=subprocess.DEVNULL)
+        server.start()
+        # Read when browser_session is imported, here and in the automation worker
+        os.environ["WHATSAPP_WEB_URL"] = server.url
+        print(f"🌐 Mock WhatsApp Web at {server.url}")
+
+        # pyautogui needs the display, so the sender is imported only now
+        from browser_session import BrowserSession
+        from idempotency import IdempotencyIndex
+        from results_sink import read_results
+        from send_massage_from_ui import send_messages_from_ui, automation_worker
+
+        session = BrowserSession(profile_dir=os.path.join(work_dir, "profile"), port=_free_port(),
+                                 template_dir=os.path.join(work_dir, "templates"),
+                                 chrome_args=["--no-sandbox", "--disable-gpu", "--password-store=basic",
+                                              "--window-position=0,0",
+                                              f"--window-size={display.size[0]},{display.size[1]}"])
+        image_count = {CONTENT_TEXT: 0, CONTENT_IMAGE: 1, CONTENT_IMAGE_TEXT: 1, CONTENT_ALBUM: ALBUM_SIZE}[content]
+        image_paths = _make_images(work_dir, image_count)
+        text = "" if content == CONTENT_IMAGE else message
+        numbers = [f"+9665{i:08d}" for i in range(1, recipients + 1)]
+        results_path = os.path.join(work_dir, "results.csv")
+
+        print(f"🚀 Sending {recipients} x {content} ({navigation} navigation)...")
+        started = time.perf_counter()
+        send_messages_from_ui(numbers, message=text, image_paths=image_paths, close_tabs=False,
+                              sent_index=IdempotencyIndex(os.path.join(work_dir, "sent_index.txt")),
+                              navigation=navigation, pause_seconds=pause_seconds, session=session,
+                              isolate=isolate, max_attempts=1, results_path=results_path)
+        wall = time.perf_counter() - started
+        automation_worker.close()
+        # Let the last tick and request land
+        time.sleep((tick_delay + 500) / 1000)
+
+        summary = summarize(read_results(results_path), server.deliveries, text, image_count)
+        summary["wall_seconds"] = wall
+        return summary
+    finally:
+        if session is not None:
+            session.close()
+        server.stop()
+        if copyq is not None:
+            subprocess.run(["copyq", "exit"], stdout=subprocess.DEVNULL, stderr=subprocess.DEVNULL)
+            copyq.wait(5)
+        display.stop()
+        os.chdir(previous_cwd)
+
+
+def print_summary(summary: Dict) -> None:
+    """Print a benchmark summary"""
+    print("\n📊 End-to-end benchmark")
+    print("=" * 50)
+    for row in summary["recipients"]:
+        mark = "✅" if row["status"] == "success" and row["delivered"] == 1 else "❌"
+        print(f"{mark} {row['number']}: {row['status']}, {row['seconds']:.2f}s, received {row['received']}")
+    print("-" * 50)
+    print(f"Sent: {summary['sent']}, delivered as expected: {summary['delivered']}, "
+          f"mismatched: {summary['mismatched']}")
+    print(f"Per recipient: mean {summary['mean']:.2f}s, p50 {summary['p50']:.2f}s, p90 {summary['p90']:.2f}s")
+    print(f"Throughput: {summary['per_hour']:.0f} recipients/hour ({summary['wall_seconds']:.1f}s wall)")
+
+
+# ===== For standalone execution =====
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="End-to-end send benchmark against a mock WhatsApp Web")
+    parser.add_argument("-n", "--recipients", type=int, default=10)
+    parser.add_argument("--content", choices=CONTENTS, default=CONTENT_TEXT)
+    parser.add_argument("--message", default="Benchmark message")
+    parser.add_argument("--navigation", choices=["in_app", "url"], default="in_app")
+    parser.add_argument("--pause", type=float, default=0, help="seconds between recipients")
+    parser.add_argument("--no-isolate", action="store_true", help="run the automation in this process")
+    parser.add_argument("--open-delay", type=int, default=DEFAULT_OPEN_DELAY, help="mock chat open time (ms)")
+    parser.add_argument("--tick-delay", type=int, default=DEFAULT_TICK_DELAY, help="mock sent tick time (ms)")
+    parser.add_argument("--profile", help="timing_profile.json to benchmark (default timings otherwise)")
+    parser.add_argument("--json", help="also write the summary to this file")
+    parser.add_argument("--serve", action="store_true", help="only serve the mock page (Ctrl+C to stop)")
+    args = parser.parse_args()
+
+    if args.serve:
+        server = MockWhatsAppServer(port=8765, open_delay=args.open_delay, tick_delay=args.tick_delay)
+        server.start()
+        print(f"🌐 Mock WhatsApp Web at {server.url}")
+        try:
+            while True:
+                time.sleep(1)
+        except KeyboardInterrupt:
+            server.stop()
+        sys.exit(0)
+
+    try:
+        summary = run_benchmark(args.recipients, args.content, args.message, args.navigation, args.pause,
+                                not args.no_isolate, args.open_delay, args.tick_delay,
+                                os.path.abspath(args.profile) if args.profile else None)
+    except RuntimeError as e:
+        print(f"❌ {e}")
+        sys.exit(2)
+    print_summary(summary)
+    if args.json:
+        with open(args.json, "w", encoding="utf-8") as f:
+            json.dump(summary, f, indent=2)
+    sys.exit(0 if summary["mismatched"] == 0 and summary["delivered"] == len(summary["recipients"]) else 1)
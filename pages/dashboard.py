@@ -0,0 +1,137 @@
+"""
+Live throughput dashboard for running campaigns
+
+Open it in its own browser tab while a campaign sends from the main page.
+Each refresh reads only the events published since the previous one (see
+send_events.py).
+"""
+import os
+import time
+import pandas as pd
+import streamlit as st
+from send_events import get_event_buffer, ThroughputStats, LATENCY_BUCKETS
+from results_sink import list_results, results_bytes
+
+# Seconds between automatic refreshes
+REFRESH_SECONDS = 2
+
+TRANSLATIONS = {
+    'ar': {
+        'title': '📊 لوحة متابعة الإرسال',
+        'per_minute': 'رسائل/دقيقة (آخر دقيقة)',
+        'per_minute_5': 'رسائل/دقيقة (آخر 5 دقائق)',
+        'sent': 'تم الإرسال',
+        'failed': 'فشل',
+        'failure_rate': 'نسبة الفشل (آخر 10 دقائق)',
+        'throughput': '📈 الإرسال لكل دقيقة',
+        'failure_trend': '📉 نسبة الفشل لكل دقيقة',
+        'latency': '⏱️ زمن كل مرحلة',
+        'phase': 'المرحلة',
+        'accounts': '👤 الحسابات',
+        'no_events': 'لا توجد أحداث بعد. ابدأ حملة من الصفحة الرئيسية.',
+        'missed': 'تم تجاوز {count} حدثاً قديماً (المخزن ممتلئ)',
+        'refresh': '🔄 تحديث',
+        'results': '🗂️ ملفات النتائج',
+        'results_file': 'الملف',
+        'download_results': '⬇️ تحميل النتائج حتى الآن',
+    },
+    'en': {
+        'title': '📊 Sending Dashboard',
+        'per_minute': 'Messages/min (last minute)',
+        'per_minute_5': 'Messages/min (last 5 min)',
+        'sent': 'Sent',
+        'failed': 'Failed',
+        'failure_rate': 'Failure rate (last 10 min)',
+        'throughput': '📈 Messages per minute',
+        'failure_trend': '📉 Failure rate per minute',
+        'latency': '⏱️ Phase latency',
+        'phase': 'Phase',
+        'accounts': '👤 Accounts',
+        'no_events': 'No events yet. Start a campaign from the main page.',
+        'missed': 'Skipped {count} old events (buffer full)',
+        'refresh': '🔄 Refresh',
+        'results': '🗂️ Results files',
+        'results_file': 'File',
+        'download_results': '⬇️ Download results so far',
+    }
+}
+
+st.set_page_config(
+    page_title="WhatsApp Sending Dashboard",
+    page_icon="📊",
+    layout="wide"
+)
+
+lang = st.session_state.get('language', 'ar')
+t = TRANSLATIONS[lang]
+st.title(t['title'])
+
+# Running statistics of this browser session, updated incrementally
+if 'dashboard_stats' not in st.session_state:
+    st.session_state.dashboard_stats = ThroughputStats()
+
+
+def render_dashboard():
+    stats = st.session_state.dashboard_stats
+    stats.update(get_event_buffer())
+    if not stats.cursor:
+        st.info(t['no_events'])
+        return
+    if stats.missed:
+        st.caption(t['missed'].format(count=stats.missed))
+
+    now = time.time()
+    failed_total = stats.totals['failed'] + stats.totals['exhausted']
+    col1, col2, col3, col4, col5 = st.columns(5)
+    col1.metric(t['per_minute'], f"{stats.per_minute(1, now):.1f}")
+    col2.metric(t['per_minute_5'], f"{stats.per_minute(5, now):.1f}")
+    col3.metric(t['sent'], stats.totals['success'])
+    col4.metric(t['failed'], failed_total)
+    col5.metric(t['failure_rate'], f"{stats.failure_rate(10, now):.0%}")
+
+    timeline = pd.DataFrame(stats.timeline())
+    if not timeline.empty:
+        timeline['minute'] = pd.to_datetime(timeline['minute'], unit='s')
+        timeline = timeline.set_index('minute')
+        chart1, chart2 = st.columns(2)
+        with chart1:
+            st.subheader(t['throughput'])
+            st.line_chart(timeline[['sent', 'failed', 'retrying']])
+        with chart2:
+            st.subheader(t['failure_trend'])
+            st.line_chart(timeline[['failure_rate']])
+
+    if stats.latency:
+        st.subheader(t['latency'])
+        summary = pd.DataFrame(stats.latency_summary()).set_index('phase')
+        col_hist, col_table = st.columns([2, 1])
+        with col_table:
+            st.dataframe(summary.round(2))
+        with col_hist:
+            phase = st.selectbox(t['phase'], options=list(summary.index), key='dashboard_phase')
+            labels = [f"≤{bound:g}s" if bound != float('inf') else f">{LATENCY_BUCKETS[-2]:g}s"
+                      for bound in LATENCY_BUCKETS]
+            histogram = pd.DataFrame({'count': stats.latency[phase]}, index=pd.Index(labels, name='seconds'))
+            st.bar_chart(histogram)
+
+    if stats.accounts:
+        st.subheader(t['accounts'])
+        st.dataframe(pd.DataFrame(stats.account_summary()).set_index('account').round(1))
+
+
+# Refresh only this part of the page while a campaign runs (Streamlit >= 1.37)
+if hasattr(st, 'fragment'):
+    st.fragment(run_every=REFRESH_SECONDS)(render_dashboard)()
+else:
+    render_dashboard()
+    st.button(t['refresh'])
+
+
+# Results files, including the one a running campaign is writing; the file
+# is read when the button is clicked, so it holds every batch written so far
+results_files = list_results()
+if results_files:
+    st.subheader(t['results'])
+    results_path = st.selectbox(t['results_file'], options=results_files, format_func=os.path.basename)
+    st.download_button(t['download_results'], lambda: results_bytes(results_path),
+                       file_name=os.path.basename(results_path))
@@ -2,8 +2,12 @@
 Module for extracting and normalizing phone numbers from CSV/Excel files
 """
 import pandas as pd
-from typing import List, Optional
+from typing import Dict, Iterator, List, Optional, Tuple
+from concurrent.futures import ThreadPoolExecutor
+import os
 import re
+import time
+from stack_profiler import section
 
 
 def normalize_phone_number(phone: str) -> Optional[str]:
@@ -75,6 +79,93 @@ def normalize_phone_number(phone: str) -> Optional[str]:
     return None
 
 
+# Reasons a row is left out, as used in validation reports
+REASON_EMPTY = 'empty'
+REASON_NON_DIGIT = 'non_digit'
+REASON_TOO_SHORT = 'too_short'
+REASON_TOO_LONG = 'too_long'
+REASON_WRONG_PREFIX = 'wrong_prefix'
+REASON_DUPLICATE = 'duplicate'
+REASON_SUPPRESSED = 'suppressed'
+REJECT_REASONS = (REASON_EMPTY, REASON_NON_DIGIT, REASON_TOO_SHORT, REASON_TOO_LONG,
+                  REASON_WRONG_PREFIX, REASON_DUPLICATE, REASON_SUPPRESSED)
+
+
+class NoPhoneColumnError(ValueError):
+    """Raised when a file has no column that looks like phone numbers"""
+
+    def __init__(self, columns: List[str]):
+        self.columns = [str(col) for col in columns]
+        super().__init__(f"No phone number column found. Available columns: {', '.join(self.columns)}. Please ensure your file has a column named 'phone', 'Phone', 'number', 'phone number', or 'ext'.")
+
+
+class NoValidNumbersError(ValueError):
+    """Raised when no row of a file holds a valid phone number; carries the validation report"""
+
+    def __init__(self, phone_col: str, report: Dict):
+        self.phone_col = phone_col
+        self.report = report
+        samples = ', '.join(str(v) for v in report['rejects']['value'].head(5) if str(v))
+        super().__init__(f"No valid phone numbers found in column '{phone_col}'. Sample values: {samples}. Please ensure numbers are in format: +966xxxxxxxxx, 966xxxxxxxxx, or 05xxxxxxxx")
+
+
+def normalize_phone_series(phones: pd.Series) -> Tuple[pd.Series, pd.Series]:
+    """
+    Normalize a column of phone numbers in one batched pass.
+    
+    Gives the same numbers as normalize_phone_number applied to each value,
+    and for each rejected value the reason it was rejected.
+    
+    Args:
+        phones: Raw phone values (any dtype)
+        
+    Returns:
+        Tuple of (normalized numbers, NA where invalid; rejection reason,
+        NA where valid). Both share the index of phones.
+    """
+    raw = phones.astype('string').str.strip()
+    empty = raw.isna() | raw.eq('') | raw.str.lower().isin(['nan', 'none'])
+    raw = raw.fillna('')
+    
+    # Same cleaning as normalize_phone_number: separators, then any non-digit
+    # (a leading + is kept)
+    cleaned = raw.str.replace(r'[\s\-\(\)\.\_]', '', regex=True)
+    plus = cleaned.str.startswith('+')
+    digits = cleaned.str.replace(r'\D', '', regex=True)
+    length = digits.str.len()
+    other_chars = cleaned.str.contains(r'[^\d+]', regex=True) | cleaned.str[1:].str.contains('+', regex=False)
+    
+    saudi = digits.str.startswith('966')
+    mobile0 = ~plus & digits.str.startswith('05')
+    mobile = ~plus & digits.str.startswith('5')
+    foreign = plus & ~saudi
+    
+    normalized = pd.Series(pd.NA, index=phones.index, dtype='string')
+    # +966 / 966 followed by 9 digits
+    ok = saudi & length.eq(12)
+    normalized = normalized.mask(ok, '+' + digits)
+    # 05xxxxxxxx and 5xxxxxxxx
+    ok = mobile0 & length.eq(10)
+    normalized = normalized.mask(ok, '+966' + digits.str[1:])
+    ok = mobile & length.eq(9)
+    normalized = normalized.mask(ok, '+966' + digits)
+    # Other country codes: + and at least 9 digits
+    ok = foreign & length.ge(9)
+    normalized = normalized.mask(ok, '+' + digits)
+    
+    expected = pd.Series(pd.NA, index=phones.index, dtype='Int64')
+    expected = expected.mask(saudi, 12).mask(mobile0, 10).mask(mobile, 9).mask(foreign, 9)
+    invalid = normalized.isna()
+    reason = pd.Series(pd.NA, index=phones.index, dtype='string')
+    reason = reason.mask(invalid & expected.isna(), REASON_WRONG_PREFIX)
+    reason = reason.mask(invalid & length.lt(expected).fillna(False), REASON_TOO_SHORT)
+    reason = reason.mask(invalid & length.gt(expected).fillna(False), REASON_TOO_LONG)
+    reason = reason.mask(invalid & (other_chars | length.eq(0)), REASON_NON_DIGIT)
+    reason = reason.mask(empty, REASON_EMPTY)
+    normalized = normalized.mask(empty)
+    return normalized, reason
+
+
 def find_phone_column(df: pd.DataFrame) -> Optional[str]:
     """
     Find the phone number column in a DataFrame.
@@ -104,13 +195,15 @@ def find_phone_column(df: pd.DataFrame) -> Optional[str]:
     return df.columns[0] if len(df.columns) > 0 else None
 
 
-def extract_phone_numbers(file_path: str, file_type: str = None) -> List[str]:
+def extract_phone_numbers(file_path: str, file_type: str = None, suppression=None) -> List[str]:
     """
     Extract and normalize phone numbers from CSV or Excel file.
     
     Args:
         file_path: Path to the file or file-like object
         file_type: 'csv', 'xlsx', 'xls', or None for auto-detect
+        suppression: Optional opt-out list (suppression.SuppressionList or a
+            set of normalized numbers); suppressed numbers are left out
         
     Returns:
         List of normalized phone numbers (format: +966xxxxxxxxx)
@@ -153,11 +246,11 @@ def extract_phone_numbers(file_path: str, file_type: str = None) -> List[str]:
     # Extract phone numbers
     phone_numbers = df[phone_col].astype(str).tolist()
     
-    # Normalize phone numbers
+    # Normalize phone numbers, dropping opted-out ones
     normalized_numbers = []
     for phone in phone_numbers:
         normalized = normalize_phone_number(phone)
-        if normalized:
+        if normalized and (suppression is None or normalized not in suppression):
             normalized_numbers.append(normalized)
     
     # Remove duplicates while preserving order
@@ -171,16 +264,16 @@ def extract_phone_numbers(file_path: str, file_type: str = None) -> List[str]:
     return unique_numbers
 
 
-def extract_from_uploaded_file(uploaded_file) -> List[str]:
+def read_uploaded_file(uploaded_file) -> pd.DataFrame:
     """
-    Extract phone numbers from a Streamlit uploaded file.
+    Read a Streamlit uploaded file into a DataFrame.
     Supports CSV, Excel (.xlsx, .xls), and Apple Numbers (.numbers) files.
     
     Args:
         uploaded_file: Streamlit UploadedFile object
         
     Returns:
-        List of normalized phone numbers
+        DataFrame with the raw contents of the first sheet/table
     """
     # Determine file type from filename
     filename = uploaded_file.name.lower()
@@ -290,46 +383,304 @@ def extract_from_uploaded_file(uploaded_file) -> List[str]:
             raise
         raise ValueError(f"Error reading file: {str(e)}")
     
+    return df
+
+
+def _suppressed(phones: pd.Series, suppression) -> pd.Series:
+    """Mask of normalized numbers found in a suppression list (SuppressionList or set)"""
+    return phones.isin(getattr(suppression, 'numbers', suppression))
+
+
+def _empty_validation_report(total: int = 0) -> Dict:
+    return {'total': total, 'valid': 0, 'counts': {reason: 0 for reason in REJECT_REASONS},
+            'rejects': pd.DataFrame({'row': pd.Series(dtype='int64'), 'value': pd.Series(dtype='string'),
+                                     'reason': pd.Series(dtype='string')})}
+
+
+def extract_records_with_report(uploaded_file, suppression=None) -> Tuple[pd.DataFrame, Dict]:
+    """
+    Extract recipient records and a validation report from an uploaded file.
+    
+    Numbers are normalized with normalize_phone_series, so validating a
+    large sheet is a handful of column operations rather than a Python call
+    per row, and every rejected row is classified in the same pass.
+    
+    Args:
+        uploaded_file: Streamlit UploadedFile object
+        suppression: Optional opt-out list (suppression.SuppressionList or a
+            set of normalized numbers); matching rows are dropped
+        
+    Returns:
+        Tuple of (records, report). Records are as described in
+        extract_records_from_uploaded_file. The report has 'total' (data
+        rows), 'valid' (rows kept), 'counts' (rows per reason in
+        REJECT_REASONS) and 'rejects', a DataFrame with the sheet 'row'
+        (header is row 1), the original 'value' and the 'reason'.
+        
+    Raises:
+        NoPhoneColumnError: No column looks like phone numbers
+        NoValidNumbersError: No row holds a valid number (has .report)
+    """
+    df = read_uploaded_file(uploaded_file)
+    
     if df.empty:
-        return []
+        df.attrs['phone_column'] = None
+        df.attrs['suppressed'] = 0
+        return df, _empty_validation_report()
     
     # Find phone column
     phone_col = find_phone_column(df)
     if phone_col is None:
-        # Return empty list with helpful message
-        available_cols = ', '.join(df.columns.tolist())
-        raise ValueError(f"No phone number column found. Available columns: {available_cols}. Please ensure your file has a column named 'phone', 'Phone', 'number', 'phone number', or 'ext'.")
+        raise NoPhoneColumnError(df.columns.tolist())
+    
+    df = df.reset_index(drop=True)
+    normalized, reason = normalize_phone_series(df[phone_col])
+    valid = normalized.notna()
+    # Keep the first occurrence of each number, then drop opted-out numbers
+    duplicate = valid & normalized.duplicated(keep='first')
+    reason = reason.mask(duplicate, REASON_DUPLICATE)
+    kept = valid & ~duplicate
+    suppressed = 0
+    if suppression is not None and len(suppression):
+        mask = kept & _suppressed(normalized, suppression)
+        suppressed = int(mask.sum())
+        reason = reason.mask(mask, REASON_SUPPRESSED)
+        kept &= ~mask
+    
+    rejected = reason.notna()
+    counts = reason[rejected].value_counts()
+    report = {
+        'total': len(df),
+        'valid': int(kept.sum()),
+        'counts': {name: int(counts.get(name, 0)) for name in REJECT_REASONS},
+        'rejects': pd.DataFrame({
+            'row': (df.index[rejected] + 2).astype('int64'),
+            'value': df.loc[rejected, phone_col].astype('string').fillna(''),
+            'reason': reason[rejected],
+        }).reset_index(drop=True),
+    }
+    
+    if not valid.any():
+        raise NoValidNumbersError(phone_col, report)
+    
+    records = df[kept].copy()
+    records[phone_col] = normalized[kept].astype(object)
+    records = records.reset_index(drop=True)
+    records.attrs['phone_column'] = phone_col
+    records.attrs['suppressed'] = suppressed
+    return records, report
+
+
+def extract_records_from_uploaded_file(uploaded_file, suppression=None) -> pd.DataFrame:
+    """
+    Extract recipient records from a Streamlit uploaded file.
     
-    # Extract and normalize phone numbers
-    phone_numbers = df[phone_col].astype(str).tolist()
-    normalized_numbers = []
-    failed_numbers = []
+    Unlike extract_from_uploaded_file, the other columns of the sheet
+    (name, city, order number, ...) are kept so they can be used as
+    message template fields. The phone column holds the normalized numbers
+    and rows are deduped on it, keeping the first occurrence.
     
-    for phone in phone_numbers:
-        # Skip NaN, None, or empty strings
-        if pd.isna(phone) or phone == '' or phone == 'nan' or phone.lower() == 'none':
-            continue
+    Args:
+        uploaded_file: Streamlit UploadedFile object
+        suppression: Optional opt-out list (suppression.SuppressionList or a
+            set of normalized numbers); matching rows are dropped
         
-        normalized = normalize_phone_number(phone)
-        if normalized:
-            normalized_numbers.append(normalized)
-        else:
-            # Keep track of failed normalizations for debugging
-            failed_numbers.append(phone)
+    Returns:
+        DataFrame of recipients. The phone column name is stored in
+        df.attrs['phone_column'] and the number of suppressed numbers
+        removed in df.attrs['suppressed'].
+    """
+    records, _report = extract_records_with_report(uploaded_file, suppression=suppression)
+    return records
+
+
+def extract_from_uploaded_file(uploaded_file, suppression=None) -> List[str]:
+    """
+    Extract phone numbers from a Streamlit uploaded file.
+    Supports CSV, Excel (.xlsx, .xls), and Apple Numbers (.numbers) files.
     
-    # Remove duplicates while preserving order
-    seen = set()
-    unique_numbers = []
-    for num in normalized_numbers:
-        if num not in seen:
-            seen.add(num)
-            unique_numbers.append(num)
+    Args:
+        uploaded_file: Streamlit UploadedFile object
+        suppression: Optional opt-out list; suppressed numbers are left out
+        
+    Returns:
+        List of normalized phone numbers
+    """
+    records = extract_records_from_uploaded_file(uploaded_file, suppression=suppression)
+    if records.empty:
+        return []
+    return records[records.attrs['phone_column']].tolist()
+
+
+def _extract_file_report(uploaded_file, suppression) -> Tuple[Optional[pd.DataFrame], Dict]:
+    """Extract one file, capturing its count, timing and error for the report"""
+    start = time.perf_counter()
+    report = {'name': uploaded_file.name, 'count': 0, 'suppressed': 0, 'error': None, 'seconds': 0.0,
+              'validation': None, 'columns': None}
+    records = None
+    try:
+        with section("extraction"):
+            records, report['validation'] = extract_records_with_report(uploaded_file, suppression=suppression)
+        report['count'] = len(records) if records.attrs.get('phone_column') else 0
+        report['suppressed'] = records.attrs.get('suppressed', 0)
+    except NoPhoneColumnError as e:
+        report['error'] = str(e)
+        report['columns'] = e.columns
+    except NoValidNumbersError as e:
+        report['error'] = str(e)
+        report['validation'] = e.report
+    except Exception as e:
+        report['error'] = str(e)
+    report['seconds'] = time.perf_counter() - start
+    return records, report
+
+
+def extract_records_from_files(uploaded_files, suppression=None,
+                               max_workers: Optional[int] = None) -> Tuple[pd.DataFrame, List[Dict]]:
+    """
+    Extract and merge recipient records from several uploaded files.
     
-    # If no valid numbers found, provide helpful error message
-    if not unique_numbers:
-        sample_numbers = failed_numbers[:5] if failed_numbers else phone_numbers[:5]
-        sample_str = ', '.join([str(n) for n in sample_numbers if n])
-        raise ValueError(f"No valid phone numbers found in column '{phone_col}'. Sample values: {sample_str}. Please ensure numbers are in format: +966xxxxxxxxx, 966xxxxxxxxx, or 05xxxxxxxx")
+    Files are parsed concurrently in a thread pool (pandas' CSV parser
+    releases the GIL), so ingest time follows the slowest file rather than
+    the sum. Results are merged in upload order and deduped on the phone
+    number, keeping the first occurrence. A file that fails to parse is
+    reported and skipped; the others are still merged.
     
-    return unique_numbers
+    Args:
+        uploaded_files: Streamlit UploadedFile objects
+        suppression: Optional opt-out list passed to each extraction
+        max_workers: Thread pool size (default: one per file, at most 8)
+        
+    Returns:
+        Tuple of (merged records, per-file reports). The phone column is
+        named after the first file's (df.attrs['phone_column']);
+        df.attrs['suppressed'] and df.attrs['duplicates'] hold the totals
+        removed. Each report has 'name', 'count', 'suppressed', 'error'
+        (None on success), 'seconds', 'validation' (see
+        extract_records_with_report; None if the file could not be
+        validated) and 'columns' (the file's columns when no phone column
+        was found).
+    """
+    uploaded_files = list(uploaded_files)
+    if not uploaded_files:
+        records = pd.DataFrame()
+        records.attrs.update(phone_column=None, suppressed=0, duplicates=0)
+        return records, []
+    
+    workers = max_workers or min(len(uploaded_files), 8)
+    with ThreadPoolExecutor(max_workers=workers) as pool:
+        # map keeps upload order
+        results = list(pool.map(lambda f: _extract_file_report(f, suppression), uploaded_files))
+    
+    reports = [report for _records, report in results]
+    frames = [records for records, _report in results
+              if records is not None and records.attrs.get('phone_column') and not records.empty]
+    if not frames:
+        records = pd.DataFrame()
+        records.attrs.update(phone_column=None, suppressed=0, duplicates=0)
+        return records, reports
+    
+    # Files may name their phone column differently
+    phone_col = frames[0].attrs['phone_column']
+    frames = [frame.rename(columns={frame.attrs['phone_column']: phone_col}) for frame in frames]
+    merged = pd.concat(frames, ignore_index=True, sort=False)
+    total = len(merged)
+    merged = merged.drop_duplicates(subset=phone_col, keep='first').reset_index(drop=True)
+    
+    merged.attrs['phone_column'] = phone_col
+    merged.attrs['suppressed'] = sum(report['suppressed'] for report in reports)
+    merged.attrs['duplicates'] = total - len(merged)
+    return merged, reports
 
+
+def rejects_frame(reports: List[Dict]) -> pd.DataFrame:
+    """
+    Rejected rows of several files, for display or download.
+    
+    Args:
+        reports: Per-file reports from extract_records_from_files
+        
+    Returns:
+        DataFrame with 'file', 'row', 'value' and 'reason' columns
+    """
+    frames = [report['validation']['rejects'].assign(file=report['name'])
+              for report in reports if report.get('validation') is not None]
+    frames = [frame for frame in frames if not frame.empty]
+    if not frames:
+        return _empty_validation_report()['rejects'].assign(file=pd.Series(dtype='string'))[['file', 'row', 'value', 'reason']]
+    return pd.concat(frames, ignore_index=True)[['file', 'row', 'value', 'reason']]
+
+
+def _iter_frames(source, chunk_size: int) -> Iterator[pd.DataFrame]:
+    """
+    Read a file as DataFrame chunks.
+
+    CSV and .xlsx files are read incrementally; other formats have no
+    streaming reader and are read whole (one chunk).
+    """
+    if isinstance(source, (str, os.PathLike)):
+        with open(source, 'rb') as f:
+            yield from _iter_frames(f, chunk_size)
+        return
+
+    filename = str(getattr(source, 'name', '')).lower()
+    if filename.endswith('.csv'):
+        # Read as text so numbers keep their leading zero and never become floats
+        try:
+            yield from pd.read_csv(source, chunksize=chunk_size, dtype=str)
+        except pd.errors.EmptyDataError:
+            return
+    elif filename.endswith('.xlsx'):
+        import openpyxl
+        workbook = openpyxl.load_workbook(source, read_only=True, data_only=True)
+        try:
+            rows = workbook.worksheets[0].iter_rows(values_only=True)
+            header = next(rows, None)
+            if header is None:
+                return
+            columns = [str(col) if col is not None else f'Column_{i + 1}' for i, col in enumerate(header)]
+            batch = []
+            for row in rows:
+                batch.append(tuple(row[:len(columns)]) + (None,) * (len(columns) - len(row)))
+                if len(batch) == chunk_size:
+                    yield pd.DataFrame(batch, columns=columns)
+                    batch = []
+            if batch:
+                yield pd.DataFrame(batch, columns=columns)
+        finally:
+            workbook.close()
+    else:
+        yield read_uploaded_file(source)
+
+
+def iter_phone_numbers(source, suppression=None, chunk_size: int = 10000) -> Iterator[str]:
+    """
+    Yield normalized, deduped phone numbers as the file is parsed.
+
+    Unlike extract_from_uploaded_file, the first numbers are available after
+    the first chunk instead of after the whole file, so a multi-million-row
+    file can be sent while it is still being read (see send_messages_from_ui).
+
+    Args:
+        source: File path or file-like object with a name (e.g. Streamlit
+            UploadedFile); CSV, Excel or Apple Numbers
+        suppression: Optional opt-out list; suppressed numbers are left out
+        chunk_size: Rows parsed at a time
+
+    Yields:
+        Normalized phone numbers, first occurrence only, in file order
+    """
+    seen = set()
+    phone_col = None
+    for chunk in _iter_frames(source, chunk_size):
+        if chunk.empty:
+            continue
+        if phone_col is None:
+            phone_col = find_phone_column(chunk)
+        normalized_chunk, _reason = normalize_phone_series(chunk[phone_col])
+        for normalized in normalized_chunk.dropna().tolist():
+            if normalized in seen:
+                continue
+            seen.add(normalized)
+            if suppression is None or normalized not in suppression:
+                yield normalized
@@ -0,0 +1,240 @@
+"""
+Module for writing per-recipient campaign results to disk as they happen
+
+send_messages_from_ui only returns its results at the very end. A
+ResultsSink appends one row per recipient outcome (sent, failed, retried,
+skipped) with its timing and failure class while the campaign runs. Rows are
+buffered and written in batches; every batch is fsynced, so an interrupted
+campaign keeps everything up to the last batch and memory stays bounded by
+the batch size however long the campaign is.
+
+CSV results are a single file, appended to. Parquet results are written as
+one part file per batch in a "<name>.parquet.parts" folder (a Parquet file
+is unreadable until it is closed) and combined into "<name>.parquet" when
+the campaign ends. read_results() reads either kind, finished or not, so
+the current results can be downloaded mid-campaign.
+"""
+import csv
+import glob
+import io
+import os
+import threading
+import time
+from datetime import datetime
+from typing import Dict, List
+
+import pandas as pd
+
+RESULTS_DIR = "results"
+FORMAT_CSV = "csv"
+FORMAT_PARQUET = "parquet"
+PARTS_SUFFIX = ".parts"
+
+# Columns of a results row, in file order
+COLUMNS = ["time", "campaign", "account", "number", "status", "attempt", "seconds",
+           "failure", "error_type", "error"]
+
+# Longest error message kept per row
+MAX_ERROR_CHARS = 500
+
+
+def _parquet_schema():
+    import pyarrow as pa
+    return pa.schema([
+        ("time", pa.string()), ("campaign", pa.int64()), ("account", pa.string()), ("number", pa.string()),
+        ("status", pa.string()), ("attempt", pa.int64()), ("seconds", pa.float64()),
+        ("failure", pa.string()), ("error_type", pa.string()), ("error", pa.string()),
+    ])
+
+
+def results_format(path: str) -> str:
+    """FORMAT_PARQUET for a .parquet path, FORMAT_CSV otherwise"""
+    return FORMAT_PARQUET if path.lower().endswith(".parquet") else FORMAT_CSV
+
+
+def default_results_path(fmt: str = FORMAT_CSV, directory: str = RESULTS_DIR) -> str:
+    """New results file named after the current time, e.g. results/campaign-20250512-173600.csv"""
+    return os.path.join(directory, f"campaign-{datetime.now():%Y%m%d-%H%M%S}.{fmt}")
+
+
+class ResultsSink:
+    """
+    Batched, fsynced writer of campaign results.
+
+    Example:
+        sink = ResultsSink("results/campaign.csv")
+        sink.write(number="+9665...", status="success", seconds=12.4)
+        sink.close()
+    """
+
+    def __init__(self, path: str, batch_size: int = 100, flush_seconds: float = 5.0):
+        """
+        Args:
+            path: Results file; .parquet for Parquet, anything else is CSV
+            batch_size: Rows buffered before a write
+            flush_seconds: Also write a partial batch once it is this old,
+                so a slow campaign's file stays current
+        """
+        self.path = path
+        self.format = results_format(path)
+        if self.format == FORMAT_PARQUET:
+            try:
+                self._schema = _parquet_schema()
+            except ImportError:
+                raise ValueError("pyarrow is required for Parquet results. Install it with: pip install pyarrow")
+        self.batch_size = batch_size
+        self.flush_seconds = flush_seconds
+        self.rows_written = 0
+        self._batch: List[Dict] = []
+        self._last_flush = time.monotonic()
+        self._lock = threading.Lock()
+        self._file = None
+        self._parts = 0
+        self.closed = False
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        if self.format == FORMAT_PARQUET:
+            os.makedirs(path + PARTS_SUFFIX, exist_ok=True)
+            self._parts = len(glob.glob(os.path.join(path + PARTS_SUFFIX, "part-*.parquet")))
+        else:
+            self._file = open(path, "a", newline="", encoding="utf-8")
+            if self._file.tell() == 0:
+                csv.writer(self._file).writerow(COLUMNS)
+                self._sync()
+
+    def write(self, **fields) -> None:
+        """
+        Add a results row; written with its batch.
+
+        Args:
+            **fields: Values for COLUMNS (time defaults to now; error is
+                cut to MAX_ERROR_CHARS)
+        """
+        row = {column: fields.get(column) for column in COLUMNS}
+        if row["time"] is None:
+            row["time"] = datetime.now().isoformat(timespec="seconds")
+        if row["seconds"] is not None:
+            row["seconds"] = round(row["seconds"], 3)
+        if row["error"] is not None:
+            row["error"] = str(row["error"])[:MAX_ERROR_CHARS]
+        with self._lock:
+            if self.closed:
+                raise ValueError("Results sink is closed")
+            self._batch.append(row)
+            if len(self._batch) >= self.batch_size or time.monotonic() - self._last_flush >= self.flush_seconds:
+                self._flush()
+
+    def flush(self) -> None:
+        """Write and fsync the buffered rows"""
+        with self._lock:
+            self._flush()
+
+    def _flush(self) -> None:
+        self._last_flush = time.monotonic()
+        if not self._batch:
+            return
+        if self.format == FORMAT_PARQUET:
+            self._write_part(self._batch)
+        else:
+            buffer = io.StringIO()
+            writer = csv.writer(buffer)
+            for row in self._batch:
+                writer.writerow(["" if row[column] is None else row[column] for column in COLUMNS])
+            # One write per batch: a reader never sees half a batch's rows
+            self._file.write(buffer.getvalue())
+            self._sync()
+        self.rows_written += len(self._batch)
+        self._batch = []
+
+    def _sync(self) -> None:
+        self._file.flush()
+        os.fsync(self._file.fileno())
+
+    def _write_part(self, rows: List[Dict]) -> None:
+        import pyarrow as pa
+        import pyarrow.parquet as pq
+        self._parts += 1
+        part = os.path.join(self.path + PARTS_SUFFIX, f"part-{self._parts:06d}.parquet")
+        table = pa.Table.from_pylist(rows, schema=self._schema)
+        # Written under a temporary name: readers only ever see complete parts
+        with open(part + ".tmp", "wb") as f:
+            pq.write_table(table, f)
+            f.flush()
+            os.fsync(f.fileno())
+        os.replace(part + ".tmp", part)
+
+    def close(self) -> None:
+        """Write the remaining rows; a Parquet sink combines its parts into one file"""
+        with self._lock:
+            if self.closed:
+                return
+            self._flush()
+            self.closed = True
+            if self._file is not None:
+                self._file.close()
+                self._file = None
+            if self.format == FORMAT_PARQUET:
+                _combine_parts(self.path, self._schema)
+
+
+def _part_files(path: str) -> List[str]:
+    return sorted(glob.glob(os.path.join(path + PARTS_SUFFIX, "part-*.parquet")))
+
+
+def _combine_parts(path: str, schema) -> None:
+    """Merge a Parquet sink's part files (and an existing file) into path"""
+    import pyarrow.parquet as pq
+    parts = _part_files(path)
+    sources = ([path] if os.path.exists(path) else []) + parts
+    with open(path + ".tmp", "wb") as f:
+        writer = pq.ParquetWriter(f, schema)
+        for source in sources:
+            writer.write_table(pq.read_table(source, schema=schema))
+        writer.close()
+        f.flush()
+        os.fsync(f.fileno())
+    os.replace(path + ".tmp", path)
+    for part in parts:
+        os.remove(part)
+    try:
+        os.rmdir(path + PARTS_SUFFIX)
+    except OSError:
+        pass
+
+
+def read_results(path: str) -> pd.DataFrame:
+    """
+    Read a results file, including the batches written so far by a running campaign.
+
+    Args:
+        path: Results file given to ResultsSink
+
+    Returns:
+        DataFrame with COLUMNS (empty if nothing was written yet)
+    """
+    if results_format(path) == FORMAT_PARQUET:
+        sources = ([path] if os.path.exists(path) else []) + _part_files(path)
+        if not sources:
+            return pd.DataFrame(columns=COLUMNS)
+        return pd.concat([pd.read_parquet(source) for source in sources], ignore_index=True)
+    if not os.path.exists(path):
+        return pd.DataFrame(columns=COLUMNS)
+    return pd.read_csv(path, dtype={"number": str, "account": str, "error": str})
+
+
+def results_bytes(path: str) -> bytes:
+    """Contents of a results file for download (a running Parquet campaign is combined in memory)"""
+    if results_format(path) == FORMAT_PARQUET:
+        buffer = io.BytesIO()
+        read_results(path).to_parquet(buffer, index=False)
+        return buffer.getvalue()
+    with open(path, "rb") as f:
+        return f.read()
+
+
+def list_results(directory: str = RESULTS_DIR) -> List[str]:
+    """Results files in a folder, newest first"""
+    paths = glob.glob(os.path.join(directory, "*.csv")) + glob.glob(os.path.join(directory, "*.parquet"))
+    paths += [part[:-len(PARTS_SUFFIX)] for part in glob.glob(os.path.join(directory, "*.parquet" + PARTS_SUFFIX))]
+    paths = sorted(set(paths), key=lambda p: os.path.getmtime(p if os.path.exists(p) else p + PARTS_SUFFIX),
+                   reverse=True)
+    return paths
@@ -0,0 +1,151 @@
+"""
+Module for the send engine: one action plan per recipient, whatever the content
+
+Text, image, image with caption and album sends used to be separate
+helpers, each repeating the open chat / copy / paste / settle / submit
+sequence with its own waits. build_plan() turns a message into the steps
+for one recipient, and SendEngine runs any plan with the same waits (this
+machine's timing profile), step timings and retry policy, so a change to a
+step or a wait applies to every kind of message.
+
+The steps themselves are GUI helpers (see send_massage_from_ui), handed to
+SendEngine as actions:
+
+    engine = SendEngine({STEP_OPEN_CHAT: open_chat, ...}, timings=TIMINGS)
+    engine.send("+9665...", text="Hello", images=["a.jpg", "b.jpg"])
+"""
+import time
+from typing import Callable, Dict, List, Optional, Sequence, Tuple, Type
+
+STEP_CHECK_NUMBER = "check_number"
+STEP_OPEN_CHAT = "open_chat"
+STEP_COPY_IMAGE = "copy_image"
+STEP_ACTIVATE_COMPOSER = "activate_composer"
+STEP_PASTE = "paste"
+STEP_SUBMIT = "submit"
+STEP_LOG = "log"
+STEPS = (STEP_CHECK_NUMBER, STEP_OPEN_CHAT, STEP_COPY_IMAGE, STEP_ACTIVATE_COMPOSER, STEP_PASTE,
+         STEP_SUBMIT, STEP_LOG)
+
+# Attempts for steps that are safe to repeat (nothing is sent twice)
+STEP_RETRIES = {STEP_COPY_IMAGE: 2}
+
+
+class Step:
+    """One action of a send plan: the action's name, its arguments and the wait after it"""
+
+    def __init__(self, name: str, *args, settle: Optional[str] = None, **kwargs):
+        """
+        Args:
+            name: Action to run (one of STEPS)
+            *args, **kwargs: Passed to the action
+            settle: Timing profile key of the wait after the action
+        """
+        self.name = name
+        self.args = args
+        self.kwargs = kwargs
+        self.settle = settle
+        self.attempts = STEP_RETRIES.get(name, 1)
+
+    def __repr__(self) -> str:
+        return f"Step({self.name})"
+
+
+def build_plan(receiver: str, text: str = "", images: Sequence[str] = (), navigation: str = "url") -> List[Step]:
+    """
+    Steps to send one message to one recipient.
+
+    The text goes into the composer while the chat opens (pasted, so Arabic,
+    emoji and long texts cost the same). A pasted image takes the composer
+    text along as its caption, and each further image pasted while the
+    preview is open joins the same message as an album.
+
+    Args:
+        receiver: Phone number with country code
+        text: Message, or caption when there are images
+        images: Image paths; several make an album
+        navigation: How to open the chat ("in_app" or "url")
+
+    Returns:
+        The steps, in order
+    """
+    plan = [Step(STEP_CHECK_NUMBER, receiver),
+            Step(STEP_OPEN_CHAT, receiver, text=text, navigation=navigation)]
+    for i, path in enumerate(images):
+        plan.append(Step(STEP_COPY_IMAGE, path))
+        if i == 0 and not text:
+            # A keystroke activates the empty composer for the paste
+            plan.append(Step(STEP_ACTIVATE_COMPOSER))
+        plan.append(Step(STEP_PASTE, settle="paste_settle"))
+    plan.append(Step(STEP_SUBMIT, receiver))
+    plan.append(Step(STEP_LOG, receiver, text=text, images=list(images)))
+    return plan
+
+
+class SendEngine:
+    """
+    Runs send plans with shared waits, timing and retries.
+
+    Hooks:
+        step_hooks: Called with (step, seconds) after each step
+        retry_hooks: Called with (step, attempt, error) before a step is retried
+    """
+
+    def __init__(self, actions: Dict[str, Callable], timings: Dict[str, float], retry_delay: float = 0.5,
+                 no_retry: Tuple[Type[BaseException], ...] = ()):
+        """
+        Args:
+            actions: Step name -> function performing it
+            timings: Timing profile (see timing_profile.py) for the settle waits
+            retry_delay: Seconds before a failed step is tried again
+            no_retry: Errors that are never retried (e.g. a user abort)
+        """
+        missing = [name for name in STEPS if name not in actions]
+        if missing:
+            raise ValueError(f"No action for steps: {', '.join(missing)}")
+        self.actions = actions
+        self.timings = timings
+        self.retry_delay = retry_delay
+        self.no_retry = no_retry
+        self.step_hooks: List[Callable[[Step, float], None]] = []
+        self.retry_hooks: List[Callable[[Step, int, Exception], None]] = []
+
+    def run(self, plan: List[Step]) -> Dict[str, float]:
+        """
+        Run a plan; stops at the first step that fails for good.
+
+        Returns:
+            Seconds spent per step name, including waits (summed over
+            repeated steps such as album pastes)
+        """
+        spent: Dict[str, float] = {}
+        for step in plan:
+            started = time.perf_counter()
+            self._run_step(step)
+            if step.settle:
+                time.sleep(self.timings[step.settle])
+            seconds = time.perf_counter() - started
+            spent[step.name] = spent.get(step.name, 0.0) + seconds
+            for hook in self.step_hooks:
+                hook(step, seconds)
+        return spent
+
+    def _run_step(self, step: Step) -> None:
+        action = self.actions[step.name]
+        for attempt in range(1, step.attempts + 1):
+            try:
+                action(*step.args, **step.kwargs)
+                return
+            except self.no_retry:
+                raise
+            except Exception as e:
+                if attempt == step.attempts:
+                    raise
+                for hook in self.retry_hooks:
+                    hook(step, attempt, e)
+                time.sleep(self.retry_delay)
+
+    def send(self, receiver: str, text: str = "", images: Sequence[str] = (),
+             navigation: str = "url") -> Dict[str, float]:
+        """Build and run the plan for one message (see build_plan); returns seconds per step"""
+        return self.run(build_plan(receiver, text, images, navigation))
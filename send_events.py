@@ -0,0 +1,229 @@
+"""
+Module for live campaign events and the dashboard's running statistics
+
+The sender publishes an event for every recipient status change and every
+timed phase (opening a chat, sending, waiting for the tick) into a bounded
+in-memory EventBuffer shared by the whole process. The dashboard page keeps
+a ThroughputStats per browser session and, on each refresh, folds in only
+the events published since its last refresh (by sequence number), so a
+refresh costs the same after five minutes of sending as after five hours.
+"""
+import collections
+import threading
+import time
+from typing import Dict, List, Optional
+
+DEFAULT_CAPACITY = 20000
+
+# Recipient outcomes (the sender's status names) and timed phases
+EVENT_SENT = "success"
+EVENT_FAILED = "failed"
+EVENT_EXHAUSTED = "exhausted"
+EVENT_RETRYING = "retrying"
+EVENT_SKIPPED = "skipped"
+EVENT_PHASE = "phase"
+OUTCOMES = (EVENT_SENT, EVENT_FAILED, EVENT_EXHAUSTED, EVENT_RETRYING, EVENT_SKIPPED)
+
+# Upper bounds of the latency histogram buckets, in seconds
+LATENCY_BUCKETS = (0.5, 1, 2, 3, 5, 8, 13, 20, 30, 60, float("inf"))
+
+# Timeline resolution and length
+BUCKET_SECONDS = 60
+TIMELINE_BUCKETS = 60
+
+
+class EventBuffer:
+    """
+    Thread-safe ring buffer of events with increasing sequence numbers.
+
+    Example:
+        buffer = get_event_buffer()
+        buffer.publish("success", number="+9665...", account="host-a", seconds=12.5)
+        new_events = buffer.since(last_seen_seq)
+    """
+
+    def __init__(self, capacity: int = DEFAULT_CAPACITY):
+        """
+        Args:
+            capacity: Events kept; older ones are dropped
+        """
+        self._events = collections.deque(maxlen=capacity)
+        self._seq = 0
+        self._lock = threading.Lock()
+
+    def publish(self, kind: str, **fields) -> Dict:
+        """
+        Append an event.
+
+        Args:
+            kind: Recipient status (see OUTCOMES) or EVENT_PHASE
+            **fields: number, campaign, account, phase, seconds, ...
+
+        Returns:
+            The event, with 'seq', 'kind' and 'time' added
+        """
+        with self._lock:
+            self._seq += 1
+            event = dict(fields, seq=self._seq, kind=kind, time=fields.get("time") or time.time())
+            self._events.append(event)
+            return event
+
+    @property
+    def last_seq(self) -> int:
+        """Sequence number of the latest event (0 if none)"""
+        return self._seq
+
+    def since(self, seq: int) -> List[Dict]:
+        """Events with a sequence number above seq, oldest first"""
+        with self._lock:
+            new = []
+            # Walk back from the newest event: cost follows the number of new events
+            for event in reversed(self._events):
+                if event["seq"] <= seq:
+                    break
+                new.append(event)
+        new.reverse()
+        return new
+
+
+def _bucket(seconds: float) -> int:
+    """Index of the latency bucket for a duration"""
+    for i, bound in enumerate(LATENCY_BUCKETS):
+        if seconds <= bound:
+            return i
+    return len(LATENCY_BUCKETS) - 1
+
+
+class ThroughputStats:
+    """
+    Running counters built incrementally from an EventBuffer.
+
+    Usage (per dashboard refresh):
+        stats.update(get_event_buffer())   # only new events are read
+        stats.per_minute(), stats.timeline(), stats.latency, stats.accounts
+    """
+
+    def __init__(self):
+        self.cursor = 0
+        # Events dropped from the buffer before this reader saw them
+        self.missed = 0
+        self.totals: Dict[str, int] = {kind: 0 for kind in OUTCOMES}
+        # Minute (bucket start, epoch seconds) -> outcome counts
+        self.minutes: "collections.OrderedDict[int, Dict[str, int]]" = collections.OrderedDict()
+        # Phase -> histogram counts per LATENCY_BUCKETS, plus sum for the mean
+        self.latency: Dict[str, List[int]] = {}
+        self.latency_sum: Dict[str, float] = {}
+        # Account -> outcome counts and seconds spent on recipients
+        self.accounts: Dict[str, Dict[str, float]] = {}
+
+    def update(self, buffer: EventBuffer) -> int:
+        """
+        Fold in the events published since the last update.
+
+        Returns:
+            Number of new events
+        """
+        events = buffer.since(self.cursor)
+        if not events:
+            return 0
+        if events[0]["seq"] > self.cursor + 1:
+            self.missed += events[0]["seq"] - self.cursor - 1
+        for event in events:
+            self._add(event)
+        self.cursor = events[-1]["seq"]
+        return len(events)
+
+    def _add(self, event: Dict) -> None:
+        kind = event["kind"]
+        if kind == EVENT_PHASE:
+            phase = event["phase"]
+            counts = self.latency.setdefault(phase, [0] * len(LATENCY_BUCKETS))
+            counts[_bucket(event["seconds"])] += 1
+            self.latency_sum[phase] = self.latency_sum.get(phase, 0.0) + event["seconds"]
+            return
+        if kind not in self.totals:
+            return
+        self.totals[kind] += 1
+
+        minute = int(event["time"] // BUCKET_SECONDS * BUCKET_SECONDS)
+        counts = self.minutes.get(minute)
+        if counts is None:
+            counts = self.minutes[minute] = {outcome: 0 for outcome in OUTCOMES}
+            while len(self.minutes) > TIMELINE_BUCKETS:
+                self.minutes.popitem(last=False)
+        counts[kind] += 1
+
+        account = self.accounts.setdefault(event.get("account") or "-",
+                                           dict({outcome: 0 for outcome in OUTCOMES}, seconds=0.0))
+        account[kind] += 1
+        account["seconds"] += event.get("seconds") or 0.0
+
+    def per_minute(self, minutes: int = 5, now: Optional[float] = None) -> float:
+        """Messages sent per minute over the last few minutes"""
+        now = time.time() if now is None else now
+        start = now - minutes * BUCKET_SECONDS
+        sent = sum(counts[EVENT_SENT] for minute, counts in self.minutes.items() if minute + BUCKET_SECONDS > start)
+        return sent / minutes
+
+    def failure_rate(self, minutes: int = 10, now: Optional[float] = None) -> float:
+        """Share of finished recipients that failed over the last few minutes (0..1)"""
+        now = time.time() if now is None else now
+        start = now - minutes * BUCKET_SECONDS
+        sent = failed = 0
+        for minute, counts in self.minutes.items():
+            if minute + BUCKET_SECONDS > start:
+                sent += counts[EVENT_SENT]
+                failed += counts[EVENT_FAILED] + counts[EVENT_EXHAUSTED]
+        return failed / (sent + failed) if sent + failed else 0.0
+
+    def timeline(self) -> List[Dict]:
+        """Per-minute rows: minute, sent, failed, retrying, skipped, failure_rate"""
+        rows = []
+        for minute, counts in self.minutes.items():
+            failed = counts[EVENT_FAILED] + counts[EVENT_EXHAUSTED]
+            finished = counts[EVENT_SENT] + failed
+            rows.append({
+                "minute": minute,
+                "sent": counts[EVENT_SENT],
+                "failed": failed,
+                "retrying": counts[EVENT_RETRYING],
+                "skipped": counts[EVENT_SKIPPED],
+                "failure_rate": failed / finished if finished else 0.0,
+            })
+        return rows
+
+    def latency_summary(self) -> List[Dict]:
+        """Per-phase rows: phase, count, mean and approximate p50/p90 (bucket bounds)"""
+        rows = []
+        for phase, counts in sorted(self.latency.items()):
+            total = sum(counts)
+            row = {"phase": phase, "count": total, "mean": self.latency_sum[phase] / total}
+            for name, share in (("p50", 0.5), ("p90", 0.9)):
+                seen = 0
+                for bound, count in zip(LATENCY_BUCKETS, counts):
+                    seen += count
+                    if seen >= share * total:
+                        row[name] = bound
+                        break
+            rows.append(row)
+        return rows
+
+    def account_summary(self) -> List[Dict]:
+        """Per-account rows: counters and average seconds per finished recipient"""
+        rows = []
+        for account, counts in sorted(self.accounts.items()):
+            finished = counts[EVENT_SENT] + counts[EVENT_FAILED] + counts[EVENT_EXHAUSTED]
+            row = {"account": account}
+            row.update({outcome: int(counts[outcome]) for outcome in OUTCOMES})
+            row["seconds_per_recipient"] = counts["seconds"] / finished if finished else 0.0
+            rows.append(row)
+        return rows
+
+
+# Shared by the send loop and all dashboard sessions of this process
+_buffer = EventBuffer()
+
+
+def get_event_buffer() -> EventBuffer:
+    """The process-wide event buffer"""
+    return _buffer
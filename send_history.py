@@ -0,0 +1,250 @@
+"""
+Module for indexed analytics over the send history log (PyWhatKit_DB.txt)
+
+pywhatkit appends one multi-line entry per sent message:
+
+    Date: 5/12/2025
+    Time: 17:36
+    Phone Number: +966505815487
+    Message: ...
+    --------------------
+
+pywhatkit writes the log in text mode, so on Windows its lines (and the
+separator) end in CRLF; both line endings are accepted.
+
+The log is scanned with mmap and only bytes after the last indexed offset
+are parsed, so keeping the index current is cheap even for a log of
+hundreds of MB. Entries are stored in a small SQLite index by phone and date.
+"""
+import mmap
+import os
+import re
+import sqlite3
+from datetime import date, datetime, timedelta
+from typing import Dict, Iterator, Optional, Tuple
+from phone_extractor import normalize_phone_number
+
+DEFAULT_LOG_PATH = "PyWhatKit_DB.txt"
+# The dashed line after each entry, with LF or CRLF line endings
+SEPARATOR = re.compile(rb"\r?\n-{20}\r?\n")
+
+
+def parse_entry(raw: bytes) -> Optional[Tuple[str, str, str, str]]:
+    """
+    Parse one log entry.
+
+    Args:
+        raw: Entry bytes without the trailing separator
+
+    Returns:
+        Tuple of (phone, day as YYYY-MM-DD, time as HH:MM, kind) where kind is
+        "text" or "image", or None if the entry is malformed
+    """
+    phone = day = at = None
+    kind = "text"
+    for line in raw.decode("utf-8", errors="replace").splitlines():
+        key, _, value = line.rstrip("\r").partition(": ")
+        if key == "Date":
+            try:
+                d, m, y = (int(part) for part in value.strip().split("/"))
+                day = date(y, m, d).isoformat()
+            except ValueError:
+                return None
+        elif key == "Time":
+            try:
+                h, mi = (int(part) for part in value.strip().split(":"))
+            except ValueError:
+                return None
+            at = f"{h:02d}:{mi:02d}"
+        elif key in ("Phone Number", "Group ID"):
+            phone = value.strip()
+        elif key == "Image":
+            kind = "image"
+    if not (phone and day and at):
+        return None
+    return phone, day, at, kind
+
+
+def _iter_entries(buf, start: int) -> Iterator[Tuple[int, int, bytes]]:
+    """Yield (offset, end offset, entry bytes) for each complete entry from start"""
+    pos = start
+    while True:
+        match = SEPARATOR.search(buf, pos)
+        if match is None:
+            return
+        end = match.end()
+        yield pos, end, buf[pos:match.start()]
+        pos = end
+
+
+class SendHistory:
+    """
+    Incrementally maintained index over the send history log.
+
+    Example:
+        history = SendHistory()
+        history.update()
+        history.sends_per_day()
+        history.last_sent("+966505815487")
+    """
+
+    def __init__(self, log_path: str = DEFAULT_LOG_PATH, index_path: Optional[str] = None):
+        self.log_path = log_path
+        self.index_path = index_path or log_path + ".index.sqlite"
+        self._db = sqlite3.connect(self.index_path)
+        self._db.executescript("""
+            CREATE TABLE IF NOT EXISTS entries (
+                offset INTEGER PRIMARY KEY,
+                phone TEXT NOT NULL,
+                day TEXT NOT NULL,
+                time TEXT NOT NULL,
+                kind TEXT NOT NULL
+            );
+            CREATE INDEX IF NOT EXISTS entries_phone ON entries (phone, day, time);
+            CREATE INDEX IF NOT EXISTS entries_day ON entries (day);
+            CREATE TABLE IF NOT EXISTS state (key TEXT PRIMARY KEY, value INTEGER);
+        """)
+
+    def close(self) -> None:
+        """Close the index database"""
+        self._db.close()
+
+    def _offset(self) -> int:
+        row = self._db.execute("SELECT value FROM state WHERE key = 'offset'").fetchone()
+        return row[0] if row else 0
+
+    def update(self) -> int:
+        """
+        Index entries appended to the log since the last update.
+
+        Only bytes after the remembered offset are read. If the log shrank
+        (rotated or replaced) the index is rebuilt from the start.
+
+        Returns:
+            Number of new entries indexed
+        """
+        if not os.path.exists(self.log_path):
+            return 0
+
+        size = os.path.getsize(self.log_path)
+        offset = self._offset()
+        if size < offset:
+            self._reset()
+            offset = 0
+        if size == offset:
+            return 0
+
+        rows = []
+        end_offset = offset
+        with open(self.log_path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                for start, end, raw in _iter_entries(buf, offset):
+                    parsed = parse_entry(raw)
+                    if parsed:
+                        rows.append((start,) + parsed)
+                    end_offset = end
+
+        # Partial trailing entries are left for the next update
+        with self._db:
+            self._db.executemany("INSERT OR REPLACE INTO entries VALUES (?, ?, ?, ?, ?)", rows)
+            self._db.execute("INSERT OR REPLACE INTO state VALUES ('offset', ?)", (end_offset,))
+        return len(rows)
+
+    def _reset(self) -> None:
+        with self._db:
+            self._db.execute("DELETE FROM entries")
+            self._db.execute("DELETE FROM state")
+
+    def sends_per_day(self, start: Optional[str] = None, end: Optional[str] = None) -> Dict[str, int]:
+        """
+        Count sends per day.
+
+        Args:
+            start: First day to include (YYYY-MM-DD, optional)
+            end: Last day to include (YYYY-MM-DD, optional)
+
+        Returns:
+            Dictionary mapping day (YYYY-MM-DD) to number of sends, in date order
+        """
+        query = "SELECT day, COUNT(*) FROM entries WHERE day >= ? AND day <= ? GROUP BY day ORDER BY day"
+        return dict(self._db.execute(query, (start or "0000-00-00", end or "9999-99-99")).fetchall())
+
+    def last_sent(self, phone: str) -> Optional[datetime]:
+        """
+        When was this number last messaged?
+
+        Args:
+            phone: Phone number in any supported format
+
+        Returns:
+            Date and time of the last send, or None if never messaged
+        """
+        phone = normalize_phone_number(phone) or phone
+        row = self._db.execute(
+            "SELECT day, time FROM entries WHERE phone = ? ORDER BY day DESC, time DESC LIMIT 1", (phone,)
+        ).fetchone()
+        if not row:
+            return None
+        return datetime.strptime(f"{row[0]} {row[1]}", "%Y-%m-%d %H:%M")
+
+    def send_count(self, phone: str) -> int:
+        """Number of messages sent to this number"""
+        phone = normalize_phone_number(phone) or phone
+        return self._db.execute("SELECT COUNT(*) FROM entries WHERE phone = ?", (phone,)).fetchone()[0]
+
+    def compact(self, keep_days: int = 90, archive_path: Optional[str] = None) -> int:
+        """
+        Rotate entries older than keep_days out of the log.
+
+        Old entries are appended to archive_path (default: PyWhatKit_DB.archive.txt
+        next to the log); the log is rewritten with the remaining entries and
+        the index rebuilt.
+
+        Args:
+            keep_days: Entries from the last keep_days days stay in the log
+            archive_path: File old entries are appended to
+
+        Returns:
+            Number of entries rotated out
+        """
+        self.update()
+        cutoff = (date.today() - timedelta(days=keep_days)).isoformat()
+        old_offsets = {row[0] for row in self._db.execute("SELECT offset FROM entries WHERE day < ?", (cutoff,))}
+        if not old_offsets:
+            return 0
+
+        archive_path = archive_path or os.path.splitext(self.log_path)[0] + ".archive.txt"
+        tmp_path = self.log_path + ".tmp"
+        with open(self.log_path, "rb") as f:
+            with mmap.mmap(f.fileno(), 0, access=mmap.ACCESS_READ) as buf:
+                last_end = 0
+                with open(archive_path, "ab") as archive, open(tmp_path, "wb") as keep:
+                    for start, end, _raw in _iter_entries(buf, 0):
+                        (archive if start in old_offsets else keep).write(buf[start:end])
+                        last_end = end
+                    # Keep any partial entry still being written
+                    keep.write(buf[last_end:])
+        os.replace(tmp_path, self.log_path)
+
+        self._reset()
+        self.update()
+        return len(old_offsets)
+
+
+# ===== For standalone execution =====
+if __name__ == "__main__":
+    import sys
+
+    history = SendHistory()
+    added = history.update()
+    print(f"📚 Indexed {added} new entries")
+
+    if len(sys.argv) > 2 and sys.argv[1] == "last":
+        last = history.last_sent(sys.argv[2])
+        print(f"🕒 Last sent to {sys.argv[2]}: {last or 'never'}")
+    elif len(sys.argv) > 1 and sys.argv[1] == "compact":
+        keep = int(sys.argv[2]) if len(sys.argv) > 2 else 90
+        print(f"🗄️ Rotated {history.compact(keep_days=keep)} old entries")
+    else:
+        for day, count in history.sends_per_day().items():
+            print(f"{day}: {count}")
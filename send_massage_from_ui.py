@@ -1,18 +1,74 @@
-import pywhatkit as kit
 import pywhatkit.core.core as core
 import time
 import os
+import itertools
+import queue
+import socket
+import threading
 from urllib.parse import quote
 from platform import system
 import pyautogui as pg
 import pyperclip
-from typing import List, Optional, Callable, Dict
+from typing import List, Optional, Callable, Dict, Iterable, Union
+from message_template import MessageTemplate
+from idempotency import IdempotencyIndex, delivery_key, media_hash
+from media_store import get_store as get_media_store
+from delivery_confirmation import SentTickWatcher, DeliveryNotConfirmedError, ChatHeaderCheck, ChatNotOpenedError
+from campaign_forecast import record_phase, save_phase_timings, content_type, default_phases
+from timing_profile import load_profile
+from browser_session import BrowserSession, get_session, WHATSAPP_URL
+from send_scheduler import SendScheduler, Campaign, PRIORITY_NORMAL, prefetch
+from send_events import get_event_buffer
+from results_sink import ResultsSink
+from stack_profiler import section, start_profiling, stop_profiling, active_profiler
+from send_watchdog import AutomationWorker, WatchdogTimeout, WorkerCrashedError, phase
+from send_engine import (SendEngine, STEP_CHECK_NUMBER, STEP_OPEN_CHAT, STEP_COPY_IMAGE, STEP_ACTIVATE_COMPOSER,
+                         STEP_PASTE, STEP_SUBMIT, STEP_LOG)
+
+# Waits used by the send helpers: this machine's calibrated profile, or the
+# original defaults (see timing_profile.py)
+TIMINGS = load_profile()
+
+# ===== تصنيف أسباب الفشل =====
+PERMANENT = "permanent"
+TRANSIENT = "transient"
+# A step after Enter failed (final wait, closing the tab, status update):
+# the message went out, only its bookkeeping is incomplete
+BOOKKEEPING = "bookkeeping"
+
+
+class InvalidNumberError(Exception):
+    """Raised when a phone number can never be sent to (e.g. no country code)"""
+
+
+def may_have_sent(error: Exception) -> bool:
+    """True if the message may have gone out before the failure (Enter was pressed)"""
+    if isinstance(error, DeliveryNotConfirmedError):
+        return True
+    return isinstance(error, (WatchdogTimeout, WorkerCrashedError)) and error.maybe_sent
+
+
+def classify_failure(error: Exception) -> str:
+    """
+    Classify a send failure as permanent or transient.
+    
+    Invalid numbers and a user abort (pyautogui fail-safe) are permanent, and
+    so is an unconfirmed delivery, since retrying it could send the message
+    twice; the same goes for a step that hung, or a worker that died, after
+    Enter was pressed. Anything else - page not loaded yet, clipboard race,
+    lost focus, a hung step before sending - is assumed transient and worth
+    retrying.
+    """
+    if isinstance(error, (InvalidNumberError, ValueError, pg.FailSafeException)) or may_have_sent(error):
+        return PERMANENT
+    return TRANSIENT
 
 # ===== دالة لإغلاق التاب مع إيقاف عند ظهور نافذة التأكيد =====
 def close_tab_with_modal_handling(wait_time: int = 2) -> bool:
     """Closes the Currently Opened Browser Tab and stops if WhatsApp modal dialog appears.
     Returns True if modal was detected and user wants to stop, False otherwise."""
     
+    phase("close_tab")
     time.sleep(wait_time)
     
     # Close the tab using keyboard shortcut
@@ -31,287 +87,774 @@ def close_tab_with_modal_handling(wait_time: int = 2) -> bool:
     # The UI will handle showing status
     return False  # Continue processing
 
-# ===== دالة لإرسال النص فقط =====
-def send_text_only(receiver: str, message: str, wait_time: int = 15):
-    """Send text message only using WhatsApp Web"""
-    
-    if (not receiver.isalnum()) and (not core.check_number(number=receiver)):
-        raise Exception("Country Code Missing in Phone Number!")
+# ===== فتح المحادثة =====
+NAVIGATION_IN_APP = "in_app"
+NAVIGATION_URL = "url"
+
+# Seconds spent opening each chat, per navigation mode actually used
+navigation_timings: Dict[str, List[float]] = {NAVIGATION_IN_APP: [], NAVIGATION_URL: []}
+
+# Created on first use: capturing the header needs a display
+chat_header: Optional[ChatHeaderCheck] = None
+
+
+def mod_key() -> str:
+    """Command key on macOS, Ctrl elsewhere"""
+    return "command" if system().lower() == "darwin" else "ctrl"
+
+
+def press_new_chat_hotkey():
+    """Open WhatsApp Web's "New chat" panel (Ctrl+Alt+N, Cmd+Ctrl+N on macOS)"""
+    if system().lower() == "darwin":
+        pg.hotkey("command", "ctrl", "n")
+    else:
+        pg.hotkey("ctrl", "alt", "n")
+
+
+def open_chat_via_url(receiver: str, text: str = ""):
+    """
+    Open the chat by pasting a web.whatsapp.com/send URL into the address bar.
     
+    This reloads the whole WhatsApp Web app (sync, service worker), hence the
+    long wait. Used as the fallback when in-app navigation is not possible.
+    """
     # Navigate to the contact URL in the same tab
-    url = f"https://web.whatsapp.com/send?phone={receiver}&text={quote(message)}"
+    url = f"{WHATSAPP_URL}send?phone={receiver}"
+    if text:
+        url += f"&text={quote(text)}"
     
     # Copy URL to clipboard
     pyperclip.copy(url)
     
     # Ensure browser tab is focused
-    time.sleep(1)
+    time.sleep(TIMINGS["focus"])
     pg.click(core.WIDTH / 2, 50)
-    time.sleep(0.5)
+    time.sleep(TIMINGS["keystroke"])
     
     # Focus address bar and navigate
-    if system().lower() == "darwin":
-        pg.hotkey("command", "l")
-    else:
-        pg.hotkey("ctrl", "l")
+    pg.hotkey(mod_key(), "l")
     
-    time.sleep(0.5)
+    time.sleep(TIMINGS["keystroke"])
     # Select all and paste the URL
-    if system().lower() == "darwin":
-        pg.hotkey("command", "a")
-        pg.hotkey("command", "v")
-    else:
-        pg.hotkey("ctrl", "a")
-        pg.hotkey("ctrl", "v")
+    pg.hotkey(mod_key(), "a")
+    pg.hotkey(mod_key(), "v")
     
-    time.sleep(0.5)
+    time.sleep(TIMINGS["keystroke"])
     pg.press("enter")
     
     # Wait for WhatsApp to load
-    time.sleep(10)
+    time.sleep(TIMINGS["page_load"])
     pg.click(core.WIDTH / 2, core.HEIGHT / 2)
-    time.sleep(3)
-    
-    # Send the message (Enter key)
-    pg.press("enter")
-    
-    # Wait for message to be sent
-    time.sleep(5)
-    
-    # Log the action
-    from pywhatkit.core import log
-    log.log_message(_time=time.localtime(), receiver=receiver, message=message)
+    time.sleep(TIMINGS["chat_settle"])
 
-# ===== دالة لإرسال الصورة فقط =====
-def send_image_only(receiver: str, img_path: str, wait_time: int = 15):
-    """Send image only using WhatsApp Web"""
-    
-    if (not receiver.isalnum()) and (not core.check_number(number=receiver)):
-        raise Exception("Country Code Missing in Phone Number!")
+
+def open_chat_in_app(receiver: str, text: str = ""):
+    """
+    Open the chat inside the already-loaded WhatsApp Web app, without a reload.
     
-    # Navigate to the contact URL
-    url = f"https://web.whatsapp.com/send?phone={receiver}"
+    Uses the "New chat" shortcut (Ctrl+Alt+N, or Cmd+Ctrl+N on macOS), searches
+    the number and opens the first result. Works for numbers that are not
+    saved contacts as long as they are on WhatsApp.
     
-    # Copy URL to clipboard
-    pyperclip.copy(url)
+    Raises:
+        ChatNotOpenedError: The chat header did not change (no search result),
+            checked before any text is pasted
+    """
+    global chat_header
+    if chat_header is None:
+        chat_header = ChatHeaderCheck()
     
-    # Ensure browser tab is focused
-    time.sleep(1)
-    pg.click(core.WIDTH / 2, 50)
-    time.sleep(0.5)
+    # Focus the page (not the address bar)
+    pg.click(core.WIDTH / 2, core.HEIGHT / 2)
+    time.sleep(0.3)
+    chat_header.arm()
     
-    # Focus address bar and navigate
-    if system().lower() == "darwin":
-        pg.hotkey("command", "l")
-    else:
-        pg.hotkey("ctrl", "l")
+    # Open the new chat panel; its search box gets focus
+    press_new_chat_hotkey()
+    time.sleep(TIMINGS["panel_open"])
     
-    time.sleep(0.5)
-    # Select all and paste the URL
-    if system().lower() == "darwin":
-        pg.hotkey("command", "a")
-        pg.hotkey("command", "v")
-    else:
-        pg.hotkey("ctrl", "a")
-        pg.hotkey("ctrl", "v")
+    # Search the number (digits only, WhatsApp matches without the +)
+    pyperclip.copy(receiver.lstrip("+"))
+    pg.hotkey(mod_key(), "a")
+    pg.hotkey(mod_key(), "v")
+    time.sleep(TIMINGS["search_results"])
     
-    time.sleep(0.5)
+    # Open the first result; the composer gets focus
     pg.press("enter")
+    time.sleep(TIMINGS["chat_open"])
+    if not chat_header.wait(timeout=TIMINGS["chat_open"]):
+        raise ChatNotOpenedError(f"no chat opened for {receiver}")
+    
+    # Put the text in the composer (pasting also handles Arabic and emoji)
+    if text:
+        pyperclip.copy(text)
+        pg.hotkey(mod_key(), "v")
+        time.sleep(TIMINGS["keystroke"])
+
+
+def open_chat(receiver: str, text: str = "", navigation: str = NAVIGATION_URL) -> str:
+    """
+    Open the chat with receiver, optionally with text already in the composer.
     
-    # Wait for WhatsApp to load
-    time.sleep(10)
-    pg.click(core.WIDTH / 2, core.HEIGHT / 2)
-    time.sleep(3)
+    Args:
+        receiver: Phone number with country code
+        text: Text to put in the composer (optional)
+        navigation: NAVIGATION_IN_APP to switch chats without reloading the
+            page (the URL is loaded instead if no chat opened), NAVIGATION_URL
+            to load the send URL
     
-    # Copy image to clipboard
-    core.copy_image(path=img_path)
+    Returns:
+        The navigation mode that was used
+    """
+    phase("open_chat")
+    start = time.perf_counter()
+    used = NAVIGATION_URL
+    if navigation == NAVIGATION_IN_APP:
+        try:
+            open_chat_in_app(receiver, text)
+            used = NAVIGATION_IN_APP
+        except pg.FailSafeException:
+            raise
+        except Exception as e:
+            print(f"   ↪️ In-app navigation failed ({e}), reloading via URL")
+    if used == NAVIGATION_URL:
+        if navigation == NAVIGATION_IN_APP:
+            # Leave the new chat panel before reloading
+            pg.press("esc")
+        open_chat_via_url(receiver, text)
+    elapsed = time.perf_counter() - start
+    navigation_timings[used].append(elapsed)
+    record_phase(f"navigate_{used}", elapsed)
+    return used
+
+
+def navigation_summary() -> str:
+    """Average chat-opening time per navigation mode and the time saved"""
+    parts = []
+    averages = {}
+    for mode, timings in navigation_timings.items():
+        if timings:
+            averages[mode] = sum(timings) / len(timings)
+            parts.append(f"{mode}: {len(timings)} chats, {averages[mode]:.1f}s avg")
+    if NAVIGATION_IN_APP in averages:
+        # Compare with the measured URL time, or the URL path's waits
+        url_avg = averages.get(NAVIGATION_URL, default_phases(TIMINGS)["navigate_url"])
+        saved = (url_avg - averages[NAVIGATION_IN_APP]) * len(navigation_timings[NAVIGATION_IN_APP])
+        parts.append(f"saved ~{saved:.0f}s vs URL navigation")
+    return ", ".join(parts)
+
+# ===== تأكيد الإرسال =====
+# Created on first use: loading tick templates needs no display, capturing does
+delivery_watcher: Optional[SentTickWatcher] = None
+
+
+def delivery_confirmation_available() -> bool:
+    """True if sent-tick templates are installed (see delivery_confirmation.py)"""
+    global delivery_watcher
+    if delivery_watcher is None:
+        delivery_watcher = SentTickWatcher()
+    return delivery_watcher.available
+
+
+def submit_message(receiver: str, timeout: float = 15, fallback_wait: Optional[float] = None) -> Optional[float]:
+    """
+    Press Enter to send what is in the composer and wait until it went out.
     
-    # Type a space to activate the input field
-    pg.typewrite(" ")
+    Returns as soon as the sent tick appears on the new bubble. Without tick
+    templates it falls back to a fixed wait and cannot confirm anything.
     
-    # Paste image
-    if system().lower() == "darwin":
-        pg.hotkey("command", "v")
-    else:
-        pg.hotkey("ctrl", "v")
+    Returns:
+        Seconds until the tick appeared, or None if confirmation is unavailable
     
-    time.sleep(1)
+    Raises:
+        DeliveryNotConfirmedError: No tick appeared within timeout
+    """
+    if fallback_wait is None:
+        fallback_wait = TIMINGS["submit_wait"]
+    phase("submit", timeout=max(timeout, fallback_wait) + 30)
+    if not delivery_confirmation_available():
+        pg.press("enter")
+        time.sleep(fallback_wait)
+        record_phase("submit", fallback_wait)
+        return None
+    
+    delivery_watcher.arm()
     pg.press("enter")
-    
-    # Wait for message to be sent
-    time.sleep(5)
-    
-    # Log the action
-    from pywhatkit.core import log
-    log.log_image(_time=time.localtime(), path=img_path, receiver=receiver, caption="")
+    elapsed = delivery_watcher.wait(timeout=timeout)
+    if elapsed is None:
+        raise DeliveryNotConfirmedError(f"No sent tick for {receiver} after {timeout:.0f}s")
+    record_phase("submit", elapsed)
+    print(f"   ✓ Sent tick after {elapsed:.1f}s")
+    return elapsed
 
-# ===== دالة لإرسال الصورة مع النص =====
-def send_image_with_text(receiver: str, img_path: str, caption: str, wait_time: int = 15):
-    """Send image with text caption using WhatsApp Web"""
-    
+# ===== نسخ الصورة للحافظة =====
+def copy_image(img_path: str) -> None:
+    """
+    Put an image on the clipboard.
+
+    On Windows, pywhatkit converts the image to a bitmap on every call; for
+    images in the media store the converted clipboard payload is cached.
+    """
+    phase("copy_image")
+    sha = get_media_store().sha_for_path(img_path) if system().lower() == "windows" else None
+    if sha is None:
+        core.copy_image(path=img_path)
+        return
+    import win32clipboard
+    
+    payload = get_media_store().clipboard_dib(sha)
+    win32clipboard.OpenClipboard()
+    try:
+        win32clipboard.EmptyClipboard()
+        win32clipboard.SetClipboardData(win32clipboard.CF_DIB, payload)
+    finally:
+        win32clipboard.CloseClipboard()
+
+# ===== خطوات الإرسال =====
+def check_receiver(receiver: str) -> None:
+    """Reject numbers without a country code before touching the browser"""
     if (not receiver.isalnum()) and (not core.check_number(number=receiver)):
-        raise Exception("Country Code Missing in Phone Number!")
-    
-    # Navigate to the contact URL
-    url = f"https://web.whatsapp.com/send?phone={receiver}"
-    
-    # Copy URL to clipboard
-    pyperclip.copy(url)
-    
-    # Ensure browser tab is focused
-    time.sleep(1)
-    pg.click(core.WIDTH / 2, 50)
-    time.sleep(0.5)
-    
-    # Focus address bar and navigate
-    if system().lower() == "darwin":
-        pg.hotkey("command", "l")
+        raise InvalidNumberError("Country Code Missing in Phone Number!")
+
+
+def activate_composer() -> None:
+    """Type a space so the empty composer takes the pasted image"""
+    phase("paste")
+    pg.typewrite(" ")
+
+
+def paste_clipboard() -> None:
+    """Paste the clipboard into the focused composer or media preview"""
+    phase("paste")
+    pg.hotkey(mod_key(), "v")
+
+
+def log_send(receiver: str, text: str = "", images: Optional[List[str]] = None) -> None:
+    """Append the message to pywhatkit's send log (PyWhatKit_DB.txt)"""
+    phase("log")
+    from pywhatkit.core import log
+    if images:
+        log.log_image(_time=time.localtime(), path=", ".join(images), receiver=receiver, caption=text)
     else:
-        pg.hotkey("ctrl", "l")
+        log.log_message(_time=time.localtime(), receiver=receiver, message=text)
+
+
+# Every kind of message runs through the same plan runner (see send_engine.py)
+send_engine = SendEngine({
+    STEP_CHECK_NUMBER: check_receiver,
+    STEP_OPEN_CHAT: open_chat,
+    STEP_COPY_IMAGE: copy_image,
+    STEP_ACTIVATE_COMPOSER: activate_composer,
+    STEP_PASTE: paste_clipboard,
+    STEP_SUBMIT: submit_message,
+    STEP_LOG: log_send,
+}, timings=TIMINGS, no_retry=(pg.FailSafeException,))
+send_engine.retry_hooks.append(lambda step, attempt, error: print(f"   ↻ {step.name} failed ({error}), retrying"))
+
+
+# ===== دالة الإرسال الموحدة =====
+def send_message(receiver: str, text: str = "", img_paths: Union[str, List[str], None] = None,
+                 navigation: str = NAVIGATION_URL) -> None:
+    """
+    Send a text, an image, an image with caption or an album using WhatsApp Web.
     
-    time.sleep(0.5)
-    # Select all and paste the URL
-    if system().lower() == "darwin":
-        pg.hotkey("command", "a")
-        pg.hotkey("command", "v")
+    Args:
+        receiver: Phone number with country code
+        text: Message, or caption when images are given
+        img_paths: Image path, or several paths sent as one album
+        navigation: NAVIGATION_IN_APP or NAVIGATION_URL (see open_chat)
+    """
+    images = [img_paths] if isinstance(img_paths, str) else list(img_paths or [])
+    spent = send_engine.send(receiver, text=text, images=images, navigation=navigation)
+    if images:
+        # Per image: copy, paste and preview (feeds the duration forecast)
+        record_phase("compose_image", (spent[STEP_COPY_IMAGE] + spent[STEP_PASTE]) / len(images))
+
+
+# ===== دالة لإرسال النص فقط =====
+def send_text_only(receiver: str, message: str, wait_time: int = 15, navigation: str = NAVIGATION_URL):
+    """Send text message only using WhatsApp Web"""
+    send_message(receiver, text=message, navigation=navigation)
+
+# ===== دالة لإرسال الصورة فقط =====
+def send_image_only(receiver: str, img_path: Union[str, List[str]], wait_time: int = 15,
+                    navigation: str = NAVIGATION_URL):
+    """Send image only (or an album, given several paths) using WhatsApp Web"""
+    send_message(receiver, img_paths=img_path, navigation=navigation)
+
+# ===== دالة لإرسال الصورة مع النص =====
+def send_image_with_text(receiver: str, img_path: Union[str, List[str]], caption: str, wait_time: int = 15,
+                         navigation: str = NAVIGATION_URL):
+    """Send image (or an album sharing one caption) with text caption using WhatsApp Web"""
+    send_message(receiver, text=caption, img_paths=img_path, navigation=navigation)
+
+# ===== جدولة الحملات =====
+# One scheduler per process: the first call to send_messages_from_ui runs the
+# send loop, and campaigns submitted meanwhile (another UI session, a queue
+# worker) are interleaved with it by priority at recipient boundaries
+scheduler = SendScheduler(per_recipient=default_phases(TIMINGS)["navigate_in_app"] + TIMINGS["submit_wait"])
+_send_loop_lock = threading.Lock()
+
+# GUI automation runs in a worker process with a deadline per step (see
+# send_watchdog.py); started on first use and shared by all campaigns
+automation_worker = AutomationWorker("send_massage_from_ui")
+
+# Campaign numbers shown on the live dashboard
+_campaign_ids = itertools.count(1)
+
+
+class CampaignRun:
+    """Settings, progress and results of one campaign in the shared send loop"""
+    
+    def __init__(self, message: str, image_paths: List[str], status_callback: Optional[Callable[[str, str], None]],
+                 close_tabs: bool, sent_index: IdempotencyIndex, force_resend: bool, max_attempts: int,
+                 retry_base_delay: float, navigation: str, pause_seconds: float, isolate: bool = True,
+                 account: Optional[str] = None):
+        self.message = message
+        self.image_paths = [path for path in image_paths if os.path.exists(path)]
+        for path in image_paths:
+            if path not in self.image_paths:
+                print(f"⚠️ Image not found, left out: {path}")
+        self.send_text = bool(message and message.strip())
+        self.send_image = bool(self.image_paths)
+        self.status_callback = status_callback
+        self.close_tabs = close_tabs
+        self.sent_index = sent_index
+        self.force_resend = force_resend
+        self.max_attempts = max_attempts
+        self.retry_base_delay = retry_base_delay
+        self.navigation = navigation
+        self.pause_seconds = pause_seconds
+        self.isolate = isolate
+        # Identifies the campaign and the sending account on the dashboard
+        self.campaign_id = next(_campaign_ids)
+        self.account = account or socket.gethostname()
+        # Phase timings feed the duration forecast (campaign_forecast.py)
+        self.content = content_type(self.send_text, self.send_image)
+        # Media goes through the content-addressed store: its key is the
+        # SHA-256 used for duplicate protection, and the campaign pastes the
+        # cached, downscaled variants, prepared once here for all recipients
+        store = get_media_store()
+        self.media_shas = [store.put_file(path) for path in self.image_paths]
+        self.send_paths = []
+        for sha in self.media_shas:
+            store.acquire(sha)
+            try:
+                self.send_paths.append(store.send_path(sha))
+            except OSError as e:
+                print(f"⚠️ Could not prepare a resized image, sending the original: {e}")
+                self.send_paths.append(store.path(sha))
+        # An album is one delivery: its key covers all images, in order
+        self.media_hash = media_hash(self.media_shas)
+        self.results: Dict[str, bool] = {}
+        # Every outcome is also appended to the results file as it happens
+        self.results_sink: Optional[ResultsSink] = None
+        self.skipped = 0
+        # Status updates reach the callback on the thread that submitted the
+        # campaign (Streamlit callbacks only work on their own script thread)
+        self.owner = threading.get_ident()
+        self.events: "queue.Queue[tuple]" = queue.Queue()
+    
+    def finish(self) -> None:
+        """Release the campaign's media and write the last results"""
+        for sha in self.media_shas:
+            get_media_store().release(sha)
+        if self.results_sink is not None:
+            self.results_sink.close()
+    
+    def notify(self, num: str, status: str, seconds: Optional[float] = None,
+               error: Optional[Exception] = None, attempt: int = 1, failure: Optional[str] = None) -> None:
+        if status != "sending":
+            get_event_buffer().publish(status, number=num, campaign=self.campaign_id, account=self.account,
+                                       seconds=seconds)
+            if self.results_sink is not None:
+                self.results_sink.write(campaign=self.campaign_id, account=self.account, number=num,
+                                        status=status, attempt=attempt, seconds=seconds,
+                                        failure=failure or (classify_failure(error) if error is not None else None),
+                                        error_type=type(error).__name__ if error is not None else None,
+                                        error=error)
+        if not self.status_callback:
+            return
+        if threading.get_ident() == self.owner:
+            self.status_callback(num, status)
+        else:
+            self.events.put((num, status))
+    
+    def drain(self, timeout: Optional[float] = None) -> None:
+        """Deliver queued status updates on the owner's thread"""
+        try:
+            num, status = self.events.get(timeout=timeout) if timeout else self.events.get_nowait()
+            self.status_callback(num, status)
+            while True:
+                num, status = self.events.get_nowait()
+                self.status_callback(num, status)
+        except queue.Empty:
+            pass
+
+
+def automate(run: CampaignRun, func: Callable, *args, **kwargs):
+    """Run an automation helper, in the watched worker process if the campaign is isolated"""
+    if run.isolate:
+        return automation_worker.call(func.__name__, *args, **kwargs)
+    return func(*args, **kwargs)
+
+
+def attempt_send(run: CampaignRun, num: str, text: str, attempt: int, label: str) -> None:
+    """Run one send attempt for a recipient; raises on failure"""
+    retry_note = f" (attempt {attempt}/{run.max_attempts})" if attempt > 1 else ""
+    # A retry reloads the page in case the app itself is in a bad state;
+    # with close_tabs there is no loaded app to navigate inside
+    nav = run.navigation if attempt == 1 and not run.close_tabs else NAVIGATION_URL
+    media = "image" if len(run.send_paths) == 1 else f"album of {len(run.send_paths)} images"
+    if run.send_text and run.send_image:
+        print(f"📸 {label} Sending {media} + text to {num}{retry_note}")
+    elif run.send_image:
+        print(f"📸 {label} Sending {media} to {num}{retry_note}")
     else:
-        pg.hotkey("ctrl", "a")
-        pg.hotkey("ctrl", "v")
-    
-    time.sleep(0.5)
-    pg.press("enter")
-    
-    # Wait for WhatsApp to load
-    time.sleep(10)
-    pg.click(core.WIDTH / 2, core.HEIGHT / 2)
-    time.sleep(3)
-    
-    # Copy image to clipboard
-    core.copy_image(path=img_path)
+        print(f"💬 {label} Sending text to {num}{retry_note}")
+    automate(run, send_message, num, text if run.send_text else "", run.send_paths, navigation=nav)
+
+
+def process_recipient(run: CampaignRun, campaign: Campaign, num: str, text: str, key: str,
+                      attempt: int, label: str) -> None:
+    """Send to one recipient; a transient failure before Enter is re-queued on its campaign"""
+    started = time.perf_counter()
+    try:
+        # Update status: sending
+        run.notify(num, "sending")
+        
+        attempt_send(run, num, text, attempt, label)
+    except Exception as e:
+        handle_send_failure(run, campaign, num, text, key, attempt, started, e)
+        return
+    
+    # Enter was pressed: record the delivery before anything else can fail,
+    # so neither a retry nor a later campaign sends it twice
+    run.sent_index.add(key)
+    run.results[num] = True
+    elapsed = time.perf_counter() - started
+    is_last = not scheduler.has_work()
+    
+    # Nothing below is retried: a failure is reported on the sent message
+    bookkeeping_error = None
+    try:
+        # Forecasts add the extra pastes of an album on top of single-image sends
+        if len(run.send_paths) <= 1:
+            record_phase(f"send_{run.content}", elapsed)
+        scheduler.per_recipient = 0.7 * scheduler.per_recipient + 0.3 * (elapsed + run.pause_seconds)
+        
+        # For the last message, wait longer to ensure it is sent
+        # (not needed when the sent tick was confirmed)
+        if is_last and not delivery_confirmation_available():
+            print(f"   ⏳ Waiting for final message to be sent...")
+            time.sleep(8)
+        
+        # Close tab if requested
+        if run.close_tabs:
+            print(f"   ✓ Closing tab...")
+            automate(run, close_tab_with_modal_handling, wait_time=2)
+    except Exception as e:
+        bookkeeping_error = e
+        print(f"⚠️ Message sent to {num}, but the step after sending failed: {e}")
+    
+    # Update status: success
+    try:
+        run.notify(num, "success", seconds=time.perf_counter() - started, error=bookkeeping_error,
+                   attempt=attempt, failure=BOOKKEEPING if bookkeeping_error is not None else None)
+    except Exception as e:
+        print(f"⚠️ Message sent to {num}, but its status could not be recorded: {e}")
+    print(f"✅ Message sent to {num}")
+    
+    # Wait before next number (except for the last one)
+    if not is_last:
+        time.sleep(run.pause_seconds)
+
+
+def handle_send_failure(run: CampaignRun, campaign: Campaign, num: str, text: str, key: str,
+                        attempt: int, started: float, error: Exception) -> None:
+    """Re-queue a recipient whose send failed transiently, or mark it failed / exhausted"""
+    kind = classify_failure(error)
+    
+    # The message may have gone out: a re-run must not send it again unasked
+    maybe_sent = may_have_sent(error)
+    if maybe_sent:
+        try:
+            run.sent_index.add(key, maybe_sent=True)
+        except Exception as e:
+            print(f"⚠️ Could not record {num} as maybe sent: {e}")
     
-    # Type caption
-    if caption:
-        for char in caption:
-            if char == "\n":
-                pg.hotkey("shift", "enter")
-            else:
-                pg.typewrite(char)
+    if isinstance(error, (WatchdogTimeout, WorkerCrashedError)):
+        # The worker was killed mid-step; dismiss whatever it left open
+        print(f"⏰ {error} for {num}, automation worker restarted")
+        try:
+            pg.press("esc")
+        except Exception:
+            pass
     
-    # Paste image
-    if system().lower() == "darwin":
-        pg.hotkey("command", "v")
+    # Try to close tab even on error
+    if run.close_tabs:
+        try:
+            automate(run, close_tab_with_modal_handling, wait_time=1)
+        except:
+            pass
+    
+    if kind == TRANSIENT and attempt < run.max_attempts:
+        # Re-queue with exponential backoff; retried after the main pass
+        delay = run.retry_base_delay * (2 ** (attempt - 1))
+        campaign.requeue(("[retry]", num, text, key, attempt + 1), time.monotonic() + delay)
+        run.notify(num, "retrying", seconds=time.perf_counter() - started, error=error, attempt=attempt)
+        print(f"🔁 Failed to send to {num}: {error} (will retry in {delay:.0f}s)")
     else:
-        pg.hotkey("ctrl", "v")
-    
-    time.sleep(1)
-    pg.press("enter")
+        # Update status: failed (permanent) or exhausted (retries used up)
+        status = "failed" if kind == PERMANENT else "exhausted"
+        run.notify(num, status, seconds=time.perf_counter() - started, error=error, attempt=attempt)
+        run.results[num] = False
+        note = " (retries exhausted)" if status == "exhausted" else ""
+        if maybe_sent:
+            note = " (may have been sent; use force_resend to send again)"
+        print(f"❌ Failed to send to {num}: {error}{note}")
+    
+    # Wait before trying next number
+    if scheduler.has_work():
+        time.sleep(5)
+
+
+def run_send_loop(session: Optional[BrowserSession] = None, until: Optional[Campaign] = None) -> None:
+    """
+    Send recipients from the scheduler until no campaign has work left.
     
-    # Wait for message to be sent
-    time.sleep(5)
+    Only one thread runs the loop at a time (see send_messages_from_ui).
     
-    # Log the action
-    from pywhatkit.core import log
-    log.log_image(_time=time.localtime(), path=img_path, receiver=receiver, caption=caption)
+    Args:
+        session: Browser session to send with
+        until: Stop as soon as this campaign is finished; a thread waiting
+            for another campaign then takes over the loop
+    """
+    # Reuse the warm WhatsApp Web session; launched only on the first campaign
+    print("🌐 Preparing WhatsApp Web...")
+    started = time.perf_counter()
+    warm = (session or get_session()).ensure_ready(startup_wait=TIMINGS["startup"])
+    record_phase("startup", time.perf_counter() - started)
+    print(f"   ✓ Session ready in {time.perf_counter() - started:.1f}s ({'warm' if warm else 'cold start'})")
+    
+    # Chat navigation timings are reported per send loop
+    for timings in navigation_timings.values():
+        timings.clear()
+    
+    waiting = False
+    while until is None or not until.finished.is_set():
+        picked = scheduler.next()
+        if picked is None:
+            break
+        campaign, item = picked
+        if campaign is None:
+            # Only retries left; wake up regularly for newly submitted campaigns
+            if not waiting:
+                print(f"⏳ Waiting {item:.0f}s before the next retry...")
+                waiting = True
+            time.sleep(min(item, 5))
+            continue
+        waiting = False
+        
+        run = campaign.context
+        try:
+            label, num, text, key, attempt = item
+            # Skip recipients that already got this exact message
+            if attempt == 1 and key in run.sent_index and not run.force_resend:
+                run.notify(num, "skipped")
+                run.skipped += 1
+                if run.sent_index.maybe_sent(key):
+                    print(f"⏭️ {label} {num} may already have this message (unconfirmed send), skipping")
+                else:
+                    print(f"⏭️ {label} Already sent to {num}, skipping")
+                continue
+            if attempt == 1 and not run.sent_index.claim(key):
+                run.notify(num, "skipped")
+                run.skipped += 1
+                print(f"⏭️ {label} {num} was taken over by another worker, skipping")
+                continue
+            if len(scheduler.campaigns) > 1:
+                label += f" (priority {campaign.priority})"
+            process_recipient(run, campaign, num, text, key, attempt, label)
+        finally:
+            scheduler.complete(campaign)
+    
+    save_phase_timings()
+    summary = navigation_summary()
+    if summary:
+        print(f"🧭 Chat navigation: {summary}")
+
 
 # ===== الدالة الرئيسية لإرسال الرسائل من الواجهة =====
 def send_messages_from_ui(
-    numbers: List[str],
+    numbers: Iterable[str],
     message: str = "",
     image_path: Optional[str] = None,
+    image_paths: Optional[List[str]] = None,
     status_callback: Optional[Callable[[str, str], None]] = None,
-    close_tabs: bool = True
+    close_tabs: bool = True,
+    fields: Optional[Iterable[Dict[str, object]]] = None,
+    template: Optional[MessageTemplate] = None,
+    sent_index: Optional[IdempotencyIndex] = None,
+    force_resend: bool = False,
+    max_attempts: int = 3,
+    retry_base_delay: float = 30,
+    navigation: str = NAVIGATION_URL,
+    pause_seconds: float = 8,
+    session: Optional[BrowserSession] = None,
+    priority: int = PRIORITY_NORMAL,
+    deadline: Optional[float] = None,
+    isolate: bool = True,
+    buffer_size: int = 1000,
+    account: Optional[str] = None,
+    results_path: Optional[str] = None,
+    profile_path: Optional[str] = None
 ) -> Dict[str, bool]:
     """
     Send messages to a list of numbers based on user input.
     
+    Campaigns started while another one is sending (from another UI
+    session or thread) share its send loop: recipients of both are
+    interleaved by priority, so an urgent notice goes out at the next
+    recipient slot instead of after the running blast.
+    
     Args:
-        numbers: List of phone numbers (with country code)
+        numbers: Phone numbers (with country code); a list, or a stream such as
+            phone_extractor.iter_phone_numbers(path)
         message: Text message to send (optional)
         image_path: Path to image file (optional)
+        image_paths: Several images to send as one album per recipient,
+            sharing the message as caption (optional; after image_path)
         status_callback: Function to call with (number, status) updates
         close_tabs: Whether to close tabs after each message
+        fields: Per-recipient template values, in the same order as numbers
+            (optional, see message_template.iter_fields). They are rendered
+            into template for each recipient as it is sent.
+        template: The message compiled against the file's columns (see
+            message_template.compile_template); required with fields
+        sent_index: Index of deliveries already made (defaults to the local
+            sent_index.txt). A recipient that already got the same message
+            and media is skipped with status "skipped"; so is one whose send
+            failed after Enter, recorded there as maybe sent.
+        force_resend: Send even if the delivery is already in sent_index
+        max_attempts: Maximum attempts for a recipient whose failure is
+            transient (page not loaded, clipboard race, ...)
+        retry_base_delay: Seconds before the first retry; doubles on each
+            further attempt
+        navigation: How to open each chat - NAVIGATION_URL (default) reloads
+            WhatsApp Web with the send URL, NAVIGATION_IN_APP switches chats
+            inside the loaded app (falls back to the URL when no chat opened)
+        pause_seconds: Pause between recipients
+        session: Browser session to send with (defaults to the process-wide
+            warm session, launched on the first campaign)
+        priority: PRIORITY_LOW, PRIORITY_NORMAL, PRIORITY_HIGH or
+            PRIORITY_URGENT (see send_scheduler.py)
+        deadline: time.time() by which the campaign should finish; it is
+            served first whenever it would otherwise miss the deadline
+        isolate: Run the GUI automation in a worker process with a deadline
+            per step; a recipient whose step hangs is re-queued (or marked
+            failed if Enter was already pressed) and the worker restarted
+        buffer_size: For a stream of numbers (e.g. iter_phone_numbers on a
+            large file), how many numbers are read ahead in the background;
+            sending starts with the first one
+        account: Name of the sending account on the live dashboard
+            (defaults to the host name)
+        results_path: File the outcome of every recipient is appended to
+            while sending (.csv or .parquet, see results_sink.py), with its
+            time, attempt, duration and failure class
+        profile_path: Write a sampled-stack profile here when the campaign
+            ends (collapsed stacks for a flamegraph, plus a .txt hotspot
+            summary; see stack_profiler.py). It covers everything profiled
+            since the last saved profile, e.g. the extraction before the
+            campaign if the caller started profiling then; otherwise
+            profiling runs for the campaign only.
+    
+    Status updates are "sending", "success", "skipped", "retrying" (transient
+    failure, re-queued), "failed" (permanent failure such as an invalid
+    number) and "exhausted" (transient failure that used up max_attempts).
     
     Returns:
-        Dictionary mapping phone numbers to success status (True/False)
+        Dictionary mapping phone numbers to success status (True/False).
+        Skipped duplicates are not included.
     """
     
-    results = {}
-    
-    # Determine what to send
-    send_text = bool(message and message.strip())
-    send_image = bool(image_path and os.path.exists(image_path))
+    if sent_index is None:
+        sent_index = IdempotencyIndex()
+    album = ([image_path] if image_path else []) + list(image_paths or [])
+    run = CampaignRun(message, album, status_callback, close_tabs, sent_index, force_resend,
+                      max_attempts, retry_base_delay, navigation, pause_seconds, isolate, account)
     
-    if not send_text and not send_image:
+    if not run.send_text and not run.send_image:
         raise ValueError("Either message text or image must be provided!")
-    
-    # Open WhatsApp Web once
-    print("🌐 Opening WhatsApp Web...")
-    kit.open_web()
-    time.sleep(5)
-    
-    # Send to each number
-    for i, num in enumerate(numbers, 1):
-        try:
-            # Update status: sending
-            if status_callback:
-                status_callback(num, "sending")
-            
-            # Determine which function to use
-            if send_text and send_image:
-                # Send both text and image
-                print(f"📸 [{i}/{len(numbers)}] Sending image + text to {num}")
-                send_image_with_text(num, image_path, message, wait_time=15)
-            elif send_image:
-                # Send image only
-                print(f"📸 [{i}/{len(numbers)}] Sending image to {num}")
-                send_image_only(num, image_path, wait_time=15)
+    if fields is not None and template is None:
+        raise ValueError("fields need the compiled template (compile_template(message, columns=...))")
+    if results_path:
+        run.results_sink = ResultsSink(results_path)
+    profiler = active_profiler()
+    own_profiler = profile_path is not None and profiler is None
+    if own_profiler:
+        profiler = start_profiling()
+    try:
+        with section("sending"):
+            return _run_campaign(run, numbers, fields, template, session, priority, deadline, buffer_size)
+    finally:
+        run.finish()
+        if profile_path is not None:
+            if own_profiler:
+                stop_profiling()
+            folded_path, summary_path = profiler.save(profile_path)
+            profiler.reset()
+            print(f"🔥 Profile written: {folded_path} (hotspots in {summary_path})")
+
+
+def _run_campaign(run: CampaignRun, numbers: Iterable[str], fields: Optional[Iterable[Dict[str, object]]],
+                  template: Optional[MessageTemplate], session: Optional[BrowserSession], priority: int,
+                  deadline: Optional[float], buffer_size: int) -> Dict[str, bool]:
+    """Submit a campaign to the scheduler and wait for it (see send_messages_from_ui)"""
+    message = run.message
+    
+    # The caller's compiled template is rendered lazily per recipient
+    if not run.send_text or fields is None:
+        template = None
+    field_values = iter(fields) if template else None
+    # A list is sent as is; a stream is parsed in the background meanwhile
+    total = len(numbers) if hasattr(numbers, "__len__") else None
+    if total is None:
+        numbers = prefetch(numbers, buffer_size)
+    
+    def recipients():
+        for i, num in enumerate(numbers, 1):
+            text = template.render(next(field_values, {})) if template else message
+            key = delivery_key(num, text if run.send_text else "", run.media_hash)
+            yield f"[{i}/{total}]" if total is not None else f"[{i}]", num, text, key, 1
+    
+    campaign = scheduler.submit(Campaign(recipients(), priority=priority, deadline=deadline, total=total,
+                                         context=run))
+    
+    # Run the send loop unless another thread already does; in that case
+    # wait (relaying status updates) and take over if it finishes first
+    while not campaign.finished.is_set():
+        if run.status_callback:
+            run.drain()
+        if _send_loop_lock.acquire(blocking=False):
+            try:
+                run_send_loop(session, until=campaign)
+            finally:
+                _send_loop_lock.release()
+        else:
+            if run.status_callback:
+                run.drain(timeout=0.5)
             else:
-                # Send text only
-                print(f"💬 [{i}/{len(numbers)}] Sending text to {num}")
-                send_text_only(num, message, wait_time=15)
-            
-            # For the last number, wait longer to ensure message is sent
-            if i == len(numbers):
-                print(f"   ⏳ Waiting for final message to be sent...")
-                time.sleep(8)
-            
-            # Close tab if requested
-            if close_tabs:
-                print(f"   ✓ Closing tab...")
-                close_tab_with_modal_handling(wait_time=2)
-            
-            # Update status: success
-            if status_callback:
-                status_callback(num, "success")
-            
-            results[num] = True
-            print(f"✅ Message sent to {num}")
-            
-            # Wait before next number (except for the last one)
-            if i < len(numbers):
-                time.sleep(8)
-                
-        except Exception as e:
-            # Update status: failed
-            if status_callback:
-                status_callback(num, "failed")
-            
-            results[num] = False
-            print(f"❌ Failed to send to {num}: {e}")
-            
-            # Try to close tab even on error
-            if close_tabs:
-                try:
-                    close_tab_with_modal_handling(wait_time=1)
-                except:
-                    pass
-            
-            # Wait before trying next number
-            if i < len(numbers):
-                time.sleep(5)
-    
+                campaign.finished.wait(0.5)
+    if run.status_callback:
+        run.drain()
+    
+    if campaign.error is not None:
+        print(f"⚠️ Stopped reading numbers after {campaign.taken}: {campaign.error}")
+    if run.skipped:
+        print(f"⏭️ Skipped {run.skipped} duplicate deliveries (use force_resend to send again)")
     print("🎉 Done sending all messages.")
-    return results
+    return run.results
 
 # ===== For testing/standalone execution =====
 if __name__ == "__main__":
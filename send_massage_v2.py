@@ -1,11 +1,9 @@
-import pywhatkit as kit
-import pywhatkit.core.core as core
 import time
 import os
-from urllib.parse import quote
-from platform import system
-import pyautogui as pg
-import pyperclip
+from idempotency import IdempotencyIndex, delivery_key
+from media_store import get_store as get_media_store
+from browser_session import get_session
+from send_massage_from_ui import send_image_with_text, navigation_summary, may_have_sent, NAVIGATION_URL, TIMINGS
 
 # ===== إعداد الأرقام + المسارات =====
 numbers = [
@@ -20,97 +18,48 @@ IMAGE_PATH = os.path.join(BASE_DIR, "PHOTO-2025-12-04-20-36-25.jpg")
 with open(MESSAGE_FILE, "r", encoding="utf-8") as f:
     MESSAGE = f.read().strip()
 
-# ===== دالة مخصصة لإرسال الصورة باستخدام نفس التاب =====
-def send_image_same_tab(receiver: str, img_path: str, caption: str = "", wait_time: int = 15):
-    """Send Image using the same WhatsApp Web tab by navigating to the contact URL"""
-    
-    if (not receiver.isalnum()) and (not core.check_number(number=receiver)):
-        raise Exception("Country Code Missing in Phone Number!")
-    
-    # Navigate to the contact URL in the same tab
-    url = f"https://web.whatsapp.com/send?phone={receiver}&text={quote(caption)}"
-    
-    # Copy URL to clipboard
-    pyperclip.copy(url)
-    
-    # Ensure browser tab is focused (click on it first)
-    time.sleep(1)
-    pg.click(core.WIDTH / 2, 50)  # Click near top of screen to focus browser
-    time.sleep(0.5)
-    
-    # Focus address bar and navigate (Cmd+L on Mac, Ctrl+L on Windows/Linux)
-    if system().lower() == "darwin":
-        pg.hotkey("command", "l")
-    else:
-        pg.hotkey("ctrl", "l")
-    
-    time.sleep(0.5)
-    # Select all and paste the URL
-    if system().lower() == "darwin":
-        pg.hotkey("command", "a")
-        pg.hotkey("command", "v")
-    else:
-        pg.hotkey("ctrl", "a")
-        pg.hotkey("ctrl", "v")
-    
-    time.sleep(0.5)
-    pg.press("enter")
-    
-    # Wait for WhatsApp to load and navigate to the contact
-    print(f"   ⏳ Navigating to {receiver}...")
-    time.sleep(10)  # Increased wait time for page navigation
-    pg.click(core.WIDTH / 2, core.HEIGHT / 2)
-    time.sleep(3)  # Additional wait to ensure chat is ready
-    print(f"   ✓ Chat ready for {receiver}")
-    
-    # Copy image to clipboard
-    core.copy_image(path=img_path)
-    
-    # Type caption if needed
-    if core.check_number(number=receiver):
-        pg.typewrite(" ")
-    else:
-        for char in caption:
-            if char == "\n":
-                pg.hotkey("shift", "enter")
-            else:
-                pg.typewrite(char)
-    
-    # Paste image
-    if system().lower() == "darwin":
-        pg.hotkey("command", "v")
-    else:
-        pg.hotkey("ctrl", "v")
-    
-    time.sleep(1)
-    pg.press("enter")
-    
-    # Wait for message to be sent (check for sent indicator)
-    print(f"   ⏳ Waiting for message to be sent to {receiver}...")
-    time.sleep(5)  # Wait for message to be sent before moving to next contact
-    
-    # Log the action
-    from pywhatkit.core import log
-    log.log_image(_time=time.localtime(), path=img_path, receiver=receiver, caption=caption)
+# Set to True to resend to numbers that already got this message + image
+FORCE_RESEND = False
+
+# How to open each chat: NAVIGATION_URL, or "in_app" (no page reload, but it
+# only checks that some chat opened, not that it is the right one)
+NAVIGATION = NAVIGATION_URL
 
 # ===== فتح WhatsApp Web مرة واحدة فقط =====
 print("🌐 Opening WhatsApp Web (this will be reused for all messages)...")
-kit.open_web()
-time.sleep(5)  # Wait for WhatsApp Web to load initially
+get_session().ensure_ready(startup_wait=TIMINGS["startup"])
 
 # ===== حلقة الإرسال =====
+sent_index = IdempotencyIndex()
+# The image is hashed and downscaled once, in the media store
+media_store = get_media_store()
+media_hash = media_store.put_file(IMAGE_PATH)
+send_path = media_store.send_path(media_hash)
+
 for i, num in enumerate(numbers, 1):
+    key = delivery_key(num, MESSAGE, media_hash)
+    if key in sent_index and not FORCE_RESEND:
+        reason = "May already have been sent (unconfirmed)" if sent_index.maybe_sent(key) else "Already sent"
+        print(f"⏭️ [{i}/{len(numbers)}] {reason} to {num}, skipping (set FORCE_RESEND = True to resend)")
+        continue
     try:
         print(f"📸 [{i}/{len(numbers)}] Sending image + caption to {num}")
-        send_image_same_tab(num, IMAGE_PATH, caption=MESSAGE, wait_time=15)
+        # Same send engine as the UI: chat opened in the same tab, caption
+        # pasted with it, image pasted on top, then Enter and the sent tick
+        send_image_with_text(num, send_path, MESSAGE, navigation=NAVIGATION)
+        sent_index.add(key)
         print(f"✅ Image sent to {num}.")
         if i < len(numbers):  # Don't wait after the last message
             print("⏳ Waiting before next contact...")
             time.sleep(8)  # Increased wait time between contacts
     except Exception as e:
+        if may_have_sent(e):
+            # Enter may have been pressed: don't resend on the next run
+            sent_index.add(key, maybe_sent=True)
         print(f"❌ Failed for {num}: {e}")
         print("⏳ Waiting before trying next contact...")
         time.sleep(5)
 
+print(f"🧭 Chat navigation: {navigation_summary()}")
 print("🎉 Done. You can close the WhatsApp Web tab manually when finished.")
 
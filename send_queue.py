@@ -0,0 +1,751 @@
+"""
+Module for distributed sending through a shared work queue
+
+A coordinator loads the recipient list into a queue. Workers - one per
+send host or browser profile - lease small batches, send them with their
+local WhatsApp Web session and acknowledge each recipient:
+
+    python send_queue.py serve --port 8765                      # on the coordinator
+    python send_queue.py --queue http://coordinator:8765 enqueue numbers.csv --message-file massage.txt
+    python send_queue.py --queue http://coordinator:8765 work --worker host-a   # on every send host
+    python send_queue.py --queue http://coordinator:8765 status
+
+Leases expire if a worker dies. Recipients of an expired lease that were
+not started yet go back to the queue for another worker; a recipient that
+was being sent when its worker vanished may already have received the
+message, so it is marked failed instead of being sent twice.
+
+WorkQueue is the interface the workers use (lease / start / ack /
+release / renew). SendQueue keeps the queue in a SQLite file (WAL mode):
+it is the coordinator's store, and on its own a stand-in for sending from
+one machine or for tests. `serve` puts a SendQueue behind a small HTTP API
+and HttpQueue reaches it from any host, so the SQLite file is only ever
+opened by the coordinator (SQLite locking is not reliable on network file
+systems). Set SEND_QUEUE_TOKEN to the same secret on every host to
+require it on every request.
+"""
+import base64
+import hashlib
+import hmac
+import json
+import os
+import socket
+import sqlite3
+import threading
+import time
+import urllib.error
+import urllib.request
+from http.server import BaseHTTPRequestHandler, ThreadingHTTPServer
+from typing import Dict, Iterable, List, Optional
+from message_template import MessageTemplate, compile_template
+from idempotency import IdempotencyIndex, delivery_key
+from media_store import get_store as get_media_store
+
+DEFAULT_QUEUE_PATH = "send_queue.sqlite"
+DEFAULT_PORT = 8765
+# Shared secret for the HTTP queue (same value on the coordinator and the workers)
+TOKEN_ENV = "SEND_QUEUE_TOKEN"
+
+# Job states
+PENDING = "pending"
+LEASED = "leased"
+SENDING = "sending"
+DONE = "done"
+FAILED = "failed"
+
+INTERRUPTED_ERROR = "Worker stopped while sending; the message may have been delivered"
+
+
+class QueueServerError(Exception):
+    """Raised when the queue server could not handle a request"""
+
+
+def campaign_jobs(numbers: List[str], message: str = "", image_hash: str = "",
+                  fields: Optional[Iterable[Dict[str, object]]] = None,
+                  template: Optional[MessageTemplate] = None) -> List[Dict]:
+    """
+    One job per recipient, with the delivery key of its rendered message.
+
+    Args:
+        numbers: Normalized phone numbers
+        message: Message text or template
+        image_hash: SHA-256 of the campaign's image ("" for none)
+        fields: Per-recipient template values, in the same order as numbers
+        template: message compiled against the file's columns; required with fields
+
+    Returns:
+        Dicts with 'phone', 'fields' (dict or None) and 'key'
+    """
+    if fields is not None and template is None:
+        raise ValueError("fields need the compiled template (compile_template(message, columns=...))")
+    if not message or fields is None:
+        template = None
+    field_values = iter(fields) if template else None
+    jobs = []
+    for num in numbers:
+        values = next(field_values, {}) if template else None
+        text = template.render(values) if template else message
+        jobs.append({"phone": num, "fields": values, "key": delivery_key(num, text, image_hash)})
+    return jobs
+
+
+class WorkQueue:
+    """
+    Queue of recipients with leases, shared by the send hosts.
+
+    SendQueue stores it in a local SQLite file; HttpQueue reaches a
+    SendQueue served by another host (see serve_queue).
+
+    Example:
+        queue = open_queue("http://coordinator:8765")
+        campaign = queue.create_campaign(numbers, "Hello {name}", fields=rows, template=template)
+        jobs = queue.lease("host-a", batch_size=10)
+        queue.start(jobs[0]["id"], "host-a")   # False if the lease was lost
+        queue.ack(jobs[0]["id"], "host-a", success=True)
+    """
+
+    # ===== Coordinator =====
+    def create_campaign(self, numbers: List[str], message: str = "", image_path: Optional[str] = None,
+                        fields: Optional[Iterable[Dict[str, object]]] = None,
+                        template: Optional[MessageTemplate] = None) -> int:
+        """
+        Load a recipient list into the queue.
+
+        A recipient whose exact delivery (number, rendered text, image) is
+        already queued - in this or an earlier campaign - is not added again.
+
+        Args:
+            numbers: Normalized phone numbers
+            message: Message text or template
+            image_path: Optional image, stored in the queue so every host can send it
+            fields: Per-recipient template values, in the same order as numbers
+            template: message compiled against the file's columns; required with fields
+
+        Returns:
+            Campaign id
+        """
+        image = image_name = None
+        image_hash = ""
+        if image_path:
+            with open(image_path, "rb") as f:
+                image = f.read()
+            image_name = os.path.basename(image_path)
+            image_hash = hashlib.sha256(image).hexdigest()
+        return self.add_campaign(message, image, image_name, image_hash,
+                                 campaign_jobs(numbers, message, image_hash, fields, template))
+
+    def add_campaign(self, message: str, image: Optional[bytes], image_name: Optional[str], image_hash: str,
+                     jobs: List[Dict]) -> int:
+        """Store a campaign and its jobs (see campaign_jobs); returns the campaign id"""
+        raise NotImplementedError
+
+    def progress(self, campaign: Optional[int] = None) -> Dict[str, int]:
+        """Number of jobs per state (for one campaign or all)"""
+        raise NotImplementedError
+
+    def failures(self, campaign: Optional[int] = None) -> List[Dict]:
+        """Failed jobs with their error"""
+        raise NotImplementedError
+
+    def campaign(self, campaign: int) -> Dict:
+        """Message, image and image name of a campaign"""
+        raise NotImplementedError
+
+    # ===== Workers =====
+    def lease(self, worker: str, batch_size: int = 10, lease_seconds: float = 300) -> List[Dict]:
+        """Lease the next batch of recipients (see SendQueue.lease)"""
+        raise NotImplementedError
+
+    def start(self, job_id: int, worker: str) -> bool:
+        """Mark a leased recipient as being sent; False if the lease was lost"""
+        raise NotImplementedError
+
+    def ack(self, job_id: int, worker: str, success: bool, error: Optional[str] = None) -> bool:
+        """Record a recipient's result; False if the lease was lost"""
+        raise NotImplementedError
+
+    def release(self, job_id: int, worker: str) -> bool:
+        """Give a leased, not yet started recipient back to the queue"""
+        raise NotImplementedError
+
+    def renew(self, worker: str, lease_seconds: float = 300) -> int:
+        """Extend all of a worker's leases; returns the number extended"""
+        raise NotImplementedError
+
+    def close(self) -> None:
+        """Release the queue's resources"""
+
+
+class SendQueue(WorkQueue):
+    """SQLite-backed queue of recipients with leases (the coordinator's store)"""
+
+    def __init__(self, path: str = DEFAULT_QUEUE_PATH, timeout: float = 30):
+        self.path = path
+        # Transactions are managed explicitly (BEGIN IMMEDIATE for leases)
+        self._db = sqlite3.connect(path, timeout=timeout, isolation_level=None, check_same_thread=False)
+        self._db.row_factory = sqlite3.Row
+        self._db.executescript("""
+            PRAGMA journal_mode = WAL;
+            CREATE TABLE IF NOT EXISTS campaigns (
+                id INTEGER PRIMARY KEY,
+                message TEXT NOT NULL,
+                image BLOB,
+                image_name TEXT,
+                image_hash TEXT NOT NULL DEFAULT '',
+                created_at REAL NOT NULL
+            );
+            CREATE TABLE IF NOT EXISTS jobs (
+                id INTEGER PRIMARY KEY,
+                campaign INTEGER NOT NULL,
+                phone TEXT NOT NULL,
+                fields TEXT,
+                key TEXT NOT NULL UNIQUE,
+                status TEXT NOT NULL DEFAULT 'pending',
+                worker TEXT,
+                lease_until REAL,
+                attempts INTEGER NOT NULL DEFAULT 0,
+                error TEXT,
+                updated_at REAL
+            );
+            CREATE INDEX IF NOT EXISTS jobs_status ON jobs (status, campaign, id);
+        """)
+
+    def close(self) -> None:
+        """Close the queue database"""
+        self._db.close()
+
+    # ===== Coordinator =====
+    def add_campaign(self, message: str, image: Optional[bytes], image_name: Optional[str], image_hash: str,
+                     jobs: List[Dict]) -> int:
+        now = time.time()
+
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            campaign = self._db.execute(
+                "INSERT INTO campaigns (message, image, image_name, image_hash, created_at) VALUES (?, ?, ?, ?, ?)",
+                (message, image, image_name, image_hash, now)
+            ).lastrowid
+            rows = [(campaign, job["phone"],
+                     json.dumps(job["fields"], ensure_ascii=False, default=str) if job["fields"] is not None else None,
+                     job["key"], now) for job in jobs]
+            self._db.executemany(
+                "INSERT OR IGNORE INTO jobs (campaign, phone, fields, key, updated_at) VALUES (?, ?, ?, ?, ?)", rows
+            )
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        return campaign
+
+    def progress(self, campaign: Optional[int] = None) -> Dict[str, int]:
+        if campaign is None:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs GROUP BY status")
+        else:
+            rows = self._db.execute("SELECT status, COUNT(*) FROM jobs WHERE campaign = ? GROUP BY status",
+                                    (campaign,))
+        counts = {PENDING: 0, LEASED: 0, SENDING: 0, DONE: 0, FAILED: 0}
+        counts.update({status: count for status, count in rows})
+        return counts
+
+    def failures(self, campaign: Optional[int] = None) -> List[Dict]:
+        query = "SELECT id, campaign, phone, worker, error FROM jobs WHERE status = 'failed'"
+        params = ()
+        if campaign is not None:
+            query += " AND campaign = ?"
+            params = (campaign,)
+        return [dict(row) for row in self._db.execute(query, params)]
+
+    def campaign(self, campaign: int) -> Dict:
+        row = self._db.execute("SELECT * FROM campaigns WHERE id = ?", (campaign,)).fetchone()
+        if row is None:
+            raise ValueError(f"Unknown campaign: {campaign}")
+        return dict(row)
+
+    # ===== Workers =====
+    def lease(self, worker: str, batch_size: int = 10, lease_seconds: float = 300) -> List[Dict]:
+        """
+        Lease the next batch of recipients (all from one campaign).
+
+        Expired leases are reclaimed first: recipients that were never
+        started become available again, ones that were mid-send are marked
+        failed (see INTERRUPTED_ERROR).
+
+        Args:
+            worker: Unique worker name
+            batch_size: Maximum recipients in the batch
+            lease_seconds: How long the batch stays reserved without renew()
+
+        Returns:
+            Jobs as dicts with 'id', 'campaign', 'phone', 'fields' (dict or None),
+            'key' (delivery key) and 'attempts'; [] if the queue is empty
+        """
+        now = time.time()
+        self._db.execute("BEGIN IMMEDIATE")
+        try:
+            self._db.execute(
+                "UPDATE jobs SET status = ?, error = ?, updated_at = ? WHERE status = ? AND lease_until < ?",
+                (FAILED, INTERRUPTED_ERROR, now, SENDING, now)
+            )
+            self._db.execute(
+                "UPDATE jobs SET status = ?, worker = NULL, lease_until = NULL, updated_at = ? "
+                "WHERE status = ? AND lease_until < ?",
+                (PENDING, now, LEASED, now)
+            )
+            first = self._db.execute(
+                "SELECT campaign FROM jobs WHERE status = ? ORDER BY campaign, id LIMIT 1", (PENDING,)
+            ).fetchone()
+            if first is None:
+                self._db.execute("COMMIT")
+                return []
+            rows = self._db.execute(
+                "SELECT id, campaign, phone, fields, key, attempts FROM jobs WHERE status = ? AND campaign = ? "
+                "ORDER BY id LIMIT ?", (PENDING, first[0], batch_size)
+            ).fetchall()
+            self._db.executemany(
+                "UPDATE jobs SET status = ?, worker = ?, lease_until = ?, attempts = attempts + 1, updated_at = ? "
+                "WHERE id = ?",
+                [(LEASED, worker, now + lease_seconds, now, row["id"]) for row in rows]
+            )
+            self._db.execute("COMMIT")
+        except BaseException:
+            self._db.execute("ROLLBACK")
+            raise
+        return [dict(row, fields=json.loads(row["fields"]) if row["fields"] else None,
+                     attempts=row["attempts"] + 1) for row in rows]
+
+    def _update_owned(self, job_id: int, worker: str, status: str, error: Optional[str] = None) -> bool:
+        cursor = self._db.execute(
+            "UPDATE jobs SET status = ?, error = ?, updated_at = ? "
+            "WHERE id = ? AND worker = ? AND status IN (?, ?)",
+            (status, error, time.time(), job_id, worker, LEASED, SENDING)
+        )
+        return cursor.rowcount == 1
+
+    def start(self, job_id: int, worker: str) -> bool:
+        """
+        Mark a leased recipient as being sent right now.
+
+        Returns:
+            False if the lease was lost (expired and taken over) - don't send
+        """
+        return self._update_owned(job_id, worker, SENDING)
+
+    def ack(self, job_id: int, worker: str, success: bool, error: Optional[str] = None) -> bool:
+        """
+        Record a recipient's result.
+
+        Returns:
+            False if the lease was lost and the result was not recorded
+        """
+        return self._update_owned(job_id, worker, DONE if success else FAILED, error)
+
+    def release(self, job_id: int, worker: str) -> bool:
+        cursor = self._db.execute(
+            "UPDATE jobs SET status = ?, worker = NULL, lease_until = NULL, updated_at = ? "
+            "WHERE id = ? AND worker = ? AND status = ?",
+            (PENDING, time.time(), job_id, worker, LEASED)
+        )
+        return cursor.rowcount == 1
+
+    def renew(self, worker: str, lease_seconds: float = 300) -> int:
+        """
+        Extend all of a worker's leases (heartbeat).
+
+        Returns:
+            Number of leases extended
+        """
+        cursor = self._db.execute(
+            "UPDATE jobs SET lease_until = ? WHERE worker = ? AND status IN (?, ?)",
+            (time.time() + lease_seconds, worker, LEASED, SENDING)
+        )
+        return cursor.rowcount
+
+
+# Methods a served SendQueue answers, with the arguments each takes
+QUEUE_METHODS = {
+    "add_campaign": ("message", "image", "image_name", "image_hash", "jobs"),
+    "progress": ("campaign",),
+    "failures": ("campaign",),
+    "campaign": ("campaign",),
+    "lease": ("worker", "batch_size", "lease_seconds"),
+    "start": ("job_id", "worker"),
+    "ack": ("job_id", "worker", "success", "error"),
+    "release": ("job_id", "worker"),
+    "renew": ("worker", "lease_seconds"),
+}
+
+
+def _encode_image(value: Optional[bytes]) -> Optional[str]:
+    return base64.b64encode(value).decode("ascii") if value is not None else None
+
+
+def _decode_image(value: Optional[str]) -> Optional[bytes]:
+    return base64.b64decode(value) if value is not None else None
+
+
+class QueueServer:
+    """
+    Serves a SendQueue over HTTP so workers on other hosts can use it.
+
+    Every call is a POST to /<method> with the method's arguments as a JSON
+    object, answered with {"result": ...}. Calls run one at a time against
+    the coordinator's SQLite file.
+    """
+
+    def __init__(self, queue: SendQueue, host: str = "0.0.0.0", port: int = DEFAULT_PORT,
+                 token: Optional[str] = None):
+        """
+        Args:
+            queue: The coordinator's queue
+            host: Address to listen on
+            port: Port to listen on (0 picks a free one)
+            token: Secret every request must carry (default: SEND_QUEUE_TOKEN)
+        """
+        self.queue = queue
+        self.host = host
+        self.port = port
+        self.token = token if token is not None else os.environ.get(TOKEN_ENV) or None
+        self._lock = threading.Lock()
+        self._httpd: Optional[ThreadingHTTPServer] = None
+
+    @property
+    def url(self) -> str:
+        host = "127.0.0.1" if self.host in ("0.0.0.0", "") else self.host
+        return f"http://{host}:{self.port}/"
+
+    def handle(self, method: str, args: Dict) -> object:
+        """Run one queue call; raises ValueError for an unknown method or bad arguments"""
+        if method not in QUEUE_METHODS:
+            raise ValueError(f"Unknown queue method: {method}")
+        unknown = set(args) - set(QUEUE_METHODS[method])
+        if unknown:
+            raise ValueError(f"Unknown arguments for {method}: {', '.join(sorted(unknown))}")
+        if method == "add_campaign":
+            args = dict(args, image=_decode_image(args.get("image")))
+        with self._lock:
+            result = getattr(self.queue, method)(**args)
+        if method == "campaign":
+            result = dict(result, image=_encode_image(result["image"]))
+        return result
+
+    def _handler(self):
+        server = self
+
+        class Handler(BaseHTTPRequestHandler):
+            def do_POST(self):
+                if server.token and not hmac.compare_digest(self.headers.get("Authorization", ""),
+                                                            f"Bearer {server.token}"):
+                    server._reply(self, 401, {"error": "missing or wrong token"})
+                    return
+                try:
+                    args = json.loads(self.rfile.read(int(self.headers.get("Content-Length", 0))) or b"{}")
+                    result = server.handle(self.path.strip("/"), args)
+                except (ValueError, TypeError) as e:
+                    server._reply(self, 400, {"error": str(e)})
+                    return
+                except Exception as e:
+                    server._reply(self, 500, {"error": f"{type(e).__name__}: {e}"})
+                    return
+                server._reply(self, 200, {"result": result})
+
+            def log_message(self, format, *args):
+                pass
+
+        return Handler
+
+    @staticmethod
+    def _reply(handler: BaseHTTPRequestHandler, status: int, payload: Dict) -> None:
+        body = json.dumps(payload, ensure_ascii=False, default=str).encode("utf-8")
+        handler.send_response(status)
+        handler.send_header("Content-Type", "application/json")
+        handler.send_header("Content-Length", str(len(body)))
+        handler.end_headers()
+        handler.wfile.write(body)
+
+    def start(self) -> None:
+        """Serve in a background thread"""
+        self._httpd = ThreadingHTTPServer((self.host, self.port), self._handler())
+        self.port = self._httpd.server_address[1]
+        threading.Thread(target=self._httpd.serve_forever, daemon=True, name="send-queue").start()
+
+    def serve_forever(self) -> None:
+        """Serve in this thread until interrupted"""
+        self._httpd = ThreadingHTTPServer((self.host, self.port), self._handler())
+        self.port = self._httpd.server_address[1]
+        try:
+            self._httpd.serve_forever()
+        finally:
+            self._httpd.server_close()
+            self._httpd = None
+
+    def stop(self) -> None:
+        if self._httpd is not None:
+            self._httpd.shutdown()
+            self._httpd.server_close()
+            self._httpd = None
+
+
+class HttpQueue(WorkQueue):
+    """
+    Client of a queue served by another host (see QueueServer).
+
+    Example:
+        queue = HttpQueue("http://coordinator:8765")
+        run_worker(queue, worker="host-b")
+    """
+
+    def __init__(self, url: str, token: Optional[str] = None, timeout: float = 30):
+        """
+        Args:
+            url: Base URL of the queue server
+            token: Secret the server requires (default: SEND_QUEUE_TOKEN)
+            timeout: Seconds to wait for each call
+        """
+        self.url = url.rstrip("/") + "/"
+        self.token = token if token is not None else os.environ.get(TOKEN_ENV) or None
+        self.timeout = timeout
+
+    def _call(self, method: str, **args) -> object:
+        body = json.dumps(args, ensure_ascii=False, default=str).encode("utf-8")
+        headers = {"Content-Type": "application/json"}
+        if self.token:
+            headers["Authorization"] = f"Bearer {self.token}"
+        request = urllib.request.Request(self.url + method, data=body, headers=headers, method="POST")
+        try:
+            with urllib.request.urlopen(request, timeout=self.timeout) as response:
+                return json.loads(response.read())["result"]
+        except urllib.error.HTTPError as e:
+            try:
+                message = json.loads(e.read()).get("error", e.reason)
+            except ValueError:
+                message = e.reason
+            if e.code == 400:
+                raise ValueError(message) from None
+            raise QueueServerError(f"{method} failed ({e.code}): {message}") from None
+
+    def add_campaign(self, message: str, image: Optional[bytes], image_name: Optional[str], image_hash: str,
+                     jobs: List[Dict]) -> int:
+        return self._call("add_campaign", message=message, image=_encode_image(image), image_name=image_name,
+                          image_hash=image_hash, jobs=jobs)
+
+    def progress(self, campaign: Optional[int] = None) -> Dict[str, int]:
+        return self._call("progress", campaign=campaign)
+
+    def failures(self, campaign: Optional[int] = None) -> List[Dict]:
+        return self._call("failures", campaign=campaign)
+
+    def campaign(self, campaign: int) -> Dict:
+        result = self._call("campaign", campaign=campaign)
+        return dict(result, image=_decode_image(result["image"]))
+
+    def lease(self, worker: str, batch_size: int = 10, lease_seconds: float = 300) -> List[Dict]:
+        return self._call("lease", worker=worker, batch_size=batch_size, lease_seconds=lease_seconds)
+
+    def start(self, job_id: int, worker: str) -> bool:
+        return self._call("start", job_id=job_id, worker=worker)
+
+    def ack(self, job_id: int, worker: str, success: bool, error: Optional[str] = None) -> bool:
+        return self._call("ack", job_id=job_id, worker=worker, success=success, error=error)
+
+    def release(self, job_id: int, worker: str) -> bool:
+        return self._call("release", job_id=job_id, worker=worker)
+
+    def renew(self, worker: str, lease_seconds: float = 300) -> int:
+        return self._call("renew", worker=worker, lease_seconds=lease_seconds)
+
+
+def open_queue(location: str = DEFAULT_QUEUE_PATH) -> WorkQueue:
+    """An HttpQueue for an http(s):// URL, otherwise a SendQueue on that path"""
+    if location.startswith(("http://", "https://")):
+        return HttpQueue(location)
+    return SendQueue(location)
+
+
+class LeaseGuard:
+    """
+    Sent-index for send_messages_from_ui that also enforces leases.
+
+    The sender claims every recipient's delivery key right before sending,
+    also with force_resend. Here the claim marks the job as being sent, so
+    a worker that dies mid-send leaves it "maybe sent"; if the lease was
+    lost meanwhile (expired and handed to another worker) the claim fails
+    and the recipient is skipped rather than sent twice.
+    """
+
+    def __init__(self, queue: WorkQueue, worker: str, jobs: List[Dict], local_index: IdempotencyIndex):
+        self.queue = queue
+        self.worker = worker
+        self.jobs = {job["key"]: job for job in jobs}
+        self.local_index = local_index
+        self.lost: List[str] = []
+
+    def __contains__(self, key: str) -> bool:
+        return key in self.local_index
+
+    def claim(self, key: str) -> bool:
+        """Mark the job as being sent; False if its lease was lost"""
+        job = self.jobs.get(key)
+        if job is not None and not self.queue.start(job["id"], self.worker):
+            self.lost.append(job["phone"])
+            return False
+        return True
+
+    def maybe_sent(self, key: str) -> bool:
+        return self.local_index.maybe_sent(key)
+
+    def add(self, key: str, maybe_sent: bool = False) -> None:
+        self.local_index.add(key, maybe_sent=maybe_sent)
+
+
+def _campaign_image(campaign: Dict) -> Optional[str]:
+    """Put a campaign's image in this host's media store (once) and return its path"""
+    if not campaign["image"]:
+        return None
+    store = get_media_store()
+    return store.path(store.put_bytes(campaign["image"], campaign["image_name"] or ""))
+
+
+def run_worker(queue: WorkQueue, worker: Optional[str] = None, batch_size: int = 10,
+               lease_seconds: float = 300, idle_exit: bool = True, poll_interval: float = 5,
+               **send_options) -> Dict[str, int]:
+    """
+    Lease batches and send them with this host's WhatsApp Web session.
+
+    Args:
+        queue: Shared send queue (a SendQueue, or an HttpQueue on other hosts)
+        worker: Unique worker name (default: host name and process id)
+        batch_size: Recipients leased at a time
+        lease_seconds: Lease length; renewed on every status update
+        idle_exit: Stop when the queue is empty instead of waiting for work
+        poll_interval: Seconds between polls of an empty queue
+        **send_options: Passed to send_messages_from_ui (navigation,
+            pause_seconds, max_attempts, ...)
+
+    Returns:
+        Dictionary with the counts of 'sent' and 'failed' recipients
+    """
+    from send_massage_from_ui import send_messages_from_ui
+
+    worker = worker or f"{socket.gethostname()}-{os.getpid()}"
+    local_index = IdempotencyIndex()
+    totals = {"sent": 0, "failed": 0}
+    campaigns: Dict[int, Dict] = {}
+    templates: Dict[int, MessageTemplate] = {}
+
+    while True:
+        jobs = queue.lease(worker, batch_size=batch_size, lease_seconds=lease_seconds)
+        if not jobs:
+            if idle_exit:
+                break
+            time.sleep(poll_interval)
+            continue
+
+        campaign_id = jobs[0]["campaign"]
+        if campaign_id not in campaigns:
+            campaigns[campaign_id] = queue.campaign(campaign_id)
+        campaign = campaigns[campaign_id]
+        fields = [job["fields"] or {} for job in jobs] if any(job["fields"] for job in jobs) else None
+        if fields is not None and campaign_id not in templates:
+            # Jobs carry exactly the fields the template was bound to when it
+            # was enqueued, so binding to their names gives the same template
+            columns = list(dict.fromkeys(name for values in fields for name in values))
+            templates[campaign_id] = compile_template(campaign["message"], columns=columns)
+        by_phone = {job["phone"]: job for job in jobs}
+        guard = LeaseGuard(queue, worker, jobs, local_index)
+
+        def on_status(num: str, status: str) -> None:
+            # Every update is also a heartbeat for the batch's leases
+            job = by_phone[num]
+            queue.renew(worker, lease_seconds)
+            if status in ("success", "skipped"):
+                queue.ack(job["id"], worker, success=True)
+            elif status in ("failed", "exhausted"):
+                queue.ack(job["id"], worker, success=False, error=status)
+
+        print(f"📦 [{worker}] Leased {len(jobs)} recipients of campaign {campaign_id}")
+        results = send_messages_from_ui(
+            numbers=list(by_phone),
+            message=campaign["message"],
+            image_path=_campaign_image(campaign),
+            status_callback=on_status,
+            close_tabs=False,
+            fields=fields,
+            template=templates.get(campaign_id),
+            sent_index=guard,
+            account=worker,
+            **send_options
+        )
+        if guard.lost:
+            print(f"⚠️ [{worker}] Lease expired for {len(guard.lost)} recipients; left to other workers")
+        totals["sent"] += sum(1 for ok in results.values() if ok)
+        totals["failed"] += sum(1 for ok in results.values() if not ok)
+
+    print(f"🏁 [{worker}] Sent {totals['sent']}, failed {totals['failed']}")
+    return totals
+
+
+# ===== For standalone execution =====
+if __name__ == "__main__":
+    import argparse
+
+    parser = argparse.ArgumentParser(description="Distributed sending through a shared queue")
+    parser.add_argument("--queue", default=DEFAULT_QUEUE_PATH,
+                        help="Queue database path, or the http:// URL of a queue server")
+    commands = parser.add_subparsers(dest="command", required=True)
+
+    serve = commands.add_parser("serve", help="Serve the queue database to workers on other hosts")
+    serve.add_argument("--host", default="0.0.0.0", help="Address to listen on")
+    serve.add_argument("--port", type=int, default=DEFAULT_PORT, help="Port to listen on")
+
+    enqueue = commands.add_parser("enqueue", help="Load a recipient file into the queue")
+    enqueue.add_argument("file", help="CSV/Excel/Numbers file with phone numbers")
+    enqueue.add_argument("--message", default="", help="Message text or template")
+    enqueue.add_argument("--message-file", help="Read the message from a file")
+    enqueue.add_argument("--image", help="Image to send")
+
+    work = commands.add_parser("work", help="Send leased batches with this host's session")
+    work.add_argument("--worker", help="Unique worker name")
+    work.add_argument("--batch", type=int, default=10, help="Recipients per lease")
+    work.add_argument("--lease", type=float, default=300, help="Lease length in seconds")
+    work.add_argument("--wait", action="store_true", help="Keep waiting for new work when the queue is empty")
+
+    status = commands.add_parser("status", help="Show queue progress")
+    status.add_argument("campaign", nargs="?", type=int)
+
+    args = parser.parse_args()
+    queue = open_queue(args.queue)
+
+    if args.command == "serve":
+        if not isinstance(queue, SendQueue):
+            parser.error("serve needs a queue database path, not a URL")
+        server = QueueServer(queue, host=args.host, port=args.port)
+        if server.token is None:
+            print(f"⚠️ {TOKEN_ENV} is not set: anyone who can reach the port can use the queue")
+        print(f"📡 Serving {args.queue} on port {args.port}")
+        try:
+            server.serve_forever()
+        except KeyboardInterrupt:
+            pass
+    elif args.command == "enqueue":
+        from phone_extractor import extract_records_from_uploaded_file
+        from message_template import iter_fields
+
+        message = args.message
+        if args.message_file:
+            with open(args.message_file, "r", encoding="utf-8") as f:
+                message = f.read().strip()
+        with open(args.file, "rb") as f:
+            records = extract_records_from_uploaded_file(f)
+        numbers = records[records.attrs["phone_column"]].tolist() if not records.empty else []
+        template = compile_template(message, columns=records.columns)
+        fields = None if template.is_static else list(iter_fields(template, records))
+        campaign = queue.create_campaign(numbers, message, args.image, fields=fields, template=template)
+        print(f"✅ Campaign {campaign}: {queue.progress(campaign)[PENDING]} recipients queued")
+    elif args.command == "work":
+        run_worker(queue, worker=args.worker, batch_size=args.batch, lease_seconds=args.lease,
+                   idle_exit=not args.wait)
+    else:
+        for state, count in queue.progress(args.campaign).items():
+            print(f"{state:8} {count}")
+        for failure in queue.failures(args.campaign):
+            print(f"❌ {failure['phone']} ({failure['worker']}): {failure['error']}")
@@ -0,0 +1,269 @@
+"""
+Module for scheduling several campaigns' recipients by priority
+
+The sender takes one recipient at a time from a SendScheduler. Campaigns
+can be submitted while another is sending (e.g. from a second browser tab
+of the UI); the next recipient slot is given by:
+
+1. Deadlines: a campaign whose remaining recipients won't fit before its
+   deadline at the current pace, if it shared slots evenly with the other
+   ready campaigns, goes first (earliest deadline first).
+2. Stride scheduling: otherwise each campaign gets slots in proportion to
+   its weight, PRIORITY_BASE ** priority. With the default base, a
+   priority 2 notice gets 16 slots for every slot of a priority 0 blast,
+   so it goes out almost immediately while the blast still progresses.
+
+Failed recipients re-queued for a retry stay with their campaign and are
+sent once the campaign's main pass is done and their backoff has passed.
+
+A campaign's recipients can be a stream (e.g. phone_extractor's
+iter_phone_numbers over a large file) read by prefetch() in a background
+thread, so sending starts while the file is still being parsed.
+"""
+import heapq
+import itertools
+import queue
+import threading
+import time
+from typing import Any, Iterable, Iterator, List, Optional, Tuple
+from stack_profiler import section
+
+# Weight multiplier per priority level
+PRIORITY_BASE = 4
+
+PRIORITY_LOW = -1
+PRIORITY_NORMAL = 0
+PRIORITY_HIGH = 1
+PRIORITY_URGENT = 2
+
+
+class _ReadError:
+    """Exception raised by a prefetched iterable, passed to the consumer"""
+
+    def __init__(self, error: BaseException):
+        self.error = error
+
+
+def prefetch(items: Iterable[Any], buffer_size: int = 1000) -> Iterator[Any]:
+    """
+    Iterate over items read by a background thread, at most buffer_size ahead.
+
+    The bounded buffer keeps memory flat however long the stream is, while
+    the consumer rarely waits on the producer.
+
+    Args:
+        items: Iterable to read (e.g. a file parser)
+        buffer_size: Maximum items read ahead
+
+    Yields:
+        The items, in order; an exception raised while reading is re-raised
+    """
+    buffer: "queue.Queue[Any]" = queue.Queue(maxsize=buffer_size)
+    end = object()
+    stopped = threading.Event()
+
+    def put(item) -> bool:
+        # Give up when the consumer stopped iterating
+        while not stopped.is_set():
+            try:
+                buffer.put(item, timeout=0.5)
+                return True
+            except queue.Full:
+                pass
+        return False
+
+    def produce():
+        with section("read_numbers"):
+            try:
+                for item in items:
+                    if not put(item):
+                        return
+                put(end)
+            except BaseException as e:
+                put(_ReadError(e))
+
+    threading.Thread(target=produce, daemon=True, name="prefetch").start()
+    try:
+        while True:
+            item = buffer.get()
+            if item is end:
+                return
+            if isinstance(item, _ReadError):
+                raise item.error
+            yield item
+    finally:
+        stopped.set()
+
+
+class Campaign:
+    """
+    One campaign's recipients as seen by the scheduler.
+
+    Items are whatever the sender needs per recipient; the scheduler only
+    hands them out.
+    """
+
+    def __init__(self, items: Iterable[Any], priority: int = PRIORITY_NORMAL, deadline: Optional[float] = None,
+                 total: Optional[int] = None, context: Any = None):
+        """
+        Args:
+            items: Recipients (consumed lazily, one at a time; may be a stream)
+            priority: Higher is more urgent (PRIORITY_LOW ... PRIORITY_URGENT)
+            deadline: time.time() by which the campaign should be done (optional)
+            total: Number of items, if known (needed for deadline checks)
+            context: Anything the sender wants to keep with the campaign
+        """
+        self.priority = priority
+        self.deadline = deadline
+        self.total = total
+        self.context = context
+        self.weight = float(PRIORITY_BASE) ** priority
+        self.pass_value = 0.0
+        self.taken = 0
+        self.in_flight = 0
+        self.finished = threading.Event()
+        # Set if reading the items failed; the campaign ends with what was read
+        self.error: Optional[Exception] = None
+        self._items = iter(items)
+        self._retries: List[Tuple[float, int, Any]] = []
+        self._retry_order = itertools.count()
+        # One item is read ahead so the scheduler knows if more are coming
+        self._next = self._read()
+
+    _END = object()
+
+    def _read(self):
+        try:
+            return next(self._items, Campaign._END)
+        except Exception as e:
+            self.error = e
+            return Campaign._END
+
+    @property
+    def remaining(self) -> Optional[int]:
+        """Recipients not yet handed out, if total is known"""
+        if self.total is None:
+            return None
+        return max(self.total - self.taken, 0) + len(self._retries)
+
+    def has_main(self) -> bool:
+        return self._next is not Campaign._END
+
+    def ready_at(self) -> Optional[float]:
+        """When the campaign can next be served (None if it has nothing left)"""
+        if self.has_main():
+            return 0.0
+        if self._retries:
+            return self._retries[0][0]
+        return None
+
+    def take(self) -> Any:
+        """Hand out the next item (main pass first, then due retries)"""
+        self.in_flight += 1
+        if self.has_main():
+            item, self._next = self._next, self._read()
+            self.taken += 1
+            return item
+        return heapq.heappop(self._retries)[2]
+
+    def requeue(self, item: Any, ready_at: float) -> None:
+        """Put an item back to be retried at ready_at"""
+        heapq.heappush(self._retries, (ready_at, next(self._retry_order), item))
+
+    @property
+    def done(self) -> bool:
+        return not self.has_main() and not self._retries and self.in_flight == 0
+
+
+class SendScheduler:
+    """
+    Thread-safe scheduler of recipient slots across campaigns.
+
+    Usage (sender loop):
+        picked = scheduler.next()
+        campaign, item = picked          # or (None, seconds to wait)
+        ... send item ...
+        campaign.requeue(item, ready_at) # if it should be retried
+        scheduler.complete(campaign)
+    """
+
+    def __init__(self, per_recipient: float = 20.0):
+        """
+        Args:
+            per_recipient: Seconds per recipient, used for deadline checks
+                (update with the measured pace)
+        """
+        self.per_recipient = per_recipient
+        self._campaigns: List[Campaign] = []
+        self._lock = threading.Lock()
+
+    def submit(self, campaign: Campaign) -> Campaign:
+        """Add a campaign; it competes for the very next slot"""
+        with self._lock:
+            # Start at the current virtual time so a newcomer neither waits
+            # for nor starves the campaigns already running
+            active = [c.pass_value for c in self._campaigns]
+            campaign.pass_value = min(active) if active else 0.0
+            if campaign.done:
+                campaign.finished.set()
+            else:
+                self._campaigns.append(campaign)
+        return campaign
+
+    @property
+    def campaigns(self) -> List[Campaign]:
+        """Campaigns not finished yet"""
+        with self._lock:
+            return list(self._campaigns)
+
+    def has_work(self) -> bool:
+        """True if any campaign has recipients left (now or as retries)"""
+        with self._lock:
+            return any(c.ready_at() is not None for c in self._campaigns)
+
+    def _at_risk(self, campaign: Campaign, now: float, sharing: int) -> bool:
+        if campaign.deadline is None or campaign.remaining is None:
+            return False
+        return campaign.deadline - now <= campaign.remaining * self.per_recipient * sharing
+
+    def next(self, now: Optional[float] = None) -> Optional[Tuple[Optional[Campaign], Any]]:
+        """
+        Pick the campaign for the next recipient slot.
+
+        Returns:
+            (campaign, item) for the chosen recipient; (None, seconds) if
+            only retries remain and none is due yet; None if there is no
+            work at all
+        """
+        clock = time.monotonic()
+        wall = time.time() if now is None else now
+        with self._lock:
+            ready = []
+            wait = None
+            for campaign in self._campaigns:
+                ready_at = campaign.ready_at()
+                if ready_at is None:
+                    continue
+                if ready_at <= clock:
+                    ready.append(campaign)
+                else:
+                    wait = ready_at - clock if wait is None else min(wait, ready_at - clock)
+            if not ready:
+                return (None, wait) if wait is not None else None
+
+            urgent = [c for c in ready if self._at_risk(c, wall, len(ready))]
+            if urgent:
+                chosen = min(urgent, key=lambda c: c.deadline)
+            else:
+                chosen = min(ready, key=lambda c: (c.pass_value, -c.priority))
+            chosen.pass_value += 1.0 / chosen.weight
+            return chosen, chosen.take()
+
+    def complete(self, campaign: Campaign) -> None:
+        """Report that an item handed out by next() was handled (sent, failed or requeued)"""
+        with self._lock:
+            campaign.in_flight -= 1
+            if campaign.done:
+                if campaign in self._campaigns:
+                    self._campaigns.remove(campaign)
+                campaign.finished.set()
@@ -0,0 +1,277 @@
+"""
+Module for running the send automation under a watchdog
+
+The GUI automation for a recipient (open the chat, copy the image, type,
+paste, press Enter) runs in a separate worker process. The send helpers
+announce each step with phase(); the parent gives every step a hard
+deadline. If a step hangs - the clipboard blocks, a modal steals focus, a
+hotkey goes to the wrong window - the worker is killed, the recipient is
+re-queued like any other transient failure, and a fresh worker takes the
+next recipient. One bad contact costs a minute instead of the campaign.
+
+A step that hangs after Enter was pressed is not retried: the message may
+already be out, and retrying could send it twice.
+
+While the parent is profiled (stack_profiler.py), the worker samples its
+own stacks under the "automation" section and returns them with each
+call's timings.
+"""
+import importlib
+import multiprocessing
+import pickle
+import time
+from typing import Any, Callable, Dict, List, Optional
+from stack_profiler import section, start_profiling, stop_profiling, active_profiler
+
+# Hard limit per automation step, in seconds
+PHASE_TIMEOUTS = {
+    "start": 60,        # worker start-up (imports the automation stack)
+    "open_chat": 60,
+    "copy_image": 15,
+    "paste": 15,
+    "submit": 45,
+    "log": 20,
+    "close_tab": 20,
+}
+DEFAULT_PHASE_TIMEOUT = 60
+
+# Steps that run once Enter was pressed: from the first of them on, the
+# message may already have been sent
+SENT_PHASES = ("submit", "log", "close_tab")
+
+
+class WatchdogTimeout(Exception):
+    """Raised when an automation step did not finish within its deadline"""
+
+    def __init__(self, phase: str, seconds: float, maybe_sent: Optional[bool] = None):
+        """
+        Args:
+            phase: Step that hung
+            seconds: Its deadline
+            maybe_sent: Whether a step of SENT_PHASES was reached during the
+                call (defaults to whether the hung step is one)
+        """
+        super().__init__(f"Step '{phase}' did not finish within {seconds:.0f}s")
+        self.phase = phase
+        self.seconds = seconds
+        self.maybe_sent = phase in SENT_PHASES if maybe_sent is None else maybe_sent
+
+
+class WorkerCrashedError(Exception):
+    """Raised when the automation worker process exited in the middle of a step"""
+
+    def __init__(self, message: str, phase: Optional[str] = None, maybe_sent: bool = False):
+        """
+        Args:
+            message: Error message
+            phase: Step the worker was in
+            maybe_sent: Whether a step of SENT_PHASES was reached during the call
+        """
+        super().__init__(message)
+        self.phase = phase
+        self.maybe_sent = maybe_sent
+
+
+# Set in the worker process; phase() is a no-op everywhere else
+_phase_hook: Optional[Callable[[str, Optional[float]], None]] = None
+
+
+def phase(name: str, timeout: Optional[float] = None) -> None:
+    """
+    Announce the start of an automation step.
+
+    Args:
+        name: Step name (a key of PHASE_TIMEOUTS)
+        timeout: Deadline for this step if it differs from PHASE_TIMEOUTS
+    """
+    if _phase_hook is not None:
+        _phase_hook(name, timeout)
+
+
+# ===== Worker process =====
+def _collect_timings(module) -> Dict[str, Any]:
+    """Timings the step recorded in this process, to be merged by the parent"""
+    from campaign_forecast import recorded_phases
+    phases = {name: list(values) for name, values in recorded_phases().items()}
+    recorded_phases().clear()
+    navigation = {}
+    for mode, values in getattr(module, "navigation_timings", {}).items():
+        navigation[mode] = list(values)
+        values.clear()
+    profiler = active_profiler()
+    return {"phases": phases, "navigation": navigation, "stacks": profiler.take() if profiler else {}}
+
+
+def _picklable(error: BaseException) -> BaseException:
+    try:
+        pickle.loads(pickle.dumps(error))
+        return error
+    except Exception:
+        return RuntimeError(f"{type(error).__name__}: {error}")
+
+
+def _worker_main(conn, module_name: str) -> None:
+    """Run calls from the parent one at a time, reporting each step"""
+    global _phase_hook
+    _phase_hook = lambda name, timeout: conn.send(("phase", name, timeout))
+    module = importlib.import_module(module_name)
+    conn.send(("ready",))
+    while True:
+        try:
+            request = conn.recv()
+        except EOFError:
+            break
+        if request is None:
+            break
+        func_name, args, kwargs, profile_interval = request
+        # Sample this process too while the parent is profiling
+        if profile_interval and active_profiler() is None:
+            start_profiling(profile_interval)
+        elif not profile_interval and active_profiler() is not None:
+            stop_profiling()
+        try:
+            with section("automation"):
+                result = getattr(module, func_name)(*args, **kwargs)
+            conn.send(("done", result, _collect_timings(module)))
+        except BaseException as e:
+            conn.send(("error", _picklable(e), _collect_timings(module)))
+
+
+class AutomationWorker:
+    """
+    Process running the send helpers of a module, restarted when a step hangs.
+
+    Usage:
+        worker = AutomationWorker("send_massage_from_ui")
+        worker.call("send_text_only", "+9665...", "Hello")   # raises WatchdogTimeout if stuck
+    """
+
+    def __init__(self, module: str = "send_massage_from_ui", timeouts: Optional[Dict[str, float]] = None):
+        """
+        Args:
+            module: Module whose functions are called in the worker
+            timeouts: Per-step deadlines overriding PHASE_TIMEOUTS
+        """
+        self.module = module
+        self.timeouts = dict(PHASE_TIMEOUTS, **(timeouts or {}))
+        # Spawn, not fork: the parent (Streamlit) runs several threads
+        self._context = multiprocessing.get_context("spawn")
+        self.process = None
+        self._conn = None
+        self.restarts = 0
+        self.timeouts_hit: List[str] = []
+
+    @property
+    def alive(self) -> bool:
+        return self.process is not None and self.process.is_alive()
+
+    def start(self) -> None:
+        """Start the worker and wait until it has loaded the module"""
+        parent_conn, child_conn = self._context.Pipe()
+        self.process = self._context.Process(target=_worker_main, args=(child_conn, self.module),
+                                             daemon=True, name="automation-worker")
+        self.process.start()
+        child_conn.close()
+        self._conn = parent_conn
+        self._receive("start", self.timeouts["start"])
+
+    def _receive(self, step: str, timeout: float, sent: bool = False) -> tuple:
+        """
+        Next message from the worker; kills it if none arrives in time.
+
+        Args:
+            step: Step the worker is in
+            timeout: Seconds to wait
+            sent: A step of SENT_PHASES was already reached during this call
+        """
+        try:
+            ready = self._conn.poll(timeout)
+        except (EOFError, OSError):
+            ready = True
+        if not ready:
+            self.kill()
+            self.timeouts_hit.append(step)
+            raise WatchdogTimeout(step, timeout, maybe_sent=sent or step in SENT_PHASES)
+        try:
+            return self._conn.recv()
+        except (EOFError, OSError):
+            self.kill()
+            raise WorkerCrashedError(f"Automation worker exited during step '{step}'", phase=step,
+                                     maybe_sent=sent or step in SENT_PHASES)
+
+    def call(self, func_name: str, *args, **kwargs) -> Any:
+        """
+        Call a function of the module in the worker, watching every step.
+
+        Raises:
+            WatchdogTimeout: A step exceeded its deadline (worker was restarted);
+                maybe_sent is set if the call got as far as Enter
+            WorkerCrashedError: The worker died (maybe_sent as above)
+            Exception: Whatever the function raised
+        """
+        if not self.alive:
+            if self.process is not None:
+                self.kill()
+            self.start()
+        profiler = active_profiler()
+        self._conn.send((func_name, args, kwargs, profiler.interval if profiler else None))
+        step = func_name
+        # Once Enter was pressed every later step (log, close the tab) is
+        # "maybe sent" too, whether or not it announced a phase
+        sent = False
+        deadline = time.monotonic() + self.timeouts.get(func_name, DEFAULT_PHASE_TIMEOUT)
+        while True:
+            message = self._receive(step, max(deadline - time.monotonic(), 0), sent)
+            if message[0] == "phase":
+                _, step, timeout = message
+                sent = sent or step in SENT_PHASES
+                if timeout is None:
+                    timeout = self.timeouts.get(step, DEFAULT_PHASE_TIMEOUT)
+                deadline = time.monotonic() + timeout
+                continue
+            kind, payload, timings = message
+            self._merge_timings(timings)
+            if kind == "done":
+                return payload
+            raise payload
+
+    def _merge_timings(self, timings: Dict[str, Any]) -> None:
+        from campaign_forecast import record_phase
+        for name, values in timings["phases"].items():
+            for seconds in values:
+                record_phase(name, seconds)
+        if timings["navigation"]:
+            module = importlib.import_module(self.module)
+            for mode, values in timings["navigation"].items():
+                module.navigation_timings.setdefault(mode, []).extend(values)
+        profiler = active_profiler()
+        if profiler is not None and timings["stacks"]:
+            profiler.merge(timings["stacks"])
+
+    def kill(self) -> None:
+        """Stop the worker at once; the next call starts a new one"""
+        if self.process is not None:
+            if self.process.is_alive():
+                self.process.terminate()
+                self.process.join(2)
+                if self.process.is_alive():
+                    self.process.kill()
+                    self.process.join(2)
+            self.restarts += 1
+        if self._conn is not None:
+            self._conn.close()
+        self.process = None
+        self._conn = None
+
+    def close(self) -> None:
+        """Shut the worker down cleanly"""
+        if self.alive:
+            try:
+                self._conn.send(None)
+                self.process.join(5)
+            except OSError:
+                pass
+        if self.alive:
+            self.kill()
+        self.process = None
+        self._conn = None
@@ -0,0 +1,424 @@
+"""
+Module for profiling a whole campaign with sampled call stacks
+
+When a campaign runs slower than expected, the question is where the time
+goes: Python work (pandas parsing the number files, PIL encoding the image
+for the clipboard, Streamlit reruns) or the deliberate waits of the send
+helpers. A StackProfiler answers it with low overhead: a background thread
+looks at the call stack of every profiled thread about a hundred times a
+second (nothing is traced in between), and each sample is classified as
+
+    sleep   inside time.sleep (the send helpers' settle and page-load waits)
+    wait    blocked on a lock, queue, pipe or pool (e.g. on the automation worker)
+    run     anything else: Python code, or C code such as pandas or PIL
+
+Only threads inside a section() are sampled, labelled with the section's
+name ("extraction", "sending", "automation", ...), so idle server threads
+stay out of the profile. The automation worker process samples its own
+stacks and hands them to the parent with its phase timings.
+
+At the end of a campaign save() writes:
+    <name>.folded   Collapsed stacks ("section;caller;callee;[sleep] <µs>"),
+                    for flamegraph.pl --countname=us, speedscope or inferno
+    <name>.txt      Per-section wall/sleep/wait/run breakdown and the top
+                    functions by self time
+
+A CLI script is profiled from start to end with:
+    python stack_profiler.py send_massage_v2.py
+"""
+import os
+import sys
+import threading
+import time
+from contextlib import contextmanager
+from datetime import datetime
+from typing import Dict, Iterator, List, Optional, Tuple
+
+PROFILES_DIR = "profiles"
+
+# Seconds between samples
+DEFAULT_INTERVAL = 0.01
+
+# Deepest stack kept per sample (the outermost frames are kept)
+MAX_DEPTH = 128
+
+CATEGORY_SLEEP = "sleep"
+CATEGORY_WAIT = "wait"
+CATEGORY_RUN = "run"
+CATEGORIES = (CATEGORY_SLEEP, CATEGORY_WAIT, CATEGORY_RUN)
+
+# A thread whose innermost Python frame is in one of these stdlib modules is
+# blocked in the C call underneath (lock acquire, select, pipe read)
+WAIT_MODULES = tuple(os.sep + os.path.join(*path) for path in [
+    ("threading.py",), ("queue.py",), ("selectors.py",), ("subprocess.py",), ("socket.py",), ("ssl.py",),
+    ("multiprocessing", "connection.py"), ("concurrent", "futures", "_base.py"),
+])
+
+# (section, category, frames from the outermost) -> seconds
+Stacks = Dict[Tuple[str, str, Tuple[str, ...]], float]
+
+
+# ===== Sections =====
+# Thread ident -> section names, innermost last
+_sections: Dict[int, List[str]] = {}
+
+
+@contextmanager
+def section(name: str) -> Iterator[None]:
+    """
+    Profile the current thread under a section name while the block runs.
+
+    Sections nest; samples are labelled with the innermost one. Costs two
+    dict operations when no profiler is running.
+    """
+    ident = threading.get_ident()
+    labels = _sections.setdefault(ident, [])
+    labels.append(name)
+    try:
+        yield
+    finally:
+        labels.pop()
+        if not labels:
+            _sections.pop(ident, None)
+
+
+def label_thread(name: str) -> None:
+    """
+    Profile the current thread under a section name until it exits.
+
+    For threads whose work has no single enclosing block, such as the
+    Streamlit script thread of a rerun.
+    """
+    labels = _sections.setdefault(threading.get_ident(), [])
+    if labels:
+        labels[0] = name
+    else:
+        labels.append(name)
+
+
+# ===== Sleep tracking =====
+_real_sleep = time.sleep
+# Idents of the threads currently in time.sleep
+_sleeping: Dict[int, bool] = {}
+
+
+def _tracked_sleep(seconds: float) -> None:
+    ident = threading.get_ident()
+    _sleeping[ident] = True
+    try:
+        _real_sleep(seconds)
+    finally:
+        _sleeping.pop(ident, None)
+
+
+def _track_sleeps(enabled: bool) -> None:
+    """
+    Route time.sleep through a wrapper that marks the sleeping thread.
+
+    Covers every module calling time.sleep(...) (the send helpers,
+    pyautogui, pywhatkit); a module that did "from time import sleep"
+    before profiling started shows its sleeps as "wait".
+    """
+    time.sleep = _tracked_sleep if enabled else _real_sleep
+
+
+# ===== Sampling =====
+def _frame_label(code) -> str:
+    name = getattr(code, "co_qualname", code.co_name)
+    label = f"{name} ({os.path.basename(code.co_filename)}:{code.co_firstlineno})"
+    return label.replace(";", ":")
+
+
+class StackProfiler:
+    """
+    Sampling profiler for the sectioned threads of this process.
+
+    Example:
+        profiler = StackProfiler()
+        profiler.start()
+        with section("sending"):
+            ...
+        profiler.stop()
+        profiler.save("profiles/campaign.folded")
+    """
+
+    def __init__(self, interval: float = DEFAULT_INTERVAL):
+        """
+        Args:
+            interval: Seconds between samples
+        """
+        self.interval = interval
+        self.stacks: Stacks = {}
+        # Seconds the profiler ran, and CPU the process and the sampler used meanwhile
+        self.wall_seconds = 0.0
+        self.cpu_seconds = 0.0
+        self.sampler_seconds = 0.0
+        self._labels: Dict[object, str] = {}
+        self._lock = threading.Lock()
+        self._stop = threading.Event()
+        self._thread: Optional[threading.Thread] = None
+
+    @property
+    def running(self) -> bool:
+        return self._thread is not None and self._thread.is_alive()
+
+    def start(self) -> None:
+        """Start sampling in a background thread"""
+        if self.running:
+            return
+        self._stop.clear()
+        _track_sleeps(True)
+        self._thread = threading.Thread(target=self._sample_loop, daemon=True, name="stack-profiler")
+        self._thread.start()
+
+    def stop(self) -> None:
+        """Stop sampling; the samples so far are kept"""
+        if not self.running:
+            return
+        self._stop.set()
+        self._thread.join()
+        self._thread = None
+        _track_sleeps(False)
+
+    def _sample_loop(self) -> None:
+        own = threading.get_ident()
+        skip = _tracked_sleep.__code__
+        last, last_cpu, last_sampler = time.perf_counter(), time.process_time(), time.thread_time()
+        rounds = 0
+        while not self._stop.wait(self.interval):
+            now, cpu, sampler = time.perf_counter(), time.process_time(), time.thread_time()
+            # The actual time since the last round: a long GIL hold by a C
+            # extension is charged to the stack that held it
+            elapsed, last = now - last, now
+            frames = sys._current_frames()
+            samples = []
+            for ident, frame in frames.items():
+                if ident == own:
+                    continue
+                try:
+                    name = _sections[ident][-1]
+                except (KeyError, IndexError):
+                    continue
+                samples.append(self._sample(name, frame, ident in _sleeping, skip))
+            del frames
+            with self._lock:
+                for key in samples:
+                    self.stacks[key] = self.stacks.get(key, 0.0) + elapsed
+                self.wall_seconds += elapsed
+                self.cpu_seconds += cpu - last_cpu
+                self.sampler_seconds += sampler - last_sampler
+            last_cpu, last_sampler = cpu, sampler
+            rounds += 1
+            if rounds % 100 == 0:
+                self._forget_exited_threads()
+
+    def _sample(self, name: str, frame, sleeping: bool, skip) -> Tuple[str, str, Tuple[str, ...]]:
+        codes = []
+        while frame is not None:
+            if frame.f_code is not skip:
+                codes.append(frame.f_code)
+            frame = frame.f_back
+        codes = codes[-MAX_DEPTH:]
+        if sleeping:
+            category = CATEGORY_SLEEP
+        elif codes and codes[0].co_filename.endswith(WAIT_MODULES):
+            category = CATEGORY_WAIT
+        else:
+            category = CATEGORY_RUN
+        labels = []
+        for code in reversed(codes):
+            label = self._labels.get(code)
+            if label is None:
+                label = self._labels[code] = _frame_label(code)
+            labels.append(label)
+        return name, category, tuple(labels)
+
+    def _forget_exited_threads(self) -> None:
+        alive = sys._current_frames().keys()
+        for ident in list(_sections):
+            if ident not in alive:
+                _sections.pop(ident, None)
+
+    def take(self) -> Stacks:
+        """Samples so far, removed from the profiler (the worker hands them to the parent this way)"""
+        with self._lock:
+            stacks, self.stacks = self.stacks, {}
+        return stacks
+
+    def merge(self, stacks: Stacks) -> None:
+        """Add samples taken elsewhere, e.g. in the automation worker process"""
+        with self._lock:
+            for key, seconds in stacks.items():
+                self.stacks[key] = self.stacks.get(key, 0.0) + seconds
+
+    def reset(self) -> None:
+        """Forget all samples; sampling goes on"""
+        with self._lock:
+            self.stacks = {}
+            self.wall_seconds = 0.0
+            self.cpu_seconds = 0.0
+            self.sampler_seconds = 0.0
+
+    # ===== Reports =====
+    def breakdown(self) -> Dict[str, Dict[str, float]]:
+        """
+        Sampled seconds per section and category.
+
+        Returns:
+            Section -> {"wall", "sleep", "wait", "run"}; threads of one
+            section add up, so wall can exceed the profiled time
+        """
+        sections: Dict[str, Dict[str, float]] = {}
+        with self._lock:
+            items = list(self.stacks.items())
+        for (name, category, _), seconds in items:
+            totals = sections.setdefault(name, {"wall": 0.0, **{c: 0.0 for c in CATEGORIES}})
+            totals["wall"] += seconds
+            totals[category] += seconds
+        return dict(sorted(sections.items(), key=lambda item: -item[1]["wall"]))
+
+    def hotspots(self, top: int = 20) -> List[Dict]:
+        """
+        Functions by self time (the time they were the innermost frame).
+
+        Args:
+            top: Number of functions returned
+
+        Returns:
+            Dicts with function, self, sleep, wait, run (self time per
+            category) and total (time on the stack at all), in seconds
+        """
+        functions: Dict[str, Dict] = {}
+
+        def entry(label: str) -> Dict:
+            if label not in functions:
+                functions[label] = {"function": label, "self": 0.0, "total": 0.0,
+                                    **{c: 0.0 for c in CATEGORIES}}
+            return functions[label]
+
+        with self._lock:
+            items = list(self.stacks.items())
+        for (_, category, frames), seconds in items:
+            if not frames:
+                continue
+            for label in set(frames):
+                entry(label)["total"] += seconds
+            leaf = entry(frames[-1])
+            leaf["self"] += seconds
+            leaf[category] += seconds
+        ranked = sorted((f for f in functions.values() if f["self"] > 0), key=lambda f: -f["self"])
+        return ranked[:top]
+
+    def folded(self) -> List[str]:
+        """Collapsed-stack lines, one per distinct stack, with microseconds as the count"""
+        with self._lock:
+            items = sorted(self.stacks.items())
+        lines = []
+        for (name, category, frames), seconds in items:
+            micros = int(round(seconds * 1e6))
+            if micros <= 0:
+                continue
+            leaf = [f"[{category}]"] if category != CATEGORY_RUN else []
+            lines.append(f"{';'.join([name, *frames, *leaf])} {micros}")
+        return lines
+
+    def summary(self, top: int = 20) -> str:
+        """Human-readable breakdown and hotspot table"""
+        lines = [f"Sampled-stack profile: {self.wall_seconds:.1f}s profiled, "
+                 f"{self.interval * 1000:.0f}ms interval, process CPU {self.cpu_seconds:.1f}s, "
+                 f"sampler CPU {self.sampler_seconds:.2f}s"]
+        lines.append("")
+        lines.append(f"{'section':<16}{'wall':>10}{'sleep':>10}{'wait':>10}{'run':>10}")
+        for name, totals in self.breakdown().items():
+            lines.append(f"{name:<16}" + "".join(f"{totals[k]:>9.1f}s" for k in ("wall", *CATEGORIES)))
+        lines.append("")
+        lines.append(f"Top {top} functions by self time:")
+        lines.append(f"{'self':>9}{'sleep':>9}{'wait':>9}{'run':>9}{'total':>9}  function")
+        for f in self.hotspots(top):
+            lines.append("".join(f"{f[k]:>8.1f}s" for k in ("self", *CATEGORIES, "total"))
+                         + f"  {f['function']}")
+        return "\n".join(lines)
+
+    def save(self, path: str, top: int = 20) -> Tuple[str, str]:
+        """
+        Write the collapsed stacks and the summary.
+
+        Args:
+            path: Collapsed-stack file (.folded); the summary goes next to
+                it with a .txt extension
+            top: Functions listed in the summary
+
+        Returns:
+            (folded path, summary path)
+        """
+        os.makedirs(os.path.dirname(os.path.abspath(path)), exist_ok=True)
+        summary_path = os.path.splitext(path)[0] + ".txt"
+        with open(path, "w", encoding="utf-8") as f:
+            f.write("\n".join(self.folded()) + "\n")
+        with open(summary_path, "w", encoding="utf-8") as f:
+            f.write(self.summary(top) + "\n")
+        return path, summary_path
+
+
+# ===== Process-wide profiler =====
+_active: Optional[StackProfiler] = None
+
+
+def start_profiling(interval: float = DEFAULT_INTERVAL) -> StackProfiler:
+    """Start the process-wide profiler (or return the one already running)"""
+    global _active
+    if _active is None or not _active.running:
+        _active = StackProfiler(interval)
+        _active.start()
+    return _active
+
+
+def stop_profiling() -> Optional[StackProfiler]:
+    """Stop the process-wide profiler; returns it with its samples"""
+    global _active
+    profiler, _active = _active, None
+    if profiler is not None:
+        profiler.stop()
+    return profiler
+
+
+def active_profiler() -> Optional[StackProfiler]:
+    """The running process-wide profiler, if any"""
+    return _active if _active is not None and _active.running else None
+
+
+def default_profile_path(directory: str = PROFILES_DIR) -> str:
+    """New profile file named after the current time, e.g. profiles/campaign-20250512-173600.folded"""
+    return os.path.join(directory, f"campaign-{datetime.now():%Y%m%d-%H%M%S}.folded")
+
+
+if __name__ == "__main__":
+    import argparse
+    import runpy
+    # The modules of the profiled script import "stack_profiler", not this
+    # __main__ copy: sections and the profiler must be that module's
+    import stack_profiler
+
+    parser = argparse.ArgumentParser(description="Run a Python script under the sampled-stack profiler")
+    parser.add_argument("-o", "--output", default=None,
+                        help="Collapsed-stack file (default: profiles/campaign-<time>.folded)")
+    parser.add_argument("--interval", type=float, default=DEFAULT_INTERVAL, help="Seconds between samples")
+    parser.add_argument("--top", type=int, default=20, help="Functions listed in the summary")
+    parser.add_argument("script", help="Script to run, e.g. send_massage_v2.py")
+    parser.add_argument("args", nargs=argparse.REMAINDER, help="Arguments for the script")
+    options = parser.parse_args()
+
+    # Resolved now: the script may change the working directory
+    output = os.path.abspath(options.output or stack_profiler.default_profile_path())
+    sys.argv = [options.script, *options.args]
+    sys.path.insert(0, os.path.dirname(os.path.abspath(options.script)))
+    profiler = stack_profiler.start_profiling(options.interval)
+    stack_profiler.label_thread("main")
+    try:
+        runpy.run_path(options.script, run_name="__main__")
+    finally:
+        stack_profiler.stop_profiling()
+        folded_path, summary_path = profiler.save(output, options.top)
+        print(profiler.summary(options.top))
+        print(f"🔥 Flamegraph stacks: {folded_path}")
+        print(f"📄 Summary: {summary_path}")
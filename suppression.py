@@ -0,0 +1,119 @@
+"""
+Module for the opt-out (suppression) list
+
+Numbers that asked not to be contacted are kept in suppression.txt, one
+normalized number per line, and merged with the contacts marked as opted
+out in the contact store. phone_extractor drops suppressed numbers right
+after normalization, so they never reach the numbers list.
+
+The list is an exact in-memory set of normalized numbers: one hash lookup
+per number, and unlike a Bloom filter no false positives that would
+silently drop real recipients.
+"""
+import os
+from typing import Iterable, List, Optional
+from phone_extractor import normalize_phone_number, read_uploaded_file, find_phone_column
+
+DEFAULT_SUPPRESSION_PATH = "suppression.txt"
+
+
+class SuppressionList:
+    """
+    Set of normalized numbers that must not be messaged.
+
+    Example:
+        suppression = load_suppression(store=ContactStore())
+        records = extract_records_from_uploaded_file(uploaded_file, suppression=suppression)
+        records.attrs['suppressed']   # numbers removed
+    """
+
+    def __init__(self, numbers: Optional[Iterable[str]] = None, path: Optional[str] = None):
+        """
+        Args:
+            numbers: Numbers in any supported format
+            path: File that add(..., persist=True) appends to
+        """
+        self.path = path
+        self._numbers = set()
+        if numbers is not None:
+            self.add(numbers)
+
+    def __contains__(self, phone: str) -> bool:
+        return phone in self._numbers
+
+    def __len__(self) -> int:
+        return len(self._numbers)
+
+    @property
+    def numbers(self) -> set:
+        """The normalized numbers (for vectorized filtering)"""
+        return self._numbers
+
+    def add(self, numbers: Iterable[str], persist: bool = False) -> int:
+        """
+        Add numbers to the list.
+
+        Args:
+            numbers: Numbers in any supported format (invalid ones are ignored)
+            persist: Also append the new numbers to self.path
+
+        Returns:
+            Number of numbers that were not suppressed before
+        """
+        new = []
+        for phone in numbers:
+            normalized = normalize_phone_number(phone)
+            if normalized and normalized not in self._numbers:
+                self._numbers.add(normalized)
+                new.append(normalized)
+        if persist and new and self.path:
+            with open(self.path, "a", encoding="utf-8") as f:
+                f.write("".join(f"{phone}\n" for phone in new))
+        return len(new)
+
+    def filter(self, numbers: Iterable[str]) -> List[str]:
+        """Return the normalized numbers that are not suppressed"""
+        return [phone for phone in numbers if phone not in self._numbers]
+
+
+def read_suppression_file(uploaded_file) -> List[str]:
+    """
+    Read numbers from an uploaded opt-out file.
+
+    Plain text files hold one number per line; CSV/Excel/Numbers files are
+    read like recipient lists (phone column detected the same way).
+
+    Returns:
+        Raw numbers as found in the file
+    """
+    if uploaded_file.name.lower().endswith('.txt'):
+        content = uploaded_file.read()
+        if isinstance(content, bytes):
+            content = content.decode('utf-8', errors='replace')
+        return [line.strip() for line in content.splitlines() if line.strip()]
+    df = read_uploaded_file(uploaded_file)
+    phone_col = find_phone_column(df)
+    if phone_col is None:
+        return []
+    return df[phone_col].dropna().astype(str).tolist()
+
+
+def load_suppression(path: str = DEFAULT_SUPPRESSION_PATH, store=None) -> SuppressionList:
+    """
+    Load the suppression list.
+
+    Args:
+        path: Opt-out file, one number per line (missing file = empty list)
+        store: Optional ContactStore whose opted-out contacts are included
+
+    Returns:
+        SuppressionList that appends newly added numbers to path
+    """
+    suppression = SuppressionList(path=path)
+    if os.path.exists(path):
+        with open(path, "r", encoding="utf-8") as f:
+            suppression.add(line.strip() for line in f if line.strip())
+    if store is not None:
+        suppression.add(store.opted_out())
+    return suppression
+
@@ -0,0 +1,80 @@
+"""
+Test script for browser_session module (against a stand-in DevTools endpoint)
+"""
+from browser_session import BrowserSession
+from http.server import BaseHTTPRequestHandler, HTTPServer
+import json
+import tempfile
+import threading
+import time
+
+tabs = [
+    {'id': 'A', 'type': 'page', 'url': 'https://web.whatsapp.com/'},
+    {'id': 'B', 'type': 'page', 'url': 'https://example.com/'},
+    {'id': 'C', 'type': 'page', 'url': 'https://web.whatsapp.com/send?phone=966505815487'},
+]
+activated = []
+
+
+class FakeDevTools(BaseHTTPRequestHandler):
+    """Answers the DevTools HTTP endpoints BrowserSession uses"""
+    def _reply(self, body):
+        data = json.dumps(body).encode()
+        self.send_response(200)
+        self.send_header("Content-Type", "application/json")
+        self.send_header("Content-Length", str(len(data)))
+        self.end_headers()
+        self.wfile.write(data)
+
+    def do_GET(self):
+        if self.path == "/json/version":
+            self._reply({'Browser': 'Chrome/Fake'})
+        elif self.path == "/json/list":
+            self._reply(tabs)
+        elif self.path.startswith("/json/close/"):
+            tab_id = self.path.rsplit("/", 1)[-1]
+            tabs[:] = [tab for tab in tabs if tab['id'] != tab_id]
+            self._reply("Target is closing")
+        elif self.path.startswith("/json/activate/"):
+            activated.append(self.path.rsplit("/", 1)[-1])
+            self._reply("Target activated")
+
+    def do_PUT(self):
+        tabs.append({'id': 'N', 'type': 'page', 'url': self.path.split("?", 1)[1]})
+        self._reply(tabs[-1])
+
+    def log_message(self, *args):
+        pass
+
+
+server = HTTPServer(("127.0.0.1", 0), FakeDevTools)
+threading.Thread(target=server.serve_forever, daemon=True).start()
+session = BrowserSession(port=server.server_port, template_dir=tempfile.mkdtemp(), chrome_path="chrome")
+
+print("Testing warm session:")
+print("=" * 50)
+status = "✅" if session.running else "❌"
+print(f"{status} Running browser detected: {session.running}")
+
+start = time.perf_counter()
+warm = session.ensure_ready(startup_wait=5)
+elapsed = time.perf_counter() - start
+status = "✅" if warm and elapsed < 1.0 else "❌"
+print(f"{status} Warm start in {elapsed:.2f}s (warm={warm}, expected < 1s)")
+
+remaining = [tab['id'] for tab in session.whatsapp_tabs()]
+status = "✅" if remaining == ['A'] and activated == ['A'] else "❌"
+print(f"{status} One WhatsApp tab left and activated: {remaining}, activated {activated}")
+
+print("\nTesting closed WhatsApp tab:")
+print("=" * 50)
+tabs[:] = [tab for tab in tabs if tab['id'] != 'A']
+reopened = session._single_tab()
+status = "✅" if reopened and [tab['id'] for tab in session.whatsapp_tabs()] == ['N'] else "❌"
+print(f"{status} WhatsApp tab reopened: {[tab['url'] for tab in session.whatsapp_tabs()]}")
+
+server.shutdown()
+status = "✅" if not session.running else "❌"
+print(f"{status} Stopped browser detected: running={session.running}")
+
+print("\n✅ All tests completed!")
@@ -0,0 +1,122 @@
+"""
+Test script for the campaign duration forecast and live ETA
+"""
+import os
+import sys
+import tempfile
+import types
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+# No timing_profile.json or phase_timings.json from this machine
+os.chdir(tempfile.mkdtemp())
+
+import campaign_forecast
+from campaign_forecast import (forecast_campaign, default_phases, EtaEstimator, format_duration, record_phase,
+                               save_phase_timings, load_phase_timings, content_type, HISTORY_WEIGHT,
+                               CONTENT_TEXT, CONTENT_IMAGE, CONTENT_IMAGE_TEXT)
+
+
+def close(a, b):
+    return abs(a - b) < 1e-9
+
+
+defaults = default_phases()
+
+# Test the default fallbacks
+print("Testing forecasts from defaults:")
+print("=" * 50)
+forecast = forecast_campaign(1, CONTENT_TEXT, navigation="in_app", pause_seconds=0, timings={})
+expected = defaults["navigate_in_app"] + defaults["submit"] + defaults["compose_text"]
+status = "✅" if close(forecast["per_recipient"], expected) else "❌"
+print(f"{status} Text: navigate + paste text + submit = {forecast['per_recipient']:.1f}s")
+
+forecast = forecast_campaign(1, CONTENT_IMAGE, navigation="url", pause_seconds=0, timings={})
+expected = defaults["navigate_url"] + defaults["submit"] + defaults["compose_image"]
+status = "✅" if close(forecast["per_recipient"], expected) else "❌"
+print(f"{status} Image via URL: navigate + paste image + submit = {forecast['per_recipient']:.1f}s")
+
+image_text = forecast_campaign(1, CONTENT_IMAGE_TEXT, pause_seconds=0, timings={})["per_recipient"]
+album = forecast_campaign(1, CONTENT_IMAGE_TEXT, pause_seconds=0, timings={}, images=3)["per_recipient"]
+status = "✅" if close(album - image_text, 2 * defaults["compose_image"]) else "❌"
+print(f"{status} Album adds a paste per extra image: +{album - image_text:.1f}s for 3 images")
+
+forecast = forecast_campaign(1, CONTENT_TEXT, navigation="unknown", pause_seconds=0, timings={})
+status = "✅" if close(forecast["per_recipient"], defaults["navigate_url"] + defaults["submit"]
+                       + defaults["compose_text"]) else "❌"
+print(f"{status} Unknown navigation falls back to the URL timing")
+
+# Test recorded timings
+print("\nTesting forecasts from recorded timings:")
+print("=" * 50)
+forecast = forecast_campaign(1, CONTENT_TEXT, pause_seconds=0, timings={"send_text": 12.0})
+status = "✅" if forecast["per_recipient"] == 12.0 else "❌"
+print(f"{status} Recorded whole-send average used: {forecast['per_recipient']}s")
+forecast = forecast_campaign(1, CONTENT_TEXT, navigation="in_app", pause_seconds=0,
+                             timings={"navigate_in_app": 2.0, "submit": 1.0, "compose_text": 0.5})
+status = "✅" if forecast["per_recipient"] == 3.5 else "❌"
+print(f"{status} Recorded phases override the defaults: {forecast['per_recipient']}s")
+
+# Test pauses
+print("\nTesting pauses:")
+print("=" * 50)
+timings = {"send_text": 10.0, "startup": 5.0}
+forecast = forecast_campaign(4, CONTENT_TEXT, pause_seconds=8, timings=timings)
+status = "✅" if forecast["total_seconds"] == 5.0 + 4 * 10.0 + 3 * 8 else "❌"
+print(f"{status} No pause after the last recipient: {forecast['total_seconds']}s (expected: 69.0s)")
+status = "✅" if close(forecast["per_hour"], 3600 / 18.0) else "❌"
+print(f"{status} Hourly rate includes the pause: {forecast['per_hour']:.0f}/h")
+forecast = forecast_campaign(0, CONTENT_TEXT, pause_seconds=8, timings=timings)
+status = "✅" if forecast["total_seconds"] == 5.0 else "❌"
+print(f"{status} Empty campaign costs only the startup: {forecast['total_seconds']}s")
+
+# Test stored averages
+print("\nTesting stored phase averages:")
+print("=" * 50)
+path = os.path.join(tempfile.mkdtemp(), "phase_timings.json")
+record_phase("submit", 2.0)
+record_phase("submit", 4.0)
+save_phase_timings(path)
+record_phase("submit", 6.0)
+stored = save_phase_timings(path)
+expected = HISTORY_WEIGHT * 3.0 + (1 - HISTORY_WEIGHT) * 6.0
+status = "✅" if close(stored["submit"], expected) and close(load_phase_timings(path)["submit"], expected) else "❌"
+print(f"{status} Run averages merged into history: {stored['submit']:.2f}s")
+
+# Test the live ETA
+print("\nTesting the live ETA:")
+print("=" * 50)
+clock = [100.0]
+campaign_forecast.time = types.SimpleNamespace(monotonic=lambda: clock[0])
+eta = EtaEstimator(total=10, per_recipient=20.0, alpha=0.5)
+status = "✅" if eta.eta_seconds == 200.0 and eta.progress == 0.0 else "❌"
+print(f"{status} Starts from the forecast: {eta.eta_seconds:.0f}s")
+
+clock[0] += 10.0
+eta.update()
+status = "✅" if eta.per_recipient == 15.0 and eta.eta_seconds == 9 * 15.0 else "❌"
+print(f"{status} Moving average toward the measured pace: {eta.per_recipient}s per recipient")
+
+clock[0] += 20.0
+eta.update(done=3)
+status = "✅" if eta.per_recipient == 12.5 and eta.done == 3 else "❌"
+print(f"{status} Several finished at once share the interval: {eta.per_recipient}s per recipient")
+
+eta.skip()
+status = "✅" if eta.total == 9 and eta.eta_seconds == 6 * 12.5 and close(eta.progress, 3 / 9) else "❌"
+print(f"{status} Skipped recipients leave the ETA: {eta.eta_seconds:.0f}s, progress {eta.progress:.2f}")
+
+eta.update(done=12)
+status = "✅" if eta.eta_seconds == 0 and eta.progress == 1.0 else "❌"
+print(f"{status} Never below zero or above 100%")
+
+# Test helpers
+print("\nTesting helpers:")
+print("=" * 50)
+formatted = [format_duration(s) for s in (45, 750, 7500)]
+status = "✅" if formatted == ["45s", "12m 30s", "2h 05m"] else "❌"
+print(f"{status} Durations formatted: {formatted}")
+status = "✅" if [content_type(True, False), content_type(False, True), content_type(True, True)] == \
+    [CONTENT_TEXT, CONTENT_IMAGE, CONTENT_IMAGE_TEXT] else "❌"
+print(f"{status} Content types named")
+
+print("\n✅ All tests completed!")
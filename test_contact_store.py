@@ -0,0 +1,77 @@
+"""
+Test script for contact_store module
+"""
+from contact_store import ContactStore
+import pandas as pd
+import os
+import tempfile
+import threading
+import time
+
+store = ContactStore(os.path.join(tempfile.mkdtemp(), "contacts.sqlite"))
+
+records = pd.DataFrame({
+    'phone': ['+966505815487', '+966541556250', '+966551111111'],
+    'name': ['Ahmed', 'Sara', 'Ali']
+})
+records.attrs['phone_column'] = 'phone'
+
+# Test import and tags
+print("Testing import:")
+print("=" * 50)
+count = store.import_records(records, tags=['Riyadh'])
+store.add_tags(['+966551111111'], ['vip'])
+status = "✅" if count == 3 and store.tags() == {'riyadh': 3, 'vip': 1} else "❌"
+print(f"{status} Imported {count} contacts, tags: {store.tags()}")
+
+# Test segments
+print("\nTesting segments:")
+print("=" * 50)
+store.mark_sent(['+966505815487'])
+store.mark_sent(['+966541556250'], when=time.time() - 10 * 86400)
+segment = store.select(tags=['riyadh'], not_sent_within_days=7)
+expected = ['+966541556250', '+966551111111']
+status = "✅" if segment == expected else "❌"
+print(f"{status} riyadh, not messaged in 7 days: {segment} (expected: {expected})")
+
+segment = store.select(tags=['riyadh', 'vip'])
+status = "✅" if segment == ['+966551111111'] else "❌"
+print(f"{status} riyadh AND vip: {segment} (expected: ['+966551111111'])")
+
+store.set_opted_out(['+966551111111'])
+segment = store.select(tags=['riyadh'])
+status = "✅" if '+966551111111' not in segment else "❌"
+print(f"{status} Opted-out contact excluded: {segment}")
+
+segment_records = store.select_records(tags=['riyadh'])
+status = "✅" if segment_records['name'].tolist() == ['Ahmed', 'Sara'] else "❌"
+print(f"{status} Segment fields: {segment_records['name'].tolist()} (expected: ['Ahmed', 'Sara'])")
+
+# Test sessions sharing the store
+print("\nTesting concurrent sessions:")
+print("=" * 50)
+errors = []
+
+
+def session(n):
+    batch = pd.DataFrame({'phone': [f'+9665{n:02d}{i:06d}' for i in range(200)]})
+    batch.attrs['phone_column'] = 'phone'
+    try:
+        for _ in range(5):
+            store.import_records(batch, tags=[f'session{n}'])
+            store.mark_sent(batch['phone'])
+            store.select(tags=[f'session{n}'])
+    except Exception as e:
+        errors.append(e)
+
+
+threads = [threading.Thread(target=session, args=(n,)) for n in range(8)]
+for thread in threads:
+    thread.start()
+for thread in threads:
+    thread.join()
+status = "✅" if not errors and len(store) == 3 + 8 * 200 else "❌"
+print(f"{status} 8 threads importing and selecting at once: {len(store)} contacts, {len(errors)} errors")
+
+store.close()
+print("\n✅ All tests completed!")
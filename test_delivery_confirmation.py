@@ -0,0 +1,102 @@
+"""
+Test script for the on-screen send checks (chat header and sent tick)
+
+Screen captures are replaced by synthetic frames, so no display is needed.
+"""
+import tempfile
+import numpy as np
+from delivery_confirmation import ChatHeaderCheck, SentTickWatcher, PENDING_STATE
+
+
+def frames(*images):
+    """grab() stand-in returning the given frames in order (the last one repeats)"""
+    images = list(images)
+    return lambda: images.pop(0) if len(images) > 1 else images[0]
+
+
+old_chat = np.full((20, 80), 240.0, dtype=np.float32)
+old_chat[5:15, 5:15] = 60.0
+new_chat = old_chat.copy()
+new_chat[5:15, 20:60] = 30.0
+
+# Test the chat header check
+print("Testing the chat header check:")
+print("=" * 50)
+check = ChatHeaderCheck()
+check.grab = frames(old_chat)
+check.arm()
+status = "✅" if not check.wait(timeout=0.05, poll_interval=0.01) else "❌"
+print(f"{status} Same header: no chat opened")
+
+check.grab = frames(old_chat, old_chat + 0.5, new_chat)
+status = "✅" if check.wait(timeout=1, poll_interval=0.01) else "❌"
+print(f"{status} New name in the header: chat opened")
+
+# ===== Synthetic chat strip =====
+tick = np.full((6, 10), 220.0, dtype=np.float32)
+tick[3:5, 1:4] = 40.0
+tick[1:5, 4:9] = np.eye(4, 5)[::-1] * -180.0 + 220.0
+clock = np.full((6, 10), 220.0, dtype=np.float32)
+clock[1:5, 3:7] = 40.0
+clock[2:4, 4:6] = 220.0
+
+
+def bubble(frame, top, text_width, icon=None, minute=1):
+    """Draw an outgoing bubble: text line, timestamp and status icon"""
+    frame[top:top + 10, 190 - text_width - 30:190] = 220.0
+    frame[top + 3:top + 7, 190 - text_width - 26:190 - 30] = 60.0
+    frame[top + 4:top + 8, 163 + minute * 3:165 + minute * 3] = 90.0
+    if icon is not None:
+        frame[top + 2:top + 8, 178:188] = icon
+
+
+def chat(*bubbles):
+    frame = np.full((60, 200), 240.0, dtype=np.float32)
+    for args in bubbles:
+        bubble(frame, *args)
+    return frame
+
+
+watcher = SentTickWatcher(template_dir=tempfile.mkdtemp())
+watcher.templates = {"delivered": tick, PENDING_STATE: clock}
+
+# Test the sent tick
+print("\nTesting the sent tick:")
+print("=" * 50)
+before = chat((20, 80, tick), (45, 60, tick))
+watcher.grab = frames(before)
+watcher.arm()
+
+status = "✅" if watcher.state(before) is None else "❌"
+print(f"{status} Nothing sent yet: no confirmation")
+
+shifted = before.copy()
+shifted[0:15, :] = 120.0
+status = "✅" if watcher.state(shifted) is None else "❌"
+print(f"{status} Layout shift above the last bubble: its old tick doesn't confirm")
+
+
+def sent(icon):
+    """The chat after Enter: older bubbles scrolled up, the new one at the bottom"""
+    return chat((5, 80, tick), (30, 60, tick), (45, 120, icon, 2))
+
+
+scrolled = sent(None)
+status = "✅" if watcher.state(scrolled) is None else "❌"
+print(f"{status} New bubble without an icon yet: older ticks don't confirm")
+
+status = "✅" if watcher.state(sent(clock)) == PENDING_STATE else "❌"
+print(f"{status} Clock on the newest bubble: pending")
+
+status = "✅" if watcher.state(sent(tick)) == "delivered" else "❌"
+print(f"{status} Tick on the newest bubble: confirmed")
+
+watcher.grab = frames(shifted, scrolled, sent(clock))
+status = "✅" if watcher.wait(timeout=0.1, poll_interval=0.01) is None else "❌"
+print(f"{status} Waiting ends without confirmation while the newest bubble has no tick")
+
+watcher.grab = frames(scrolled, sent(clock), sent(tick))
+status = "✅" if watcher.wait(timeout=1, poll_interval=0.01) is not None else "❌"
+print(f"{status} Waiting stops once the newest bubble's clock turns into a tick")
+
+print("\n✅ All tests completed!")
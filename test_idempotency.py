@@ -0,0 +1,97 @@
+"""
+Test script for delivery keys and the sent index
+"""
+from idempotency import delivery_key, media_hash, file_sha256, IdempotencyIndex, MAYBE_SENT
+import os
+import tempfile
+
+tmp = tempfile.mkdtemp()
+image_a = os.path.join(tmp, "a.jpg")
+image_b = os.path.join(tmp, "b.jpg")
+with open(image_a, "wb") as f:
+    f.write(b"first image")
+with open(image_b, "wb") as f:
+    f.write(b"second image")
+sha_a, sha_b = file_sha256(image_a), file_sha256(image_b)
+
+# Test delivery keys
+print("Testing delivery keys:")
+print("=" * 50)
+formats = ["+966505815487", "966505815487", "0505815487", " +966505815487 "]
+keys = {delivery_key(number, "Hello", sha_a) for number in formats}
+status = "✅" if len(keys) == 1 else "❌"
+print(f"{status} Same number in {len(formats)} formats gives one key")
+
+key = delivery_key("+966505815487", "Hello", sha_a)
+status = "✅" if delivery_key("+966505815487", "Hello ", sha_a) == key else "❌"
+print(f"{status} Surrounding whitespace of the text is ignored")
+status = "✅" if delivery_key("+966505815487", "Hello!", sha_a) != key else "❌"
+print(f"{status} Different text gives a different key")
+status = "✅" if delivery_key("+966505815487", "Hello", sha_b) != key else "❌"
+print(f"{status} Different image gives a different key")
+status = "✅" if delivery_key("+966505815487", "Hello") != key else "❌"
+print(f"{status} Text alone differs from text with an image")
+status = "✅" if delivery_key("+966541556250", "Hello", sha_a) != key else "❌"
+print(f"{status} Different number gives a different key")
+
+# Test album keys
+print("\nTesting album keys:")
+print("=" * 50)
+status = "✅" if media_hash([]) == "" and media_hash([sha_a]) == sha_a else "❌"
+print(f"{status} No media and single images hash as before")
+album = delivery_key("+966505815487", "Hello", media_hash([sha_a, sha_b]))
+reordered = delivery_key("+966505815487", "Hello", media_hash([sha_b, sha_a]))
+status = "✅" if album != reordered else "❌"
+print(f"{status} Album image order changes the key")
+status = "✅" if album not in (key, delivery_key("+966505815487", "Hello", sha_b)) else "❌"
+print(f"{status} Album differs from each of its images sent alone")
+
+# Test the sent index
+print("\nTesting the sent index:")
+print("=" * 50)
+path = os.path.join(tmp, "sent_index.txt")
+index = IdempotencyIndex(path)
+index.add(key)
+index.add(album)
+index.add(key)
+status = "✅" if len(index) == 2 and key in index and reordered not in index else "❌"
+print(f"{status} Keys recorded once: {len(index)}")
+with open(path, encoding="utf-8") as f:
+    lines = f.read().splitlines()
+status = "✅" if lines == [key, album] else "❌"
+print(f"{status} Each new key appended to the file: {len(lines)} lines")
+
+reloaded = IdempotencyIndex(path)
+status = "✅" if len(reloaded) == 2 and key in reloaded and album in reloaded else "❌"
+print(f"{status} Index survives a reload")
+
+memory = IdempotencyIndex(None)
+memory.add(key)
+status = "✅" if key in memory and not os.path.exists(os.path.join(os.getcwd(), "None")) else "❌"
+print(f"{status} In-memory index writes no file")
+
+# Test deliveries that may have been sent
+print("\nTesting maybe-sent deliveries:")
+print("=" * 50)
+maybe = delivery_key("+966541556250", "Hello")
+index.add(maybe, maybe_sent=True)
+status = "✅" if maybe in index and index.maybe_sent(maybe) and not index.maybe_sent(key) else "❌"
+print(f"{status} Unconfirmed send counts as sent, marked maybe sent")
+index.add(key, maybe_sent=True)
+status = "✅" if not index.maybe_sent(key) else "❌"
+print(f"{status} Confirmed send stays confirmed")
+
+reloaded = IdempotencyIndex(path)
+status = "✅" if maybe in reloaded and reloaded.maybe_sent(maybe) and len(reloaded) == 3 else "❌"
+print(f"{status} Maybe-sent status survives a reload")
+
+reloaded.add(maybe)
+reloaded = IdempotencyIndex(path)
+status = "✅" if maybe in reloaded and not reloaded.maybe_sent(maybe) else "❌"
+print(f"{status} Later confirmed send replaces the maybe-sent status")
+with open(path, encoding="utf-8") as f:
+    lines = f.read().splitlines()
+status = "✅" if lines == [key, album, f"{maybe}\t{MAYBE_SENT}", maybe] else "❌"
+print(f"{status} Statuses appended, never rewritten: {len(lines)} lines")
+
+print("\n✅ All tests completed!")
@@ -0,0 +1,108 @@
+"""
+Test script for the content-addressed media store
+"""
+from media_store import MediaStore
+from idempotency import file_sha256
+from PIL import Image
+import io
+import os
+import tempfile
+
+
+class Upload(io.BytesIO):
+    """Minimal stand-in for a Streamlit UploadedFile"""
+    def __init__(self, name: str, data: bytes):
+        super().__init__(data)
+        self.name = name
+
+
+def image_bytes(size, fmt="JPEG", color=(200, 30, 30), orientation=None) -> bytes:
+    out = io.BytesIO()
+    img = Image.new("RGB", size, color)
+    if orientation is None:
+        img.save(out, fmt)
+    else:
+        exif = Image.Exif()
+        exif[0x0112] = orientation
+        img.save(out, fmt, exif=exif)
+    return out.getvalue()
+
+
+store = MediaStore(root=tempfile.mkdtemp())
+big = image_bytes((3200, 2400))
+small = image_bytes((800, 600), "PNG")
+
+# Test content addressing
+print("Testing storage:")
+print("=" * 50)
+sha = store.put_upload(Upload("photo.JPG", big))
+path = store.path(sha)
+status = "✅" if path.endswith(sha + ".jpg") and file_sha256(path) == sha else "❌"
+print(f"{status} Stored under its SHA-256: {os.path.basename(path)[:16]}...")
+
+mtime = os.path.getmtime(path)
+again = store.put_upload(Upload("same-picture-other-name.jpg", big))
+status = "✅" if again == sha and os.path.getmtime(path) == mtime else "❌"
+print(f"{status} Same bytes from another session reuse the file")
+
+status = "✅" if store.put_file(path) == sha and store.sha_for_path(path) == sha else "❌"
+print(f"{status} Paths inside the store are recognized without re-reading")
+
+outside = os.path.join(tempfile.mkdtemp(), "photo.png")
+with open(outside, "wb") as f:
+    f.write(small)
+status = "✅" if store.sha_for_path(outside) is None and store.put_file(outside) == file_sha256(outside) else "❌"
+print(f"{status} Files outside the store are imported")
+
+# Test derivatives
+print("\nTesting derivatives:")
+print("=" * 50)
+send_path = store.send_path(sha)
+with Image.open(send_path) as img:
+    status = "✅" if max(img.size) == 1600 and send_path != path else "❌"
+    print(f"{status} Large image downscaled for sending: {img.size}")
+status = "✅" if store.send_path(sha) == send_path else "❌"
+print(f"{status} Derivative is cached")
+
+small_sha = file_sha256(outside)
+status = "✅" if store.send_path(small_sha) == store.path(small_sha) else "❌"
+print(f"{status} Small image is sent as it is")
+
+# Orientation 6: stored landscape, shown rotated 90° clockwise (portrait)
+for name, size in [("small", (800, 600)), ("large", (3200, 2400))]:
+    rotated_sha = store.put_upload(Upload(f"phone-{name}.jpg", image_bytes(size, orientation=6)))
+    with Image.open(store.send_path(rotated_sha)) as img:
+        upright = img.size[0] < img.size[1] and img.getexif().get(0x0112, 1) == 1
+    status = "✅" if upright and store.send_path(rotated_sha) != store.path(rotated_sha) else "❌"
+    print(f"{status} Rotated {name} phone photo sent upright: {img.size}")
+
+dib = store.clipboard_dib(sha)
+status = "✅" if int.from_bytes(dib[:4], "little") == 40 else "❌"
+print(f"{status} Clipboard payload is a DIB ({len(dib)} bytes)")
+
+# Test references and eviction
+print("\nTesting eviction:")
+print("=" * 50)
+store.evict(max_bytes=0)
+status = "✅" if os.path.exists(store.path(small_sha)) else "❌"
+print(f"{status} Fresh upload not evicted before its campaign takes a reference")
+
+store.keep_recent = 0
+store.acquire(sha)
+freed = store.evict(max_bytes=0)
+status = "✅" if os.path.exists(path) and not os.path.exists(send_path) and freed > 0 else "❌"
+print(f"{status} Referenced image kept, derivatives and unreferenced images evicted ({freed} bytes)")
+small_path = os.path.join(store.root, "objects", small_sha + ".png")
+status = "✅" if not os.path.exists(small_path) and store.sha_for_path(small_path) is None else "❌"
+print(f"{status} Unreferenced image removed from the index")
+
+status = "✅" if store.send_path(sha) == send_path and os.path.exists(send_path) else "❌"
+print(f"{status} Evicted derivative is rebuilt on demand")
+
+store.release(sha)
+store.evict(max_bytes=0)
+status = "✅" if not os.path.exists(path) and store.total_bytes() == 0 else "❌"
+print(f"{status} Released image can be evicted")
+
+store.close()
+print("\n✅ All tests completed!")
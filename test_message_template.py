@@ -0,0 +1,86 @@
+"""
+Test script for message_template module
+"""
+from message_template import compile_template, find_missing_fields, find_format_errors, iter_fields
+import pandas as pd
+
+records = pd.DataFrame({
+    'Name': ['Ahmed', 'Sara', None],
+    'phone': ['+966505815487', '+966541556250', '+966551111111'],
+    'order': [1001.0, 1002.0, 1003.0]
+})
+
+# Test rendering
+print("Testing template rendering:")
+print("=" * 50)
+template = compile_template("مرحبا {name}، طلبك رقم {order} {{جاهز}}")
+expected = [
+    "مرحبا Ahmed، طلبك رقم 1001 {جاهز}",
+    "مرحبا Sara، طلبك رقم 1002 {جاهز}",
+    "مرحبا ، طلبك رقم 1003 {جاهز}",
+]
+for values, exp in zip(iter_fields(template, records), expected):
+    result = template.render(values)
+    status = "✅" if result == exp else "❌"
+    print(f"{status} Expected: {exp:35} Got: {result}")
+
+# Test pre-flight check
+print("\nTesting missing field report:")
+print("=" * 50)
+missing = find_missing_fields(template, records)
+status = "✅" if missing == {'name': 1} else "❌"
+print(f"{status} Missing: {missing} (expected: {{'name': 1}})")
+
+missing2 = find_missing_fields(compile_template("Hi {city}"), records)
+status = "✅" if missing2 == {'city': 3} else "❌"
+print(f"{status} Missing: {missing2} (expected: {{'city': 3}})")
+
+static = compile_template("No placeholders here")
+status = "✅" if static.is_static else "❌"
+print(f"{status} Static template detected: {static.is_static}")
+
+# Test plain messages with braces
+print("\nTesting braces that are not fields:")
+print("=" * 50)
+columns = records.columns
+plain = "Use code {SAVE10} at checkout :} or {"
+template = compile_template(plain, columns=columns)
+status = "✅" if template.is_static and template.render({}) == plain else "❌"
+print(f"{status} Stray braces and unknown {{text}} kept as written: {template.render({})}")
+status = "✅" if template.unmatched == ['{SAVE10}'] else "❌"
+print(f"{status} Unmatched placeholders listed: {template.unmatched}")
+
+template = compile_template("Hi {name}, code {SAVE10}", columns=columns)
+rendered = [template.render(values) for values in iter_fields(template, records)]
+status = "✅" if template.fields == ['name'] and rendered[0] == "Hi Ahmed, code {SAVE10}" else "❌"
+print(f"{status} Only column placeholders rendered: {rendered[0]}")
+status = "✅" if find_missing_fields(template, records) == {'name': 1} else "❌"
+print(f"{status} Literal {{text}} does not count as missing")
+
+# Test formats and conversions
+print("\nTesting formats and conversions:")
+print("=" * 50)
+prices = pd.DataFrame({'order': [7.0, 1002.0], 'price': [5, '12.5'], 'name': ['Ahmed', 'Sara']})
+template = compile_template("#{order:05d} {price:.2f} {name!r} {name:>6}", columns=prices.columns)
+rendered = [template.render(values) for values in iter_fields(template, prices)]
+expected = ["#00007 5.00 'Ahmed'  Ahmed", "#01002 12.50 'Sara'   Sara"]
+status = "✅" if rendered == expected else "❌"
+print(f"{status} Specs and conversions applied: {rendered}")
+
+for source in ["{name!x}", "{price:.2q}"]:
+    try:
+        compile_template(source, columns=prices.columns)
+        status = "❌"
+    except ValueError:
+        status = "✅"
+    print(f"{status} Invalid format rejected: {source}")
+
+status = "✅" if compile_template("{other:.2q}", columns=prices.columns).is_static else "❌"
+print(f"{status} Invalid format of a non-column kept as text")
+
+bad = pd.DataFrame({'price': [5, 'free', None]})
+errors = find_format_errors(compile_template("{price:.2f}", columns=bad.columns), bad)
+status = "✅" if errors == {'price': 1} else "❌"
+print(f"{status} Values that don't fit the format counted: {errors}")
+
+print("\n✅ All tests completed!")
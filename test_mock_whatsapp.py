@@ -0,0 +1,65 @@
+"""
+Test script for the end-to-end benchmark harness
+
+The mock server is always tested; the benchmark itself runs only where
+Xvfb, Chrome and the clipboard tools are installed.
+"""
+from mock_whatsapp import MockWhatsAppServer, summarize, missing_tools, run_benchmark, CONTENT_ALBUM
+import json
+import urllib.request
+import pandas as pd
+
+# Test the mock page and its delivery record
+print("Testing mock WhatsApp Web server:")
+print("=" * 50)
+server = MockWhatsAppServer(open_delay=50, tick_delay=75)
+server.start()
+with urllib.request.urlopen(server.url) as response:
+    page = response.read().decode("utf-8")
+status = "✅" if 'id="composer"' in page and '"open_delay": 50' in page and "__CONFIG__" not in page else "❌"
+print(f"{status} Page served with its latencies at {server.url}")
+
+with urllib.request.urlopen(server.url + "send?phone=966505815487&text=Hi") as response:
+    status = "✅" if response.status == 200 else "❌"
+print(f"{status} Send URL served like WhatsApp Web's")
+
+for phone, text, images in [("+966505815487", "Hello", 0), ("+966541556250", "Hello", 2)]:
+    body = json.dumps({"phone": phone, "text": text, "images": images}).encode()
+    request = urllib.request.Request(server.url + "api/sent", data=body, method="POST",
+                                     headers={"Content-Type": "application/json"})
+    urllib.request.urlopen(request).close()
+with urllib.request.urlopen(server.url + "api/deliveries") as response:
+    deliveries = json.loads(response.read())
+status = "✅" if [d["phone"] for d in deliveries] == ["+966505815487", "+966541556250"] and \
+    all("received_at" in d for d in deliveries) else "❌"
+print(f"{status} Sent messages recorded: {len(deliveries)}")
+server.stop()
+
+# Test matching the sender's results with what arrived
+print("\nTesting benchmark summary:")
+print("=" * 50)
+results = pd.DataFrame({
+    "number": ["+966505815487", "+966541556250", "+966551234567"],
+    "status": ["success", "success", "failed"],
+    "seconds": [2.0, 3.0, 1.0],
+})
+summary = summarize(results, server.deliveries, "Hello", 0)
+status = "✅" if summary["sent"] == 2 and summary["delivered"] == 1 and summary["mismatched"] == 1 else "❌"
+print(f"{status} Wrong image count caught: sent {summary['sent']}, delivered {summary['delivered']}, "
+      f"mismatched {summary['mismatched']}")
+status = "✅" if summary["mean"] == 2.0 and summary["per_hour"] == 1800 else "❌"
+print(f"{status} Timing: mean {summary['mean']:.1f}s, {summary['per_hour']:.0f}/hour")
+
+# End-to-end run on a virtual display
+print("\nTesting end-to-end sending:")
+print("=" * 50)
+missing = missing_tools()
+if missing:
+    print(f"⏭️ Skipped: {', '.join(missing)} not installed")
+else:
+    for content in ("text", CONTENT_ALBUM):
+        summary = run_benchmark(recipients=3, content=content, open_delay=100, tick_delay=100)
+        status = "✅" if summary["delivered"] == 3 and summary["mismatched"] == 0 else "❌"
+        print(f"{status} {content}: {summary['delivered']}/3 delivered, {summary['mean']:.1f}s per recipient")
+
+print("\n✅ All tests completed!")
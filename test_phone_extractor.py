@@ -1,8 +1,10 @@
 """
 Test script for phone_extractor module
 """
-from phone_extractor import normalize_phone_number, find_phone_column
+from phone_extractor import normalize_phone_number, find_phone_column, extract_records_from_files, iter_phone_numbers
+from phone_extractor import normalize_phone_series, extract_records_with_report, rejects_frame, NoValidNumbersError
 import pandas as pd
+import io
 
 # Test normalization
 test_cases = [
@@ -55,5 +57,98 @@ test_df3 = pd.DataFrame({
 col3 = find_phone_column(test_df3)
 print(f"✅ Found column: {col3} (expected: 'ext')")
 
+# Test multi-file merge
+print("\nTesting multi-file merge:")
+print("=" * 50)
+
+
+class Upload(io.BytesIO):
+    """Minimal stand-in for a Streamlit UploadedFile"""
+    def __init__(self, name, data):
+        super().__init__(data)
+        self.name = name
+
+
+files = [
+    Upload("branch1.csv", b"phone,name\n0505815487,Ahmed\n0551234567,Sara\n"),
+    Upload("branch2.csv", b"Mobile,name\n966551234567,Sara B\n+966541556250,Ali\n"),
+    Upload("broken.csv", b"name\nno numbers here\n"),
+]
+merged, reports = extract_records_from_files(files)
+numbers = merged[merged.attrs['phone_column']].tolist()
+expected = ['+966505815487', '+966551234567', '+966541556250']
+status = "✅" if numbers == expected else "❌"
+print(f"{status} Merged: {numbers} (expected: {expected})")
+status = "✅" if merged['name'].tolist() == ['Ahmed', 'Sara', 'Ali'] else "❌"
+print(f"{status} First occurrence kept: {merged['name'].tolist()}")
+counts = [(r['name'], r['count'], r['error'] is not None) for r in reports]
+status = "✅" if counts == [('branch1.csv', 2, False), ('branch2.csv', 2, False), ('broken.csv', 0, True)] else "❌"
+print(f"{status} Per-file reports: {counts}")
+status = "✅" if merged.attrs['duplicates'] == 1 else "❌"
+print(f"{status} Duplicates across files: {merged.attrs['duplicates']} (expected: 1)")
+
+# Test streaming extraction
+print("\nTesting streaming extraction:")
+print("=" * 50)
+rows = "".join(f"05{i:08d},Customer {i}\n" for i in range(50000))
+big = Upload("big.csv", ("phone,name\n" + rows + "0500000001,Again\nbad,Row\n").encode())
+stream = iter_phone_numbers(big, suppression={'+966500000002'}, chunk_size=1000)
+first = next(stream)
+status = "✅" if first == '+966500000000' and big.tell() < len(big.getvalue()) else "❌"
+print(f"{status} First number yielded before the file is read: {first}")
+rest = list(stream)
+status = "✅" if len(rest) == 49998 and '+966500000002' not in rest else "❌"
+print(f"{status} Deduped and suppressed while streaming: {len(rest) + 1} numbers (expected: 49999)")
+
+numbers = list(iter_phone_numbers(Upload("list.csv", b"id,mobile\n1,0505815487\n2,\n3,966541556250\n")))
+status = "✅" if numbers == ['+966505815487', '+966541556250'] else "❌"
+print(f"{status} Phone column found, empty cells skipped: {numbers}")
+
+xlsx = io.BytesIO()
+pd.DataFrame({'name': ['Ahmed', 'Sara'], 'phone': ['0505815487', '0551234567']}).to_excel(xlsx, index=False)
+numbers = list(iter_phone_numbers(Upload("list.xlsx", xlsx.getvalue()), chunk_size=1))
+status = "✅" if numbers == ['+966505815487', '+966551234567'] else "❌"
+print(f"{status} Excel rows streamed: {numbers}")
+
+# Test the batched validation report
+print("\nTesting validation report:")
+print("=" * 50)
+values = ["966505815487", "0505815487", "+966 50 581 5487", "505815487", "+14155552671", "", None,
+          "nan", "abc", "05058154", "9665058154870", "12345", "+1415", "05x05815487", "505815487.0"]
+normalized, reason = normalize_phone_series(pd.Series(values, dtype=object))
+matches = [(None if pd.isna(n) else n) == (normalize_phone_number(v) if v else None) for v, n in zip(values, normalized)]
+status = "✅" if all(matches) else "❌"
+print(f"{status} Batched normalization matches normalize_phone_number ({sum(matches)}/{len(values)})")
+expected = [None, None, None, None, None, 'empty', 'empty', 'empty', 'non_digit', 'too_short',
+            'too_long', 'wrong_prefix', 'too_short', None, 'too_long']
+reasons = [None if pd.isna(r) else r for r in reason]
+status = "✅" if reasons == expected else "❌"
+print(f"{status} Rejection reasons: {reasons}")
+
+sheet = Upload("customers.csv", b"phone,name\n0505815487,Ahmed\nabc,Bad\n966505815487,Again\n,Empty\n05123,Short\n0551234567,Sara\n")
+records, report = extract_records_with_report(sheet, suppression={'+966551234567'})
+counts = {k: v for k, v in report['counts'].items() if v}
+status = "✅" if counts == {'non_digit': 1, 'empty': 1, 'too_short': 1, 'duplicate': 1, 'suppressed': 1} and \
+    report['total'] == 6 and report['valid'] == 1 and len(records) == 1 else "❌"
+print(f"{status} Counts per reason: {counts} ({report['valid']}/{report['total']} valid)")
+rows = report['rejects'][['row', 'reason']].values.tolist()
+status = "✅" if rows == [[3, 'non_digit'], [4, 'duplicate'], [5, 'empty'], [6, 'too_short'], [7, 'suppressed']] else "❌"
+print(f"{status} Sheet rows of rejects: {rows}")
+
+try:
+    extract_records_with_report(Upload("bad.csv", b"phone\nabc\n123\n"))
+    print("❌ No error for a file without valid numbers")
+except NoValidNumbersError as e:
+    status = "✅" if e.report['counts']['non_digit'] == 1 and e.report['counts']['wrong_prefix'] == 1 else "❌"
+    print(f"{status} Report kept on the error: {e.report['counts']}")
+
+merged, reports = extract_records_from_files([Upload("a.csv", b"phone\n0505815487\nx\n"),
+                                              Upload("b.csv", b"phone\nabc\n"),
+                                              Upload("c.csv", b"phone\n0551234567\n")])
+rejects = rejects_frame(reports)
+status = "✅" if rejects['file'].tolist() == ['a.csv', 'b.csv'] and reports[1]['error'] and \
+    len(merged) == 2 else "❌"
+print(f"{status} Rejects of all files combined: {rejects.values.tolist()}")
+
 print("\n✅ All tests completed!")
 
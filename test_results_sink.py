@@ -0,0 +1,71 @@
+"""
+Test script for the campaign results sink
+"""
+from results_sink import ResultsSink, read_results, results_bytes, list_results, PARTS_SUFFIX
+import io
+import os
+import tempfile
+import pandas as pd
+
+tmp = tempfile.mkdtemp()
+
+# Test CSV results
+print("Testing CSV results:")
+print("=" * 50)
+path = os.path.join(tmp, "campaign.csv")
+sink = ResultsSink(path, batch_size=3, flush_seconds=3600)
+sink.write(campaign=1, account="host-a", number="+966505815487", status="success", attempt=1, seconds=12.5)
+sink.write(campaign=1, account="host-a", number="+966541556250", status="retrying", attempt=1, seconds=4.0,
+           failure="transient", error_type="TimeoutError", error="page not loaded")
+status = "✅" if len(read_results(path)) == 0 and sink.rows_written == 0 else "❌"
+print(f"{status} Rows buffered until the batch is full")
+
+sink.write(campaign=1, account="host-a", number="0500", status="failed", attempt=1, seconds=1.0,
+           failure="permanent", error_type="InvalidNumberError", error="x" * 1000)
+results = read_results(path)
+status = "✅" if len(results) == 3 and results['number'].tolist()[0] == "+966505815487" else "❌"
+print(f"{status} Full batch written: {results['status'].tolist()}")
+status = "✅" if results['failure'].tolist()[1] == "transient" and len(results['error'][2]) == 500 else "❌"
+print(f"{status} Failure class kept, long errors cut: {results['error_type'].tolist()}")
+status = "✅" if results['number'][2] == "0500" else "❌"
+print(f"{status} Numbers read back as text: {results['number'][2]}")
+
+sink.write(number="+966551234567", status="skipped")
+sink.close()
+sink = ResultsSink(path)
+sink.write(number="+966551234568", status="success")
+sink.close()
+results = read_results(path)
+with open(path, encoding="utf-8") as f:
+    headers = sum(1 for line in f if line.startswith("time,"))
+status = "✅" if len(results) == 5 and headers == 1 else "❌"
+print(f"{status} Close writes the rest, reopening appends: {len(results)} rows, {headers} header")
+
+timed = ResultsSink(os.path.join(tmp, "slow.csv"), batch_size=100, flush_seconds=0)
+timed.write(number="+966505815487", status="success")
+status = "✅" if timed.rows_written == 1 else "❌"
+print(f"{status} Partial batch written once it is old enough")
+timed.close()
+
+# Test Parquet results
+print("\nTesting Parquet results:")
+print("=" * 50)
+path = os.path.join(tmp, "campaign.parquet")
+sink = ResultsSink(path, batch_size=2)
+for i in range(5):
+    sink.write(campaign=2, number=f"+96650000{i:04d}", status="success", attempt=1, seconds=float(i))
+status = "✅" if len(os.listdir(path + PARTS_SUFFIX)) == 2 and not os.path.exists(path) else "❌"
+print(f"{status} One part file per batch while sending")
+
+snapshot = pd.read_parquet(io.BytesIO(results_bytes(path)))
+status = "✅" if len(snapshot) == 4 and snapshot['seconds'].tolist() == [0.0, 1.0, 2.0, 3.0] else "❌"
+print(f"{status} Mid-campaign download holds the batches so far: {len(snapshot)} rows")
+status = "✅" if list_results(tmp)[0] == path else "❌"
+print(f"{status} Running campaign listed: {[os.path.basename(p) for p in list_results(tmp)]}")
+
+sink.close()
+results = read_results(path)
+status = "✅" if len(results) == 5 and not os.path.exists(path + PARTS_SUFFIX) else "❌"
+print(f"{status} Parts combined into one file on close: {len(results)} rows")
+
+print("\n✅ All tests completed!")
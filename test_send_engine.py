@@ -0,0 +1,95 @@
+"""
+Test script for the send engine
+"""
+from send_engine import build_plan, SendEngine, STEPS, STEP_COPY_IMAGE, STEP_PASTE, STEP_SUBMIT
+
+# Test plans per content type
+print("Testing send plans:")
+print("=" * 50)
+cases = [
+    ("text", dict(text="Hello"), ["check_number", "open_chat", "submit", "log"]),
+    ("image", dict(images=["a.jpg"]),
+     ["check_number", "open_chat", "copy_image", "activate_composer", "paste", "submit", "log"]),
+    ("image + caption", dict(text="Hi", images=["a.jpg"]),
+     ["check_number", "open_chat", "copy_image", "paste", "submit", "log"]),
+    ("album", dict(text="Hi", images=["a.jpg", "b.jpg", "c.jpg"]),
+     ["check_number", "open_chat", "copy_image", "paste", "copy_image", "paste", "copy_image", "paste",
+      "submit", "log"]),
+]
+for name, content, expected in cases:
+    steps = [step.name for step in build_plan("+966505815487", **content)]
+    status = "✅" if steps == expected else "❌"
+    print(f"{status} {name}: {steps}")
+
+plan = build_plan("+966505815487", text="مرحبا", images=["a.jpg"], navigation="in_app")
+open_step = plan[1]
+status = "✅" if open_step.kwargs == {"text": "مرحبا", "navigation": "in_app"} else "❌"
+print(f"{status} Caption goes into the composer with the chat: {open_step.kwargs}")
+status = "✅" if all(step.settle == "paste_settle" for step in plan if step.name == STEP_PASTE) else "❌"
+print(f"{status} Every paste settles with the same profile wait")
+
+
+# Test running plans
+print("\nTesting the engine:")
+print("=" * 50)
+calls = []
+failures = {"copy_image": 1}
+
+
+class Abort(Exception):
+    pass
+
+
+def action(name):
+    def run(*args, **kwargs):
+        calls.append((name, args))
+        if failures.get(name):
+            failures[name] -= 1
+            raise OSError("clipboard busy")
+    return run
+
+
+engine = SendEngine({name: action(name) for name in STEPS}, timings={"paste_settle": 0.01},
+                    retry_delay=0, no_retry=(Abort,))
+seen_steps, retries = [], []
+engine.step_hooks.append(lambda step, seconds: seen_steps.append(step.name))
+engine.retry_hooks.append(lambda step, attempt, error: retries.append((step.name, attempt)))
+
+spent = engine.send("+966505815487", text="Hi", images=["a.jpg", "b.jpg"])
+status = "✅" if [c[0] for c in calls].count("copy_image") == 3 and retries == [("copy_image", 1)] else "❌"
+print(f"{status} Clipboard failure retried once: {retries}")
+status = "✅" if spent[STEP_PASTE] >= 0.02 and set(spent) == set(seen_steps) else "❌"
+print(f"{status} Waits and timings shared by all steps: paste {spent[STEP_PASTE]:.3f}s for 2 images")
+
+calls.clear()
+failures = {"submit": 1}
+try:
+    engine.send("+966505815487", text="Hi")
+    print("❌ Submit failure not raised")
+except OSError:
+    status = "✅" if [c[0] for c in calls].count("submit") == 1 and calls[-1][0] == "submit" else "❌"
+    print(f"{status} Submit is never repeated (could send twice): {[c[0] for c in calls]}")
+
+aborts = []
+
+
+def abort(*args):
+    aborts.append(args)
+    raise Abort()
+
+
+engine.actions[STEP_COPY_IMAGE] = abort
+try:
+    engine.send("+966505815487", images=["a.jpg"])
+    print("❌ Abort not raised")
+except Abort:
+    status = "✅" if len(aborts) == 1 else "❌"
+    print(f"{status} User abort is not retried ({len(aborts)} attempt)")
+
+try:
+    SendEngine({STEP_SUBMIT: print}, timings={})
+    print("❌ Missing actions accepted")
+except ValueError as e:
+    print(f"✅ Missing actions rejected: {e}")
+
+print("\n✅ All tests completed!")
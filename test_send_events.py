@@ -0,0 +1,61 @@
+"""
+Test script for live campaign events and throughput statistics
+"""
+from send_events import EventBuffer, ThroughputStats, BUCKET_SECONDS
+
+buffer = EventBuffer(capacity=100)
+stats = ThroughputStats()
+# 50 seconds into a minute, so the events below share one minute bucket
+now = 1_700_000_000 // BUCKET_SECONDS * BUCKET_SECONDS + 50.0
+
+# Test incremental reads
+print("Testing event buffer:")
+print("=" * 50)
+for i in range(10):
+    buffer.publish("success", number=f"+96650000{i:04d}", account="host-a", seconds=10.0, time=now - 30)
+buffer.publish("phase", phase="submit", seconds=1.2, time=now - 30)
+status = "✅" if stats.update(buffer) == 11 and stats.cursor == 11 else "❌"
+print(f"{status} First update reads all events (cursor: {stats.cursor})")
+status = "✅" if stats.update(buffer) == 0 and buffer.since(11) == [] else "❌"
+print(f"{status} Refresh without new events reads nothing")
+
+buffer.publish("failed", number="+966500009999", account="host-b", seconds=3.0, time=now - 10)
+buffer.publish("exhausted", number="+966500008888", account="host-b", seconds=50.0, time=now - 5)
+status = "✅" if stats.update(buffer) == 2 and stats.totals["success"] == 10 else "❌"
+print(f"{status} Only new events folded in: totals {stats.totals}")
+
+# Test statistics
+print("\nTesting statistics:")
+print("=" * 50)
+status = "✅" if stats.per_minute(1, now) == 10 and stats.per_minute(5, now) == 2 else "❌"
+print(f"{status} Messages per minute: {stats.per_minute(1, now)} (1 min), {stats.per_minute(5, now)} (5 min)")
+status = "✅" if abs(stats.failure_rate(10, now) - 2 / 12) < 1e-9 else "❌"
+print(f"{status} Failure rate: {stats.failure_rate(10, now):.2f}")
+
+latency = stats.latency_summary()
+status = "✅" if latency == [{"phase": "submit", "count": 1, "mean": 1.2, "p50": 2, "p90": 2}] else "❌"
+print(f"{status} Latency summary: {latency}")
+
+accounts = {row["account"]: row for row in stats.account_summary()}
+status = "✅" if accounts["host-a"]["seconds_per_recipient"] == 10 and \
+    accounts["host-b"]["seconds_per_recipient"] == 26.5 else "❌"
+print(f"{status} Slow account stands out: host-b {accounts['host-b']['seconds_per_recipient']}s "
+      f"vs host-a {accounts['host-a']['seconds_per_recipient']}s per recipient")
+
+buffer.publish("success", number="+966500007777", account="host-a", seconds=9.0, time=now + BUCKET_SECONDS)
+stats.update(buffer)
+timeline = stats.timeline()
+status = "✅" if [row["sent"] for row in timeline] == [10, 1] and timeline[0]["failed"] == 2 else "❌"
+print(f"{status} Per-minute timeline: {[(row['sent'], row['failed']) for row in timeline]}")
+
+# Test a reader that fell behind a full buffer
+print("\nTesting buffer overflow:")
+print("=" * 50)
+late = ThroughputStats()
+for i in range(150):
+    buffer.publish("success", number=str(i), time=now)
+late.update(buffer)
+status = "✅" if late.missed == buffer.last_seq - 100 and late.totals["success"] == 100 else "❌"
+print(f"{status} Dropped events counted as missed: {late.missed}")
+
+print("\n✅ All tests completed!")
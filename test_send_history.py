@@ -0,0 +1,69 @@
+"""
+Test script for send_history module
+"""
+from send_history import SendHistory, parse_entry
+import os
+import tempfile
+
+ENTRY = "Date: {d}/12/2025\nTime: 9:{m}\nPhone Number: {phone}\nMessage: hello\n--------------------\n"
+
+tmp_dir = tempfile.mkdtemp()
+log_path = os.path.join(tmp_dir, "PyWhatKit_DB.txt")
+with open(log_path, "w", encoding="utf-8") as f:
+    f.write(ENTRY.format(d=5, m=7, phone="+966505815487"))
+    f.write(ENTRY.format(d=5, m=8, phone="+966541556250"))
+    f.write(ENTRY.format(d=6, m=9, phone="+966505815487"))
+
+# Test entry parsing
+print("Testing entry parsing:")
+print("=" * 50)
+parsed = parse_entry(ENTRY.format(d=5, m=7, phone="+966505815487").split("\n----")[0].encode("utf-8"))
+expected = ("+966505815487", "2025-12-05", "09:07", "text")
+status = "✅" if parsed == expected else "❌"
+print(f"{status} Parsed: {parsed} (expected: {expected})")
+
+# Test incremental indexing
+print("\nTesting incremental indexing:")
+print("=" * 50)
+history = SendHistory(log_path)
+added = history.update()
+status = "✅" if added == 3 else "❌"
+print(f"{status} First update indexed {added} entries (expected: 3)")
+
+with open(log_path, "a", encoding="utf-8") as f:
+    f.write(ENTRY.format(d=7, m=1, phone="+966541556250"))
+    f.write("Date: 8/12/2025\nTime: 1")  # entry still being written
+added = history.update()
+status = "✅" if added == 1 else "❌"
+print(f"{status} Second update indexed {added} new entries (expected: 1)")
+
+# Test queries
+print("\nTesting queries:")
+print("=" * 50)
+per_day = history.sends_per_day()
+expected_days = {"2025-12-05": 2, "2025-12-06": 1, "2025-12-07": 1}
+status = "✅" if per_day == expected_days else "❌"
+print(f"{status} Sends per day: {per_day}")
+
+last = history.last_sent("0505815487")
+status = "✅" if last and last.strftime("%Y-%m-%d %H:%M") == "2025-12-06 09:09" else "❌"
+print(f"{status} Last sent to 0505815487: {last} (expected: 2025-12-06 09:09)")
+
+history.close()
+
+# Test a log written on Windows (text mode, CRLF line endings)
+print("\nTesting a Windows log:")
+print("=" * 50)
+crlf_path = os.path.join(tmp_dir, "PyWhatKit_DB_windows.txt")
+with open(crlf_path, "wb") as f:
+    f.write(ENTRY.format(d=5, m=7, phone="+966505815487").replace("\n", "\r\n").encode("utf-8"))
+    f.write(ENTRY.format(d=6, m=9, phone="+966505815487").replace("\n", "\r\n").encode("utf-8"))
+history = SendHistory(crlf_path)
+added = history.update()
+status = "✅" if added == 2 and history.send_count("+966505815487") == 2 else "❌"
+print(f"{status} CRLF entries indexed: {added} (expected: 2)")
+last = history.last_sent("+966505815487")
+status = "✅" if last and last.strftime("%Y-%m-%d %H:%M") == "2025-12-06 09:09" else "❌"
+print(f"{status} Last sent from a CRLF log: {last}")
+history.close()
+print("\n✅ All tests completed!")
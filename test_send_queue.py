@@ -0,0 +1,114 @@
+"""
+Test script for send_queue module (queue and leases, no sending)
+"""
+from send_queue import SendQueue, HttpQueue, QueueServer, LeaseGuard, PENDING, SENDING, DONE, FAILED, \
+    INTERRUPTED_ERROR
+from idempotency import IdempotencyIndex
+from message_template import compile_template
+import os
+import tempfile
+import time
+
+tmp = tempfile.mkdtemp()
+queue = SendQueue(os.path.join(tmp, "queue.sqlite"))
+numbers = ['+966505815487', '+966541556250', '+966551234567', '+966551111111']
+
+# Test enqueue
+print("Testing enqueue:")
+print("=" * 50)
+template = compile_template("مرحبا {name}", columns=['phone', 'name'])
+campaign = queue.create_campaign(numbers, "مرحبا {name}", fields=[{'name': n} for n in 'ABCD'], template=template)
+again = queue.create_campaign(numbers[:2], "مرحبا {name}", fields=[{'name': 'A'}, {'name': 'B'}], template=template)
+status = "✅" if queue.progress(campaign)[PENDING] == 4 and queue.progress(again)[PENDING] == 0 else "❌"
+print(f"{status} Queued {queue.progress(campaign)[PENDING]}, re-queued duplicates: {queue.progress(again)[PENDING]}")
+
+# Test leases
+print("\nTesting leases:")
+print("=" * 50)
+batch_a = queue.lease("worker-a", batch_size=2, lease_seconds=0.2)
+batch_b = queue.lease("worker-b", batch_size=10)
+phones_a = [job['phone'] for job in batch_a]
+phones_b = [job['phone'] for job in batch_b]
+status = "✅" if phones_a == numbers[:2] and phones_b == numbers[2:] else "❌"
+print(f"{status} Disjoint batches: {phones_a} / {phones_b}")
+status = "✅" if batch_a[0]['fields'] == {'name': 'A'} else "❌"
+print(f"{status} Fields travel with the job: {batch_a[0]['fields']}")
+
+# worker-a starts its first recipient, then dies
+queue.start(batch_a[0]['id'], "worker-a")
+for job in batch_b:
+    queue.ack(job['id'], "worker-b", success=True)
+time.sleep(0.3)
+
+reissued = queue.lease("worker-c", batch_size=10)
+status = "✅" if [job['phone'] for job in reissued] == [numbers[1]] and reissued[0]['attempts'] == 2 else "❌"
+print(f"{status} Unstarted recipient re-issued: {[job['phone'] for job in reissued]}")
+failures = queue.failures(campaign)
+status = "✅" if [f['phone'] for f in failures] == [numbers[0]] and failures[0]['error'] == INTERRUPTED_ERROR else "❌"
+print(f"{status} Mid-send recipient not re-issued: {[f['phone'] for f in failures]}")
+
+status = "✅" if not queue.ack(batch_a[1]['id'], "worker-a", success=True) else "❌"
+print(f"{status} Late ack from the dead worker is rejected")
+
+# Test lease guard
+print("\nTesting lease guard:")
+print("=" * 50)
+guard = LeaseGuard(queue, "worker-a", batch_a[1:], IdempotencyIndex(os.path.join(tmp, "sent.txt")))
+status = "✅" if not guard.claim(batch_a[1]['key']) and guard.lost == [numbers[1]] else "❌"
+print(f"{status} Lost lease skips the recipient: {guard.lost}")
+local = IdempotencyIndex(os.path.join(tmp, "sent.txt"))
+local.add(reissued[0]['key'])
+guard = LeaseGuard(queue, "worker-c", reissued, local)
+# With force_resend the sender claims a recipient it already has in its local index
+status = "✅" if reissued[0]['key'] in guard and guard.claim(reissued[0]['key']) and not guard.lost else "❌"
+print(f"{status} Owned lease is claimed, also for a forced resend")
+status = "✅" if queue.progress(campaign)[SENDING] == 1 else "❌"
+print(f"{status} Claimed recipient marked as being sent")
+queue.ack(reissued[0]['id'], "worker-c", success=True)
+
+progress = queue.progress(campaign)
+status = "✅" if progress[DONE] == 3 and progress[FAILED] == 1 else "❌"
+print(f"{status} Final progress: {progress}")
+
+# Test the queue over HTTP (as a worker on another host reaches it)
+print("\nTesting the HTTP queue:")
+print("=" * 50)
+image = os.path.join(tmp, "photo.jpg")
+with open(image, "wb") as f:
+    f.write(b"not really a jpeg")
+server = QueueServer(queue, host="127.0.0.1", port=0, token="secret")
+server.start()
+remote = HttpQueue(server.url, token="secret")
+remote_campaign = remote.create_campaign(['+966500000001', '+966500000002'], "Hi {name}", image_path=image,
+                                         fields=[{'name': 'E'}, {'name': 'F'}], template=template)
+status = "✅" if remote.progress(remote_campaign)[PENDING] == 2 else "❌"
+print(f"{status} Campaign created remotely: {remote.progress(remote_campaign)}")
+status = "✅" if remote.campaign(remote_campaign)['image'] == b"not really a jpeg" else "❌"
+print(f"{status} Image travels with the campaign")
+
+jobs = remote.lease("host-b", batch_size=5)
+started = remote.start(jobs[0]['id'], "host-b")
+acked = remote.ack(jobs[0]['id'], "host-b", success=True)
+released = remote.release(jobs[1]['id'], "host-b")
+status = "✅" if [j['fields'] for j in jobs] == [{'name': 'E'}, {'name': 'F'}] and started and acked and released \
+    else "❌"
+print(f"{status} Lease, start, ack and release over HTTP")
+status = "✅" if queue.progress(remote_campaign) == {**queue.progress(remote_campaign), DONE: 1, PENDING: 1} else "❌"
+print(f"{status} Results stored on the coordinator: {queue.progress(remote_campaign)}")
+
+try:
+    HttpQueue(server.url, token="wrong").progress()
+    status = "❌"
+except Exception as e:
+    status = "✅" if "401" in str(e) else "❌"
+print(f"{status} Wrong token rejected")
+try:
+    remote.campaign(999)
+    status = "❌"
+except ValueError:
+    status = "✅"
+print(f"{status} Errors reach the worker as ValueError")
+server.stop()
+
+queue.close()
+print("\n✅ All tests completed!")
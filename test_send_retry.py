@@ -0,0 +1,266 @@
+"""
+Test script for the retry policy of the send loop
+
+The GUI steps are replaced by stand-ins (no browser, display or clipboard
+is touched): pyautogui, pyperclip and pywhatkit are stubbed before the
+sender is imported, and each test decides what the send attempt raises.
+"""
+import io
+import os
+import sys
+import tempfile
+import time
+import types
+from contextlib import redirect_stdout
+
+# ===== GUI stand-ins =====
+for name in ["pyautogui", "pyperclip", "pywhatkit", "pywhatkit.core", "pywhatkit.core.core", "pywhatkit.core.log"]:
+    sys.modules[name] = types.ModuleType(name)
+sys.modules["pyautogui"].FailSafeException = type("FailSafeException", (Exception,), {})
+# GUI actions in order, for the navigation tests
+actions = []
+sys.modules["pyautogui"].press = lambda *args, **kwargs: actions.append(("press",) + args)
+sys.modules["pyautogui"].hotkey = lambda *args, **kwargs: actions.append(("hotkey",) + args)
+sys.modules["pyautogui"].click = lambda *args, **kwargs: None
+sys.modules["pyperclip"].copy = lambda text: actions.append(("copy", text))
+sys.modules["pywhatkit.core.core"].WIDTH, sys.modules["pywhatkit.core.core"].HEIGHT = 1920, 1080
+sys.modules["pywhatkit.core"].core = sys.modules["pywhatkit.core.core"]
+sys.modules["pywhatkit.core"].log = sys.modules["pywhatkit.core.log"]
+sys.modules["pywhatkit"].core = sys.modules["pywhatkit.core"]
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(tempfile.mkdtemp())
+
+import send_massage_from_ui as sender
+from send_massage_from_ui import (classify_failure, InvalidNumberError, PERMANENT, TRANSIENT)
+from send_watchdog import WatchdogTimeout, WorkerCrashedError
+from delivery_confirmation import DeliveryNotConfirmedError
+from idempotency import IdempotencyIndex, delivery_key
+from message_template import compile_template
+import pyautogui as pg
+
+# No real waits between attempts or recipients
+sender.time = types.SimpleNamespace(sleep=lambda seconds: None, perf_counter=time.perf_counter,
+                                    monotonic=time.monotonic, localtime=time.localtime, time=time.time)
+sender.delivery_confirmation_available = lambda: True
+
+
+class FakeSession:
+    def ensure_ready(self, startup_wait=0):
+        return True
+
+
+# Backoff delays asked for by each re-queue, texts handed to each attempt
+delays = []
+sent_texts = []
+
+
+class RecordingCampaign(sender.Campaign):
+    def requeue(self, item, ready_at):
+        delays.append(ready_at - time.monotonic())
+        super().requeue(item, ready_at)
+
+
+sender.Campaign = RecordingCampaign
+
+
+def run_campaign(errors, max_attempts=3, retry_base_delay=0.0, close_tabs=False, callback_error=None,
+                 index=None, force_resend=False, message="Hello", **options):
+    """
+    Send "Hello" to one number; the n-th attempt raises errors[n] (None = sent).
+
+    Returns:
+        (results, statuses, attempts, sent_index)
+    """
+    attempts, statuses = [], []
+    sent_texts.clear()
+    index = IdempotencyIndex(None) if index is None else index
+    delays.clear()
+
+    def attempt_send(run, num, text, attempt, label):
+        attempts.append(attempt)
+        sent_texts.append(text)
+        error = errors[min(len(attempts), len(errors)) - 1]
+        if error is not None:
+            raise error
+
+    def callback(num, status):
+        statuses.append(status)
+        if callback_error is not None and status == "success":
+            raise callback_error
+
+    sender.attempt_send = attempt_send
+    # The sender's own log (including its ❌ lines) is not part of the test output
+    with redirect_stdout(io.StringIO()):
+        results = sender.send_messages_from_ui(["+966505815487"], message=message, status_callback=callback,
+                                               session=FakeSession(), isolate=False, sent_index=index,
+                                               max_attempts=max_attempts, retry_base_delay=retry_base_delay,
+                                               close_tabs=close_tabs, pause_seconds=0,
+                                               force_resend=force_resend, **options)
+    return results, [s for s in statuses if s != "sending"], attempts, index
+
+
+KEY = delivery_key("+966505815487", "Hello")
+
+# Test failure classes
+print("Testing failure classes:")
+print("=" * 50)
+cases = [
+    ("invalid number", InvalidNumberError("no country code"), PERMANENT),
+    ("bad value", ValueError("bad"), PERMANENT),
+    ("user abort", pg.FailSafeException(), PERMANENT),
+    ("no sent tick", DeliveryNotConfirmedError(), PERMANENT),
+    ("hang before Enter", WatchdogTimeout("copy_image", 15), TRANSIENT),
+    ("hang after Enter", WatchdogTimeout("submit", 45), PERMANENT),
+    ("hang closing the tab", WatchdogTimeout("close_tab", 20), PERMANENT),
+    ("hang in a later step after Enter", WatchdogTimeout("tidy_up", 20, maybe_sent=True), PERMANENT),
+    ("worker crash before Enter", WorkerCrashedError("exited during 'open_chat'", phase="open_chat"), TRANSIENT),
+    ("worker crash after Enter", WorkerCrashedError("exited during 'log'", phase="log", maybe_sent=True),
+     PERMANENT),
+    ("clipboard race", OSError("clipboard busy"), TRANSIENT),
+]
+for name, error, expected in cases:
+    kind = classify_failure(error)
+    status = "✅" if kind == expected else "❌"
+    print(f"{status} {name}: {kind}")
+
+# Test re-queue and exhaustion
+print("\nTesting retries:")
+print("=" * 50)
+results, statuses, attempts, index = run_campaign([OSError("page not loaded"), OSError("page not loaded"), None],
+                                                  retry_base_delay=0.01)
+status = "✅" if results == {"+966505815487": True} and statuses == ["retrying", "retrying", "success"] else "❌"
+print(f"{status} Transient failures re-queued until sent: {statuses}")
+status = "✅" if attempts == [1, 2, 3] and KEY in index else "❌"
+print(f"{status} Attempts counted, delivery recorded: {attempts}")
+status = "✅" if len(delays) == 2 and 0.005 < delays[0] <= 0.01 and 0.015 < delays[1] <= 0.02 else "❌"
+print(f"{status} Backoff doubles per attempt: {[round(d, 3) for d in delays]}")
+
+results, statuses, attempts, index = run_campaign([OSError("clipboard busy")], max_attempts=2)
+status = "✅" if results == {"+966505815487": False} and statuses == ["retrying", "exhausted"] and attempts == [1, 2] \
+    else "❌"
+print(f"{status} Retries stop at max_attempts: {statuses}")
+status = "✅" if KEY not in index else "❌"
+print(f"{status} Unsent delivery not recorded")
+
+results, statuses, attempts, _ = run_campaign([InvalidNumberError("no country code")])
+status = "✅" if statuses == ["failed"] and attempts == [1] else "❌"
+print(f"{status} Permanent failure not retried: {statuses}")
+
+# Test failures after Enter
+print("\nTesting failures after the message was sent:")
+print("=" * 50)
+
+
+def broken_close_tab(wait_time=2):
+    raise OSError("tab did not close")
+
+
+close_tab = sender.close_tab_with_modal_handling
+sender.close_tab_with_modal_handling = broken_close_tab
+results, statuses, attempts, index = run_campaign([None], close_tabs=True)
+sender.close_tab_with_modal_handling = close_tab
+status = "✅" if attempts == [1] and statuses == ["success"] and KEY in index else "❌"
+print(f"{status} Failed tab close does not resend: {attempts} attempt, {statuses}")
+
+results, statuses, attempts, index = run_campaign([None], callback_error=RuntimeError("UI gone"))
+status = "✅" if attempts == [1] and results == {"+966505815487": True} and KEY in index else "❌"
+print(f"{status} Failed status update does not resend: {attempts} attempt")
+
+# Test sends that may have gone out
+print("\nTesting unconfirmed sends:")
+print("=" * 50)
+results, statuses, attempts, index = run_campaign([DeliveryNotConfirmedError("no tick")])
+status = "✅" if statuses == ["failed"] and KEY in index and index.maybe_sent(KEY) else "❌"
+print(f"{status} No sent tick: failed and recorded as maybe sent")
+
+results, statuses, attempts, index = run_campaign([None], index=index)
+status = "✅" if attempts == [] and statuses == ["skipped"] else "❌"
+print(f"{status} Re-run skips the maybe-sent delivery: {statuses}")
+
+results, statuses, attempts, index = run_campaign([None], index=index, force_resend=True)
+status = "✅" if attempts == [1] and statuses == ["success"] and not index.maybe_sent(KEY) else "❌"
+print(f"{status} force_resend sends it again and confirms it: {statuses}")
+
+results, statuses, attempts, index = run_campaign([WatchdogTimeout("submit", 45)])
+status = "✅" if statuses == ["failed"] and index.maybe_sent(KEY) else "❌"
+print(f"{status} Hang after Enter recorded as maybe sent")
+
+results, statuses, attempts, index = run_campaign([WatchdogTimeout("copy_image", 15), None])
+status = "✅" if attempts == [1, 2] and KEY in index and not index.maybe_sent(KEY) else "❌"
+print(f"{status} Hang before Enter retried, not recorded as maybe sent: {attempts}")
+
+# Test claims (a queue worker's lease guard)
+print("\nTesting claims:")
+print("=" * 50)
+
+
+class ClaimingIndex(IdempotencyIndex):
+    def __init__(self, allow):
+        super().__init__(None)
+        self.allow = allow
+        self.claimed = []
+
+    def claim(self, key):
+        self.claimed.append(key)
+        return self.allow
+
+
+index = ClaimingIndex(allow=True)
+index.add(KEY)
+results, statuses, attempts, _ = run_campaign([None], index=index, force_resend=True)
+status = "✅" if index.claimed == [KEY] and attempts == [1] else "❌"
+print(f"{status} Forced resend still claims the delivery: {len(index.claimed)} claim")
+
+index = ClaimingIndex(allow=False)
+results, statuses, attempts, _ = run_campaign([None], index=index)
+status = "✅" if attempts == [] and statuses == ["skipped"] else "❌"
+print(f"{status} Refused claim is not sent: {statuses}")
+
+# Test templates
+print("\nTesting templates:")
+print("=" * 50)
+source = "Total {price:usd} {SAVE10}"
+template = compile_template(source, columns=["phone", "price:usd"])
+run_campaign([None], message=source, fields=[{"price:usd": 5}], template=template)
+status = "✅" if sent_texts == ["Total 5 {SAVE10}"] else "❌"
+print(f"{status} Caller's column-bound template rendered: {sent_texts}")
+try:
+    run_campaign([None], message=source, fields=[{"price:usd": 5}])
+    status = "❌"
+except ValueError:
+    status = "✅"
+print(f"{status} Fields without their compiled template rejected")
+
+# Test in-app navigation
+print("\nTesting in-app navigation:")
+print("=" * 50)
+
+
+class FakeHeader:
+    def __init__(self, opens):
+        self.opens = opens
+
+    def arm(self):
+        pass
+
+    def wait(self, timeout=3, poll_interval=0.15):
+        return self.opens
+
+
+for opens, expected in [(True, sender.NAVIGATION_IN_APP), (False, sender.NAVIGATION_URL)]:
+    sender.chat_header = FakeHeader(opens)
+    actions.clear()
+    with redirect_stdout(io.StringIO()):
+        used = sender.open_chat("+966505815487", text="Hello", navigation=sender.NAVIGATION_IN_APP)
+    copies = [a[1] for a in actions if a[0] == "copy"]
+    if opens:
+        ok = copies == ["966505815487", "Hello"]
+    else:
+        # The text only goes out with the send URL, never into the search box
+        ok = "Hello" not in copies and copies[-1].endswith("send?phone=+966505815487&text=Hello") \
+            and ("press", "esc") in actions
+    status = "✅" if used == expected and ok else "❌"
+    print(f"{status} Header {'changed' if opens else 'unchanged'}: opened via {used}")
+
+print("\n✅ All tests completed!")
@@ -0,0 +1,109 @@
+"""
+Test script for send_scheduler module
+"""
+from send_scheduler import SendScheduler, Campaign, PRIORITY_LOW, PRIORITY_URGENT, prefetch
+import time
+
+
+def drain(scheduler, limit=1000):
+    """Take every item in order, completing each one"""
+    order = []
+    while len(order) < limit:
+        picked = scheduler.next()
+        if picked is None or picked[0] is None:
+            break
+        campaign, item = picked
+        order.append(item)
+        scheduler.complete(campaign)
+    return order
+
+
+# Test interleaving
+print("Testing priority interleaving:")
+print("=" * 50)
+scheduler = SendScheduler()
+blast = scheduler.submit(Campaign((f"blast{i}" for i in range(100)), priority=PRIORITY_LOW, total=100))
+first = drain(scheduler, limit=10)
+urgent = scheduler.submit(Campaign(["urgent0", "urgent1", "urgent2"], priority=PRIORITY_URGENT, total=3))
+rest = drain(scheduler)
+position = rest.index("urgent0")
+status = "✅" if position == 0 else "❌"
+print(f"{status} Urgent notice sent at slot {position} after submission (expected: 0)")
+last_urgent = max(rest.index(f"urgent{i}") for i in range(3))
+status = "✅" if last_urgent < 6 else "❌"
+print(f"{status} All urgent recipients within {last_urgent + 1} slots")
+status = "✅" if len(first + rest) == 103 and urgent.finished.is_set() and blast.finished.is_set() else "❌"
+print(f"{status} Every recipient handed out once: {len(first + rest)} (expected: 103)")
+
+# Test fairness
+print("\nTesting fairness:")
+print("=" * 50)
+scheduler = SendScheduler()
+scheduler.submit(Campaign((f"low{i}" for i in range(100)), priority=PRIORITY_LOW))
+scheduler.submit(Campaign((f"high{i}" for i in range(100)), priority=PRIORITY_URGENT))
+window = drain(scheduler, limit=100)
+low = sum(1 for item in window if item.startswith("low"))
+status = "✅" if 1 <= low <= 5 else "❌"
+print(f"{status} Low priority still progresses: {low} of 100 slots (weights 1:64)")
+
+# Test deadlines
+print("\nTesting deadlines:")
+print("=" * 50)
+scheduler = SendScheduler(per_recipient=10)
+scheduler.submit(Campaign((f"vip{i}" for i in range(50)), priority=PRIORITY_URGENT, total=50))
+scheduler.submit(Campaign(["due0", "due1"], priority=PRIORITY_LOW, total=2, deadline=time.time() + 15))
+order = drain(scheduler, limit=3)
+status = "✅" if order[0] == "due0" and "due1" in order else "❌"
+print(f"{status} Campaign at risk of missing its deadline goes first: {order}")
+
+# Test retries
+print("\nTesting retries:")
+print("=" * 50)
+scheduler = SendScheduler()
+campaign = scheduler.submit(Campaign(["a", "b"]))
+picked_campaign, item = scheduler.next()
+picked_campaign.requeue(item, time.monotonic() + 0.2)
+scheduler.complete(picked_campaign)
+order = drain(scheduler)
+waiting = scheduler.next()
+status = "✅" if order == ["b"] and waiting[0] is None and waiting[1] > 0 else "❌"
+print(f"{status} Retry waits for its backoff: {order}, wait {waiting[1]:.2f}s")
+time.sleep(0.25)
+order = drain(scheduler)
+status = "✅" if order == ["a"] and campaign.finished.is_set() and scheduler.next() is None else "❌"
+print(f"{status} Retry sent once due: {order}")
+
+# Test streamed recipients
+print("\nTesting streams:")
+print("=" * 50)
+read = []
+
+
+def numbers():
+    for i in range(100):
+        read.append(i)
+        yield i
+
+
+stream = prefetch(numbers(), buffer_size=5)
+first = next(stream)
+time.sleep(0.2)
+status = "✅" if first == 0 and len(read) <= 7 else "❌"
+print(f"{status} Read ahead is bounded: {len(read)} read for 1 consumed")
+status = "✅" if [first] + list(stream) == list(range(100)) else "❌"
+print(f"{status} Stream delivered in order")
+
+
+def broken():
+    yield "a"
+    yield "b"
+    raise ValueError("bad row")
+
+
+scheduler = SendScheduler()
+campaign = scheduler.submit(Campaign(prefetch(broken()), total=None))
+order = drain(scheduler)
+status = "✅" if order == ["a", "b"] and isinstance(campaign.error, ValueError) and campaign.finished.is_set() else "❌"
+print(f"{status} Read error ends the campaign with what was read: {order}, {campaign.error!r}")
+
+print("\n✅ All tests completed!")
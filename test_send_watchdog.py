@@ -0,0 +1,125 @@
+"""
+Test script for the automation watchdog
+"""
+from send_watchdog import AutomationWorker, WatchdogTimeout, WorkerCrashedError
+from campaign_forecast import recorded_phases
+import os
+import sys
+import tempfile
+import time
+
+# Stand-in for the send helpers, imported by the worker process
+HELPERS = '''
+import os
+import time
+from send_watchdog import phase
+from campaign_forecast import record_phase
+
+navigation_timings = {"in_app": []}
+
+
+def send(receiver):
+    phase("open_chat")
+    navigation_timings["in_app"].append(0.5)
+    record_phase("navigate_in_app", 0.5)
+    phase("submit")
+    return f"sent to {receiver} by {os.getpid()}"
+
+
+def hang(step):
+    phase(step)
+    time.sleep(3600)
+
+
+def fail():
+    phase("open_chat")
+    raise ValueError("invalid number")
+
+
+def hang_after_submit():
+    phase("submit")
+    # A later step with no phase of its own in SENT_PHASES
+    phase("tidy_up", timeout=1)
+    time.sleep(3600)
+
+
+def crash(step):
+    phase(step)
+    os._exit(1)
+'''
+
+# The worker is a spawned process: it imports this script again, so the
+# tests only run in the parent
+if __name__ == "__main__":
+    helpers_dir = tempfile.mkdtemp()
+    with open(os.path.join(helpers_dir, "watchdog_helpers.py"), "w", encoding="utf-8") as f:
+        f.write(HELPERS)
+    sys.path.insert(0, helpers_dir)
+    import watchdog_helpers
+
+    worker = AutomationWorker("watchdog_helpers", timeouts={"copy_image": 1, "submit": 1})
+
+    # Test normal calls
+    print("Testing calls:")
+    print("=" * 50)
+    result = worker.call("send", "+966505815487")
+    first_pid = worker.process.pid
+    status = "✅" if result == f"sent to +966505815487 by {first_pid}" else "❌"
+    print(f"{status} Result returned from the worker: {result}")
+
+    status = "✅" if recorded_phases().get("navigate_in_app") == [0.5] and \
+        watchdog_helpers.navigation_timings["in_app"] == [0.5] else "❌"
+    print(f"{status} Timings recorded in the worker are merged into the parent")
+
+    try:
+        worker.call("fail")
+        print("❌ Exception not raised")
+    except ValueError as e:
+        status = "✅" if str(e) == "invalid number" and worker.process.pid == first_pid else "❌"
+        print(f"{status} Exception re-raised, worker kept: {e}")
+
+    # Test the watchdog
+    print("\nTesting hung steps:")
+    print("=" * 50)
+    started = time.monotonic()
+    try:
+        worker.call("hang", "copy_image")
+        print("❌ Hung step not detected")
+    except WatchdogTimeout as e:
+        elapsed = time.monotonic() - started
+        status = "✅" if e.phase == "copy_image" and not e.maybe_sent and elapsed < 5 else "❌"
+        print(f"{status} {e} (detected after {elapsed:.1f}s, retry allowed: {not e.maybe_sent})")
+    status = "✅" if worker.process is None and worker.restarts == 1 else "❌"
+    print(f"{status} Hung worker killed")
+
+    result = worker.call("send", "+966541556250")
+    status = "✅" if worker.process.pid != first_pid and result.startswith("sent to +966541556250") else "❌"
+    print(f"{status} Fresh worker takes the next recipient")
+
+    try:
+        worker.call("hang", "submit")
+        print("❌ Hung step not detected")
+    except WatchdogTimeout as e:
+        status = "✅" if e.maybe_sent else "❌"
+        print(f"{status} Step hung after Enter is not retried: {e}")
+
+    try:
+        worker.call("hang_after_submit")
+        print("❌ Hung step not detected")
+    except WatchdogTimeout as e:
+        status = "✅" if e.phase == "tidy_up" and e.maybe_sent else "❌"
+        print(f"{status} Any step after Enter counts as maybe sent: {e}")
+
+    # Test crashed workers
+    print("\nTesting crashed workers:")
+    print("=" * 50)
+    for step, expected in [("open_chat", False), ("submit", True), ("log", True)]:
+        try:
+            worker.call("crash", step)
+            print("❌ Crash not detected")
+        except WorkerCrashedError as e:
+            status = "✅" if e.phase == step and e.maybe_sent == expected else "❌"
+            print(f"{status} Crash during '{step}': maybe sent {e.maybe_sent}")
+
+    worker.close()
+    print("\n✅ All tests completed!")
@@ -0,0 +1,139 @@
+"""
+Test script for the sampled-stack profiler
+"""
+from stack_profiler import (StackProfiler, section, label_thread, start_profiling, stop_profiling,
+                            active_profiler, CATEGORY_SLEEP, CATEGORY_WAIT, CATEGORY_RUN)
+from send_watchdog import AutomationWorker
+import os
+import queue
+import sys
+import tempfile
+import threading
+import time
+
+# Stand-in for the send helpers, imported by the worker process
+HELPERS = '''
+import time
+
+
+def settle():
+    time.sleep(0.3)
+'''
+
+
+def encode(n):
+    total = 0
+    for i in range(n):
+        total += i * i
+    return total
+
+
+def settle_wait():
+    time.sleep(0.3)
+
+
+def wait_for_worker():
+    q = queue.Queue()
+    threading.Timer(0.3, q.put, args=(1,)).start()
+    q.get()
+
+
+# The worker is a spawned process: it imports this script again, so the
+# tests only run in the parent
+if __name__ == "__main__":
+    tmp = tempfile.mkdtemp()
+
+    # Test sampling and classification
+    print("Testing sampling:")
+    print("=" * 50)
+    profiler = StackProfiler(interval=0.005)
+    profiler.start()
+    status = "✅" if time.sleep.__name__ == "_tracked_sleep" else "❌"
+    print(f"{status} Sleeps tracked while profiling")
+    with section("extraction"):
+        started = time.perf_counter()
+        while time.perf_counter() - started < 0.3:
+            encode(10000)
+    with section("sending"):
+        settle_wait()
+        wait_for_worker()
+    idle = threading.Thread(target=time.sleep, args=(0.3,))
+    idle.start()
+    idle.join()
+    profiler.stop()
+    status = "✅" if time.sleep.__name__ == "sleep" else "❌"
+    print(f"{status} time.sleep restored when stopped")
+
+    breakdown = profiler.breakdown()
+    status = "✅" if set(breakdown) == {"extraction", "sending"} else "❌"
+    print(f"{status} Only sectioned threads sampled: {list(breakdown)}")
+    extraction, sending = breakdown["extraction"], breakdown["sending"]
+    status = "✅" if extraction[CATEGORY_RUN] > 0.2 and extraction[CATEGORY_SLEEP] == 0 else "❌"
+    print(f"{status} Python work counted as run: {extraction[CATEGORY_RUN]:.2f}s")
+    status = "✅" if 0.2 < sending[CATEGORY_SLEEP] < 0.45 and 0.2 < sending[CATEGORY_WAIT] < 0.45 else "❌"
+    print(f"{status} Sleeps and waits told apart: sleep {sending[CATEGORY_SLEEP]:.2f}s, "
+          f"wait {sending[CATEGORY_WAIT]:.2f}s")
+
+    hotspots = profiler.hotspots(top=3)
+    names = [f["function"].split(" ")[0] for f in hotspots]
+    status = "✅" if "encode" in names and "settle_wait" in names else "❌"
+    print(f"{status} Hotspots by self time: {names}")
+    settle = next(f for f in hotspots if f["function"].startswith("settle_wait"))
+    status = "✅" if settle["sleep"] == settle["self"] else "❌"
+    print(f"{status} Sleep share shown per function: {settle['sleep']:.2f}s of {settle['self']:.2f}s")
+
+    # Test output files
+    print("\nTesting output:")
+    print("=" * 50)
+    folded_path, summary_path = profiler.save(os.path.join(tmp, "profiles", "campaign.folded"))
+    with open(folded_path, encoding="utf-8") as f:
+        lines = f.read().splitlines()
+    valid = all(line.rsplit(" ", 1)[1].isdigit() and ";" in line for line in lines)
+    status = "✅" if lines and valid else "❌"
+    print(f"{status} Collapsed stacks written: {len(lines)} lines")
+    status = "✅" if any(line.startswith("sending;") and ";settle_wait " in line and "[sleep] " in line
+                        for line in lines) else "❌"
+    print(f"{status} Sleeps show as a [sleep] leaf under their caller")
+    micros = sum(int(line.rsplit(" ", 1)[1]) for line in lines)
+    total = sum(t["wall"] for t in breakdown.values())
+    status = "✅" if abs(micros / 1e6 - total) < 0.01 else "❌"
+    print(f"{status} Counts are microseconds: {micros / 1e6:.2f}s")
+    with open(summary_path, encoding="utf-8") as f:
+        summary = f.read()
+    status = "✅" if "extraction" in summary and "encode" in summary else "❌"
+    print(f"{status} Summary written next to it: {os.path.basename(summary_path)}")
+
+    taken = profiler.take()
+    other = StackProfiler()
+    other.merge(taken)
+    other.merge(taken)
+    status = "✅" if not profiler.stacks and abs(other.breakdown()["sending"]["wall"] - 2 * sending["wall"]) < 1e-9 \
+        else "❌"
+    print(f"{status} Samples taken from one profiler merge into another")
+
+    # Test the process-wide profiler and the automation worker
+    print("\nTesting a profiled campaign:")
+    print("=" * 50)
+    with open(os.path.join(tmp, "profiler_helpers.py"), "w", encoding="utf-8") as f:
+        f.write(HELPERS)
+    sys.path.insert(0, tmp)
+    worker = AutomationWorker("profiler_helpers")
+    worker.call("settle")
+    profiler = start_profiling(0.005)
+    status = "✅" if active_profiler() is profiler and start_profiling() is profiler else "❌"
+    print(f"{status} One process-wide profiler")
+    label_thread("ui_rerun")
+    with section("sending"):
+        worker.call("settle")
+    stop_profiling()
+    worker.close()
+    breakdown = profiler.breakdown()
+    automation = breakdown.get("automation", {})
+    status = "✅" if automation.get(CATEGORY_SLEEP, 0) > 0.2 else "❌"
+    print(f"{status} Worker stacks merged under 'automation': sleep {automation.get(CATEGORY_SLEEP, 0):.2f}s")
+    status = "✅" if breakdown.get("sending", {}).get(CATEGORY_WAIT, 0) > 0.2 else "❌"
+    print(f"{status} Parent shows the wait on the worker: {breakdown.get('sending', {}).get(CATEGORY_WAIT, 0):.2f}s")
+    status = "✅" if active_profiler() is None else "❌"
+    print(f"{status} Profiling stopped")
+
+    print("\n✅ All tests completed!")
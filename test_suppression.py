@@ -0,0 +1,47 @@
+"""
+Test script for the opt-out (suppression) list
+"""
+from suppression import load_suppression
+from phone_extractor import extract_records_from_uploaded_file
+import io
+import os
+import tempfile
+
+
+class Upload(io.BytesIO):
+    """Minimal stand-in for a Streamlit UploadedFile"""
+    def __init__(self, name: str, data: bytes):
+        super().__init__(data)
+        self.name = name
+
+
+path = os.path.join(tempfile.mkdtemp(), "suppression.txt")
+suppression = load_suppression(path)
+
+# Test adding and persisting numbers
+print("Testing suppression list:")
+print("=" * 50)
+added = suppression.add(['0505815487', '966541556250', 'invalid'], persist=True)
+status = "✅" if added == 2 and '+966505815487' in suppression else "❌"
+print(f"{status} Added {added} numbers (expected: 2)")
+
+reloaded = load_suppression(path)
+status = "✅" if len(reloaded) == 2 and '+966541556250' in reloaded else "❌"
+print(f"{status} Reloaded {len(reloaded)} numbers from file (expected: 2)")
+
+# Test extraction with suppression
+print("\nTesting extraction:")
+print("=" * 50)
+csv = b"phone,name\n0505815487,Ahmed\n0551234567,Sara\n+966541556250,Ali\n0551234567,Sara\n"
+records = extract_records_from_uploaded_file(Upload("list.csv", csv), suppression=reloaded)
+numbers = records['phone'].tolist()
+status = "✅" if numbers == ['+966551234567'] else "❌"
+print(f"{status} Numbers: {numbers} (expected: ['+966551234567'])")
+status = "✅" if records.attrs['suppressed'] == 2 else "❌"
+print(f"{status} Suppressed: {records.attrs['suppressed']} (expected: 2)")
+
+records = extract_records_from_uploaded_file(Upload("list.csv", csv), suppression={'+966551234567'})
+status = "✅" if records['phone'].tolist() == ['+966505815487', '+966541556250'] else "❌"
+print(f"{status} Plain set works: {records['phone'].tolist()}")
+
+print("\n✅ All tests completed!")
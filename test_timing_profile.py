@@ -0,0 +1,110 @@
+"""
+Test script for per-machine timing profiles
+
+Calibration is run with stand-ins for the GUI (pyautogui, pyperclip,
+pywhatkit and the browser are stubbed, and every measurement returns a
+fixed latency), so no screen or browser is needed.
+"""
+import json
+import os
+import socket
+import sys
+import tempfile
+import types
+
+# Calibrate against a mock page instead of WhatsApp Web
+MOCK_URL = "http://127.0.0.1:8765/"
+os.environ["WHATSAPP_WEB_URL"] = MOCK_URL
+
+# ===== GUI stand-ins =====
+copied, opened, images = [], [], []
+for name in ["pyautogui", "pyperclip", "pywhatkit", "pywhatkit.core", "pywhatkit.core.core", "pywhatkit.core.log"]:
+    sys.modules[name] = types.ModuleType(name)
+pg = sys.modules["pyautogui"]
+pg.FailSafeException = type("FailSafeException", (Exception,), {})
+pg.size = lambda: (1920, 1080)
+pg.click = pg.hotkey = pg.press = lambda *args, **kwargs: None
+sys.modules["pyperclip"].copy = copied.append
+
+
+def copy_image(path):
+    images.append(path)
+    copied.append("image")
+
+
+sys.modules["pywhatkit.core.core"].copy_image = copy_image
+sys.modules["pywhatkit.core"].core = sys.modules["pywhatkit.core.core"]
+sys.modules["pywhatkit.core"].log = sys.modules["pywhatkit.core.log"]
+sys.modules["pywhatkit"].core = sys.modules["pywhatkit.core"]
+
+sys.path.insert(0, os.path.dirname(os.path.abspath(__file__)))
+os.chdir(tempfile.mkdtemp())
+
+import webbrowser
+import timing_profile
+from timing_profile import (load_profile, save_profile, calibrate, DEFAULT_TIMINGS, MIN_TIMINGS, SAFETY_FACTOR,
+                            SAFETY_PAD)
+
+webbrowser.open = opened.append
+# An image preview settles slower than anything else
+timing_profile.wait_until_stable = lambda timeout=30, **kwargs: 4.0 if copied[-1:] == ["image"] else 2.0
+
+path = os.path.join(tempfile.mkdtemp(), "timing_profile.json")
+
+# Test saving with safety margins
+print("Testing saved profiles:")
+print("=" * 50)
+saved = save_profile({"page_load": [3.0, 4.0, 3.5], "submit_wait": [0.2], "chat_open": [], "unknown": [9.0]}, path)
+expected = round(4.0 * SAFETY_FACTOR + SAFETY_PAD, 2)
+status = "✅" if saved["page_load"] == expected else "❌"
+print(f"{status} Slowest measurement with margin: page_load {saved['page_load']}s (expected: {expected}s)")
+status = "✅" if saved["submit_wait"] == MIN_TIMINGS["submit_wait"] else "❌"
+print(f"{status} Never below the minimum: submit_wait {saved['submit_wait']}s")
+status = "✅" if set(saved) == {"page_load", "submit_wait"} else "❌"
+print(f"{status} Unmeasured and unknown waits left out: {sorted(saved)}")
+
+# Test loading
+print("\nTesting loaded profiles:")
+print("=" * 50)
+profile = load_profile(path)
+status = "✅" if profile["page_load"] == expected and profile["chat_open"] == DEFAULT_TIMINGS["chat_open"] else "❌"
+print(f"{status} This host's profile loaded, defaults for the rest")
+
+with open(path, "r", encoding="utf-8") as f:
+    data = json.load(f)
+data["host"] = socket.gethostname() + "-other"
+with open(path, "w", encoding="utf-8") as f:
+    json.dump(data, f)
+status = "✅" if load_profile(path) == DEFAULT_TIMINGS else "❌"
+print(f"{status} Profile of another host ignored")
+
+with open(path, "w", encoding="utf-8") as f:
+    f.write("{not json")
+status = "✅" if load_profile(path) == DEFAULT_TIMINGS else "❌"
+print(f"{status} Unreadable profile ignored")
+status = "✅" if load_profile(os.path.join(tempfile.mkdtemp(), "missing.json")) == DEFAULT_TIMINGS else "❌"
+print(f"{status} Missing profile gives the defaults")
+
+# Test calibration
+print("\nTesting calibration:")
+print("=" * 50)
+measured = calibrate(numbers=["+966500000000"], rounds=2)
+urls = [text for text in copied if "send?phone=" in text]
+status = "✅" if urls and all(url.startswith(MOCK_URL) for url in urls) else "❌"
+print(f"{status} Chats opened on WHATSAPP_URL: {urls[0] if urls else None}")
+status = "✅" if opened == [MOCK_URL] and measured.get("startup") == [2.0] else "❌"
+print(f"{status} Startup measured on a fresh tab: {measured.get('startup')}")
+status = "✅" if set(measured) == set(DEFAULT_TIMINGS) else "❌"
+print(f"{status} Every wait of the profile measured: {len(measured)}/{len(DEFAULT_TIMINGS)}")
+status = "✅" if measured.get("paste_settle") == [4.0, 4.0] else "❌"
+print(f"{status} Paste wait measured on an image paste: {measured.get('paste_settle')}")
+status = "✅" if len(images) == 2 and not os.path.exists(images[0]) else "❌"
+print(f"{status} Generated calibration image pasted and removed: {len(images)} pastes")
+
+images.clear()
+supplied = timing_profile.calibration_image(os.path.join(tempfile.mkdtemp(), "photo.jpg"))
+calibrate(numbers=["+966500000000"], rounds=1, image=supplied)
+status = "✅" if images == [supplied] and os.path.exists(supplied) else "❌"
+print(f"{status} Supplied image pasted and kept: {images}")
+
+print("\n✅ All tests completed!")
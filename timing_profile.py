@@ -0,0 +1,280 @@
+"""
+Module for per-machine timing profiles of the send helpers' waits
+
+The waits in send_massage_from_ui.py (page load, chat settle, paste, send)
+were tuned on one laptop. A calibration run measures how long each phase
+really takes on this machine and writes timing_profile.json with a safety
+margin; the send path loads that profile instead of hard-coded constants.
+
+    python timing_profile.py +966500000000 +966500000001   # test numbers
+    python timing_profile.py --page http://localhost:8000/ # local stand-in page
+    python timing_profile.py --image photo.jpg +966500000000  # your typical image
+
+Chats are opened on WHATSAPP_URL (set WHATSAPP_WEB_URL to calibrate
+against the mock page of mock_whatsapp.py or another host).
+
+Calibration drives the real browser with pyautogui: keep WhatsApp Web (or
+the stand-in page) open and in front, and don't touch mouse/keyboard.
+"""
+import json
+import os
+import socket
+import tempfile
+import time
+from typing import Dict, List, Optional
+
+DEFAULT_PROFILE_PATH = "timing_profile.json"
+
+# Seconds for each wait, as tuned originally
+DEFAULT_TIMINGS = {
+    "startup": 5.0,           # after kit.open_web()
+    "focus": 1.0,             # before clicking the browser to focus it
+    "keystroke": 0.5,         # between address bar shortcuts
+    "page_load": 10.0,        # after loading a send URL
+    "chat_settle": 3.0,       # after clicking into the loaded chat
+    "panel_open": 1.0,        # in-app: new chat panel
+    "search_results": 2.0,    # in-app: number search results
+    "chat_open": 1.5,         # in-app: opening the chat
+    "paste_settle": 1.0,      # after pasting an image (preview)
+    "submit_wait": 5.0,       # after Enter when the tick can't be confirmed
+}
+
+# Size of the generated calibration image (a typical phone photo)
+CALIBRATION_IMAGE_SIZE = (1600, 1200)
+
+# Calibrated waits are the slowest measurement times this, plus a fixed pad
+SAFETY_FACTOR = 1.5
+SAFETY_PAD = 0.3
+
+# Never go below these, however fast the measurements
+MIN_TIMINGS = {
+    "startup": 1.0,
+    "focus": 0.2,
+    "keystroke": 0.1,
+    "page_load": 2.0,
+    "chat_settle": 0.5,
+    "panel_open": 0.3,
+    "search_results": 0.5,
+    "chat_open": 0.5,
+    "paste_settle": 0.3,
+    "submit_wait": 1.0,
+}
+
+
+def load_profile(path: str = DEFAULT_PROFILE_PATH) -> Dict[str, float]:
+    """
+    Load this machine's timing profile.
+
+    A profile written on another host (e.g. a synced folder) is ignored.
+
+    Returns:
+        Seconds per wait; DEFAULT_TIMINGS for anything not calibrated
+    """
+    timings = dict(DEFAULT_TIMINGS)
+    if not os.path.exists(path):
+        return timings
+    try:
+        with open(path, "r", encoding="utf-8") as f:
+            data = json.load(f)
+    except (OSError, ValueError):
+        return timings
+    if data.get("host") != socket.gethostname():
+        return timings
+    for name, value in data.get("timings", {}).items():
+        if name in timings:
+            timings[name] = float(value)
+    return timings
+
+
+def save_profile(measurements: Dict[str, List[float]], path: str = DEFAULT_PROFILE_PATH) -> Dict[str, float]:
+    """
+    Turn measured latencies into a profile and write it.
+
+    Args:
+        measurements: Measured seconds per wait name
+        path: Where to write the profile
+
+    Returns:
+        The saved timings
+    """
+    timings = {}
+    for name, values in measurements.items():
+        if name in DEFAULT_TIMINGS and values:
+            timings[name] = round(max(max(values) * SAFETY_FACTOR + SAFETY_PAD, MIN_TIMINGS[name]), 2)
+
+    with open(path, "w", encoding="utf-8") as f:
+        json.dump({
+            "host": socket.gethostname(),
+            "calibrated_at": time.strftime("%Y-%m-%d %H:%M:%S"),
+            "measurements": measurements,
+            "timings": timings,
+        }, f, indent=2)
+    return timings
+
+
+def _grab(factor: int = 4):
+    """Downscaled grayscale screenshot for change detection"""
+    import numpy as np
+    import pyautogui as pg
+    return np.asarray(pg.screenshot().convert("L").reduce(factor), dtype=np.float32)
+
+
+def wait_until_stable(timeout: float = 30, poll_interval: float = 0.1, stable_for: float = 0.4,
+                      threshold: float = 0.3) -> float:
+    """
+    Measure how long the screen keeps changing after an action.
+
+    Args:
+        timeout: Give up after this many seconds
+        poll_interval: Seconds between screenshots
+        stable_for: How long the screen must stay unchanged
+        threshold: Mean gray-level change below which frames count as equal
+
+    Returns:
+        Seconds from the call until the last change (timeout if never stable)
+    """
+    import numpy as np
+    start = time.perf_counter()
+    previous = _grab()
+    last_change = start
+    while time.perf_counter() - start < timeout:
+        time.sleep(poll_interval)
+        frame = _grab()
+        now = time.perf_counter()
+        if np.abs(frame - previous).mean() > threshold:
+            last_change = now
+        elif now - last_change >= stable_for:
+            return last_change - start
+        previous = frame
+    return timeout
+
+
+def calibration_image(path: Optional[str] = None) -> str:
+    """
+    Write a photo-sized noise image for measuring the image paste.
+
+    Args:
+        path: Where to write it (a temporary file by default)
+
+    Returns:
+        The image path
+    """
+    from PIL import Image
+
+    if path is None:
+        fd, path = tempfile.mkstemp(suffix=".jpg", prefix="calibration_")
+        os.close(fd)
+    Image.effect_noise(CALIBRATION_IMAGE_SIZE, 64).convert("RGB").save(path, "JPEG", quality=90)
+    return path
+
+
+def calibrate(numbers: Optional[List[str]] = None, page: Optional[str] = None, rounds: int = 3,
+              message: str = "calibration", image: Optional[str] = None) -> Dict[str, List[float]]:
+    """
+    Measure each phase's real latency on this machine.
+
+    Startup is measured once, by opening WhatsApp Web (WHATSAPP_URL) in a
+    new browser tab as a cold start does; calibration goes on in that tab.
+    With test numbers, each round opens the chat via URL and in-app search
+    and sends message as the caption of image, so every phase is measured.
+    The send path waits paste_settle after pasting an image, whose preview
+    takes much longer than a text paste, so that is what is measured. With
+    a local stand-in page, only loading and focus phases are measured.
+
+    Args:
+        numbers: Test phone numbers that may receive the calibration message
+        page: URL of a local stand-in page to load instead
+        rounds: Measurements per phase
+        message: Caption sent to the test numbers
+        image: Image sent to the test numbers (a generated photo-sized one by default)
+
+    Returns:
+        Measured seconds per wait name
+    """
+    import webbrowser
+    import pyautogui as pg
+    import pyperclip
+    from send_massage_from_ui import copy_image, mod_key, press_new_chat_hotkey
+    from browser_session import WHATSAPP_URL
+
+    width, height = pg.size()
+    measurements: Dict[str, List[float]] = {name: [] for name in DEFAULT_TIMINGS}
+
+    def load(url: str) -> None:
+        pyperclip.copy(url)
+        pg.click(width / 2, 50)
+        measurements["focus"].append(wait_until_stable(timeout=5))
+        pg.hotkey(mod_key(), "l")
+        measurements["keystroke"].append(wait_until_stable(timeout=5))
+        pg.hotkey(mod_key(), "a")
+        pg.hotkey(mod_key(), "v")
+        pg.press("enter")
+        measurements["page_load"].append(wait_until_stable(timeout=60))
+        pg.click(width / 2, height / 2)
+        measurements["chat_settle"].append(wait_until_stable(timeout=15))
+
+    webbrowser.open(WHATSAPP_URL)
+    measurements["startup"].append(wait_until_stable(timeout=90))
+
+    targets = numbers or []
+    generated = bool(targets) and image is None
+    if generated:
+        image = calibration_image()
+    for i in range(rounds):
+        print(f"⏱️ Calibration round {i + 1}/{rounds}")
+        if page:
+            load(page)
+        for num in targets:
+            load(f"{WHATSAPP_URL}send?phone={num}")
+
+            # In-app navigation to the same chat
+            press_new_chat_hotkey()
+            measurements["panel_open"].append(wait_until_stable(timeout=10))
+            pyperclip.copy(num.lstrip("+"))
+            pg.hotkey(mod_key(), "a")
+            pg.hotkey(mod_key(), "v")
+            measurements["search_results"].append(wait_until_stable(timeout=15))
+            pg.press("enter")
+            measurements["chat_open"].append(wait_until_stable(timeout=15))
+
+            # Send the calibration image, with the text as its caption
+            pyperclip.copy(f"{message} {i + 1}")
+            pg.hotkey(mod_key(), "v")
+            copy_image(image)
+            pg.hotkey(mod_key(), "v")
+            measurements["paste_settle"].append(wait_until_stable(timeout=10))
+            pg.press("enter")
+            measurements["submit_wait"].append(wait_until_stable(timeout=20))
+
+    if generated:
+        os.remove(image)
+    return {name: values for name, values in measurements.items() if values}
+
+
+# ===== For standalone execution =====
+if __name__ == "__main__":
+    import sys
+
+    args = sys.argv[1:]
+    page = image = None
+    if "--page" in args:
+        idx = args.index("--page")
+        page = args[idx + 1]
+        del args[idx:idx + 2]
+    if "--image" in args:
+        idx = args.index("--image")
+        image = args[idx + 1]
+        del args[idx:idx + 2]
+    if not args and not page:
+        print("Usage: python timing_profile.py [--page URL] [--image PATH] [test numbers...]")
+        sys.exit(1)
+
+    print("🧪 Calibrating - keep the browser in front and don't touch mouse or keyboard")
+    time.sleep(3)
+    measured = calibrate(numbers=args, page=page, image=image)
+    saved = save_profile(measured)
+    for name, default in DEFAULT_TIMINGS.items():
+        value = saved.get(name, default)
+        note = "" if name in saved else " (not measured, default)"
+        print(f"   {name:15} {default:5.1f}s -> {value:5.2f}s{note}")
+    print(f"✅ Saved {DEFAULT_PROFILE_PATH}")
@@ -2,24 +2,70 @@ import streamlit as st
 import pandas as pd
 import os
 import json
-from pathlib import Path
+from typing import Dict, List, Optional
 import time
-from send_massage_from_ui import send_messages_from_ui
-from phone_extractor import extract_from_uploaded_file, normalize_phone_number
+from phone_extractor import extract_records_from_files, normalize_phone_number, rejects_frame, REJECT_REASONS
+from message_template import compile_template, find_missing_fields, find_format_errors, iter_fields
+from contact_store import ContactStore
+from suppression import load_suppression, read_suppression_file, SuppressionList
+from send_scheduler import PRIORITY_LOW, PRIORITY_NORMAL, PRIORITY_HIGH, PRIORITY_URGENT
+from media_store import get_store as get_media_store
+from campaign_forecast import forecast_campaign, content_type, format_duration, EtaEstimator
+from results_sink import default_results_path, results_bytes, FORMAT_CSV, FORMAT_PARQUET
+from stack_profiler import start_profiling, stop_profiling, label_thread, default_profile_path
+
+# Extraction-only mode: load and clean number lists without the automation stack
+EXTRACT_ONLY = os.environ.get("WHATSAPP_EXTRACT_ONLY", "") == "1"
+
+
+def load_sender():
+    """
+    Import the sending module on first use.
+    
+    send_massage_from_ui pulls in pywhatkit (which checks the internet
+    connection on import), pyautogui (which needs a display) and pyperclip.
+    None of that is needed to load and clean a number list, so it is only
+    imported when a campaign actually starts. Python caches the module, so
+    later campaigns pay nothing.
+    
+    Returns:
+        (send_messages_from_ui, None) on success, (None, error message) otherwise
+    """
+    start = time.perf_counter()
+    try:
+        from send_massage_from_ui import send_messages_from_ui
+    except Exception as e:
+        return None, f"{type(e).__name__}: {e}"
+    print(f"⏱️ Automation stack ready in {time.perf_counter() - start:.2f}s")
+    return send_messages_from_ui, None
+
+
+@st.cache_resource
+def get_contact_store() -> ContactStore:
+    """Local contact directory shared by all sessions"""
+    return ContactStore()
+
+
+@st.cache_resource
+def get_suppression() -> SuppressionList:
+    """Opt-out list (suppression.txt plus opted-out contacts), loaded once"""
+    return load_suppression(store=get_contact_store())
+
 
 # Language translations
 TRANSLATIONS = {
     'ar': {
         'title': '📱 رسالة واتساب جماعية',
         'upload_files': '📤 رفع الملفات',
-        'upload_csv_excel': 'رفع ملف CSV/Excel/Numbers يحتوي على أرقام الهواتف',
+        'upload_csv_excel': 'رفع ملفات CSV/Excel/Numbers تحتوي على أرقام الهواتف',
         'upload_help': 'يجب أن يحتوي الملف على عمود بأرقام الهواتف',
         'or_enter_manually': 'أو أدخل الأرقام يدوياً',
         'enter_numbers': 'أدخل أرقام الهواتف (رقم واحد في كل سطر)',
         'add_numbers': 'إضافة الأرقام',
         'message_content': '📝 محتوى الرسالة',
         'type_message': 'اكتب رسالتك',
-        'upload_image': 'رفع صورة (اختياري)',
+        'upload_image': 'رفع صورة أو عدة صور كألبوم (اختياري)',
+        'album': 'ألبوم من {count} صور يُرسل في رسالة واحدة مع النص كتعليق',
         'phone_numbers_list': '📋 قائمة الارقام ',
         'total_numbers': 'إجمالي الأرقام',
         'send_messages': '🚀 إرسال الرسائل',
@@ -42,19 +88,79 @@ TRANSLATIONS = {
         'pending': '⏸️',
         'sending': '⏳',
         'success': '✅',
-        'failed': '❌'
+        'failed': '❌',
+        'template_fields': 'يمكنك استخدام أعمدة الملف في الرسالة، مثل: {fields}',
+        'missing_fields': '❌ بعض المستلمين ليس لديهم قيم لحقول القالب: {fields}',
+        'invalid_template': '❌ قالب الرسالة غير صالح: {error}',
+        'format_errors': '❌ بعض القيم لا تناسب تنسيق الحقل: {fields}',
+        'skipped': '⏭️',
+        'force_resend': 'إعادة الإرسال لمن استلم نفس الرسالة',
+        'force_resend_help': 'بشكل افتراضي يتم تخطي الأرقام التي استلمت نفس الرسالة ونفس الصورة من قبل',
+        'skipped_duplicates': '⏭️ تم تخطي {count} رقم استلم نفس الرسالة من قبل',
+        'retrying': '🔁',
+        'exhausted': '⛔',
+        'failed_breakdown': 'فشل دائم (رقم غير صالح أو لم يتم تأكيد الإرسال): {permanent}، فشل بعد استنفاد المحاولات: {exhausted}',
+        'download_numbers': '📥 تحميل الأرقام بعد التنظيف',
+        'extract_only': 'وضع استخراج الأرقام فقط: الإرسال غير متاح على هذا الجهاز',
+        'automation_unavailable': '❌ أدوات الإرسال غير متاحة على هذا الجهاز: {error}',
+        'navigation': 'طريقة فتح المحادثة',
+        'nav_in_app': 'داخل واتساب وب (أسرع)',
+        'nav_url': 'إعادة تحميل الصفحة لكل رقم',
+        'pause_seconds': 'الانتظار بين الأرقام (ثواني)',
+        'priority': 'الأولوية (عند إرسال عدة حملات معاً)',
+        'priority_names': {-1: 'منخفضة', 0: 'عادية', 1: 'عالية', 2: 'عاجلة'},
+        'deadline_minutes': 'يجب أن تنتهي خلال (دقائق، 0 = بدون موعد)',
+        'results_format': 'صيغة ملف النتائج',
+        'download_results': '⬇️ تحميل ملف النتائج',
+        'results_saved': '🗂️ تُحفظ النتائج أثناء الإرسال في {path} (يمكن تحميلها من لوحة المتابعة)',
+        'profiling': 'تحليل الأداء (عينات من مكدس الاستدعاءات)',
+        'profiling_help': 'يسجّل أين يذهب الوقت (الاستخراج، الإرسال، الانتظار) ويكتب ملف flamegraph وملخصاً لأبطأ الدوال عند انتهاء الحملة',
+        'profile_saved': '🔥 تحليل الأداء: {path}',
+        'download_profile': '⬇️ تحميل ملف flamegraph',
+        'forecast': '⏱️ المدة المتوقعة: {duration} (حوالي {per_hour} رسالة في الساعة)',
+        'eta': '{done}/{total} - الوقت المتبقي: {eta}',
+        'contacts': '📇 جهات الاتصال',
+        'contact_tags': 'وسوم (مفصولة بفاصلة)',
+        'save_contacts': 'حفظ الأرقام في جهات الاتصال',
+        'contacts_saved': '✅ تم حفظ {count} رقم في جهات الاتصال',
+        'segment_tags': 'اختيار حسب الوسوم',
+        'segment_days': 'لم يتم مراسلتهم منذ (أيام، 0 = الكل)',
+        'load_segment': 'تحميل المجموعة',
+        'segment_loaded': '✅ تم تحميل {count} رقم من جهات الاتصال',
+        'segment_empty': 'لا توجد أرقام مطابقة',
+        'opt_out': '🚫 قائمة إلغاء الاشتراك',
+        'upload_opt_out': 'رفع أرقام ألغت الاشتراك (TXT/CSV/Excel)',
+        'opt_out_count': '{count} رقم لن يتم مراسلتهم',
+        'opt_out_added': '✅ تمت إضافة {count} رقم إلى قائمة إلغاء الاشتراك',
+        'suppressed': '🚫 تم استبعاد {count} رقم ألغى الاشتراك',
+        'file_loaded': '📄 {name}: {count} رقم ({seconds:.1f} ث)',
+        'validation_report': '🧾 تقرير التحقق: {rejected} صف مرفوض من {total}',
+        'reason': 'السبب',
+        'rows': 'الصفوف',
+        'download_rejects': '⬇️ تحميل الصفوف المرفوضة (CSV)',
+        'reasons': {
+            'empty': 'فارغ',
+            'non_digit': 'يحتوي على أحرف',
+            'too_short': 'قصير جداً',
+            'too_long': 'طويل جداً',
+            'wrong_prefix': 'مقدمة خاطئة',
+            'duplicate': 'مكرر',
+            'suppressed': 'ضمن قائمة الإلغاء',
+        },
+        'merged_duplicates': 'تم حذف {count} رقم مكرر بين الملفات'
     },
     'en': {
         'title': '📱 WhatsApp Message Sender',
         'upload_files': '📤 Upload Files',
-        'upload_csv_excel': 'Upload CSV/Excel/Numbers file with phone numbers',
+        'upload_csv_excel': 'Upload CSV/Excel/Numbers files with phone numbers',
         'upload_help': 'File should contain phone numbers in a column',
         'or_enter_manually': 'Or Enter Numbers Manually',
         'enter_numbers': 'Enter phone numbers (one per line)',
         'add_numbers': 'Add Manual Numbers',
         'message_content': '📝 Message Content',
         'type_message': 'Type your message',
-        'upload_image': 'Upload Image (Optional)',
+        'upload_image': 'Upload Image or several as an album (Optional)',
+        'album': 'Album of {count} images, sent as one message with the text as caption',
         'phone_numbers_list': '📋 Phone Numbers List',
         'total_numbers': 'Total numbers',
         'send_messages': '🚀 Send Messages',
@@ -77,7 +183,66 @@ TRANSLATIONS = {
         'pending': '⏸️',
         'sending': '⏳',
         'success': '✅',
-        'failed': '❌'
+        'failed': '❌',
+        'template_fields': 'You can use file columns in the message, e.g.: {fields}',
+        'missing_fields': '❌ Some recipients have no value for template fields: {fields}',
+        'invalid_template': '❌ Invalid message template: {error}',
+        'format_errors': '❌ Some values do not fit the field format: {fields}',
+        'skipped': '⏭️',
+        'force_resend': 'Resend to numbers that already got this message',
+        'force_resend_help': 'By default, numbers that already received the same message and image are skipped',
+        'skipped_duplicates': '⏭️ Skipped {count} numbers that already got this message',
+        'retrying': '🔁',
+        'exhausted': '⛔',
+        'failed_breakdown': 'Permanent failures (invalid number or send not confirmed): {permanent}, failed after all retries: {exhausted}',
+        'download_numbers': '📥 Download cleaned numbers',
+        'extract_only': 'Extraction-only mode: sending is disabled on this machine',
+        'automation_unavailable': '❌ Sending tools are not available on this machine: {error}',
+        'navigation': 'How to open each chat',
+        'nav_in_app': 'Inside WhatsApp Web (faster)',
+        'nav_url': 'Reload the page for each number',
+        'pause_seconds': 'Pause between numbers (seconds)',
+        'priority': 'Priority (when several campaigns send at once)',
+        'priority_names': {-1: 'Low', 0: 'Normal', 1: 'High', 2: 'Urgent'},
+        'deadline_minutes': 'Finish within (minutes, 0 = no deadline)',
+        'results_format': 'Results file format',
+        'download_results': '⬇️ Download results file',
+        'results_saved': '🗂️ Results are saved while sending to {path} (download them from the dashboard)',
+        'profiling': 'Profile (sampled call stacks)',
+        'profiling_help': 'Records where time goes (extraction, sending, waits) and writes a flamegraph file and a hotspot summary when the campaign ends',
+        'profile_saved': '🔥 Profile: {path}',
+        'download_profile': '⬇️ Download flamegraph stacks',
+        'forecast': '⏱️ Estimated duration: {duration} (~{per_hour} messages/hour)',
+        'eta': '{done}/{total} - time remaining: {eta}',
+        'contacts': '📇 Contacts',
+        'contact_tags': 'Tags (comma separated)',
+        'save_contacts': 'Save numbers to contacts',
+        'contacts_saved': '✅ Saved {count} numbers to contacts',
+        'segment_tags': 'Select by tags',
+        'segment_days': 'Not messaged in the last (days, 0 = any)',
+        'load_segment': 'Load segment',
+        'segment_loaded': '✅ Loaded {count} numbers from contacts',
+        'segment_empty': 'No matching numbers',
+        'opt_out': '🚫 Opt-out list',
+        'upload_opt_out': 'Upload opted-out numbers (TXT/CSV/Excel)',
+        'opt_out_count': '{count} numbers will never be messaged',
+        'opt_out_added': '✅ Added {count} numbers to the opt-out list',
+        'suppressed': '🚫 Removed {count} opted-out numbers',
+        'file_loaded': '📄 {name}: {count} numbers ({seconds:.1f}s)',
+        'validation_report': '🧾 Validation report: {rejected} of {total} rows rejected',
+        'reason': 'Reason',
+        'rows': 'Rows',
+        'download_rejects': '⬇️ Download rejected rows (CSV)',
+        'reasons': {
+            'empty': 'Empty',
+            'non_digit': 'Not a number',
+            'too_short': 'Too short',
+            'too_long': 'Too long',
+            'wrong_prefix': 'Wrong prefix',
+            'duplicate': 'Duplicate',
+            'suppressed': 'Opted out',
+        },
+        'merged_duplicates': 'Removed {count} numbers repeated across files'
     }
 }
 
@@ -91,10 +256,14 @@ st.set_page_config(
 # Initialize session state
 if 'numbers_list' not in st.session_state:
     st.session_state.numbers_list = []
+if 'records' not in st.session_state:
+    st.session_state.records = None
 if 'message_text' not in st.session_state:
     st.session_state.message_text = ""
-if 'image_file' not in st.session_state:
-    st.session_state.image_file = None
+if 'image_shas' not in st.session_state:
+    # Content hashes of the uploaded images (one, or an album) in the media store
+    st.session_state.image_shas = []
+    st.session_state.image_upload_id = None
 if 'sending_status' not in st.session_state:
     st.session_state.sending_status = {}
 if 'is_sending' not in st.session_state:
@@ -102,6 +271,16 @@ if 'is_sending' not in st.session_state:
 if 'language' not in st.session_state:
     st.session_state.language = 'ar'  # Arabic as default
 
+# Profiling mode (sidebar switch): sample this rerun, the extraction and the
+# campaign until the campaign ends (see stack_profiler.py)
+if st.session_state.get('profiling'):
+    start_profiling()
+    label_thread("ui_rerun")
+    st.session_state.profiler_owner = True
+elif st.session_state.get('profiler_owner'):
+    stop_profiling()
+    st.session_state.profiler_owner = False
+
 # Get current language translations
 lang = st.session_state.language
 t = TRANSLATIONS[lang]
@@ -118,6 +297,33 @@ with st.sidebar:
     if language_option != st.session_state.language:
         st.session_state.language = language_option
         st.rerun()
+    
+    force_resend = st.checkbox(t['force_resend'], value=False, help=t['force_resend_help'])
+    navigation = st.radio(
+        t['navigation'],
+        options=['url', 'in_app'],
+        format_func=lambda x: t['nav_in_app'] if x == 'in_app' else t['nav_url']
+    )
+    pause_seconds = st.number_input(t['pause_seconds'], min_value=0, max_value=120, value=8)
+    priority = st.select_slider(t['priority'], options=[PRIORITY_LOW, PRIORITY_NORMAL, PRIORITY_HIGH, PRIORITY_URGENT],
+                                value=PRIORITY_NORMAL, format_func=lambda p: t['priority_names'][p])
+    deadline_minutes = st.number_input(t['deadline_minutes'], min_value=0, value=0)
+    results_format = st.radio(t['results_format'], options=[FORMAT_CSV, FORMAT_PARQUET],
+                              format_func=str.upper, horizontal=True)
+    st.checkbox(t['profiling'], key='profiling', help=t['profiling_help'])
+    
+    # Opt-out list, applied to every number list below
+    st.subheader(t['opt_out'])
+    suppression = get_suppression()
+    opt_out_file = st.file_uploader(t['upload_opt_out'], type=['txt', 'csv', 'xlsx', 'xls', 'numbers'])
+    if opt_out_file is not None:
+        try:
+            added = suppression.add(read_suppression_file(opt_out_file), persist=True)
+            if added:
+                st.success(t['opt_out_added'].format(count=added))
+        except Exception as e:
+            st.error(f"❌ {t['failed']} {e}")
+    st.caption(t['opt_out_count'].format(count=len(suppression)))
 
 st.title(t['title'])
 st.markdown("---")
@@ -125,48 +331,113 @@ st.markdown("---")
 # Warning banner at the top
 st.warning(f"⚠️ **{t['warning_title']}**: {t['warning_text']}")
 st.warning(f"{t['tip3']}")
+if EXTRACT_ONLY:
+    st.info(t['extract_only'])
+
 
 
 
+def show_extraction_error(report: Dict, file_name: Optional[str] = None):
+    """Show a helpful message for a file that could not be extracted"""
+    prefix = f"❌ {t['failed']} " + (f"{file_name}: " if file_name else "")
+    if report.get('columns') is not None:
+        st.error(prefix + ("لم يتم العثور على عمود أرقام الهواتف. " if lang == 'ar' else "No phone number column found. ") + 
+                ("العمود يجب أن يحتوي على: phone, Phone, number, phone number, أو ext" if lang == 'ar' else "Column should contain: phone, Phone, number, phone number, or ext"))
+        st.info("📋 " + ("الأعمدة المتاحة: " if lang == 'ar' else "Available columns: ") + ', '.join(report['columns']))
+    elif report.get('validation') is not None:
+        st.error(prefix + ("لم يتم العثور على أرقام هاتف صحيحة. " if lang == 'ar' else "No valid phone numbers found. "))
+        st.info("💡 " + ("تأكد من أن الأرقام بصيغة: +966xxxxxxxxx أو 966xxxxxxxxx أو 05xxxxxxxx" if lang == 'ar' else "Ensure numbers are in format: +966xxxxxxxxx, 966xxxxxxxxx, or 05xxxxxxxx"))
+    else:
+        st.error(prefix + ("خطأ في قراءة الملف: " if lang == 'ar' else "Error reading file: ") + report['error'])
+
+
+def show_validation_report(file_reports: List[Dict]):
+    """Rejected rows per reason across the uploaded files, with a download of the rows"""
+    validated = [report['validation'] for report in file_reports if report.get('validation') is not None]
+    rejected = sum(sum(v['counts'].values()) for v in validated)
+    if not rejected:
+        return
+    total = sum(v['total'] for v in validated)
+    with st.expander(t['validation_report'].format(rejected=rejected, total=total)):
+        counts = pd.DataFrame({
+            t['reason']: [t['reasons'][reason] for reason in REJECT_REASONS],
+            t['rows']: [sum(v['counts'][reason] for v in validated) for reason in REJECT_REASONS],
+        })
+        st.dataframe(counts[counts[t['rows']] > 0], hide_index=True)
+        rejects = rejects_frame(file_reports)
+        preview = rejects.head(200).assign(reason=lambda df: df['reason'].map(t['reasons']))
+        st.dataframe(preview, hide_index=True)
+        st.download_button(t['download_rejects'], rejects.to_csv(index=False).encode('utf-8-sig'),
+                           file_name='rejected_rows.csv', mime='text/csv')
+
 
 # Sidebar for file upload and settings
 with st.sidebar:
     st.header(t['upload_files'])
     
-    # CSV/Excel/Numbers file upload
-    uploaded_file = st.file_uploader(
+    # CSV/Excel/Numbers file upload (several files are merged)
+    uploaded_files = st.file_uploader(
         t['upload_csv_excel'],
         type=['csv', 'xlsx', 'xls', 'numbers'],
+        accept_multiple_files=True,
         help=t['upload_help'] + (" (CSV, Excel, Apple Numbers)" if lang == 'en' else " (CSV, Excel, Apple Numbers)")
     )
     
-    if uploaded_file is not None:
-        try:
-            # Use phone_extractor module
-            numbers = extract_from_uploaded_file(uploaded_file)
-            
-            if numbers:
-                st.session_state.numbers_list = numbers
-                st.success(f"✅ {t['success']} تم تحميل {len(numbers)} رقم هاتف" if lang == 'ar' else f"✅ {t['success']} Loaded {len(numbers)} phone numbers")
-            else:
-                st.error(f"❌ {t['failed']} لم يتم العثور على أرقام هاتف صحيحة" if lang == 'ar' else f"❌ {t['failed']} No valid phone numbers found")
-                
-        except Exception as e:
-            error_msg = str(e)
-            # Provide more helpful error messages
-            if "No phone number column found" in error_msg:
-                st.error(f"❌ {t['failed']} " + ("لم يتم العثور على عمود أرقام الهواتف. " if lang == 'ar' else "No phone number column found. ") + 
-                        ("العمود يجب أن يحتوي على: phone, Phone, number, phone number, أو ext" if lang == 'ar' else "Column should contain: phone, Phone, number, phone number, or ext"))
-                if "Available columns" in error_msg:
-                    st.info("📋 " + ("الأعمدة المتاحة: " if lang == 'ar' else "Available columns: ") + error_msg.split("Available columns: ")[-1] if "Available columns: " in error_msg else "")
-            elif "No valid phone numbers found" in error_msg:
-                st.error(f"❌ {t['failed']} " + ("لم يتم العثور على أرقام هاتف صحيحة. " if lang == 'ar' else "No valid phone numbers found. "))
-                if "Sample values" in error_msg:
-                    sample_info = error_msg.split("Sample values: ")[-1] if "Sample values: " in error_msg else ""
-                    st.info("💡 " + ("أمثلة على القيم الموجودة: " if lang == 'ar' else "Sample values found: ") + sample_info)
-                    st.info("💡 " + ("تأكد من أن الأرقام بصيغة: +966xxxxxxxxx أو 966xxxxxxxxx أو 05xxxxxxxx" if lang == 'ar' else "Ensure numbers are in format: +966xxxxxxxxx, 966xxxxxxxxx, or 05xxxxxxxx"))
-            else:
-                st.error(f"❌ {t['failed']} " + ("خطأ في قراءة الملف: " if lang == 'ar' else "Error reading file: ") + error_msg)
+    if uploaded_files:
+        # Use phone_extractor module; files are parsed in parallel
+        records, file_reports = extract_records_from_files(uploaded_files, suppression=suppression)
+        numbers = records[records.attrs['phone_column']].tolist() if not records.empty else []
+        
+        if len(file_reports) > 1:
+            for report in file_reports:
+                if report['error'] is None:
+                    st.caption(t['file_loaded'].format(name=report['name'], count=report['count'],
+                                                       seconds=report['seconds']))
+        for report in file_reports:
+            if report['error'] is not None:
+                show_extraction_error(report, report['name'] if len(file_reports) > 1 else None)
+        show_validation_report(file_reports)
+        if records.attrs.get('suppressed'):
+            st.info(t['suppressed'].format(count=records.attrs['suppressed']))
+        if records.attrs.get('duplicates'):
+            st.info(t['merged_duplicates'].format(count=records.attrs['duplicates']))
+        
+        if numbers:
+            st.session_state.numbers_list = numbers
+            st.session_state.records = records
+            st.success(f"✅ {t['success']} تم تحميل {len(numbers)} رقم هاتف" if lang == 'ar' else f"✅ {t['success']} Loaded {len(numbers)} phone numbers")
+        elif all(report['error'] is None for report in file_reports):
+            st.error(f"❌ {t['failed']} لم يتم العثور على أرقام هاتف صحيحة" if lang == 'ar' else f"❌ {t['failed']} No valid phone numbers found")
+    
+    # Contact directory: save the current list, or build a list from a segment
+    st.markdown("---")
+    st.subheader(t['contacts'])
+    store = get_contact_store()
+    contact_tags = st.text_input(t['contact_tags'])
+    if st.button(t['save_contacts'], disabled=not st.session_state.numbers_list):
+        if st.session_state.records is not None:
+            save_records = st.session_state.records
+        else:
+            save_records = pd.DataFrame({'phone': st.session_state.numbers_list})
+            save_records.attrs['phone_column'] = 'phone'
+        count = store.import_records(save_records, tags=contact_tags.split(','))
+        st.success(t['contacts_saved'].format(count=count))
+    
+    available_tags = store.tags()
+    segment_tags = st.multiselect(t['segment_tags'], options=list(available_tags.keys()),
+                                  format_func=lambda tag: f"{tag} ({available_tags[tag]})")
+    segment_days = st.number_input(t['segment_days'], min_value=0, value=7)
+    if st.button(t['load_segment']):
+        segment = store.select_records(tags=segment_tags, not_sent_within_days=segment_days or None)
+        segment = segment[~segment['phone'].isin(suppression.numbers)].reset_index(drop=True)
+        segment.attrs['phone_column'] = 'phone'
+        if segment.empty:
+            st.warning(t['segment_empty'])
+        else:
+            st.session_state.numbers_list = segment['phone'].tolist()
+            st.session_state.records = segment
+            st.session_state.sending_status = {}
+            st.success(t['segment_loaded'].format(count=len(segment)))
     
     # Manual number input
     st.markdown("---")
@@ -187,6 +458,11 @@ with st.sidebar:
                     normalized = normalize_phone_number(num)
                     if normalized:
                         numbers.append(normalized)
+            suppressed = len(numbers)
+            numbers = suppression.filter(numbers)
+            suppressed -= len(numbers)
+            if suppressed:
+                st.info(t['suppressed'].format(count=suppressed))
             
             if numbers:
                 st.session_state.numbers_list.extend(numbers)
@@ -194,6 +470,15 @@ with st.sidebar:
                 st.success(f"✅ {t['success']} تمت إضافة {len(numbers)} رقم" if lang == 'ar' else f"✅ {t['success']} Added {len(numbers)} numbers")
             else:
                 st.error(f"❌ {t['failed']} لم يتم العثور على أرقام هاتف صحيحة" if lang == 'ar' else f"❌ {t['failed']} No valid phone numbers found")
+    
+    # Cleaned list download (works in extraction-only mode too)
+    if st.session_state.numbers_list:
+        st.download_button(
+            t['download_numbers'],
+            data=pd.DataFrame({'phone': st.session_state.numbers_list}).to_csv(index=False).encode('utf-8'),
+            file_name="numbers_cleaned.csv",
+            mime="text/csv"
+        )
 
 # Main content area
 col1, col2 = st.columns([1, 1])
@@ -210,27 +495,43 @@ with col1:
     )
     st.session_state.message_text = message_text
     
+    # Columns from the uploaded file can be used as {placeholders}
+    if st.session_state.records is not None:
+        placeholders = ' '.join('{' + str(col) + '}' for col in st.session_state.records.columns)
+        st.caption(t['template_fields'].format(fields=placeholders))
+    
     # Image upload
     st.markdown("---")
-    uploaded_image = st.file_uploader(
+    uploaded_images = st.file_uploader(
         t['upload_image'],
         type=['jpg', 'jpeg', 'png', 'gif'],
+        accept_multiple_files=True,
         help=t['tip2']
     )
     
-    if uploaded_image is not None:
-        st.session_state.image_file = uploaded_image
+    if uploaded_images:
+        # Stored once per upload (not on every rerun); identical images share one file
+        upload_id = tuple(getattr(image, 'file_id', None) or (image.name, image.size) for image in uploaded_images)
+        if st.session_state.image_upload_id != upload_id:
+            st.session_state.image_shas = [get_media_store().put_upload(image) for image in uploaded_images]
+            st.session_state.image_upload_id = upload_id
         # Make image more visible with larger display
         st.markdown("**" + ("معاينة الصورة" if lang == 'ar' else "Image Preview") + ":**")
-        # Display image - compatible with all Streamlit versions
-        try:
-            # Try with use_container_width for newer versions
-            st.image(uploaded_image, caption=uploaded_image.name, use_container_width=True)
-        except TypeError:
-            # Fallback for older Streamlit versions that don't support use_container_width
-            st.image(uploaded_image, caption=uploaded_image.name)
+        if len(uploaded_images) > 1:
+            st.caption(t['album'].format(count=len(uploaded_images)))
+        preview_cols = st.columns(min(len(uploaded_images), 3))
+        for i, image in enumerate(uploaded_images):
+            with preview_cols[i % len(preview_cols)]:
+                # Display image - compatible with all Streamlit versions
+                try:
+                    # Try with use_container_width for newer versions
+                    st.image(image, caption=image.name, use_container_width=True)
+                except TypeError:
+                    # Fallback for older Streamlit versions that don't support use_container_width
+                    st.image(image, caption=image.name)
     else:
-        st.session_state.image_file = None
+        st.session_state.image_shas = []
+        st.session_state.image_upload_id = None
 
 with col2:
     st.header(t['phone_numbers_list'])
@@ -250,13 +551,58 @@ with col2:
                     st.success(f"{t['success']} {num}")
                 elif status == "failed":
                     st.error(f"{t['failed']} {num}")
+                elif status == "exhausted":
+                    st.error(f"{t['exhausted']} {num} ({'فشل بعد عدة محاولات' if lang == 'ar' else 'failed after retries'})")
+                elif status == "retrying":
+                    st.warning(f"{t['retrying']} {num} ({'سيتم إعادة المحاولة' if lang == 'ar' else 'will retry'})")
                 elif status == "sending":
                     st.warning(f"{t['sending']} {num} ({'جاري الإرسال...' if lang == 'ar' else 'sending...'})")
+                elif status == "skipped":
+                    st.info(f"{t['skipped']} {num}")
                 else:
                     st.write(f"{t['pending']} {num}")
     else:
         st.info("👆 " + ("قم برفع ملف CSV/Excel أو أدخل الأرقام يدوياً في الشريط الجانبي" if lang == 'ar' else "Upload a CSV/Excel file or enter numbers manually in the sidebar"))
 
+def template_preflight(message: str):
+    """
+    Compile the message template and check every recipient has its fields.
+    
+    Only {placeholders} naming a file column are fields; other braces are
+    sent as written. Returns None for a plain message, otherwise a dict
+    with the compiled 'template' and the 'records' aligned to numbers_list,
+    or an 'error'.
+    """
+    if not message:
+        return None
+    
+    # Align file columns to the current list (manually added numbers have no fields)
+    if st.session_state.records is not None:
+        phone_col = st.session_state.records.attrs['phone_column']
+        records = (st.session_state.records.set_index(phone_col)
+                   .reindex(st.session_state.numbers_list)
+                   .rename_axis(phone_col).reset_index())
+    else:
+        records = pd.DataFrame({'phone': st.session_state.numbers_list})
+    
+    try:
+        template = compile_template(message, columns=records.columns)
+    except ValueError as e:
+        return {'error': t['invalid_template'].format(error=str(e))}
+    if template.is_static:
+        return None
+    
+    missing = find_missing_fields(template, records)
+    if missing:
+        details = ', '.join(f"{{{field}}} ({count})" for field, count in missing.items())
+        return {'error': t['missing_fields'].format(fields=details)}
+    bad_format = find_format_errors(template, records)
+    if bad_format:
+        details = ', '.join(f"{{{field}:{template.formats[field][1]}}} ({count})"
+                            for field, count in bad_format.items())
+        return {'error': t['format_errors'].format(fields=details)}
+    return {'template': template, 'records': records}
+
 # Send button and status
 st.markdown("---")
 col_btn1, col_btn2, col_status = st.columns([1, 1, 2])
@@ -265,7 +611,7 @@ with col_btn1:
     send_button = st.button(
         t['send_messages'],
         type="primary",
-        disabled=st.session_state.is_sending or not st.session_state.numbers_list
+        disabled=EXTRACT_ONLY or st.session_state.is_sending or not st.session_state.numbers_list
     )
 
 with col_btn2:
@@ -276,45 +622,83 @@ with col_btn2:
 
 if clear_button:
     st.session_state.numbers_list = []
+    st.session_state.records = None
     st.session_state.message_text = ""
-    st.session_state.image_file = None
+    st.session_state.image_shas = []
+    st.session_state.image_upload_id = None
     st.session_state.sending_status = {}
     st.rerun()
 
+# Duration forecast before sending
+forecast = None
+has_content = bool(st.session_state.message_text.strip()) or bool(st.session_state.image_shas)
+if st.session_state.numbers_list and has_content:
+    forecast = forecast_campaign(
+        count=len(st.session_state.numbers_list),
+        content=content_type(bool(st.session_state.message_text.strip()), bool(st.session_state.image_shas)),
+        navigation=navigation,
+        pause_seconds=pause_seconds,
+        images=max(len(st.session_state.image_shas), 1)
+    )
+    with col_status:
+        st.info(t['forecast'].format(duration=format_duration(forecast['total_seconds']),
+                                     per_hour=int(forecast['per_hour'])))
+
 # Status display
 if st.session_state.is_sending:
     st.info(t['sending_in_progress'])
 
 # Handle send button click
 if send_button and not st.session_state.is_sending:
+    preflight = template_preflight(st.session_state.message_text)
     if not st.session_state.numbers_list:
         st.error(t['no_numbers'])
-    elif not st.session_state.message_text and not st.session_state.image_file:
+    elif not st.session_state.message_text and not st.session_state.image_shas:
         st.error(t['no_content'])
+    elif preflight and 'error' in preflight:
+        st.error(preflight['error'])
+    elif (sender := load_sender())[0] is None:
+        st.error(t['automation_unavailable'].format(error=sender[1]))
     else:
+        send_messages_from_ui = sender[0]
         st.session_state.is_sending = True
         st.session_state.sending_status = {num: "pending" for num in st.session_state.numbers_list}
         
-        # Save image temporarily if uploaded
-        image_path = None
-        if st.session_state.image_file:
-            # Create temp directory if it doesn't exist
-            temp_dir = Path("temp_uploads")
-            temp_dir.mkdir(exist_ok=True)
-            
-            # Save uploaded image
-            image_path = temp_dir / st.session_state.image_file.name
-            with open(image_path, "wb") as f:
-                f.write(st.session_state.image_file.getbuffer())
+        # The images are already in the media store; keep them from eviction while sending
+        image_shas = list(st.session_state.image_shas)
+        for sha in image_shas:
+            get_media_store().acquire(sha)
+        image_paths = [get_media_store().path(sha) for sha in image_shas]
         
         # Create status callback function
+        eta = EtaEstimator(
+            total=len(st.session_state.numbers_list),
+            per_recipient=forecast['per_recipient'] + pause_seconds if forecast else 30
+        )
+        
         def update_status(number, status):
             st.session_state.sending_status[number] = status
+            if status == "success":
+                store.mark_sent([number])
+            # Live progress and ETA once a recipient is finished
+            if status == "skipped":
+                eta.skip()
+            elif status in ("success", "failed", "exhausted"):
+                eta.update()
+            else:
+                return
+            progress_bar.progress(eta.progress)
+            status_text.text(t['eta'].format(done=eta.done, total=eta.total, eta=format_duration(eta.eta_seconds)))
         
         # Start sending
         try:
             st.info(t['starting'])
             
+            # Outcomes are written to disk as they happen
+            results_path = default_results_path(results_format)
+            st.caption(t['results_saved'].format(path=results_path))
+            profile_path = default_profile_path() if st.session_state.get('profiling') else None
+            
             # Create progress bar
             progress_bar = st.progress(0)
             status_text = st.empty()
@@ -323,26 +707,54 @@ if send_button and not st.session_state.is_sending:
             results = send_messages_from_ui(
                 numbers=st.session_state.numbers_list,
                 message=st.session_state.message_text,
-                image_path=str(image_path) if image_path else None,
+                image_paths=image_paths,
                 status_callback=update_status,
-                close_tabs=False  # Don't close tabs automatically in UI mode
+                close_tabs=False,  # Don't close tabs automatically in UI mode
+                fields=iter_fields(preflight['template'], preflight['records']) if preflight else None,
+                template=preflight['template'] if preflight else None,
+                force_resend=force_resend,
+                navigation=navigation,
+                pause_seconds=pause_seconds,
+                priority=priority,
+                deadline=time.time() + deadline_minutes * 60 if deadline_minutes else None,
+                results_path=results_path,
+                profile_path=profile_path
             )
             
             # Update final statuses
             for num, result in results.items():
-                st.session_state.sending_status[num] = "success" if result else "failed"
+                if result:
+                    st.session_state.sending_status[num] = "success"
+                elif st.session_state.sending_status.get(num) != "exhausted":
+                    st.session_state.sending_status[num] = "failed"
             
             st.session_state.is_sending = False
             progress_bar.progress(1.0)
             
             # Show final summary
             success_count = sum(1 for s in st.session_state.sending_status.values() if s == "success")
-            failed_count = sum(1 for s in st.session_state.sending_status.values() if s == "failed")
+            permanent_count = sum(1 for s in st.session_state.sending_status.values() if s == "failed")
+            exhausted_count = sum(1 for s in st.session_state.sending_status.values() if s == "exhausted")
+            failed_count = permanent_count + exhausted_count
+            skipped_count = sum(1 for s in st.session_state.sending_status.values() if s == "skipped")
             
             if failed_count == 0:
                 st.success(t['completed_all'])
             else:
                 st.warning(t['completed_with_errors'].format(success=success_count, failed=failed_count))
+                st.info(t['failed_breakdown'].format(permanent=permanent_count, exhausted=exhausted_count))
+            if skipped_count:
+                st.info(t['skipped_duplicates'].format(count=skipped_count))
+            if os.path.exists(results_path):
+                st.download_button(t['download_results'], results_bytes(results_path),
+                                   file_name=os.path.basename(results_path))
+            if profile_path and os.path.exists(profile_path):
+                with st.expander(t['profile_saved'].format(path=profile_path)):
+                    with open(os.path.splitext(profile_path)[0] + ".txt", encoding="utf-8") as f:
+                        st.code(f.read())
+                    with open(profile_path, "rb") as f:
+                        st.download_button(t['download_profile'], f.read(),
+                                           file_name=os.path.basename(profile_path))
             
         except Exception as e:
             st.error(f"❌ {t['failed']} خطأ: {str(e)}" if lang == 'ar' else f"❌ {t['failed']} Error: {str(e)}")
@@ -352,12 +764,8 @@ if send_button and not st.session_state.is_sending:
                 st.session_state.sending_status[num] = "failed"
         
         finally:
-            # Clean up temp image if exists
-            if image_path and image_path.exists():
-                try:
-                    image_path.unlink()
-                except:
-                    pass
+            for sha in image_shas:
+                get_media_store().release(sha)
 
 # Footer
 st.markdown("---")